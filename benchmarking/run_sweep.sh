@@ -0,0 +1,25 @@
+#!/bin/bash
+# run_sweep.sh
+
+python src/evaluator.py \
+--mode sweep \
+--model-names "llama3-8b" \
+--results-dir "./data/results/llmperf" \
+--concurrency-levels "1 2 4 8 16 32" \
+--num-input-tokens "1000" \
+--num-output-tokens "1000" \
+--num-requests-per-concurrency 4 \
+--output-format csv \
+--timeout 600 \
+--llm-api sncloud
+
+# Notes:
+# 1. Every combination of concurrency level, number of input tokens and number of output tokens is evaluated.
+#   For example, to evaluate two prompt sizes:
+#      --num-input-tokens "1000 4000"
+#
+# 2. Each run sends (concurrency level x num-requests-per-concurrency) requests, and its summary is appended to a
+#   consolidated `<MODEL_NAME>_sweep_summary.csv` (or `.parquet`) file as soon as it finishes.
+#
+# 3. The saturation point (the concurrency level beyond which the output throughput stops growing while the p99 TTFT
+#   keeps climbing) of each prompt size is saved to `<MODEL_NAME>_sweep_saturation.json`.
@@ -0,0 +1,446 @@
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import socket
+import struct
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from benchmarking.src.llmperf.llmperf_utils import get_tokenizer
+from benchmarking.src.llmperf.models import LLMResponse, RequestConfig
+from benchmarking.src.performance_evaluation import BasePerformanceEvaluator, LoadGenerator
+
+logger = logging.getLogger(__name__)
+
+# Messages are JSON documents prefixed with their length as a 4 bytes big endian unsigned integer
+MESSAGE_HEADER = struct.Struct('>I')
+LOCAL_WORKER_HOST = '127.0.0.1'
+WORKER_CONNECT_TIMEOUT = 30
+# Environment variable holding the secret shared by the coordinator and its remote workers
+WORKER_AUTHKEY_ENV_VARIABLE = 'BENCHMARKING_WORKER_AUTHKEY'
+AUTH_CHALLENGE_SIZE = 32
+# Max size of the messages received before the coordinator is authenticated
+MAX_AUTH_MESSAGE_SIZE = 1024
+# Load generator settings a coordinator can set on a worker
+WORKER_LOAD_CONFIG_FIELDS = ('engine', 'num_concurrent_requests')
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]) -> None:
+    """Sends a length prefixed JSON message
+
+    Args:
+        connection (socket.socket): connected socket
+        message (dict): message to send
+    """
+    payload = json.dumps(message, default=str).encode('utf-8')
+    connection.sendall(MESSAGE_HEADER.pack(len(payload)) + payload)
+
+
+def receive_exactly(connection: socket.socket, num_bytes: int) -> bytes:
+    """Receives exactly `num_bytes` bytes
+
+    Args:
+        connection (socket.socket): connected socket
+        num_bytes (int): number of bytes to receive
+
+    Returns:
+        bytes: received bytes, empty if the connection was closed before any byte was received
+
+    Raises:
+        ConnectionError: If the connection is closed in the middle of a message.
+    """
+    chunks = []
+    num_received_bytes = 0
+    while num_received_bytes < num_bytes:
+        chunk = connection.recv(min(num_bytes - num_received_bytes, 1 << 20))
+        if not chunk:
+            if num_received_bytes == 0:
+                return b''
+            raise ConnectionError('Connection closed in the middle of a message')
+        chunks.append(chunk)
+        num_received_bytes += len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(connection: socket.socket, max_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Receives a length prefixed JSON message
+
+    Args:
+        connection (socket.socket): connected socket
+        max_size (int, optional): max size of the message payload in bytes. Defaults to None, no limit.
+
+    Returns:
+        dict: received message, None if the connection was closed
+
+    Raises:
+        ConnectionError: If the message is larger than `max_size`.
+    """
+    header = receive_exactly(connection, MESSAGE_HEADER.size)
+    if not header:
+        return None
+    (payload_size,) = MESSAGE_HEADER.unpack(header)
+    if max_size is not None and payload_size > max_size:
+        raise ConnectionError(f'Message of {payload_size} bytes is larger than {max_size} bytes')
+    message: Dict[str, Any] = json.loads(receive_exactly(connection, payload_size).decode('utf-8'))
+    return message
+
+
+def get_worker_authkey() -> Optional[bytes]:
+    """Gets the secret shared by the coordinator and its workers from the environment
+
+    Returns:
+        bytes: shared secret, None if it is not set
+    """
+    authkey = os.environ.get(WORKER_AUTHKEY_ENV_VARIABLE)
+    return authkey.encode('utf-8') if authkey else None
+
+
+def get_challenge_digest(authkey: bytes, challenge: str) -> str:
+    return hmac.new(authkey, bytes.fromhex(challenge), hashlib.sha256).hexdigest()
+
+
+def deliver_challenge(connection: socket.socket, authkey: bytes) -> bool:
+    """Authenticates the coordinator of a connection: the worker sends a random challenge, which the coordinator has
+    to answer with its HMAC keyed by the shared secret
+
+    Args:
+        connection (socket.socket): connection to the coordinator
+        authkey (bytes): shared secret
+
+    Returns:
+        bool: whether the coordinator knows the shared secret
+    """
+    challenge = secrets.token_hex(AUTH_CHALLENGE_SIZE)
+    send_message(connection, {'type': 'challenge', 'challenge': challenge})
+    message = receive_message(connection, MAX_AUTH_MESSAGE_SIZE)
+    if message is None or message.get('type') != 'answer' or not isinstance(message.get('digest'), str):
+        return False
+    return hmac.compare_digest(message['digest'], get_challenge_digest(authkey, challenge))
+
+
+def answer_challenge(connection: socket.socket, authkey: bytes) -> None:
+    """Answers the authentication challenge of a worker, see deliver_challenge
+
+    Args:
+        connection (socket.socket): connection to the worker
+        authkey (bytes): shared secret
+
+    Raises:
+        ConnectionError: If the worker didn't send a challenge.
+    """
+    message = receive_message(connection, MAX_AUTH_MESSAGE_SIZE)
+    if message is None or message.get('type') != 'challenge':
+        raise ConnectionError('Worker did not send an authentication challenge')
+    send_message(connection, {'type': 'answer', 'digest': get_challenge_digest(authkey, message['challenge'])})
+
+
+def run_shard(
+    load_generator: LoadGenerator, request_configs: List[RequestConfig], schedule: Optional[List[float]]
+) -> List[LLMResponse]:
+    """Sends a shard of the requests of a run, from its synchronized start
+
+    Args:
+        load_generator (LoadGenerator): load generator of the worker
+        request_configs (list): request configs of the shard
+        schedule (list, optional): scheduled send offsets of the shard requests, for open loop runs
+
+    Returns:
+        List[LLMResponse]: list of completed responses
+    """
+    progress_bar = tqdm(total=len(request_configs), disable=True)
+    start_time = time.monotonic()
+    if schedule is not None:
+        return load_generator.execute_scheduled_requests(request_configs, progress_bar, start_time, schedule)
+    request_config_batches = load_generator.split_request_configs(request_configs)
+    return load_generator.execute_request_batches(request_config_batches, progress_bar, start_time)
+
+
+def serve_worker_connection(connection: socket.socket) -> None:
+    """Runs the shards a coordinator sends over a connection, until the coordinator closes it. A run is made of a
+    `prepare` message with the shard, answered with `ready` once the load generator is set up, and a `start` message,
+    answered with the shard `results` once all its requests are done.
+
+    Args:
+        connection (socket.socket): connection to the coordinator
+    """
+    load_generator: Optional[LoadGenerator] = None
+    request_configs: List[RequestConfig] = []
+    schedule: Optional[List[float]] = None
+
+    while True:
+        message = receive_message(connection)
+        if message is None:
+            return
+        try:
+            if message['type'] == 'prepare':
+                unknown_fields = set(message['load_config']).difference(WORKER_LOAD_CONFIG_FIELDS)
+                if len(unknown_fields) > 0:
+                    raise ValueError(f'Unsupported load config fields {sorted(unknown_fields)}')
+                # Tokenizers come from the process-wide registry, so each one is only loaded once per worker
+                load_generator = LoadGenerator(
+                    tokenizer=get_tokenizer(message['model_name'], lazy=True), **message['load_config']
+                )
+                # Workers read the endpoint credentials from their own environment
+                request_configs = [
+                    RequestConfig(**{**request_config, 'api_variables': {}})
+                    for request_config in message['request_configs']
+                ]
+                schedule = message['schedule']
+                send_message(connection, {'type': 'ready'})
+
+            elif message['type'] == 'start':
+                assert load_generator is not None, 'A shard must be prepared before being started'
+                load_generator.timeout = message['timeout']
+                llm_responses = run_shard(load_generator, request_configs, schedule)
+                send_message(
+                    connection,
+                    {'type': 'results', 'responses': [response.model_dump() for response in llm_responses]},
+                )
+
+            else:
+                raise ValueError(f'Unknown message type {message["type"]}')
+
+        except Exception:
+            send_message(connection, {'type': 'error', 'message': traceback.format_exc()})
+
+
+def run_worker_server(host: str, port: int, authkey: bytes, port_queue: Optional[Any] = None) -> None:
+    """Runs a worker server, which serves coordinator connections one after the other, forever. Only coordinators
+    that know the shared secret are served.
+
+    Args:
+        host (str): host to listen on
+        port (int): port to listen on, 0 to pick a free one
+        authkey (bytes): secret shared with the coordinator
+        port_queue (multiprocessing.Queue, optional): queue to report the listening port to, for local workers
+    """
+    with socket.create_server((host, port)) as server:
+        listening_port = server.getsockname()[1]
+        logger.info(f'Worker listening on {host}:{listening_port}')
+        if port_queue is not None:
+            port_queue.put(listening_port)
+        while True:
+            connection, address = server.accept()
+            with connection:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    connection.settimeout(WORKER_CONNECT_TIMEOUT)
+                    is_authenticated = deliver_challenge(connection, authkey)
+                    connection.settimeout(None)
+                except (OSError, ValueError) as e:
+                    logger.warning(f'Authentication of {address[0]}:{address[1]} failed: {e}')
+                    continue
+                if not is_authenticated:
+                    logger.warning(f'Rejected unauthenticated connection from {address[0]}:{address[1]}')
+                    continue
+                logger.info(f'Serving coordinator {address[0]}:{address[1]}')
+                serve_worker_connection(connection)
+
+
+class DistributedCoordinator:
+    """Spreads the requests of a run across worker processes, to get past the load a single Python process can
+    generate (GIL, tokenization and response parsing).
+
+    Workers are local processes spawned by the coordinator and/or remote worker servers, started with
+    `python src/evaluator.py --mode worker`. Each run is split into one shard per worker: closed loop runs split the
+    concurrent requests between workers, while open loop runs build the arrival schedule once and deal its requests
+    round robin. Workers get their shard first and are all started together once every one of them is ready, then
+    their responses are gathered, so the coordinator evaluator summarizes them as if it had sent them itself.
+
+    Workers only serve coordinators that answer their challenge with the secret they share, and read the endpoint
+    credentials from their own environment. Messages are not encrypted though, so remote workers should only be used
+    on trusted networks.
+    """
+
+    def __init__(
+        self, num_local_workers: int = 0, worker_hosts: List[str] = [], authkey: Optional[bytes] = None
+    ) -> None:
+        """
+        Args:
+            num_local_workers (int): number of worker processes to spawn on this machine
+            worker_hosts (list): `host:port` addresses of remote worker servers
+            authkey (bytes, optional): secret shared with the workers. Defaults to the value of the
+                BENCHMARKING_WORKER_AUTHKEY environment variable, which remote workers require, or to a random secret
+                for local workers only.
+        """
+        if num_local_workers < 0:
+            raise ValueError(f'num_local_workers must not be negative, got {num_local_workers}')
+        if num_local_workers == 0 and len(worker_hosts) == 0:
+            raise ValueError('At least one local worker or worker host is required')
+        authkey = authkey or get_worker_authkey()
+        if authkey is None and len(worker_hosts) > 0:
+            raise ValueError(f'Remote workers require a shared secret in the {WORKER_AUTHKEY_ENV_VARIABLE} variable')
+        self.authkey = authkey or secrets.token_bytes(AUTH_CHALLENGE_SIZE)
+        self.num_local_workers = num_local_workers
+        self.worker_addresses: List[Tuple[str, int]] = []
+        for worker_host in worker_hosts:
+            host, port = worker_host.rsplit(':', 1)
+            self.worker_addresses.append((host, int(port)))
+        self.local_workers: List[multiprocessing.process.BaseProcess] = []
+
+        # Time at which the workers of the last run were started, after they were set up
+        self.run_start_time: Optional[float] = None
+
+    def __enter__(self) -> 'DistributedCoordinator':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def start_local_workers(self) -> None:
+        """Spawns the local worker processes, once"""
+        if len(self.local_workers) == self.num_local_workers:
+            return
+        context = multiprocessing.get_context('spawn')
+        port_queue = context.Queue()
+        for _ in range(self.num_local_workers):
+            worker = context.Process(
+                target=run_worker_server, args=(LOCAL_WORKER_HOST, 0, self.authkey, port_queue), daemon=True
+            )
+            worker.start()
+            self.local_workers.append(worker)
+        for _ in range(self.num_local_workers):
+            self.worker_addresses.append((LOCAL_WORKER_HOST, port_queue.get(timeout=WORKER_CONNECT_TIMEOUT)))
+        logger.info(f'Started {self.num_local_workers} local workers')
+
+    def close(self) -> None:
+        """Stops the local worker processes"""
+        for worker in self.local_workers:
+            worker.terminate()
+            worker.join()
+        self.local_workers = []
+
+    def build_shards(
+        self, evaluator: BasePerformanceEvaluator, request_configs: List[RequestConfig]
+    ) -> List[Tuple[List[RequestConfig], int, Optional[List[float]]]]:
+        """Splits the requests of a run into one shard per worker, empty shards being dropped
+
+        Args:
+            evaluator (BasePerformanceEvaluator): coordinator evaluator
+            request_configs (list): request configs of the run
+
+        Returns:
+            list: request configs, number of concurrent requests and schedule (None for closed loop runs) of each
+            shard
+        """
+        num_workers = len(self.worker_addresses)
+        shards: List[Tuple[List[RequestConfig], int, Optional[List[float]]]] = []
+
+        if evaluator.arrival_process == 'closed':
+            # Every worker gets whole batches of requests, one per concurrent request
+            request_config_batches = evaluator.split_request_configs(request_configs)
+            for worker_idx in range(num_workers):
+                worker_batches = request_config_batches[worker_idx::num_workers]
+                shard_request_configs = [
+                    request_config for request_config_batch in worker_batches for request_config in request_config_batch
+                ]
+                if len(shard_request_configs) > 0:
+                    shards.append((shard_request_configs, len(worker_batches), None))
+        else:
+            schedule = evaluator.build_arrival_schedule(len(request_configs))
+            for worker_idx in range(num_workers):
+                shard_request_configs = request_configs[worker_idx::num_workers]
+                if len(shard_request_configs) > 0:
+                    shards.append((shard_request_configs, 1, schedule[worker_idx::num_workers]))
+
+        return shards
+
+    def execute_requests(
+        self, evaluator: BasePerformanceEvaluator, request_configs: List[RequestConfig], start_time: float
+    ) -> List[LLMResponse]:
+        """Executes the requests of a run on the workers
+
+        Args:
+            evaluator (BasePerformanceEvaluator): coordinator evaluator, whose load engine and arrival process are
+                used by the workers
+            request_configs (list): request configs of the run
+            start_time (float): start time of the process
+
+        Returns:
+            List[LLMResponse]: list of completed responses
+
+        Raises:
+            ValueError: If the evaluator holds API variables, which are never sent to the workers.
+            Exception: If a worker fails.
+        """
+        if evaluator.api_variables:
+            raise ValueError(
+                'Distributed runs do not send API variables to the workers, set the credentials in their environment'
+            )
+        self.start_local_workers()
+        shards = self.build_shards(evaluator, request_configs)
+
+        connections = []
+        try:
+            for address, (shard_request_configs, num_concurrent_requests, schedule) in zip(
+                self.worker_addresses, shards
+            ):
+                connection = socket.create_connection(address, timeout=WORKER_CONNECT_TIMEOUT)
+                connections.append((address, connection))
+                answer_challenge(connection, self.authkey)
+                connection.settimeout(None)
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                send_message(
+                    connection,
+                    {
+                        'type': 'prepare',
+                        'model_name': evaluator.model_name,
+                        'load_config': {'engine': evaluator.engine, 'num_concurrent_requests': num_concurrent_requests},
+                        'request_configs': [
+                            request_config.model_dump(exclude={'api_variables'})
+                            for request_config in shard_request_configs
+                        ],
+                        'schedule': schedule,
+                    },
+                )
+
+            # Wait for every worker to be ready, then start them all together with the remaining time of the run
+            for address, connection in connections:
+                self.check_response(address, receive_message(connection), 'ready')
+            self.run_start_time = time.monotonic()
+            remaining_time = evaluator.timeout - (self.run_start_time - start_time)
+            for _, connection in connections:
+                send_message(connection, {'type': 'start', 'timeout': remaining_time})
+            logger.info(f'Started {len(connections)} workers')
+
+            llm_responses: List[LLMResponse] = []
+            for address, connection in connections:
+                message = self.check_response(address, receive_message(connection), 'results')
+                llm_responses.extend(LLMResponse(**response) for response in message['responses'])
+            return llm_responses
+
+        finally:
+            for _, connection in connections:
+                connection.close()
+
+    @staticmethod
+    def check_response(
+        address: Tuple[str, int], message: Optional[Dict[str, Any]], expected_type: str
+    ) -> Dict[str, Any]:
+        """Checks a worker response has the expected type
+
+        Args:
+            address (tuple): worker host and port
+            message (dict): worker response
+            expected_type (str): expected message type
+
+        Returns:
+            dict: worker response
+
+        Raises:
+            Exception: If the worker failed or closed the connection.
+        """
+        if message is None:
+            raise Exception(f'Worker {address[0]}:{address[1]} closed the connection')
+        if message['type'] == 'error':
+            raise Exception(f'Worker {address[0]}:{address[1]} failed:\n{message["message"]}')
+        if message['type'] != expected_type:
+            raise Exception(f'Unexpected {message["type"]} message from worker {address[0]}:{address[1]}')
+        return message
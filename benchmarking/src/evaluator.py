@@ -37,40 +37,67 @@ def str2bool(value: str) -> bool:
 
 
 def main() -> None:
+    from benchmarking.src.distributed_performance_evaluation import (
+        WORKER_AUTHKEY_ENV_VARIABLE,
+        DistributedCoordinator,
+        get_worker_authkey,
+        run_worker_server,
+    )
     from benchmarking.src.performance_evaluation import CustomPerformanceEvaluator, SyntheticPerformanceEvaluator
+    from benchmarking.src.sweep_performance_evaluation import SweepPerformanceEvaluator
+
+    # Worker servers only need a host and a port
+    mode_parser = argparse.ArgumentParser(add_help=False)
+    mode_parser.add_argument('--mode')
+    is_worker_mode = mode_parser.parse_known_args()[0].mode == 'worker'
 
     parser = argparse.ArgumentParser(
-        description="""Run a token throughput and latency benchmark. You have the option of running in two different 
-            modes - 'custom' or 'synthetic'.
+        description="""Run a token throughput and latency benchmark. You have the option of running in three different 
+            modes - 'custom', 'synthetic' or 'sweep'.
             
             Custom: You provide your own dataset via the `input-file-path argument. We will run the performance 
                     evaluation with the provided dataset.
                     
             Synthetic: You provide the number of input tokens, number of output tokens, and number of requests. We 
-                    will generate n input prompts for you where n is the number of requests specified."""
+                    will generate n input prompts for you where n is the number of requests specified.
+
+            Sweep: You provide lists of concurrency levels, input tokens and output tokens. We will run a synthetic
+                    evaluation for every combination and report the saturation point of the endpoint.
+
+            Worker: You provide a host and a port. We will run a worker server that sends the requests of the runs
+                    distributed to it by other machines with the `worker-hosts` argument."""
     )
 
     # Distinguish between custom and synthetic dataset runs
     parser.add_argument(
         '--mode',
-        choices=['custom', 'synthetic'],
+        choices=['custom', 'synthetic', 'sweep', 'worker'],
         required=True,
-        help="""Run mode for the performance evaluation. You have two options to choose from - 'custom' or 'synthetic'.
+        help="""Run mode for the performance evaluation. You have four options to choose from - 'custom', 'synthetic',
+            'sweep' or 'worker'.
             
             Custom: You provide your own dataset via the `input-file-path argument. We will run the performance 
                     evaluation with the provided dataset.
                 
             Synthetic: You provide the number of input tokens, number of output tokens, and number of requests. We 
-                    will generate n input prompts for you where n is the number of requests specified.""",
+                    will generate n input prompts for you where n is the number of requests specified.
+
+            Sweep: You provide lists of concurrency levels, input tokens and output tokens. We will run a synthetic
+                    evaluation for every combination and report the saturation point of the endpoint.
+
+            Worker: You provide a host and a port. We will run a worker server that sends the requests of the runs
+                    distributed to it by other machines with the `worker-hosts` argument.""",
     )
 
     # Required Common Argurments
-    parser.add_argument('--results-dir', type=str, required=True, help='The output directory to save the results to.')
+    parser.add_argument(
+        '--results-dir', type=str, required=not is_worker_mode, help='The output directory to save the results to.'
+    )
 
     parser.add_argument(
         '--llm-api',
         type=str,
-        required=True,
+        required=not is_worker_mode,
         default='sncloud',
         help="The LLM API type. It could be either 'sambastudio' or 'sncloud'. Default value: 'sncloud'",
     )
@@ -91,6 +118,81 @@ def main() -> None:
         help='The amount of time to run the load test for. (default: %(default)s)',
     )
 
+    parser.add_argument(
+        '--engine',
+        choices=['threads', 'asyncio'],
+        required=False,
+        default='threads',
+        help="""The load generation engine. 'threads' runs one thread per concurrent request, while 'asyncio' runs
+            all concurrent requests as coroutines over a pooled HTTP client. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--arrival-process',
+        choices=['closed', 'fixed', 'poisson', 'trace'],
+        required=False,
+        default='closed',
+        help="""The request arrival process. 'closed' sends each request after the previous one of the same
+            concurrent request finishes. 'fixed', 'poisson' and 'trace' send requests in open loop at a fixed rate,
+            with Poisson arrivals, or replaying the arrival timestamps of a trace file, regardless of the number of
+            concurrent requests. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--qps',
+        type=float,
+        required=False,
+        default=None,
+        help="The target number of requests per second for the 'fixed' and 'poisson' arrival processes.",
+    )
+
+    parser.add_argument(
+        '--trace-file-path',
+        type=str,
+        required=False,
+        default=None,
+        help="""The path to the trace file for the 'trace' arrival process, with one arrival timestamp in seconds
+            per line.""",
+    )
+
+    parser.add_argument(
+        '--results-format',
+        choices=['json', 'jsonl', 'parquet'],
+        required=False,
+        default='json',
+        help="""The individual responses file format. 'json' keeps the responses in memory and saves them at the end
+            of the run, while 'jsonl' and 'parquet' write each response as it completes, keeping memory flat and the
+            completed responses if the run is interrupted. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--quantile-sketch',
+        type=str2bool,
+        required=False,
+        default=False,
+        help="""Whether to summarize the metrics with mergeable quantile sketches instead of exact quantiles. Memory
+            doesn't grow with the number of requests, and the sketches saved next to the summary can be merged
+            across workers and runs. Quantiles are within 1%% of their exact values. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--num-workers',
+        type=int,
+        required=False,
+        default=0,
+        help="""The number of local worker processes to spread the requests across, to generate more load than a
+            single process can. 0 sends the requests from this process. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--worker-hosts',
+        type=str,
+        required=False,
+        default='',
+        help="""The host:port addresses of remote worker servers to spread the requests across, separated by spaces.
+            Workers are started with `--mode worker`. (default: %(default)s)""",
+    )
+
     parser.add_argument(
         '--metadata',
         type=str,
@@ -117,106 +219,227 @@ def main() -> None:
             key, value = item.split('=')
             user_metadata[key] = value
 
-    # Custom dataset evaluation path
-    if args.mode == 'custom':
-        # Custom dataset specific arguments
-        parser.add_argument(
-            '--model-name',
-            type=str,
-            required=True,
-            help='The name of the model to use for this performance evaluation.',
-        )
-
-        parser.add_argument(
-            '--input-file-path',
-            type=str,
-            required=True,
-            help='The absolute path to the dataset to be used for running the custom performance evaluation.',
-        )
-
+    # Worker server path
+    if args.mode == 'worker':
         parser.add_argument(
-            '--save-llm-responses',
-            type=str2bool,
-            required=False,
-            default=False,
-            help='Whether to save the llm responses to an output JSONL file. (default: %(default)s)',
+            '--host', type=str, default='127.0.0.1', help='The host to listen on. (default: %(default)s)'
         )
-
-        # Parse arguments and instantiate evaluator
+        parser.add_argument('--port', type=int, default=5555, help='The port to listen on. (default: %(default)s)')
         args = parser.parse_args()
-        custom_evaluator = CustomPerformanceEvaluator(
-            model_name=args.model_name,
-            results_dir=args.results_dir,
-            num_concurrent_requests=args.num_concurrent_requests,
-            timeout=args.timeout,
-            user_metadata=user_metadata,
-            input_file_path=args.input_file_path,
-            save_response_texts=args.save_llm_responses,
-            llm_api=args.llm_api,
-        )
-
-        # Run performance evaluation
-        custom_evaluator.run_benchmark(sampling_params=json.loads(args.sampling_params))
+        authkey = get_worker_authkey()
+        if authkey is None:
+            raise ValueError(f'Workers require a shared secret in the {WORKER_AUTHKEY_ENV_VARIABLE} variable')
+        run_worker_server(args.host, args.port, authkey)
+        return
+
+    # Spread the requests across worker processes if any, the same workers being reused by every run
+    coordinator = None
+    worker_hosts = args.worker_hosts.strip().split()
+    if args.num_workers > 0 or len(worker_hosts) > 0:
+        coordinator = DistributedCoordinator(num_local_workers=args.num_workers, worker_hosts=worker_hosts)
+
+    try:
+        # Custom dataset evaluation path
+        if args.mode == 'custom':
+            # Custom dataset specific arguments
+            parser.add_argument(
+                '--model-name',
+                type=str,
+                required=True,
+                help='The name of the model to use for this performance evaluation.',
+            )
 
-    # Synthetic dataset evaluation path
-    elif args.mode == 'synthetic':
-        # Synthetic dataset specific arguments
-        parser.add_argument(
-            '--model-names',
-            type=str,
-            required=True,
-            help='The name of the models to use for this performance evaluation.',
-        )
+            parser.add_argument(
+                '--input-file-path',
+                type=str,
+                required=True,
+                help='The absolute path to the dataset to be used for running the custom performance evaluation.',
+            )
 
-        parser.add_argument(
-            '--num-input-tokens',
-            type=int,
-            default=550,
-            help="""The number of tokens to include in the prompt for each request made from the synthetic 
-                dataset. (default: %(default)s)""",
-        )
-        parser.add_argument(
-            '--num-output-tokens',
-            type=int,
-            default=150,
-            help="""The number of tokens to generate from each llm request. This is the `max_tokens` param for the 
-                completions API. (default: %(default)s)""",
-        )
-        parser.add_argument(
-            '--num-requests',
-            type=int,
-            default=10,
-            help="""The number of requests to make from the synthetic dataset. Note that it is possible for the test 
-                to timeout first. (default: %(default)s)""",
-        )
+            parser.add_argument(
+                '--save-llm-responses',
+                type=str2bool,
+                required=False,
+                default=False,
+                help='Whether to save the llm responses to an output JSONL file. (default: %(default)s)',
+            )
 
-        # Parse arguments and instantiate evaluator
-        args = parser.parse_args()
-        model_names = args.model_names.strip().split()
-
-        # running perf eval for multiple coe models
-        for model_idx, model_name in enumerate(model_names):
-            user_metadata['model_idx'] = model_idx
-            # set synthetic evaluator
-            evaluator = SyntheticPerformanceEvaluator(
-                model_name=model_name,
+            # Parse arguments and instantiate evaluator
+            args = parser.parse_args()
+            custom_evaluator = CustomPerformanceEvaluator(
+                model_name=args.model_name,
                 results_dir=args.results_dir,
                 num_concurrent_requests=args.num_concurrent_requests,
                 timeout=args.timeout,
                 user_metadata=user_metadata,
+                input_file_path=args.input_file_path,
+                save_response_texts=args.save_llm_responses,
                 llm_api=args.llm_api,
+                engine=args.engine,
+                arrival_process=args.arrival_process,
+                qps=args.qps,
+                trace_file_path=args.trace_file_path,
+                results_format=args.results_format,
+                quantile_sketch=args.quantile_sketch,
+                coordinator=coordinator,
             )
 
             # Run performance evaluation
-            evaluator.run_benchmark(
-                num_input_tokens=args.num_input_tokens,
-                num_output_tokens=args.num_output_tokens,
-                num_requests=args.num_requests,
-                sampling_params=json.loads(args.sampling_params),
+            custom_evaluator.run_benchmark(sampling_params=json.loads(args.sampling_params))
+
+        # Synthetic dataset evaluation path
+        elif args.mode == 'synthetic':
+            # Synthetic dataset specific arguments
+            parser.add_argument(
+                '--model-names',
+                type=str,
+                required=True,
+                help='The name of the models to use for this performance evaluation.',
             )
 
-    else:
-        raise Exception("Performance eval mode not valid. Available values are 'custom', 'synthetic'")
+            parser.add_argument(
+                '--num-input-tokens',
+                type=int,
+                default=550,
+                help="""The number of tokens to include in the prompt for each request made from the synthetic 
+                    dataset. (default: %(default)s)""",
+            )
+            parser.add_argument(
+                '--num-output-tokens',
+                type=int,
+                default=150,
+                help="""The number of tokens to generate from each llm request. This is the `max_tokens` param for the 
+                    completions API. (default: %(default)s)""",
+            )
+            parser.add_argument(
+                '--num-requests',
+                type=int,
+                default=10,
+                help="""The number of requests to make from the synthetic dataset. Note that it is possible for the
+                    test to timeout first. (default: %(default)s)""",
+            )
+
+            # Parse arguments and instantiate evaluator
+            args = parser.parse_args()
+            model_names = args.model_names.strip().split()
+
+            # running perf eval for multiple coe models
+            for model_idx, model_name in enumerate(model_names):
+                user_metadata['model_idx'] = model_idx
+                # set synthetic evaluator
+                evaluator = SyntheticPerformanceEvaluator(
+                    model_name=model_name,
+                    results_dir=args.results_dir,
+                    num_concurrent_requests=args.num_concurrent_requests,
+                    timeout=args.timeout,
+                    user_metadata=user_metadata,
+                    llm_api=args.llm_api,
+                    engine=args.engine,
+                    arrival_process=args.arrival_process,
+                    qps=args.qps,
+                    trace_file_path=args.trace_file_path,
+                    results_format=args.results_format,
+                    quantile_sketch=args.quantile_sketch,
+                    coordinator=coordinator,
+                )
+
+                # Run performance evaluation
+                evaluator.run_benchmark(
+                    num_input_tokens=args.num_input_tokens,
+                    num_output_tokens=args.num_output_tokens,
+                    num_requests=args.num_requests,
+                    sampling_params=json.loads(args.sampling_params),
+                )
+
+        # Concurrency sweep evaluation path
+        elif args.mode == 'sweep':
+            # Sweep specific arguments
+            parser.add_argument(
+                '--model-names',
+                type=str,
+                required=True,
+                help='The name of the models to use for this performance evaluation.',
+            )
+            parser.add_argument(
+                '--concurrency-levels',
+                type=str,
+                required=True,
+                help='Space separated list of number of concurrent requests to evaluate, e.g. "1 2 4 8 16".',
+            )
+            parser.add_argument(
+                '--num-input-tokens',
+                type=str,
+                default='550',
+                help='Space separated list of number of input tokens to evaluate. (default: %(default)s)',
+            )
+            parser.add_argument(
+                '--num-output-tokens',
+                type=str,
+                default='150',
+                help='Space separated list of number of output tokens to evaluate. (default: %(default)s)',
+            )
+            parser.add_argument(
+                '--num-requests-per-concurrency',
+                type=int,
+                default=4,
+                help="""The number of requests sent by each concurrent request in every run, so each run sends
+                    concurrency level x this value requests. (default: %(default)s)""",
+            )
+            parser.add_argument(
+                '--throughput-gain-threshold',
+                type=float,
+                default=0.05,
+                help="""Minimum relative output throughput gain between consecutive concurrency levels for the endpoint
+                    not to be considered saturated. (default: %(default)s)""",
+            )
+            parser.add_argument(
+                '--output-format',
+                choices=['csv', 'parquet'],
+                default='csv',
+                help='File format of the consolidated sweep summary. (default: %(default)s)',
+            )
+
+            # Parse arguments and instantiate evaluator
+            args = parser.parse_args()
+            model_names = args.model_names.strip().split()
+            concurrency_levels = [int(level) for level in args.concurrency_levels.strip().split()]
+            token_sizes = [
+                (int(num_input_tokens), int(num_output_tokens))
+                for num_input_tokens in args.num_input_tokens.strip().split()
+                for num_output_tokens in args.num_output_tokens.strip().split()
+            ]
+
+            # running sweep for multiple models
+            for model_idx, model_name in enumerate(model_names):
+                user_metadata['model_idx'] = model_idx
+                sweep_evaluator = SweepPerformanceEvaluator(
+                    model_name=model_name,
+                    results_dir=args.results_dir,
+                    concurrency_levels=concurrency_levels,
+                    token_sizes=token_sizes,
+                    num_requests_per_concurrency=args.num_requests_per_concurrency,
+                    throughput_gain_threshold=args.throughput_gain_threshold,
+                    output_format=args.output_format,
+                    user_metadata=user_metadata,
+                    timeout=args.timeout,
+                    llm_api=args.llm_api,
+                    engine=args.engine,
+                    results_format=args.results_format,
+                    quantile_sketch=args.quantile_sketch,
+                    coordinator=coordinator,
+                )
+
+                # Run concurrency sweep
+                sweep_evaluator.run_sweep(sampling_params=json.loads(args.sampling_params))
+
+        else:
+            raise Exception(
+                "Performance eval mode not valid. Available values are 'custom', 'synthetic', 'sweep', 'worker'"
+            )
+    finally:
+        # Stop the workers even when a run fails
+        if coordinator is not None:
+            coordinator.close()
 
 
 if __name__ == '__main__':
@@ -12,6 +12,14 @@ REQ_END_TIME = 'end_time'
 BATCH_SIZE_USED = 'batch_size_used'
 QUEUE_TIME = 'queue_time'
 
+# Open loop metrics
+SCHEDULED_SEND_TIME = 'scheduled_send_time_s'
+SEND_TIME = 'send_time_s'
+COMPLETION_TIME = 'completion_time_s'
+SEND_LAG = 'send_lag_s'
+OFFERED_LOAD = 'offered_requests_per_s'
+ACHIEVED_LOAD = 'achieved_requests_per_s'
+
 # Client-side metrics
 TTFT = 'client_ttft_s'
 E2E_LAT = 'client_end_to_end_latency_s'
@@ -5,6 +5,8 @@ from typing import Any, Dict, Generator, List, Optional, Tuple, Union
 
 from transformers import AutoTokenizer
 
+from utils.model_wrappers import tokenizer_registry
+
 SAMBANOVA_URL = 'https://api.sambanova.ai/v1/chat/completions'
 NUM_RNG_ATTEMPTS = 10  # Unlikely to be used in practice: prevents eternal WHILE-loops
 MODEL_TYPE_IDENTIFIER = {
@@ -53,14 +55,14 @@ class LLMPerfResults:
         return json.dumps(data)
 
 
-def get_tokenizer(model_name: str) -> AutoTokenizer:
-    """Gets generic tokenizer according to model type
+def get_tokenizer_name(model_name: str) -> str:
+    """Gets the HuggingFace Hub repo id of the generic tokenizer of a model type
 
     Args:
         model_name (str): model name
 
     Returns:
-        AutoTokenizer: generic HuggingFace tokenizer
+        str: tokenizer repo id
     """
     # Using NousrResearch for calling out model tokenizers without requesting access.
     # Ref: https://huggingface.co/NousResearch
@@ -71,21 +73,34 @@ def get_tokenizer(model_name: str) -> AutoTokenizer:
     # Ref: https://huggingface.co/yanolja
 
     if MODEL_TYPE_IDENTIFIER['mistral'] in model_name.lower().replace('-', ''):
-        tokenizer = AutoTokenizer.from_pretrained('TheBloke/Mistral-7B-Instruct-v0.2-AWQ')
+        return 'TheBloke/Mistral-7B-Instruct-v0.2-AWQ'
     elif MODEL_TYPE_IDENTIFIER['llama3'] in model_name.lower().replace('-', ''):
-        tokenizer = AutoTokenizer.from_pretrained('unsloth/llama-3-8b-Instruct')
+        return 'unsloth/llama-3-8b-Instruct'
     elif MODEL_TYPE_IDENTIFIER['deepseek'] in model_name.lower().replace('-', ''):
         if 'coder' in model_name.lower():
-            tokenizer = AutoTokenizer.from_pretrained('deepseek-ai/deepseek-coder-1.3b-base')
+            return 'deepseek-ai/deepseek-coder-1.3b-base'
         else:
-            tokenizer = AutoTokenizer.from_pretrained('deepseek-ai/deepseek-llm-7b-base')
+            return 'deepseek-ai/deepseek-llm-7b-base'
     elif MODEL_TYPE_IDENTIFIER['solar'] in model_name.lower().replace('-', ''):
-        tokenizer = AutoTokenizer.from_pretrained('upstage/SOLAR-10.7B-Instruct-v1.0')
+        return 'upstage/SOLAR-10.7B-Instruct-v1.0'
     elif MODEL_TYPE_IDENTIFIER['eeve'] in model_name.lower().replace('-', ''):
-        tokenizer = AutoTokenizer.from_pretrained('yanolja/EEVE-Korean-10.8B-v1.0')
+        return 'yanolja/EEVE-Korean-10.8B-v1.0'
     else:
-        tokenizer = AutoTokenizer.from_pretrained('NousResearch/Llama-2-7b-chat-hf')
-    return tokenizer
+        return 'NousResearch/Llama-2-7b-chat-hf'
+
+
+def get_tokenizer(model_name: str, lazy: bool = False) -> AutoTokenizer:
+    """Gets generic tokenizer according to model type. Tokenizers come from the process-wide tokenizer registry, so
+    each one is loaded once per process, and from the serialized tokenizer cache after the first download.
+
+    Args:
+        model_name (str): model name
+        lazy (bool): whether to return a proxy that loads the tokenizer on first use
+
+    Returns:
+        AutoTokenizer: generic HuggingFace tokenizer
+    """
+    return tokenizer_registry.get_tokenizer(get_tokenizer_name(model_name), lazy=lazy)
 
 
 def flatten(item: Union[Iterable[Union[str, Iterable[str]]], str]) -> Generator[str, None, None]:
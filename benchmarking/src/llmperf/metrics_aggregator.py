@@ -0,0 +1,413 @@
+import json
+import logging
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from benchmarking.src.llmperf import common_metrics
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+# Values closer to zero than this one are counted in the zero bucket
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with a fixed relative accuracy, in the spirit of HDR histograms.
+
+    Values are counted in logarithmically sized buckets, so any quantile is known within `relative_accuracy` of its
+    exact value, and memory only grows with the dynamic range of the values, not with their number. Two sketches with
+    the same relative accuracy are merged by adding up their bucket counts, which makes them suitable for combining
+    the results of several processes, machines or runs. Count, mean, standard deviation, min and max are exact.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        """
+        Args:
+            relative_accuracy (float): maximum relative error of the quantiles, between 0 and 1
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f'relative_accuracy must be between 0 and 1, got {relative_accuracy}')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.positive_buckets: Counter = Counter()
+        self.negative_buckets: Counter = Counter()
+        self.zero_count = 0
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def get_bucket_index(self, value: float) -> int:
+        return math.ceil(math.log(abs(value)) / self.log_gamma)
+
+    def get_bucket_value(self, index: int) -> float:
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        """Adds a value to the sketch, NaN values are ignored
+
+        Args:
+            value (float): value to add
+        """
+        if value is None or math.isnan(value):
+            return
+        if value > MIN_INDEXABLE_VALUE:
+            self.positive_buckets[self.get_bucket_index(value)] += 1
+        elif value < -MIN_INDEXABLE_VALUE:
+            self.negative_buckets[self.get_bucket_index(value)] += 1
+        else:
+            self.zero_count += 1
+
+        # Welford's online algorithm for the mean and variance
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Merges another sketch into this one
+
+        Args:
+            other (QuantileSketch): sketch to merge, with the same relative accuracy
+
+        Raises:
+            ValueError: If the sketches have different relative accuracies.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                f'Sketches with relative accuracies {self.relative_accuracy} and {other.relative_accuracy} '
+                'can not be merged'
+            )
+        if other.count == 0:
+            return
+        self.positive_buckets.update(other.positive_buckets)
+        self.negative_buckets.update(other.negative_buckets)
+        self.zero_count += other.zero_count
+
+        # Chan's parallel algorithm for the mean and variance
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Gets an approximate quantile: the value of the bucket holding the rank `q * (count - 1)`, which is the
+        rank pandas interpolates at
+
+        Args:
+            q (float): quantile, between 0 and 1
+
+        Returns:
+            float: quantile value, NaN if the sketch is empty
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+
+        # Buckets from the lowest value to the highest one
+        buckets = [(-self.get_bucket_value(index), count) for index, count in sorted(self.negative_buckets.items())][
+            ::-1
+        ]
+        buckets.append((0.0, self.zero_count))
+        buckets.extend((self.get_bucket_value(index), count) for index, count in sorted(self.positive_buckets.items()))
+
+        cumulative_count = 0
+        for bucket_value, bucket_count in buckets:
+            cumulative_count += bucket_count
+            if cumulative_count > rank:
+                return min(max(bucket_value, self.min), self.max)
+        return self.max
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def sum(self) -> float:
+        return self.mean * self.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive_buckets': {str(index): count for index, count in self.positive_buckets.items()},
+            'negative_buckets': {str(index): count for index, count in self.negative_buckets.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, sketch_dict: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(sketch_dict['relative_accuracy'])
+        sketch.positive_buckets = Counter(
+            {int(index): count for index, count in sketch_dict['positive_buckets'].items()}
+        )
+        sketch.negative_buckets = Counter(
+            {int(index): count for index, count in sketch_dict['negative_buckets'].items()}
+        )
+        sketch.zero_count = sketch_dict['zero_count']
+        sketch.count = sketch_dict['count']
+        sketch.mean = sketch_dict['mean']
+        sketch.m2 = sketch_dict['m2']
+        sketch.min = math.inf if sketch_dict['min'] is None else sketch_dict['min']
+        sketch.max = -math.inf if sketch_dict['max'] is None else sketch_dict['max']
+        return sketch
+
+
+class MetricsAggregator:
+    """Aggregates the metrics of the responses of a run as they arrive, with a quantile sketch per metric, so memory
+    doesn't grow with the number of requests.
+
+    Aggregators are mergeable and JSON serializable, so the results of parallel workers, machines or separate runs can
+    be rolled up into a single summary. Summaries have the same keys as `build_metrics_summary`.
+    """
+
+    def __init__(self, metrics: List[str], relative_accuracy: float = 0.01) -> None:
+        """
+        Args:
+            metrics (list): metrics to summarize with descriptive statistics
+            relative_accuracy (float): maximum relative error of the quantiles
+        """
+        self.metrics = metrics
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {metric: QuantileSketch(relative_accuracy) for metric in metrics}
+        self.lock = threading.Lock()
+
+        self.num_requests = 0
+        self.num_completed_requests = 0
+        self.num_output_tokens = 0.0
+        self.error_codes: Counter = Counter()
+
+        # Open loop timings, only set for requests sent following an arrival schedule
+        self.send_lag_sketch = QuantileSketch(relative_accuracy)
+        self.num_scheduled_requests = 0
+        self.min_scheduled_send_time = math.inf
+        self.max_scheduled_send_time = -math.inf
+        self.min_send_time = math.inf
+        self.max_completion_time = -math.inf
+
+    @staticmethod
+    def get_values(value: Any) -> Iterable[float]:
+        """Gets the values of a metric, which can be a single value or a list of values"""
+        if isinstance(value, (list, tuple)):
+            return [float(item) for item in value if item is not None]
+        if value is None:
+            return []
+        return [float(value)]
+
+    def update(self, metrics: Dict[str, Any]) -> None:
+        """Adds the metrics of a response. It can be called concurrently from several threads.
+
+        Args:
+            metrics (dict): metrics of a response
+        """
+        with self.lock:
+            self.num_requests += 1
+            is_error = not pd.isnull(metrics.get(common_metrics.ERROR_CODE))
+            if is_error:
+                self.error_codes[str(metrics[common_metrics.ERROR_CODE])] += 1
+            else:
+                self.num_completed_requests += 1
+                for metric in self.metrics:
+                    for value in self.get_values(metrics.get(metric)):
+                        self.sketches[metric].add(value)
+                self.num_output_tokens += sum(self.get_values(metrics.get(common_metrics.NUM_OUTPUT_TOKENS)))
+
+            if metrics.get(common_metrics.SCHEDULED_SEND_TIME) is not None:
+                scheduled_send_time = metrics[common_metrics.SCHEDULED_SEND_TIME]
+                send_time = metrics[common_metrics.SEND_TIME]
+                self.num_scheduled_requests += 1
+                self.min_scheduled_send_time = min(self.min_scheduled_send_time, scheduled_send_time)
+                self.max_scheduled_send_time = max(self.max_scheduled_send_time, scheduled_send_time)
+                self.min_send_time = min(self.min_send_time, send_time)
+                self.send_lag_sketch.add(send_time - scheduled_send_time)
+                if not is_error:
+                    self.max_completion_time = max(self.max_completion_time, metrics[common_metrics.COMPLETION_TIME])
+
+    def merge(self, other: 'MetricsAggregator') -> None:
+        """Merges another aggregator into this one
+
+        Args:
+            other (MetricsAggregator): aggregator to merge, with the same metrics and relative accuracy
+        """
+        with self.lock:
+            for metric in self.metrics:
+                if metric in other.sketches:
+                    self.sketches[metric].merge(other.sketches[metric])
+            self.num_requests += other.num_requests
+            self.num_completed_requests += other.num_completed_requests
+            self.num_output_tokens += other.num_output_tokens
+            self.error_codes.update(other.error_codes)
+
+            self.send_lag_sketch.merge(other.send_lag_sketch)
+            self.num_scheduled_requests += other.num_scheduled_requests
+            self.min_scheduled_send_time = min(self.min_scheduled_send_time, other.min_scheduled_send_time)
+            self.max_scheduled_send_time = max(self.max_scheduled_send_time, other.max_scheduled_send_time)
+            self.min_send_time = min(self.min_send_time, other.min_send_time)
+            self.max_completion_time = max(self.max_completion_time, other.max_completion_time)
+
+    def summarize_metric(self, metric: str) -> Dict[str, Any]:
+        """Builds the descriptive statistics of a metric
+
+        Args:
+            metric (str): metric name
+
+        Returns:
+            dict: quantiles, mean, min, max and stddev of the metric
+        """
+        sketch = self.sketches[metric]
+        metric_summary: Dict[str, Any] = {
+            'quantiles': {
+                f'p{int(quantile * 100)}': round(sketch.quantile(quantile), 4) for quantile in SUMMARY_QUANTILES
+            },
+            'mean': round(sketch.mean, 4) if sketch.count else math.nan,
+            'min': round(sketch.min, 4) if sketch.count else math.nan,
+            'max': round(sketch.max, 4) if sketch.count else math.nan,
+            'stddev': round(sketch.stddev, 4),
+        }
+        logger.info(f'Metrics Summary for metric: {metric}')
+        for key, value in metric_summary['quantiles'].items():
+            logger.info(f'    {key} = {value}')
+        for key in ['mean', 'min', 'max', 'stddev']:
+            logger.info(f'    {key} = {metric_summary[key]}')
+        return metric_summary
+
+    def summarize(self, start_time: float, end_time: float) -> Dict[str, Any]:
+        """Builds the summary of metrics, with the same keys as `build_metrics_summary`
+
+        Args:
+            start_time (float): The start time of the metrics collection.
+            end_time (float): The end time of the metrics collection.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the summary metrics.
+        """
+        metrics_summary: Dict[str, Any] = {metric: self.summarize_metric(metric) for metric in self.metrics}
+
+        metrics_summary[common_metrics.NUM_REQ_STARTED] = self.num_requests
+
+        num_errors = sum(self.error_codes.values())
+        metrics_summary[common_metrics.ERROR_RATE] = num_errors / self.num_requests if self.num_requests else 0
+        metrics_summary[common_metrics.NUM_ERRORS] = num_errors
+        metrics_summary[common_metrics.ERROR_CODE_FREQ] = str(dict(self.error_codes))
+        logger.info(f'Number Of Errored Requests: {num_errors}')
+        if num_errors:
+            logger.error('Error Code Frequency')
+            logger.error(dict(self.error_codes))
+
+        overall_output_throughput = round(self.num_output_tokens / (end_time - start_time), 4)
+        logger.info(f'Overall Output Throughput: {overall_output_throughput}')
+        metrics_summary[common_metrics.OUTPUT_THROUGHPUT] = overall_output_throughput
+
+        num_completed_requests_per_min = round(self.num_completed_requests / (end_time - start_time) * 60, 4)
+        logger.info(f'Number Of Completed Requests: {self.num_completed_requests}')
+        logger.info(f'Completed Requests Per Minute: {num_completed_requests_per_min}')
+        metrics_summary[common_metrics.NUM_COMPLETED_REQUESTS] = self.num_completed_requests
+        metrics_summary[common_metrics.COMPLETED_REQUESTS_PER_MIN] = num_completed_requests_per_min
+
+        # Record offered vs achieved load for open loop runs
+        if self.num_scheduled_requests:
+            schedule_span = self.max_scheduled_send_time - self.min_scheduled_send_time
+            offered_load = round((self.num_scheduled_requests - 1) / schedule_span, 4) if schedule_span > 0 else None
+            run_span = self.max_completion_time - self.min_send_time
+            achieved_load = round(self.num_completed_requests / run_span, 4) if run_span > 0 else None
+            metrics_summary[common_metrics.OFFERED_LOAD] = offered_load
+            metrics_summary[common_metrics.ACHIEVED_LOAD] = achieved_load
+            metrics_summary[common_metrics.SEND_LAG] = {
+                'mean': round(self.send_lag_sketch.mean, 4),
+                'p99': round(self.send_lag_sketch.quantile(0.99), 4),
+                'max': round(self.send_lag_sketch.max, 4),
+            }
+            logger.info(f'Offered Load (requests/s): {offered_load}')
+            logger.info(f'Achieved Load (requests/s): {achieved_load}')
+            logger.info(f'Send Lag (s): {metrics_summary[common_metrics.SEND_LAG]}')
+
+        return metrics_summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'metrics': self.metrics,
+                'relative_accuracy': self.relative_accuracy,
+                'sketches': {metric: sketch.to_dict() for metric, sketch in self.sketches.items()},
+                'num_requests': self.num_requests,
+                'num_completed_requests': self.num_completed_requests,
+                'num_output_tokens': self.num_output_tokens,
+                'error_codes': dict(self.error_codes),
+                'send_lag_sketch': self.send_lag_sketch.to_dict(),
+                'num_scheduled_requests': self.num_scheduled_requests,
+                'min_scheduled_send_time': None if self.num_scheduled_requests == 0 else self.min_scheduled_send_time,
+                'max_scheduled_send_time': None if self.num_scheduled_requests == 0 else self.max_scheduled_send_time,
+                'min_send_time': None if self.num_scheduled_requests == 0 else self.min_send_time,
+                'max_completion_time': None if math.isinf(self.max_completion_time) else self.max_completion_time,
+            }
+
+    @classmethod
+    def from_dict(cls, aggregator_dict: Dict[str, Any]) -> 'MetricsAggregator':
+        aggregator = cls(aggregator_dict['metrics'], aggregator_dict['relative_accuracy'])
+        aggregator.sketches = {
+            metric: QuantileSketch.from_dict(sketch_dict) for metric, sketch_dict in aggregator_dict['sketches'].items()
+        }
+        aggregator.num_requests = aggregator_dict['num_requests']
+        aggregator.num_completed_requests = aggregator_dict['num_completed_requests']
+        aggregator.num_output_tokens = aggregator_dict['num_output_tokens']
+        aggregator.error_codes = Counter(aggregator_dict['error_codes'])
+        aggregator.send_lag_sketch = QuantileSketch.from_dict(aggregator_dict['send_lag_sketch'])
+        aggregator.num_scheduled_requests = aggregator_dict['num_scheduled_requests']
+        if aggregator.num_scheduled_requests:
+            aggregator.min_scheduled_send_time = aggregator_dict['min_scheduled_send_time']
+            aggregator.max_scheduled_send_time = aggregator_dict['max_scheduled_send_time']
+            aggregator.min_send_time = aggregator_dict['min_send_time']
+        if aggregator_dict['max_completion_time'] is not None:
+            aggregator.max_completion_time = aggregator_dict['max_completion_time']
+        return aggregator
+
+    def save(self, file_path: str) -> None:
+        """Saves the aggregator to a JSON file, to be merged later with other aggregators
+
+        Args:
+            file_path (str): JSON file path
+        """
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'MetricsAggregator':
+        with open(file_path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def merge_files(cls, file_paths: List[str]) -> Optional['MetricsAggregator']:
+        """Loads and merges the aggregators saved in several JSON files, e.g. by separate workers or runs
+
+        Args:
+            file_paths (list): JSON file paths
+
+        Returns:
+            MetricsAggregator: merged aggregator, None if no file path is given
+        """
+        merged_aggregator = None
+        for file_path in file_paths:
+            aggregator = cls.load(file_path)
+            if merged_aggregator is None:
+                merged_aggregator = aggregator
+            else:
+                merged_aggregator.merge(aggregator)
+        return merged_aggregator
@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from transformers import AutoTokenizer
+
+from benchmarking.src.llmperf.llmperf_utils import NUM_RNG_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+PREFIX_NUM_TOKENS = 8
+
+
+class SyntheticPromptCache:
+    """Builds synthetic prompts with an exact number of tokens, caching their tokenized body.
+
+    Every prompt starts with a few random tokens, so that prompts don't share a prefix that server-side prefix caching
+    would hit, followed by the prompt template tokens trimmed (or repeated) to the target length. Only the body token
+    ids are kept in memory and on disk, keyed by tokenizer, prompt template and target number of tokens. The random
+    prefixes are drawn from the seed and a nonce that changes with every run, so repeated runs and sweep steps don't
+    resend prompts the server has already cached. All the prompts of a run are built in one vectorized pass.
+    """
+
+    def __init__(self, tokenizer: AutoTokenizer, cache_dir: str) -> None:
+        self.tokenizer = tokenizer
+        self.cache_dir = cache_dir
+        self.bodies: Dict[str, Dict[str, List[int]]] = {}
+
+    def get_cache_key(self, prompt_template: str, num_input_tokens: int) -> str:
+        """Gets the cache key of a prompt body
+
+        Args:
+            prompt_template (str): prompt template text
+            num_input_tokens (int): number of tokens of each prompt
+
+        Returns:
+            str: cache key digest
+        """
+        key = json.dumps(
+            {
+                'tokenizer': getattr(self.tokenizer, 'name_or_path', type(self.tokenizer).__name__),
+                'vocab_size': len(self.tokenizer),
+                'template': hashlib.sha256(prompt_template.encode('utf-8')).hexdigest(),
+                'num_input_tokens': num_input_tokens,
+                'prefix_num_tokens': PREFIX_NUM_TOKENS,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_body(self, prompt_template: str, num_input_tokens: int) -> Dict[str, List[int]]:
+        """Gets the tokenized body of the prompts, from memory, from disk, or tokenizing the prompt template
+
+        Args:
+            prompt_template (str): prompt template text
+            num_input_tokens (int): number of tokens of each prompt, special tokens included
+
+        Returns:
+            dict: `body_token_ids`, the template tokens trimmed or repeated to the target length minus the prefix,
+                and `prefix_vocab`, the tokens the random prefixes are drawn from
+        """
+        cache_key = self.get_cache_key(prompt_template, num_input_tokens)
+        if cache_key in self.bodies:
+            return self.bodies[cache_key]
+
+        cache_file_path = os.path.join(self.cache_dir, f'{cache_key}.json.gz')
+        if os.path.exists(cache_file_path):
+            with gzip.open(cache_file_path, 'rt', encoding='utf-8') as f:
+                self.bodies[cache_key] = json.load(f)
+            return self.bodies[cache_key]
+
+        target_token_count = num_input_tokens - self.tokenizer.num_special_tokens_to_add()
+        prefix_num_tokens = min(PREFIX_NUM_TOKENS, target_token_count // 4)
+        template_token_ids = np.array(self.tokenizer.encode(prompt_template, add_special_tokens=False))
+        # Random prefixes are drawn from the template tokens, which are known to round trip through the tokenizer
+        self.bodies[cache_key] = {
+            'body_token_ids': np.resize(template_token_ids, target_token_count - prefix_num_tokens).tolist(),
+            'prefix_vocab': np.unique(template_token_ids).tolist(),
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with gzip.open(cache_file_path, 'wt', encoding='utf-8') as f:
+            json.dump(self.bodies[cache_key], f)
+        return self.bodies[cache_key]
+
+    def get_prompts(
+        self, prompt_template: str, num_prompts: int, num_input_tokens: int, seed: int, run_nonce: int
+    ) -> List[Tuple[str, int]]:
+        """Builds `num_prompts` unique prompts of `num_input_tokens` tokens in one vectorized pass: the token ids of
+        all the prompts are laid out in a single matrix, decoded in one batch and validated in one batched tokenizer
+        call. Prompts whose token count changes when re-tokenized are rebuilt with a new random prefix, up to
+        NUM_RNG_ATTEMPTS times.
+
+        Args:
+            prompt_template (str): prompt template text
+            num_prompts (int): number of prompts
+            num_input_tokens (int): number of tokens of each prompt, special tokens included
+            seed (int): seed for the random prefixes
+            run_nonce (int): nonce of the run, e.g. its start time, so that every run gets different prefixes
+
+        Returns:
+            List[Tuple[str, int]]: list of prompts and their length in tokens
+        """
+        body = self.get_body(prompt_template, num_input_tokens)
+        body_token_ids = np.array(body['body_token_ids'], dtype=np.int64)
+        prefix_vocab = np.array(body['prefix_vocab'], dtype=np.int64)
+
+        num_special_tokens = self.tokenizer.num_special_tokens_to_add()
+        target_token_count = num_input_tokens - num_special_tokens
+        prefix_num_tokens = target_token_count - len(body_token_ids)
+
+        rng = np.random.default_rng([seed, run_nonce])
+        prefix_token_ids = rng.choice(prefix_vocab, size=(num_prompts, prefix_num_tokens))
+
+        prompts: List[str] = [''] * num_prompts
+        token_counts = [0] * num_prompts
+        prompt_idxs = list(range(num_prompts))
+
+        # Prompts whose token count changes when re-tokenized are rebuilt, all together, with new random prefixes
+        for attempt in range(NUM_RNG_ATTEMPTS):
+            token_ids = np.concatenate(
+                [prefix_token_ids, np.tile(body_token_ids, (len(prompt_idxs), 1))],
+                axis=1,
+            )
+            attempt_prompts = self.tokenizer.batch_decode(token_ids.tolist(), clean_up_tokenization_spaces=False)
+            for prompt_idx, prompt, token_count in zip(
+                prompt_idxs, attempt_prompts, self.count_tokens(attempt_prompts)
+            ):
+                prompts[prompt_idx] = prompt
+                token_counts[prompt_idx] = token_count
+
+            prompt_idxs = [idx for idx in prompt_idxs if token_counts[idx] != target_token_count]
+            if len(prompt_idxs) == 0:
+                break
+            prefix_token_ids = np.stack(
+                [
+                    np.random.default_rng([seed, run_nonce, prompt_idx, attempt + 1]).choice(
+                        prefix_vocab, size=prefix_num_tokens
+                    )
+                    for prompt_idx in prompt_idxs
+                ]
+            )
+
+        for prompt_idx in prompt_idxs:
+            logger.warning(f'Prompt {prompt_idx} has {token_counts[prompt_idx]} tokens instead of {target_token_count}')
+
+        return [(prompt, token_count + num_special_tokens) for prompt, token_count in zip(prompts, token_counts)]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Counts the tokens of several texts with a single batched tokenizer call
+
+        Args:
+            texts (list): texts to tokenize
+
+        Returns:
+            list: number of tokens of each text, without special tokens
+        """
+        input_ids = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(text_input_ids) for text_input_ids in input_ids]
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Generator, List, Optional, Set
+
+import pandas as pd
+
+from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.models import LLMResponse
+
+logger = logging.getLogger(__name__)
+
+STREAMING_RESULTS_FORMATS = ['jsonl', 'parquet']
+# Metrics stored as text in Parquet files, every other metric is stored as a float
+STRING_METRICS = [
+    common_metrics.ERROR_CODE,
+    common_metrics.ERROR_MSG,
+    common_metrics.REQ_START_TIME,
+    common_metrics.REQ_END_TIME,
+]
+
+
+class ResultsSink:
+    """Writes the individual responses of a run to disk as they complete, so memory stays flat however long the run
+    is, and the completed responses are kept if the run is interrupted.
+
+    JSONL files get one line per response, flushed right away. Parquet results are written as a directory with one
+    file per row group, since a Parquet file is only readable once it has been closed.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        output_format: str,
+        response_texts_file_path: Optional[str] = None,
+        row_group_size: int = 1000,
+    ) -> None:
+        """
+        Args:
+            file_path (str): individual responses file path, or directory path for Parquet results
+            output_format (str): either 'jsonl' or 'parquet'
+            response_texts_file_path (str, optional): JSONL file path for the prompts and completions, if they have
+                to be saved
+            row_group_size (int): number of responses per Parquet row group
+        """
+        if output_format not in STREAMING_RESULTS_FORMATS:
+            raise ValueError(
+                f'output_format parameter with value {output_format} is not valid. '
+                f'Available values are {STREAMING_RESULTS_FORMATS}'
+            )
+        self.file_path = file_path
+        self.output_format = output_format
+        self.response_texts_file_path = response_texts_file_path
+        self.row_group_size = row_group_size
+        self.lock = threading.Lock()
+
+        # Running counters used to validate the run without keeping the responses in memory
+        self.num_responses = 0
+        self.first_metrics: Optional[Dict[str, Any]] = None
+        self.error_codes: Counter = Counter()
+        self.error_msgs: Set[str] = set()
+
+        self.buffer: List[Dict[str, Any]] = []
+        self.num_row_groups = 0
+
+        if self.output_format == 'jsonl':
+            self.file = open(self.file_path, 'w')
+        else:
+            os.makedirs(self.file_path, exist_ok=True)
+            for existing_file in os.listdir(self.file_path):
+                if existing_file.endswith('.parquet'):
+                    os.remove(os.path.join(self.file_path, existing_file))
+        self.response_texts_file = open(self.response_texts_file_path, 'w') if self.response_texts_file_path else None
+
+    def __enter__(self) -> 'ResultsSink':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def write(self, response: LLMResponse) -> None:
+        """Writes a completed response. It can be called concurrently from several threads.
+
+        Args:
+            response (LLMResponse): completed response
+        """
+        metrics = response.metrics
+        with self.lock:
+            self.num_responses += 1
+            if self.first_metrics is None:
+                self.first_metrics = metrics
+            if not pd.isnull(metrics[common_metrics.ERROR_CODE]):
+                self.error_codes[str(metrics[common_metrics.ERROR_CODE])] += 1
+                self.error_msgs.add(str(metrics[common_metrics.ERROR_MSG]))
+
+            if self.output_format == 'jsonl':
+                self.file.write(json.dumps(metrics, default=str))
+                self.file.write('\n')
+                self.file.flush()
+            else:
+                self.buffer.append(metrics)
+                if len(self.buffer) >= self.row_group_size:
+                    self.write_row_group()
+
+            if self.response_texts_file is not None:
+                output_json = {
+                    'prompt': response.request_config.prompt_tuple[0],
+                    'completion': str(response.response_text),
+                }
+                self.response_texts_file.write(json.dumps(output_json))
+                self.response_texts_file.write('\n')
+                self.response_texts_file.flush()
+
+    def write_row_group(self) -> None:
+        """Writes the buffered responses to a new Parquet file of the results directory"""
+        if len(self.buffer) == 0:
+            return
+        # Every row group gets the same column types, whatever the values of its responses
+        row_group_df = pd.DataFrame(self.buffer)
+        for column in row_group_df.columns:
+            if column in STRING_METRICS:
+                row_group_df[column] = [
+                    None if pd.isnull(metrics.get(column)) else str(metrics.get(column)) for metrics in self.buffer
+                ]
+            else:
+                row_group_df[column] = pd.to_numeric(row_group_df[column], errors='coerce').astype('float64')
+        row_group_df.to_parquet(
+            os.path.join(self.file_path, f'part-{self.num_row_groups:06d}.parquet'),
+            index=False,
+        )
+        self.num_row_groups += 1
+        self.buffer = []
+
+    def close(self) -> None:
+        """Flushes the pending responses and closes the files"""
+        with self.lock:
+            if self.output_format == 'jsonl':
+                if not self.file.closed:
+                    self.file.close()
+            else:
+                self.write_row_group()
+            if self.response_texts_file is not None and not self.response_texts_file.closed:
+                self.response_texts_file.close()
+
+    @property
+    def num_errors(self) -> int:
+        return sum(self.error_codes.values())
+
+    def iter_metrics(self, columns: List[str], chunk_size: int = 10000) -> Generator[pd.DataFrame, None, None]:
+        """Reads back the written responses in chunks, keeping only the given metrics
+
+        Args:
+            columns (list): metrics to read, the ones missing from the results are skipped
+            chunk_size (int): number of responses per JSONL chunk, Parquet files are read by record batch
+
+        Yields:
+            pd.DataFrame: chunk of responses metrics
+        """
+        if self.output_format == 'jsonl':
+            chunk: List[Dict[str, Any]] = []
+            with open(self.file_path, 'r') as f:
+                for line in f:
+                    metrics = json.loads(line)
+                    chunk.append({column: metrics[column] for column in columns if column in metrics})
+                    if len(chunk) >= chunk_size:
+                        yield pd.DataFrame(chunk)
+                        chunk = []
+            if len(chunk) > 0:
+                yield pd.DataFrame(chunk)
+        else:
+            import pyarrow.parquet as pq
+
+            for part_file in sorted(os.listdir(self.file_path)):
+                if not part_file.endswith('.parquet'):
+                    continue
+                part = pq.ParquetFile(os.path.join(self.file_path, part_file))
+                part_columns = [column for column in columns if column in part.schema_arrow.names]
+                for batch in part.iter_batches(columns=part_columns):
+                    yield batch.to_pandas()
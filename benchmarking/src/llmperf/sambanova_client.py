@@ -1,4 +1,5 @@
 import abc
+import asyncio
 import json
 import os
 import sys
@@ -7,6 +8,7 @@ from datetime import datetime
 from math import isclose
 from typing import Any, Dict, List, Tuple
 
+import httpx
 import requests
 import sseclient
 
@@ -25,6 +27,130 @@ from benchmarking.src.llmperf.models import RequestConfig
 warnings.filterwarnings('ignore')
 
 
+class StreamTokenAccountant:
+    """Collects the chunks of a streamed response with minimal per-event work, and resolves their token counts once
+    the stream has ended. Token counts are taken, in order of preference, from the usage reported by the server,
+    from per-chunk token counts sent by the server, or from a single batched call to the tokenizer over all the
+    chunks that are missing a count."""
+
+    def __init__(self, tokenizer: AutoTokenizer, start_time: float) -> None:
+        self.tokenizer = tokenizer
+        self.start_time = start_time
+        self.chunks: List[str] = []
+        self.arrival_times: List[float] = []
+        self.chunks_token_counts: List[int | None] = []
+        self.reported_num_tokens = 0
+
+    def add_chunk(self, chunk: str, arrival_time: float, num_tokens: int | None = None) -> None:
+        """Records a streamed chunk. This is the only work done per event while receiving the stream.
+
+        Args:
+            chunk (str): streamed text
+            arrival_time (float): time at which the event was received
+            num_tokens (int | None): number of tokens in the chunk, when reported by the server
+        """
+        self.chunks.append(chunk)
+        self.arrival_times.append(arrival_time)
+        self.chunks_token_counts.append(num_tokens)
+
+    def add_chunk_with_usage(self, chunk: str, arrival_time: float, completion_tokens: int) -> None:
+        """Records a streamed chunk from an event that carries the cumulative number of completion tokens reported by
+        the server. The chunk token count is the difference with the previous report, as long as every previous
+        chunk was also counted by the server.
+
+        Args:
+            chunk (str): streamed text
+            arrival_time (float): time at which the event was received
+            completion_tokens (int): cumulative number of completion tokens reported by the server
+        """
+        num_tokens = completion_tokens - self.reported_num_tokens if None not in self.chunks_token_counts else None
+        self.reported_num_tokens = completion_tokens
+        self.add_chunk(chunk, arrival_time, num_tokens)
+
+    @property
+    def generated_text(self) -> str:
+        """Concatenation of all the streamed chunks"""
+        return ''.join(self.chunks)
+
+    def get_chunks_timings(self) -> List[float]:
+        """Gets the time that each event took to arrive since the previous one (or since the request start)
+
+        Returns:
+            list: timings for each event
+        """
+        previous_arrival_times = [self.start_time] + self.arrival_times[:-1]
+        return [
+            arrival_time - previous_arrival_time
+            for arrival_time, previous_arrival_time in zip(self.arrival_times, previous_arrival_times)
+        ]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Counts the tokens of several texts with a single batched tokenizer call
+
+        Args:
+            texts (list): texts to tokenize
+
+        Returns:
+            list: number of tokens of each text
+        """
+        if len(texts) == 0:
+            return []
+        input_ids = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(text_input_ids) for text_input_ids in input_ids]
+
+    def get_chunks_token_counts(self) -> List[int]:
+        """Gets the number of tokens of every chunk, batch encoding only the chunks without a server reported count
+
+        Returns:
+            list: number of tokens of each chunk
+        """
+        missing_idxs = [idx for idx, num_tokens in enumerate(self.chunks_token_counts) if num_tokens is None]
+        missing_counts = self.count_tokens([self.chunks[idx] for idx in missing_idxs])
+
+        chunks_token_counts = list(self.chunks_token_counts)
+        for idx, num_tokens in zip(missing_idxs, missing_counts):
+            chunks_token_counts[idx] = num_tokens
+        return [int(num_tokens or 0) for num_tokens in chunks_token_counts]
+
+    def get_stream_token_counts(self, server_num_output_tokens: int | None) -> Tuple[int, int]:
+        """Gets the number of tokens in the first chunk and the number of tokens received after it. When the server
+        reports the total number of output tokens, only the first chunk needs to be counted.
+
+        Args:
+            server_num_output_tokens (int | None): number of output tokens reported by the server, if any
+
+        Returns:
+            tuple[int, int]: tokens in the first chunk and tokens after the first chunk
+        """
+        if len(self.chunks) == 0:
+            return 0, 0
+
+        if server_num_output_tokens is None or None not in self.chunks_token_counts:
+            chunks_token_counts = self.get_chunks_token_counts()
+            return chunks_token_counts[0], sum(chunks_token_counts[1:])
+
+        first_chunk_num_tokens = self.chunks_token_counts[0]
+        if first_chunk_num_tokens is None:
+            first_chunk_num_tokens = self.count_tokens([self.chunks[0]])[0]
+        return first_chunk_num_tokens, max(server_num_output_tokens - first_chunk_num_tokens, 0)
+
+    def get_num_output_tokens(self, server_num_output_tokens: int | None, generated_text: str) -> int:
+        """Gets the total number of output tokens
+
+        Args:
+            server_num_output_tokens (int | None): number of output tokens reported by the server, if any
+            generated_text (str): complete generated text
+
+        Returns:
+            int: number of output tokens
+        """
+        if server_num_output_tokens is not None:
+            return int(server_num_output_tokens)
+        if len(self.chunks) > 0 and None not in self.chunks_token_counts:
+            return sum(self.get_chunks_token_counts())
+        return self.count_tokens([generated_text])[0]
+
+
 class BaseAPIEndpoint(abc.ABC):
     def __init__(self, request_config: RequestConfig, tokenizer: AutoTokenizer) -> None:
         self.request_config = request_config
@@ -54,22 +180,19 @@ class BaseAPIEndpoint(abc.ABC):
         return len(self.tokenizer.encode(input_text))
 
     def _calculate_tpot_from_streams_after_first(
-        self, chunks_received: List[str], chunks_timings: List[int | float]
+        self, total_tokens_received_after_first_chunk: int, chunks_timings: List[int | float]
     ) -> float:
         """Calculates Time per Output Token (TPOT) based on the streaming events coming after the first one.
         In general, the way to calculate this metric is: time_to_generate_tokens/number_of_tokens_generated
 
         Args:
-            chunks_received (list): complete list of events coming from streaming response
+            total_tokens_received_after_first_chunk (int): number of tokens received after the first event
             chunks_timings (list): complete list of timings that each event took to process
 
         Returns:
             float: calculated tpot
         """
 
-        # Calculate tokens
-        total_tokens_received_after_first_chunk = sum(self._get_token_length(c) for c in chunks_received[1:])
-
         # Calculate time
         total_time_to_receive_tokens_after_first_chunk = sum(chunks_timings[1:])
 
@@ -79,31 +202,39 @@ class BaseAPIEndpoint(abc.ABC):
         return tpot
 
     def _calculate_ttft_from_streams(
-        self, chunks_received: List[str], chunks_timings: List[int | float], total_request_time: int | float
+        self,
+        token_accountant: 'StreamTokenAccountant',
+        server_num_output_tokens: int | None,
+        total_request_time: int | float,
     ) -> float:
         """Calculates Time to First Token (TTFT) based on the streaming events coming from the response.
         If there are enough streaming events, the formula to calculate ttft is:
         time_first_chunk - (tokens_first_chunk - 1) * tpot
 
         Args:
-            chunks_received (list): list of events having the streaming tokens
-            chunks_timings (list): list of timings for each event
+            token_accountant (StreamTokenAccountant): streamed chunks with their timings and token counts
+            server_num_output_tokens (int | None): number of output tokens reported by the server, if any
             total_request_time (int): total request time calculated from client side
 
         Returns:
             float: calculated ttft
         """
 
-        number_chunks_recieved = len(chunks_received)
+        number_chunks_recieved = len(token_accountant.chunks)
+        chunks_timings = token_accountant.get_chunks_timings()
 
         # if one or no chunks were recieved
         if number_chunks_recieved <= 1:
             ttft = total_request_time
         else:
+            total_tokens_in_first_chunk, total_tokens_after_first_chunk = token_accountant.get_stream_token_counts(
+                server_num_output_tokens
+            )
+            if total_tokens_after_first_chunk == 0:
+                return chunks_timings[0]
             # calculate tpot
-            tpot = self._calculate_tpot_from_streams_after_first(chunks_received, chunks_timings)
+            tpot = self._calculate_tpot_from_streams_after_first(total_tokens_after_first_chunk, chunks_timings)
             # calculate ttft
-            total_tokens_in_first_chunk = self._get_token_length(chunks_received[0])
             ttft = chunks_timings[0] - (total_tokens_in_first_chunk - 1) * tpot
         return ttft
 
@@ -217,6 +348,48 @@ class BaseAPIEndpoint(abc.ABC):
 
         return metrics
 
+    def _build_metrics(
+        self,
+        metrics: Dict[str, Any],
+        token_accountant: 'StreamTokenAccountant',
+        total_request_time: int | float,
+        generated_text: str,
+        response_dict: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Computes ttft and populates server and client metrics once a streamed response has been fully received.
+        All the token counting happens here, after the stream has been closed.
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            token_accountant (StreamTokenAccountant): streamed chunks with their timings and token counts
+            total_request_time (int): total request time calculated from client side
+            generated_text (str): complete generated text
+            response_dict (dict): dict data with server performance metrics
+
+        Returns:
+            dict: updated metrics dictionary
+        """
+        server_metrics = self._populate_server_metrics(response_dict, metrics)
+        server_num_output_tokens = server_metrics[common_metrics.NUM_OUTPUT_TOKENS_SERVER]
+
+        ttft = self._calculate_ttft_from_streams(token_accountant, server_num_output_tokens, total_request_time)
+
+        # Populate client metrics
+        prompt_len = self.request_config.prompt_tuple[1]
+        number_chunks_recieved = len(token_accountant.chunks)
+
+        num_output_tokens = token_accountant.get_num_output_tokens(server_num_output_tokens, generated_text)
+        metrics = self._populate_client_metrics(
+            prompt_len,
+            num_output_tokens,
+            ttft,
+            total_request_time,
+            server_metrics,
+            number_chunks_recieved,
+        )
+
+        return metrics
+
 
 class SambaStudioAPI(BaseAPIEndpoint):
     def __init__(self, *args: Any, **kwargs: Any) -> None:
@@ -294,6 +467,86 @@ class SambaStudioAPI(BaseAPIEndpoint):
 
         return data
 
+    def _get_stream_response(self, data: Dict[str, Any], url: str) -> Dict[str, Any]:
+        """Gets the response item of a streamed event according to the API version
+
+        Args:
+            data (dict): parsed streamed event
+            url (str): URL being used for the API call
+
+        Returns:
+            dict: response item containing stream token, completion and performance metrics
+        """
+        if '/api/v2' in url.lower().strip():
+            return dict(data['result']['items'][0]['value'])
+        return dict(data['result']['responses'][0])
+
+    async def async_compute_metrics(
+        self, metrics: Dict[str, Any], client: httpx.AsyncClient
+    ) -> Tuple[Dict[str, Any], str]:
+        """Computes metrics for SambaStudio API endpoint using an async pooled HTTP client.
+        Event timings are taken with `time.perf_counter_ns` as each streamed line arrives.
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            client (httpx.AsyncClient): pooled async HTTP client
+
+        Raises:
+            ValueError: raises when streaming is not selected
+
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+
+        if not self.request_config.is_stream_mode:
+            raise ValueError('SambaStudio endpoints only support streaming mode with the asyncio engine')
+
+        # Get API request components
+        url = self._get_url()
+        headers = self._get_headers()
+        json_data = self._get_json_data(url)
+
+        # Set variables
+        generated_text = ''
+
+        # Start measuring time
+        metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        start_time = time.perf_counter_ns() / 1e9
+        token_accountant = StreamTokenAccountant(self.tokenizer, start_time)
+
+        async with client.stream('POST', url, headers=headers, json=json_data) as response:
+            if response.status_code != 200:
+                await response.aread()
+                error_details = response.json().get('error', 'No additional error details provided.')
+                raise Exception(f'Error: {response.status_code}, Details: {error_details}')
+
+            async for chunk_orig in response.aiter_lines():
+                chunk_time = time.perf_counter_ns() / 1e9
+                chunk = chunk_orig.strip()
+                if not chunk:
+                    continue
+                stream_response = self._get_stream_response(json.loads(chunk), url)
+
+                if stream_response['is_last_response'] is False:
+                    token_accountant.add_chunk(stream_response['stream_token'], chunk_time)
+                    continue
+                else:
+                    generated_text = stream_response['completion']
+                    response_dict = stream_response
+                    break
+
+        # End measuring time
+        metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        total_request_time = time.perf_counter_ns() / 1e9 - start_time
+
+        # Tokens are counted in a worker thread, so that the event loop keeps timing the other in-flight requests
+        metrics = await asyncio.get_running_loop().run_in_executor(
+            None, self._build_metrics, metrics, token_accountant, total_request_time, generated_text, response_dict
+        )
+
+        return metrics, generated_text
+
     def compute_metrics(self, metrics: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
         """Computes metrics for SambaStudio API endpoint
 
@@ -315,12 +568,11 @@ class SambaStudioAPI(BaseAPIEndpoint):
 
         # Set variables
         generated_text = ''
-        chunks_received = []
-        chunks_timings = []
 
         # Start measuring time
         metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
-        start_time = chunk_start_time = time.monotonic()
+        start_time = time.monotonic()
+        token_accountant = StreamTokenAccountant(self.tokenizer, start_time)
 
         if self.request_config.is_stream_mode:
             with requests.post(
@@ -330,38 +582,19 @@ class SambaStudioAPI(BaseAPIEndpoint):
                     error_details = response.json().get('error', 'No additional error details provided.')
                     raise Exception(f'Error: {response.status_code}, Details: {error_details}')
 
-                # fetch generated text and metrics for api v2
-                if '/api/v2' in url.lower().strip():
-                    for chunk_orig in response.iter_lines(chunk_size=None):
-                        chunk = chunk_orig.strip()
-                        data = json.loads(chunk)
-
-                        completion = data['result']['items'][0]['value']['is_last_response']
-                        chunks_timings.append(time.monotonic() - chunk_start_time)
-                        chunk_start_time = time.monotonic()
-                        if completion is False:
-                            chunks_received.append(data['result']['items'][0]['value']['stream_token'])
-                            continue
-                        else:
-                            generated_text = data['result']['items'][0]['value']['completion']
-                            response_dict = data['result']['items'][0]['value']
+                # fetch generated text and metrics for api v1 and v2
+                for chunk_orig in response.iter_lines(chunk_size=None):
+                    chunk_time = time.monotonic()
+                    chunk = chunk_orig.strip()
+                    stream_response = self._get_stream_response(json.loads(chunk), url)
+
+                    if stream_response['is_last_response'] is False:
+                        token_accountant.add_chunk(stream_response['stream_token'], chunk_time)
+                        continue
+                    else:
+                        generated_text = stream_response['completion']
+                        response_dict = stream_response
                         break
-                # support to fetch generated text and metrics for api v1
-                else:
-                    for chunk_orig in response.iter_lines(chunk_size=None):
-                        chunk = chunk_orig.strip()
-                        data = json.loads(chunk)
-
-                        completion = data['result']['responses'][0]['is_last_response']
-                        chunks_timings.append(time.monotonic() - chunk_start_time)
-                        chunk_start_time = time.monotonic()
-                        if completion is False:
-                            chunks_received.append(data['result']['responses'][0]['stream_token'])
-                            continue
-                        else:
-                            generated_text = data['result']['responses'][0]['completion']
-                            response_dict = data['result']['responses'][0]
-                            break
         else:
             # TODO: support non-streaming mode
             raise ValueError('Streaming mode required')
@@ -369,22 +602,8 @@ class SambaStudioAPI(BaseAPIEndpoint):
         # End measuring time
         metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
         total_request_time = time.monotonic() - start_time
-        ttft = self._calculate_ttft_from_streams(chunks_received, chunks_timings, total_request_time)
 
-        # Populate server and client metrics
-        prompt_len = self.request_config.prompt_tuple[1]
-        number_chunks_recieved = len(chunks_received)
-
-        num_output_tokens = self._get_token_length(generated_text)
-        server_metrics = self._populate_server_metrics(response_dict, metrics)
-        metrics = self._populate_client_metrics(
-            prompt_len,
-            num_output_tokens,
-            ttft,
-            total_request_time,
-            server_metrics,
-            number_chunks_recieved,
-        )
+        metrics = self._build_metrics(metrics, token_accountant, total_request_time, generated_text, response_dict)
 
         return metrics, generated_text
 
@@ -436,6 +655,94 @@ class SambaNovaCloudAPI(BaseAPIEndpoint):
 
         return data
 
+    def _process_event(
+        self, data: Dict[str, Any], event_time: float, token_accountant: StreamTokenAccountant
+    ) -> Dict[str, Any] | None:
+        """Records the streamed content of a parsed event, doing as little work as possible
+
+        Args:
+            data (dict): parsed streamed event
+            event_time (float): time at which the event was received
+            token_accountant (StreamTokenAccountant): streamed chunks with their timings and token counts
+
+        Returns:
+            dict | None: performance usage, if the event provides it
+        """
+        # events contain "usage" key when the stream returns performance metrics, or on every event for servers
+        # reporting continuous usage stats
+        usage = data.get('usage')
+        choices = data.get('choices') or []
+
+        # if streams still don't hit a finish reason
+        if len(choices) > 0 and choices[0]['finish_reason'] is None:
+            if usage is None:
+                token_accountant.add_chunk(choices[0]['delta']['content'], event_time)
+            elif choices[0]['delta'].get('content') and usage.get('completion_tokens') is not None:
+                token_accountant.add_chunk_with_usage(
+                    choices[0]['delta']['content'], event_time, usage['completion_tokens']
+                )
+
+        return dict(usage) if usage is not None else None
+
+    async def async_compute_metrics(
+        self, metrics: Dict[str, Any], client: httpx.AsyncClient
+    ) -> Tuple[Dict[str, Any], str]:
+        """Computes metrics for SambaNovaCloud endpoint using an async pooled HTTP client.
+        Event timings are taken with `time.perf_counter_ns` as each SSE event arrives.
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            client (httpx.AsyncClient): pooled async HTTP client
+
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+
+        # Get API request components
+        url = self._get_url()
+        headers = self._get_headers()
+        json_data = self._get_json_data()
+
+        # Start measuring time
+        metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        start_time = time.perf_counter_ns() / 1e9
+        token_accountant = StreamTokenAccountant(self.tokenizer, start_time)
+
+        async with client.stream('POST', url, headers=headers, json=json_data) as response:
+            if response.status_code != 200:
+                await response.aread()
+                response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                event_time = time.perf_counter_ns() / 1e9
+                # only SSE data fields carry streamed content
+                if not line.startswith('data:'):
+                    continue
+                event_data = line[len('data:') :].strip()
+                if event_data == '[DONE]':
+                    break
+                try:
+                    usage = self._process_event(json.loads(event_data), event_time, token_accountant)
+                    # process streaming chunk when performance usage is provided
+                    if usage is not None:
+                        response_dict = usage
+                except Exception as e:
+                    raise Exception(f'Error: {e} at streamed event: {event_data}')
+
+        # End measuring time
+        metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        total_request_time = time.perf_counter_ns() / 1e9 - start_time
+
+        # concatenate streaming text pieces
+        generated_text = token_accountant.generated_text
+        # Tokens are counted in a worker thread, so that the event loop keeps timing the other in-flight requests
+        metrics = await asyncio.get_running_loop().run_in_executor(
+            None, self._build_metrics, metrics, token_accountant, total_request_time, generated_text, response_dict
+        )
+
+        return metrics, generated_text
+
     def compute_metrics(self, metrics: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
         """Computes metrics for SambaNovaCloud endpoint
 
@@ -452,63 +759,35 @@ class SambaNovaCloudAPI(BaseAPIEndpoint):
         headers = self._get_headers()
         json_data = self._get_json_data()
 
-        # Set variables
-        generated_text = ''
-        events_received = []
-        events_timings = []
-
         # Start measuring time
         metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
-        start_time = event_start_time = time.monotonic()
+        start_time = time.monotonic()
+        token_accountant = StreamTokenAccountant(self.tokenizer, start_time)
 
         with requests.post(url, headers=headers, json=json_data, stream=self.request_config.is_stream_mode) as response:
             if response.status_code != 200:
                 response.raise_for_status()
             client = sseclient.SSEClient(response)
-            generated_text = ''
 
             for event in client.events():
+                event_time = time.monotonic()
                 try:
                     # check streaming events before last stream returns DONE
                     if event.data != '[DONE]':
-                        data = json.loads(event.data)
-                        # if events don't contain "usage" key, which only shows up in stream returning
-                        # performance metrics
-                        if data.get('usage') is None:
-                            # if streams still don't hit a finish reason
-                            if data['choices'][0]['finish_reason'] is None:
-                                # log s timings
-                                events_timings.append(time.monotonic() - event_start_time)
-                                event_start_time = time.monotonic()
-                                # concatenate streaming text pieces
-                                stream_content = data['choices'][0]['delta']['content']
-                                events_received.append(stream_content)
-                                generated_text += stream_content
+                        usage = self._process_event(json.loads(event.data), event_time, token_accountant)
                         # process streaming chunk when performance usage is provided
-                        else:
-                            response_dict = data['usage']
+                        if usage is not None:
+                            response_dict = usage
                 except Exception as e:
                     raise Exception(f'Error: {e} at streamed event: {event.data}')
 
         # End measuring time
         metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
         total_request_time = time.monotonic() - start_time
-        ttft = self._calculate_ttft_from_streams(events_received, events_timings, total_request_time)
 
-        # Populate server and client metrics
-        prompt_len = self.request_config.prompt_tuple[1]
-        number_chunks_recieved = len(events_received)
-
-        num_output_tokens = self._get_token_length(generated_text)
-        server_metrics = self._populate_server_metrics(response_dict, metrics)
-        metrics = self._populate_client_metrics(
-            prompt_len,
-            num_output_tokens,
-            ttft,
-            total_request_time,
-            server_metrics,
-            number_chunks_recieved,
-        )
+        # concatenate streaming text pieces
+        generated_text = token_accountant.generated_text
+        metrics = self._build_metrics(metrics, token_accountant, total_request_time, generated_text, response_dict)
 
         return metrics, generated_text
 
@@ -559,6 +838,69 @@ def llm_request(request_config: RequestConfig, tokenizer: AutoTokenizer) -> Tupl
         return metrics, '', request_config
 
 
+def get_async_http_client(max_connections: int | None, timeout: int | float) -> httpx.AsyncClient:
+    """Creates a pooled async HTTP client with keep-alive connections, shared by all in-flight requests of a run
+
+    Args:
+        max_connections (int | None): maximum number of simultaneous connections in the pool. None means unbounded
+        timeout (int | float): timeout in seconds for connecting to and reading from the endpoint
+
+    Returns:
+        httpx.AsyncClient: async HTTP client
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(timeout))
+
+
+async def async_llm_request(
+    request_config: RequestConfig, tokenizer: AutoTokenizer, client: httpx.AsyncClient
+) -> Tuple[Dict[str, Any], str, RequestConfig]:
+    """Makes a single completion request to a LLM API over an async pooled HTTP client
+
+    Args:
+        request_config (RequestConfig): config options including user's prompt and LLM parameters
+        tokenizer (AutoTokenizer): tokenizer for counting tokens
+        client (httpx.AsyncClient): pooled async HTTP client
+
+    Returns:
+        tuple: Metrics about the performance charateristics of the request.
+        The text generated by the request to the LLM API.
+        The request_config used to make the request. This is mainly for logging purposes.
+    """
+
+    generated_text = ''
+    metrics: Dict[str, Any] = {}
+    metrics[common_metrics.ERROR_CODE] = None
+    metrics[common_metrics.ERROR_MSG] = ''
+
+    try:
+        if request_config.llm_api == 'sncloud':
+            sncloud_client = SambaNovaCloudAPI(request_config, tokenizer)
+            metrics, generated_text = await sncloud_client.async_compute_metrics(metrics, client)
+
+        elif request_config.llm_api == 'sambastudio':
+            sambastudio_client = SambaStudioAPI(request_config, tokenizer)
+            metrics, generated_text = await sambastudio_client.async_compute_metrics(metrics, client)
+
+        else:
+            raise ValueError(f'llm_api parameter with value {request_config.llm_api} is not valid.')
+
+        return metrics, generated_text, request_config
+
+    except Exception as e:
+        error_code = getattr(
+            e,
+            'code',
+            """Error while running LLM API requests.
+            Check your model name, LLM API type, env variables and endpoint status.""",
+        )
+        error_message = str(e)
+        metrics[common_metrics.ERROR_MSG] = error_message
+        metrics[common_metrics.ERROR_CODE] = error_code
+
+        return metrics, '', request_config
+
+
 if __name__ == '__main__':
     # The call of this python file is more for debugging purposes
 
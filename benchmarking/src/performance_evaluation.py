@@ -1,12 +1,14 @@
 import abc
+import asyncio
 import json
 import os
 import random
 import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import yaml
 
@@ -20,14 +22,21 @@ import transformers
 from dotenv import load_dotenv
 from langchain.prompts import PromptTemplate
 from stqdm import stqdm
-from streamlit.runtime.scriptrunner import add_script_run_ctx
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from tqdm import tqdm
+from transformers import AutoTokenizer
 
 import benchmarking.src.llmperf.llmperf_utils as llmperf_utils
 from benchmarking.src.llmperf import common_metrics
 from benchmarking.src.llmperf.llmperf_utils import LLMPerfResults, flatten, get_tokenizer
+from benchmarking.src.llmperf.metrics_aggregator import MetricsAggregator
 from benchmarking.src.llmperf.models import LLMResponse, RequestConfig
-from benchmarking.src.llmperf.sambanova_client import llm_request
+from benchmarking.src.llmperf.prompt_cache import SyntheticPromptCache
+from benchmarking.src.llmperf.results_sink import STREAMING_RESULTS_FORMATS, ResultsSink
+from benchmarking.src.llmperf.sambanova_client import async_llm_request, get_async_http_client, llm_request
+
+if TYPE_CHECKING:
+    from benchmarking.src.distributed_performance_evaluation import DistributedCoordinator
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,9 +49,480 @@ load_dotenv('../.env', override=True)
 
 SYSTEM_PROMPT_PATH = os.path.join(file_location, '../prompts/system-prompt_template.yaml')
 USER_PROMPT_PATH = os.path.join(file_location, '../prompts/user-prompt_template.yaml')
+PROMPT_CACHE_DIR = os.path.join(file_location, '../data/prompt_cache')
+LOAD_ENGINES = ['threads', 'asyncio']
+ARRIVAL_PROCESSES = ['closed', 'fixed', 'poisson', 'trace']
+# Max number of open loop requests in flight with the threads engine, unless more concurrent requests are set
+MAX_OPEN_LOOP_THREADS = 256
+RESULTS_FORMATS = ['json'] + STREAMING_RESULTS_FORMATS
+SUMMARY_METRICS = [
+    common_metrics.TTFT,
+    common_metrics.E2E_LAT,
+    common_metrics.REQ_OUTPUT_THROUGHPUT,
+    common_metrics.NUM_INPUT_TOKENS,
+    common_metrics.NUM_OUTPUT_TOKENS,
+]
+
+
+class LoadGenerator:
+    """Sends the requests of a run to the LLM API with a load engine, in closed loop or following an open loop
+    arrival process, and collects their responses. The performance evaluators build on it, and the distributed
+    workers use it directly to send the requests they get from the coordinator."""
+
+    def __init__(
+        self,
+        tokenizer: AutoTokenizer,
+        num_concurrent_requests: int,
+        timeout: int = 600,
+        engine: str = 'threads',
+        arrival_process: str = 'closed',
+        qps: Optional[float] = None,
+        trace_file_path: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            tokenizer (AutoTokenizer): tokenizer for counting tokens
+            num_concurrent_requests (int): number of concurrent requests in closed loop
+            timeout (int): time in seconds after which no new request is sent
+            engine (str): load engine, either 'threads' or 'asyncio'
+            arrival_process (str): request arrival process, one of 'closed', 'fixed', 'poisson' or 'trace'
+            qps (float, optional): target request rate of the fixed and poisson arrival processes
+            trace_file_path (str, optional): arrival timestamps file of the trace arrival process
+        """
+        if engine not in LOAD_ENGINES:
+            raise ValueError(f'engine parameter with value {engine} is not valid. Available values are {LOAD_ENGINES}')
+        if arrival_process not in ARRIVAL_PROCESSES:
+            raise ValueError(
+                f'arrival_process parameter with value {arrival_process} is not valid. '
+                f'Available values are {ARRIVAL_PROCESSES}'
+            )
+        if arrival_process in ['fixed', 'poisson'] and (qps is None or qps <= 0):
+            raise ValueError(f'A positive qps value is required for the {arrival_process} arrival process')
+        if arrival_process == 'trace' and trace_file_path is None:
+            raise ValueError('A trace_file_path is required for the trace arrival process')
+        self.tokenizer = tokenizer
+        self.num_concurrent_requests = num_concurrent_requests
+        self.timeout = timeout
+        self.engine = engine
+        self.arrival_process = arrival_process
+        self.qps = qps
+        self.trace_file_path = trace_file_path
+
+    def collect_response(self, response: LLMResponse, completed_requests: List[Any]) -> None:
+        """Collects a completed response
+
+        Args:
+            response (LLMResponse): completed response
+            completed_requests (list): list of completed outputs from requests
+        """
+        completed_requests.append(response)
+
+    def send_requests(
+        self,
+        request_config_batch: List[Any],
+        completed_requests: List[Any],
+        progress_bar: tqdm,
+        start_time: float,
+    ) -> None:
+        """Sends multiple requests to LLM and collects results
+
+        Args:
+            request_config_batch (list): list of request configs for LLM calls
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            start_time (float): start time of the process
+        """
+        for request_config in request_config_batch:
+            if time.monotonic() - start_time >= self.timeout:
+                break
+            req_metrics, response_text, request_config = llm_request(request_config, self.tokenizer)
+
+            # Create response object containing metrics, generated text, and corresponding request config
+            response_object = LLMResponse(
+                metrics=req_metrics, response_text=response_text, request_config=request_config
+            )
+            self.collect_response(response_object, completed_requests)
+            progress_bar.update(1)
+
+    async def send_requests_async(
+        self,
+        request_config_batch: List[Any],
+        completed_requests: List[Any],
+        progress_bar: tqdm,
+        start_time: float,
+        client: Any,
+    ) -> None:
+        """Sends multiple requests to LLM over a shared async HTTP client and collects results.
+        Coroutine counterpart of `send_requests`, one per concurrent request.
 
+        Args:
+            request_config_batch (list): list of request configs for LLM calls
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            start_time (float): start time of the process
+            client (httpx.AsyncClient): pooled async HTTP client
+        """
+        for request_config in request_config_batch:
+            if time.monotonic() - start_time >= self.timeout:
+                break
+            req_metrics, response_text, request_config = await async_llm_request(request_config, self.tokenizer, client)
+
+            # Create response object containing metrics, generated text, and corresponding request config
+            response_object = LLMResponse(
+                metrics=req_metrics, response_text=response_text, request_config=request_config
+            )
+            self.collect_response(response_object, completed_requests)
+            progress_bar.update(1)
+
+    async def run_request_batches_async(
+        self,
+        request_config_batches: List[List[RequestConfig]],
+        completed_requests: List[LLMResponse],
+        progress_bar: tqdm,
+        start_time: float,
+    ) -> None:
+        """Runs every batch of requests as a coroutine on a single event loop, sharing one connection pool
+
+        Args:
+            request_config_batches (list): list of request config batches, one per concurrent request
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            start_time (float): start time of the process
+        """
+        async with get_async_http_client(self.num_concurrent_requests, self.timeout) as client:
+            await asyncio.gather(
+                *[
+                    self.send_requests_async(request_config_batch, completed_requests, progress_bar, start_time, client)
+                    for request_config_batch in request_config_batches
+                ]
+            )
+
+    def execute_request_batches(
+        self,
+        request_config_batches: List[List[RequestConfig]],
+        progress_bar: tqdm,
+        start_time: float,
+    ) -> List[LLMResponse]:
+        """Executes the batches of requests concurrently with the selected load engine. The `threads` engine runs
+        one thread per batch, while the `asyncio` engine runs one coroutine per batch on a single event loop.
+
+        Args:
+            request_config_batches (list): list of request config batches, one per concurrent request
+            progress_bar (tqdm): progress bar
+            start_time (float): start time of the process
+
+        Returns:
+            List[LLMResponse]: list of completed responses
+        """
+        llm_responses: List[LLMResponse] = []
 
-class BasePerformanceEvaluator(abc.ABC):
+        if self.engine == 'asyncio':
+            asyncio.run(self.run_request_batches_async(request_config_batches, llm_responses, progress_bar, start_time))
+            return llm_responses
+
+        # Create empty `threads` array to be populated with execution threads
+        threads: List[threading.Thread] = []
+
+        # Send request threads and add to the threads array
+        for request_config_batch in request_config_batches:
+            thread = threading.Thread(
+                target=self.send_requests,
+                args=(
+                    request_config_batch,
+                    llm_responses,
+                    progress_bar,
+                    start_time,
+                ),
+            )
+            threads.append(thread)
+            add_script_run_ctx(thread)  # Add Streamlit context to thread
+            thread.start()
+
+        # Wait for all threads to complete
+        for thread in threads:
+            add_script_run_ctx(thread)
+            thread.join()
+
+        return llm_responses
+
+    def split_request_configs(self, request_configs: List[RequestConfig]) -> List[List[RequestConfig]]:
+        """Splits the request configs evenly into one batch per concurrent request. If there is a remainder, it
+        assigns one extra request to the first batches.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+
+        Returns:
+            list: list of request config batches, one per concurrent request
+        """
+        # Get the request counts in order to place them into threads to be executed in batches
+        total_request_count = len(request_configs)
+        requests_per_thread = total_request_count // self.num_concurrent_requests
+        remainder = total_request_count % self.num_concurrent_requests
+
+        # Set up empty batch array and index for a sliding window of request selection
+        request_config_batches = []
+        idx = 0
+
+        # Create batches of requests for each concurrent request
+        for concurrent_requests in range(self.num_concurrent_requests):
+            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
+            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
+            idx += num_requests_for_thread
+            request_config_batches.append(request_config_batch)
+
+        return request_config_batches
+
+    def read_arrival_trace(self) -> List[float]:
+        """Reads the arrival timestamps from the trace file. The file must contain one timestamp in seconds per line,
+        either as a plain number, as the first column of a CSV file, or as a JSON object with a `timestamp` key. A CSV
+        header line is skipped. Timestamps are shifted so that the first arrival happens at 0.
+
+        Returns:
+            List[float]: sorted arrival offsets in seconds
+
+        Raises:
+            ValueError: If a line of the trace file has no valid timestamp.
+        """
+        assert isinstance(self.trace_file_path, str), 'No trace file provided'
+
+        timestamps = []
+        has_header = False
+        with open(self.trace_file_path, 'r') as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    if line.startswith('{'):
+                        timestamps.append(float(json.loads(line)['timestamp']))
+                    else:
+                        timestamps.append(float(line.split(',')[0]))
+                except (ValueError, KeyError) as e:
+                    # The first non empty line can be a CSV header
+                    if not has_header and len(timestamps) == 0 and not line.startswith('{'):
+                        has_header = True
+                        continue
+                    raise ValueError(
+                        f'Invalid arrival timestamp at line {line_number} of {self.trace_file_path}: {line}'
+                    ) from e
+
+        if len(timestamps) == 0:
+            raise ValueError(f'No arrival timestamps found in {self.trace_file_path}')
+
+        timestamps.sort()
+        return [timestamp - timestamps[0] for timestamp in timestamps]
+
+    def build_arrival_schedule(self, num_requests: int) -> List[float]:
+        """Builds the scheduled send time of each request, as an offset in seconds from the start of the run,
+        following the selected open loop arrival process:
+        - fixed: requests are sent every 1/qps seconds.
+        - poisson: inter-arrival times are exponentially distributed with mean 1/qps seconds.
+        - trace: arrival times are replayed from the trace file.
+
+        Args:
+            num_requests (int): number of requests to schedule
+
+        Returns:
+            List[float]: scheduled send offsets in seconds. It can be shorter than `num_requests` when replaying a
+            trace with fewer arrivals.
+        """
+        if self.arrival_process == 'fixed':
+            assert self.qps is not None
+            return [request_idx / self.qps for request_idx in range(num_requests)]
+
+        elif self.arrival_process == 'poisson':
+            assert self.qps is not None
+            rng = np.random.default_rng(11111)
+            inter_arrival_times = rng.exponential(1 / self.qps, num_requests - 1)
+            return [0.0] + [float(offset) for offset in np.cumsum(inter_arrival_times)]
+
+        elif self.arrival_process == 'trace':
+            schedule = self.read_arrival_trace()
+            if len(schedule) < num_requests:
+                logger.warning(
+                    f'Trace file has {len(schedule)} arrivals for {num_requests} requests. '
+                    f'Only the first {len(schedule)} requests will be sent.'
+                )
+            return schedule[:num_requests]
+
+        else:
+            raise ValueError(f'Arrival process {self.arrival_process} does not have an arrival schedule')
+
+    def record_request_times(
+        self, metrics: Dict[str, Any], scheduled_send_time: float, send_time: float, completion_time: float
+    ) -> Dict[str, Any]:
+        """Records the open loop timings of a request in its metrics, as offsets in seconds from the run start
+
+        Args:
+            metrics (dict): request metrics
+            scheduled_send_time (float): time at which the request was scheduled to be sent
+            send_time (float): time at which the request was actually sent
+            completion_time (float): time at which the response was completed
+
+        Returns:
+            dict: updated metrics dictionary
+        """
+        metrics[common_metrics.SCHEDULED_SEND_TIME] = scheduled_send_time
+        metrics[common_metrics.SEND_TIME] = send_time
+        metrics[common_metrics.COMPLETION_TIME] = completion_time
+        return metrics
+
+    def send_scheduled_request(
+        self,
+        request_config: RequestConfig,
+        scheduled_send_time: float,
+        completed_requests: List[Any],
+        progress_bar: tqdm,
+        schedule_start_time: float,
+    ) -> None:
+        """Sends a single open loop request to LLM and collects its result along with its schedule timings
+
+        Args:
+            request_config (RequestConfig): request config for the LLM call
+            scheduled_send_time (float): offset in seconds at which the request was scheduled to be sent
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            schedule_start_time (float): start time of the arrival schedule
+        """
+        send_time = time.monotonic() - schedule_start_time
+        req_metrics, response_text, request_config = llm_request(request_config, self.tokenizer)
+        completion_time = time.monotonic() - schedule_start_time
+
+        req_metrics = self.record_request_times(req_metrics, scheduled_send_time, send_time, completion_time)
+        response_object = LLMResponse(metrics=req_metrics, response_text=response_text, request_config=request_config)
+        self.collect_response(response_object, completed_requests)
+        progress_bar.update(1)
+
+    async def send_scheduled_request_async(
+        self,
+        request_config: RequestConfig,
+        scheduled_send_time: float,
+        completed_requests: List[Any],
+        progress_bar: tqdm,
+        schedule_start_time: float,
+        client: Any,
+    ) -> None:
+        """Coroutine counterpart of `send_scheduled_request`. It waits until the scheduled send time before sending.
+
+        Args:
+            request_config (RequestConfig): request config for the LLM call
+            scheduled_send_time (float): offset in seconds at which the request was scheduled to be sent
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            schedule_start_time (float): start time of the arrival schedule
+            client (httpx.AsyncClient): pooled async HTTP client
+        """
+        await asyncio.sleep(max(0.0, schedule_start_time + scheduled_send_time - time.monotonic()))
+
+        send_time = time.monotonic() - schedule_start_time
+        req_metrics, response_text, request_config = await async_llm_request(request_config, self.tokenizer, client)
+        completion_time = time.monotonic() - schedule_start_time
+
+        req_metrics = self.record_request_times(req_metrics, scheduled_send_time, send_time, completion_time)
+        response_object = LLMResponse(metrics=req_metrics, response_text=response_text, request_config=request_config)
+        self.collect_response(response_object, completed_requests)
+        progress_bar.update(1)
+
+    async def run_scheduled_requests_async(
+        self,
+        request_configs: List[RequestConfig],
+        schedule: List[float],
+        completed_requests: List[LLMResponse],
+        progress_bar: tqdm,
+        schedule_start_time: float,
+    ) -> None:
+        """Runs every scheduled request as a coroutine on a single event loop. The connection pool is not bounded, so
+        that requests are never queued on the client side.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            schedule (list): scheduled send offsets in seconds, one per request config
+            completed_requests (list): list of completed outputs from requests
+            progress_bar (tqdm): progress bar
+            schedule_start_time (float): start time of the arrival schedule
+        """
+        async with get_async_http_client(None, self.timeout) as client:
+            await asyncio.gather(
+                *[
+                    self.send_scheduled_request_async(
+                        request_config,
+                        scheduled_send_time,
+                        completed_requests,
+                        progress_bar,
+                        schedule_start_time,
+                        client,
+                    )
+                    for request_config, scheduled_send_time in zip(request_configs, schedule)
+                ]
+            )
+
+    def execute_scheduled_requests(
+        self,
+        request_configs: List[RequestConfig],
+        progress_bar: tqdm,
+        start_time: float,
+        schedule: Optional[List[float]] = None,
+    ) -> List[LLMResponse]:
+        """Executes the requests in open loop: each request is sent at its scheduled time, regardless of whether
+        previous requests have finished. Requests scheduled after the timeout are not sent.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            progress_bar (tqdm): progress bar
+            start_time (float): start time of the process
+            schedule (list, optional): sorted scheduled send offsets in seconds, one per request config. Built from
+                the arrival process if not given.
+
+        Returns:
+            List[LLMResponse]: list of completed responses
+        """
+        if schedule is None:
+            schedule = self.build_arrival_schedule(len(request_configs))
+
+        # Drop the requests that would be sent after the timeout
+        schedule_start_time = time.monotonic()
+        remaining_time = self.timeout - (schedule_start_time - start_time)
+        schedule = [scheduled_send_time for scheduled_send_time in schedule if scheduled_send_time < remaining_time]
+        request_configs = request_configs[: len(schedule)]
+
+        llm_responses: List[LLMResponse] = []
+
+        if self.engine == 'asyncio':
+            asyncio.run(
+                self.run_scheduled_requests_async(
+                    request_configs, schedule, llm_responses, progress_bar, schedule_start_time
+                )
+            )
+            return llm_responses
+
+        # Submit each request to a bounded thread pool at its scheduled send time. When every thread is busy, the
+        # request waits for a free one and the delay shows up as send lag
+        with ThreadPoolExecutor(
+            max_workers=max(self.num_concurrent_requests, MAX_OPEN_LOOP_THREADS),
+            initializer=add_script_run_ctx,  # Add Streamlit context to the pool threads
+            initargs=(None, get_script_run_ctx()),
+        ) as executor:
+            futures = []
+            for request_config, scheduled_send_time in zip(request_configs, schedule):
+                time.sleep(max(0.0, schedule_start_time + scheduled_send_time - time.monotonic()))
+                futures.append(
+                    executor.submit(
+                        self.send_scheduled_request,
+                        request_config,
+                        scheduled_send_time,
+                        llm_responses,
+                        progress_bar,
+                        schedule_start_time,
+                    )
+                )
+            for future in futures:
+                future.result()
+
+        return llm_responses
+
+
+class BasePerformanceEvaluator(LoadGenerator, abc.ABC):
     def __init__(
         self,
         model_name: str,
@@ -53,20 +533,44 @@ class BasePerformanceEvaluator(abc.ABC):
         api_variables: Dict[str, Any] = {},
         is_stream_mode: bool = True,
         timeout: int = 600,
+        engine: str = 'threads',
+        arrival_process: str = 'closed',
+        qps: Optional[float] = None,
+        trace_file_path: Optional[str] = None,
+        results_format: str = 'json',
+        quantile_sketch: bool = False,
+        coordinator: Optional['DistributedCoordinator'] = None,
     ) -> None:
+        if results_format not in RESULTS_FORMATS:
+            raise ValueError(
+                f'results_format parameter with value {results_format} is not valid. '
+                f'Available values are {RESULTS_FORMATS}'
+            )
+        super().__init__(
+            tokenizer=get_tokenizer(model_name, lazy=True),
+            num_concurrent_requests=num_concurrent_requests,
+            timeout=timeout,
+            engine=engine,
+            arrival_process=arrival_process,
+            qps=qps,
+            trace_file_path=trace_file_path,
+        )
         self.model_name = model_name
         self.results_dir = results_dir
-        self.num_concurrent_requests = num_concurrent_requests
         self.user_metadata = user_metadata
         self.llm_api = llm_api
         self.api_variables = api_variables
         self.is_stream_mode = is_stream_mode
-        self.timeout = timeout
-        self.tokenizer = get_tokenizer(self.model_name)
+        self.results_format = results_format
+        self.quantile_sketch = quantile_sketch
+        self.coordinator = coordinator
 
         # To be set upon saving of results
         self.summary_file_path: Optional[str] = None
         self.individual_responses_file_path: Optional[str] = None
+        self.results_sink: Optional[ResultsSink] = None
+        self.metrics_aggregator: Optional[MetricsAggregator] = None
+        self.metrics_sketch_file_path: Optional[str] = None
 
     def get_token_length(self, input_text: str) -> int:
         return len(self.tokenizer.encode(input_text))
@@ -85,6 +589,18 @@ class BasePerformanceEvaluator(abc.ABC):
         outfile_prefix = re.sub(r'-{2,}', '-', outfile_prefix)
         return outfile_prefix
 
+    def get_arrival_suffix(self) -> str:
+        """Utility for creating the output filename suffix of open loop runs.
+
+        Returns:
+            str: Arrival process and qps suffix, empty for closed loop runs
+        """
+        if self.arrival_process == 'closed':
+            return ''
+        if self.arrival_process == 'trace':
+            return '_trace'
+        return f'_{self.arrival_process}_{self.qps}qps'
+
     @abc.abstractmethod
     def create_output_filename(self, *args: Any, **kwargs: Any) -> str:
         pass
@@ -146,36 +662,95 @@ class BasePerformanceEvaluator(abc.ABC):
 
         return adjusted_text
 
-    def send_requests(
+    def get_results_dir(self) -> Path:
+        """Gets the results directory, creating it if it doesn't exist.
+
+        Returns:
+            Path: results directory
+
+        Raises:
+            ValueError: If the results directory path exists but is not a directory.
+        """
+        results_dir = Path(self.results_dir)
+        if not results_dir.exists():
+            results_dir.mkdir(parents=True)
+        elif not results_dir.is_dir():
+            raise ValueError(f'{results_dir} is not a directory')
+        return results_dir
+
+    def open_results_sink(self, filename: str, response_texts_file_path: Optional[str] = None) -> None:
+        """Opens the sink that writes the individual responses to disk as they complete, for the streaming results
+        formats. With the `json` format, responses are kept in memory and saved at the end of the run.
+
+        Args:
+            filename (str): The base name of the results files.
+            response_texts_file_path (str, optional): File path for the prompts and completions, if they have to be
+                saved.
+        """
+        if self.results_format not in STREAMING_RESULTS_FORMATS or not self.results_dir:
+            self.results_sink = None
+            return
+
+        self.individual_responses_file_path = (
+            f'{self.get_results_dir()}/{filename}_individual_responses.{self.results_format}'
+        )
+        self.results_sink = ResultsSink(
+            self.individual_responses_file_path, self.results_format, response_texts_file_path
+        )
+        logger.info(f'Writing individual responses to {self.individual_responses_file_path}')
+
+    def reset_metrics_aggregator(self) -> None:
+        """Sets up a new metrics aggregator for the run if quantile sketches are enabled"""
+        self.metrics_aggregator = MetricsAggregator(SUMMARY_METRICS) if self.quantile_sketch else None
+
+    def collect_response(self, response: LLMResponse, completed_requests: List[Any]) -> None:
+        """Collects a completed response, writing it to the results sink if there is one, or keeping it in memory.
+        The metrics aggregator, if any, is updated as well.
+
+        Args:
+            response (LLMResponse): completed response
+            completed_requests (list): list of completed outputs from requests
+        """
+        if self.metrics_aggregator is not None:
+            self.metrics_aggregator.update(response.metrics)
+        if self.results_sink is not None:
+            self.results_sink.write(response)
+        else:
+            completed_requests.extend([response])
+
+    def execute_requests(
         self,
-        request_config_batch: List[Any],
-        completed_requests: List[Any],
+        request_configs: List[RequestConfig],
         progress_bar: tqdm,
         start_time: float,
-    ) -> None:
-        """Sends multiple requests to LLM and collects results
+    ) -> List[LLMResponse]:
+        """Executes the requests following the selected arrival process. In closed loop mode, each concurrent request
+        sends its next request only after the previous one finishes. Otherwise, requests are sent in open loop.
+        With a distributed coordinator, requests are spread across its worker processes instead.
 
         Args:
-            request_config_batch (list): list of request configs for LLM calls
-            completed_requests (list): list of completed outputs from requests
+            request_configs (list): list of request configs for LLM calls
             progress_bar (tqdm): progress bar
             start_time (float): start time of the process
-        """
-        for request_config in request_config_batch:
-            if time.monotonic() - start_time >= self.timeout:
-                break
-            req_metrics, response_text, request_config = llm_request(request_config, self.tokenizer)
 
-            # Create response object containing metrics, generated text, and corresponding request config
-            response_object = LLMResponse(
-                metrics=req_metrics, response_text=response_text, request_config=request_config
-            )
-            completed_requests.extend([response_object])
-            progress_bar.update(1)
+        Returns:
+            List[LLMResponse]: list of completed responses
+        """
+        if self.coordinator is not None:
+            llm_responses: List[LLMResponse] = []
+            for response in self.coordinator.execute_requests(self, request_configs, start_time):
+                self.collect_response(response, llm_responses)
+                progress_bar.update(1)
+            return llm_responses
+
+        if self.arrival_process == 'closed':
+            request_config_batches = self.split_request_configs(request_configs)
+            return self.execute_request_batches(request_config_batches, progress_bar, start_time)
+        return self.execute_scheduled_requests(request_configs, progress_bar, start_time)
 
     def build_metrics_summary(
         self,
-        metrics: List[Dict[str, Any]],
+        metrics: List[Dict[str, Any]] | pd.DataFrame,
         start_time: float,
         end_time: float,
     ) -> Dict[str, Any]:
@@ -187,7 +762,8 @@ class BasePerformanceEvaluator(abc.ABC):
         the error rate and count, the overall throughput, and the number of completed requests.
 
         Parameters:
-        metrics (List[Dict[str, Any]]): A list of dictionaries, each representing a metric.
+        metrics (List[Dict[str, Any]] | pd.DataFrame): A list of dictionaries, each representing a metric, or a
+            DataFrame with one row per request.
         start_time (time): The start time of the metrics collection.
         end_time (time): The end time of the metrics collection.
 
@@ -198,19 +774,13 @@ class BasePerformanceEvaluator(abc.ABC):
         metrics_summary: Dict[str, Any] = {}
 
         # Create base df from metrics returned from request responses
-        raw_df = pd.DataFrame(metrics)
+        raw_df = metrics if isinstance(metrics, pd.DataFrame) else pd.DataFrame(metrics)
 
         # Remove errored requests
         metrics_df = raw_df[raw_df[common_metrics.ERROR_CODE].isna()]
 
         # Record descriptive statistics for the metrics in the following list
-        for metric in [
-            common_metrics.TTFT,
-            common_metrics.E2E_LAT,
-            common_metrics.REQ_OUTPUT_THROUGHPUT,
-            common_metrics.NUM_INPUT_TOKENS,
-            common_metrics.NUM_OUTPUT_TOKENS,
-        ]:
+        for metric in SUMMARY_METRICS:
             logger.info(f'Building Metrics Summary for metric: {metric}')
             metrics_summary[metric] = {}
 
@@ -243,12 +813,12 @@ class BasePerformanceEvaluator(abc.ABC):
             metrics_summary[metric]['stddev'] = series_std
 
         # Record number of requests started
-        metrics_summary[common_metrics.NUM_REQ_STARTED] = len(metrics)
+        metrics_summary[common_metrics.NUM_REQ_STARTED] = len(raw_df)
 
         # Record error count and rate
         error_codes = raw_df[common_metrics.ERROR_CODE].dropna()
         num_errors = len(error_codes)
-        metrics_summary[common_metrics.ERROR_RATE] = num_errors / len(metrics) if len(metrics) else 0
+        metrics_summary[common_metrics.ERROR_RATE] = num_errors / len(raw_df) if len(raw_df) else 0
         metrics_summary[common_metrics.NUM_ERRORS] = num_errors
         logger.info(f'Number Of Errored Requests: {num_errors}')
 
@@ -278,8 +848,97 @@ class BasePerformanceEvaluator(abc.ABC):
         metrics_summary[common_metrics.NUM_COMPLETED_REQUESTS] = num_completed_requests
         metrics_summary[common_metrics.COMPLETED_REQUESTS_PER_MIN] = num_completed_requests_per_min
 
+        # Record offered vs achieved load for open loop runs
+        if common_metrics.SCHEDULED_SEND_TIME in raw_df.columns:
+            metrics_summary.update(self.build_load_summary(raw_df, metrics_df))
+
         return metrics_summary
 
+    def build_load_summary(self, raw_df: pd.DataFrame, metrics_df: pd.DataFrame) -> Dict[str, Any]:
+        """Builds the offered vs achieved load summary of an open loop run.
+        Offered load is the request rate of the arrival schedule, achieved load is the rate of successfully completed
+        requests between the first send and the last completion, and send lag is the delay between the scheduled
+        and the actual send time of each request.
+
+        Args:
+            raw_df (pd.DataFrame): metrics of all the requests sent
+            metrics_df (pd.DataFrame): metrics of the requests completed without errors
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the load summary metrics.
+        """
+        load_summary: Dict[str, Any] = {}
+
+        scheduled_send_times = raw_df[common_metrics.SCHEDULED_SEND_TIME]
+        schedule_span = scheduled_send_times.max() - scheduled_send_times.min()
+        offered_load = round((len(scheduled_send_times) - 1) / schedule_span, 4) if schedule_span > 0 else None
+        logger.info(f'Offered Load (requests/s): {offered_load}')
+        load_summary[common_metrics.OFFERED_LOAD] = offered_load
+
+        run_span = metrics_df[common_metrics.COMPLETION_TIME].max() - raw_df[common_metrics.SEND_TIME].min()
+        achieved_load = round(len(metrics_df) / run_span, 4) if run_span > 0 else None
+        logger.info(f'Achieved Load (requests/s): {achieved_load}')
+        load_summary[common_metrics.ACHIEVED_LOAD] = achieved_load
+
+        send_lags = raw_df[common_metrics.SEND_TIME] - raw_df[common_metrics.SCHEDULED_SEND_TIME]
+        load_summary[common_metrics.SEND_LAG] = {
+            'mean': round(send_lags.mean(), 4),
+            'p99': round(send_lags.quantile(0.99), 4),
+            'max': round(send_lags.max(), 4),
+        }
+        logger.info(f'Send Lag (s): {load_summary[common_metrics.SEND_LAG]}')
+
+        return load_summary
+
+    def build_run_summary(self, llm_responses: List[LLMResponse], start_time: float, end_time: float) -> Dict[str, Any]:
+        """Builds the summary of metrics of a run from the quantile sketches if they are enabled, or else from the
+        results sink, or else from the responses held in memory.
+
+        Args:
+            llm_responses (list): completed responses kept in memory, empty when a results sink is used
+            start_time (float): The start time of the metrics collection.
+            end_time (float): The end time of the metrics collection.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the summary metrics.
+        """
+        if self.metrics_aggregator is not None:
+            return self.metrics_aggregator.summarize(start_time, end_time)
+        if self.results_sink is not None:
+            return self.build_metrics_summary_from_sink(start_time, end_time)
+        return self.build_metrics_summary(
+            metrics=[response.metrics for response in llm_responses],
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+    def build_metrics_summary_from_sink(self, start_time: float, end_time: float) -> Dict[str, Any]:
+        """Builds the summary of metrics from the individual responses written by the results sink. The responses
+        file is read back in chunks keeping only the metrics the summary needs, and each chunk is added to quantile
+        sketches before the next one is read, so memory doesn't grow with the number of requests.
+
+        Args:
+            start_time (float): The start time of the metrics collection.
+            end_time (float): The end time of the metrics collection.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the summary metrics.
+        """
+        assert self.results_sink is not None
+        summary_columns = SUMMARY_METRICS + [
+            common_metrics.ERROR_CODE,
+            common_metrics.SCHEDULED_SEND_TIME,
+            common_metrics.SEND_TIME,
+            common_metrics.COMPLETION_TIME,
+        ]
+        metrics_aggregator = MetricsAggregator(SUMMARY_METRICS)
+        for metrics_chunk in self.results_sink.iter_metrics(summary_columns):
+            # Missing values are read back as NaN, the aggregator expects None
+            metrics_chunk = metrics_chunk.astype(object).where(metrics_chunk.notna(), None)
+            for metrics in metrics_chunk.to_dict('records'):
+                metrics_aggregator.update(metrics)
+        return metrics_aggregator.summarize(start_time, end_time)
+
     def save_results(
         self,
         filename: str,
@@ -309,11 +968,7 @@ class BasePerformanceEvaluator(abc.ABC):
         summary.update(self.user_metadata)
 
         results = LLMPerfResults(name=summary_filename, metadata=summary)
-        results_dir = Path(self.results_dir)
-        if not results_dir.exists():
-            results_dir.mkdir(parents=True)
-        elif not results_dir.is_dir():
-            raise ValueError(f'{results_dir} is not a directory')
+        results_dir = self.get_results_dir()
 
         # Save summary results
         try:
@@ -324,6 +979,15 @@ class BasePerformanceEvaluator(abc.ABC):
             logger.error(results.to_dict())
             raise e
 
+        # Save the quantile sketches, so they can be merged with the ones of other workers or runs
+        if self.metrics_aggregator is not None:
+            self.metrics_sketch_file_path = f'{results_dir}/{filename}_metrics_sketch.json'
+            self.metrics_aggregator.save(self.metrics_sketch_file_path)
+
+        # Individual responses were already written as they completed
+        if self.results_sink is not None:
+            return
+
         # Save individual response results
         try:
             self.individual_responses_file_path = f'{results_dir}/{individual_responses_filename}.json'
@@ -371,7 +1035,10 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
         if self.is_stream_mode:
             generation_mode = 'stream'
 
-        output_file_name = f'{self.model_name}_{self.file_name}_{self.num_concurrent_requests}_{generation_mode}'
+        output_file_name = (
+            f'{self.model_name}_{self.file_name}_{self.num_concurrent_requests}_{generation_mode}'
+            f'{self.get_arrival_suffix()}'
+        )
         return self.sanitize_file_prefix(output_file_name)
 
     def save_results(
@@ -397,8 +1064,8 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
         super().save_results(filename, summary, individual_responses)
 
-        # If specified, save the llm responses to output file
-        if self.save_response_texts:
+        # If specified, save the llm responses to output file, unless the results sink already wrote them
+        if self.save_response_texts and self.results_sink is None:
             # Create response texts file name
             response_texts_file_name = f'{filename}_response_texts'
             results_dir = Path(self.results_dir)
@@ -433,6 +1100,14 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
         Returns:
             None
         """
+        filename = self.create_output_filename()
+
+        # With a streaming results format, responses are written to the results directory as they complete
+        response_texts_file_path = None
+        if self.save_response_texts:
+            response_texts_file_path = f'{Path(self.results_dir)}/{filename}_response_texts.jsonl'
+        self.open_results_sink(filename, response_texts_file_path)
+
         # Calculate performance metrics individually and summary
         summary, individual_responses = self.get_token_throughput_latencies(
             sampling_params=sampling_params,
@@ -440,7 +1115,6 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
         # Save benchmarking results to the specified results directory, it it exists
         if self.results_dir:
-            filename = self.create_output_filename()
             self.save_results(
                 filename,
                 summary,
@@ -466,70 +1140,52 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
             Exception: If an unexpected error happens when executing requests.
 
         Note:
-            This function uses threading to send requests concurrently. It splits the total request count evenly among
-            the threads. If there is a remainder, it assigns one extra request to the first threads.
+            This function uses threading (or asyncio, depending on the selected engine) to send requests concurrently.
+            In closed loop mode it splits the total request count evenly among the threads. If there is a remainder,
+            it assigns one extra request to the first threads. In open loop mode requests are sent following the
+            selected arrival process.
         """
         random.seed(11111)
+        self.reset_metrics_aggregator()
         start_time = time.monotonic()
 
         request_configs = self.build_request_configs(
             sampling_params,
         )
 
-        # Get batch size details
         total_request_count = len(request_configs)
-        requests_per_thread = total_request_count // self.num_concurrent_requests
-        remainder = total_request_count % self.num_concurrent_requests
-
-        request_config_batches = []
-        idx = 0
-        for concurrent_requests in range(self.num_concurrent_requests):
-            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
-            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
-            idx = idx + num_requests_for_thread
-            request_config_batches.append(request_config_batch)
-
-        threads = []
-        llm_responses: List[LLMResponse] = []
         progress_bar = stqdm(total=total_request_count, desc='Running Requests', mininterval=1)
         # progress_bar = tqdm(total=total_request_count, desc="Running Requests")
 
-        for request_config_batch in request_config_batches:
-            thread = threading.Thread(
-                target=self.send_requests,
-                args=(
-                    request_config_batch,
-                    llm_responses,
-                    progress_bar,
-                    start_time,
-                ),
-            )
-            threads.append(thread)
-            add_script_run_ctx(thread)  # Give Streamlit context to thread
-            thread.start()
-
-        for thread in threads:
-            add_script_run_ctx(thread)
-            thread.join()
-
-        if llm_responses[0].metrics[common_metrics.ERROR_CODE]:
+        try:
+            llm_responses = self.execute_requests(request_configs, progress_bar, start_time)
+        finally:
+            if self.results_sink is not None:
+                self.results_sink.close()
+
+        first_metrics = llm_responses[0].metrics if self.results_sink is None else self.results_sink.first_metrics
+        if first_metrics is None:
+            raise Exception('No request was completed before the timeout')
+        if first_metrics[common_metrics.ERROR_CODE]:
             raise Exception(
-                f"""Unexpected error happened when executing requests: {llm_responses[0].metrics['error_code']}.
-                  Additional message: {llm_responses[0].metrics['error_msg']}"""
+                f"""Unexpected error happened when executing requests: {first_metrics['error_code']}.
+                  Additional message: {first_metrics['error_msg']}"""
             )
 
         end_time = time.monotonic()
         logger.info('Tasks Executed!')
+
+        # Distributed runs are timed from the synchronized start of the workers, once they are set up
+        if self.coordinator is not None and self.coordinator.run_start_time is not None:
+            start_time = self.coordinator.run_start_time
         logger.info(f'Results for token benchmark for {self.model_name} queried with the {self.llm_api} api.')
-        results = self.build_metrics_summary(
-            metrics=[response.metrics for response in llm_responses],
-            start_time=start_time,
-            end_time=end_time,
-        )
+        results = self.build_run_summary(llm_responses, start_time, end_time)
 
         metadata = {
             'model': self.model_name,
             'num_concurrent_requests': self.num_concurrent_requests,
+            'arrival_process': self.arrival_process,
+            'qps': self.qps,
             'results': results,
             'request_count': len(self.dataset),
             'sampling_params': sampling_params,
@@ -624,8 +1280,16 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
 
 class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
+    def __init__(
+        self, prompt_seed: int = 11111, prompt_cache_dir: str = PROMPT_CACHE_DIR, *args: Any, **kwargs: Any
+    ) -> None:
         super().__init__(*args, **kwargs)
+        self.prompt_seed = prompt_seed
+        # Prompt bodies are tokenized once per number of input tokens and reused across runs, from memory or from
+        # disk, while the random prefixes change with the nonce of each run
+        self.prompt_cache = SyntheticPromptCache(self.tokenizer, prompt_cache_dir)
+        self.run_nonce = time.time_ns()
+        self.prompt_template: Optional[str] = None
 
     def create_output_filename(self, num_input_tokens: int, num_output_tokens: int) -> str:
         """Utility for creating a unique filename for a synthetic benchmarking experiment given user specified params.
@@ -639,16 +1303,13 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
 
         output_file_name = (
             f'{self.user_metadata["model_idx"]}_{self.model_name}_{num_input_tokens}'
-            f'_{num_output_tokens}_{self.num_concurrent_requests}_{generation_mode}'
+            f'_{num_output_tokens}_{self.num_concurrent_requests}_{generation_mode}{self.get_arrival_suffix()}'
         )
         return self.sanitize_file_prefix(output_file_name)
 
     def run_benchmark(
         self, sampling_params: Dict[str, Any] = {}, *args: Any, **kwargs: Any
-    ) -> (
-        Tuple[Dict[str, Any] | Dict[str, object], List[Tuple[Dict[str, Any], str, RequestConfig]] | List[LLMResponse]]
-        | None
-    ):
+    ) -> Tuple[Dict[str, Any], List[LLMResponse]]:
         """Run a benchmark test for the specified LLM using synthetically generated data.
 
         Args:
@@ -672,6 +1333,11 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                 'The minimum number of input tokens that will be sent is 40' ' because of the prompting logic right now'
             )
 
+        filename = self.create_output_filename(num_input_tokens, num_output_tokens)
+
+        # With a streaming results format, responses are written to the results directory as they complete
+        self.open_results_sink(filename)
+
         # Calculate performance metrics individually and summary
         summary, individual_responses = self.get_token_throughput_latencies(
             num_input_tokens=num_input_tokens,
@@ -681,7 +1347,6 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         )
 
         if self.results_dir:
-            filename = self.create_output_filename(num_input_tokens, num_output_tokens)
             self.save_results(filename, summary, individual_responses)
 
         return summary, individual_responses
@@ -778,16 +1443,61 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
 
         return llm_responses
 
+    def calculate_switching_time_from_sink(self) -> Optional[float]:
+        """Calculates the switching time, as `calculate_switching_time` does, from the responses written by the
+        results sink. They are read back in chunks, keeping only the running sums of the server TTFTs and the TTFT of
+        the first request sent.
+
+        Returns:
+            float: switching time, None if the first request TTFT is not an outlier
+        """
+        assert self.results_sink is not None
+        num_ttfts = 0
+        ttfts_sum = 0.0
+        ttfts_squares_sum = 0.0
+        first_start_time: Optional[str] = None
+        first_ttft = 0.0
+        columns = [common_metrics.ERROR_CODE, common_metrics.REQ_START_TIME, common_metrics.TTFT_SERVER]
+        for metrics_chunk in self.results_sink.iter_metrics(columns):
+            if common_metrics.TTFT_SERVER not in metrics_chunk.columns:
+                continue
+            metrics_chunk = metrics_chunk[metrics_chunk[common_metrics.ERROR_CODE].isna()]
+            metrics_chunk = metrics_chunk.dropna(subset=[common_metrics.TTFT_SERVER])
+            if metrics_chunk.empty:
+                continue
+            ttfts = metrics_chunk[common_metrics.TTFT_SERVER].astype(float)
+            num_ttfts += len(ttfts)
+            ttfts_sum += ttfts.sum()
+            ttfts_squares_sum += (ttfts**2).sum()
+            # Start times are zero padded H:M:S.f strings, so they sort as text
+            chunk_first = metrics_chunk[common_metrics.REQ_START_TIME].astype(str).idxmin()
+            chunk_first_start_time = str(metrics_chunk.at[chunk_first, common_metrics.REQ_START_TIME])
+            if first_start_time is None or chunk_first_start_time < first_start_time:
+                first_start_time = chunk_first_start_time
+                first_ttft = float(metrics_chunk.at[chunk_first, common_metrics.TTFT_SERVER])
+
+        # Mean and standard deviation of the TTFTs of the requests after the first one
+        if num_ttfts < 2:
+            return None
+        mean_ttft = (ttfts_sum - first_ttft) / (num_ttfts - 1)
+        if num_ttfts > 2:
+            variance = (ttfts_squares_sum - first_ttft**2 - (num_ttfts - 1) * mean_ttft**2) / (num_ttfts - 2)
+            std_ttft = float(np.sqrt(max(variance, 0.0)))
+        else:
+            std_ttft = 1e-16
+
+        switching_time = first_ttft - mean_ttft
+        if switching_time > (mean_ttft + 3 * std_ttft):
+            return float(switching_time)
+        return None
+
     def get_token_throughput_latencies(
         self,
         num_input_tokens: int,
         num_output_tokens: int,
         num_requests: int,
         sampling_params: Dict[str, Any],
-    ) -> (
-        Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str, RequestConfig]]]
-        | Tuple[Dict[str, object], list[LLMResponse]]
-    ):
+    ) -> Tuple[Dict[str, Any], List[LLMResponse]]:
         """This function runs a token benchmark for the given model and API,
         measuring the throughput and latencies for the specified number of input and output tokens,
         and the specified number of requests.
@@ -809,58 +1519,32 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
             Exception: If an unexpected error occurs during the execution of requests.
         """
         random.seed(11111)
+        self.reset_metrics_aggregator()
+        self.run_nonce = time.time_ns()
         start_time = time.monotonic()
 
         # Build the request config objects that are to be sent to the LLM API endpoint
         request_configs = self.build_request_configs(num_requests, num_input_tokens, num_output_tokens, sampling_params)
 
-        # Get the request counts in order to place them into threads to be executed in batches
         total_request_count = len(request_configs)
-        requests_per_thread = (total_request_count) // self.num_concurrent_requests
-        remainder = (total_request_count) % self.num_concurrent_requests
-
-        # Set up empty batch array and index for a sliding window of request selection
-        request_config_batches = []
-        idx = 0
-
-        # Create batches of requests for each concurrent request
-        for concurrent_requests in range(self.num_concurrent_requests):
-            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
-            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
-            idx += num_requests_for_thread
-            request_config_batches.append(request_config_batch)
-
-        # Create empty `threads` and `completed_requests` arrays to be populated with execution threads and
-        # completed requests respectively
-        threads: List[threading.Thread] = []
-        llm_responses: List[LLMResponse] = []
         progress_bar = stqdm(total=total_request_count, desc='Running Requests', mininterval=1)
         # progress_bar = tqdm(total=total_request_count, desc="Running Requests")
 
-        # Send request threads and add to the threads array
-        for request_config_batch in request_config_batches:
-            thread = threading.Thread(
-                target=self.send_requests,
-                args=(
-                    request_config_batch,
-                    llm_responses,
-                    progress_bar,
-                    start_time,
-                ),
-            )
-            threads.append(thread)
-            add_script_run_ctx(thread)  # Add Streamlit context to thread
-            thread.start()
-
-        # Wait for all threads to complete
-        for thread in threads:
-            add_script_run_ctx(thread)
-            thread.join()
+        # Send the requests with the selected engine and arrival process, and wait for all of them to complete
+        try:
+            llm_responses = self.execute_requests(request_configs, progress_bar, start_time)
+        finally:
+            if self.results_sink is not None:
+                self.results_sink.close()
 
         # Error handling
-        error_codes = [llm_response.metrics['error_code'] for llm_response in llm_responses]
-
-        if not any([pd.isnull(error_code) for error_code in error_codes]):
+        if self.results_sink is not None:
+            all_requests_failed = self.results_sink.num_errors == self.results_sink.num_responses
+            unique_error_codes = list(self.results_sink.error_codes.keys())
+            unique_error_msgs = list(self.results_sink.error_msgs)
+        else:
+            error_codes = [llm_response.metrics['error_code'] for llm_response in llm_responses]
+            all_requests_failed = not any([pd.isnull(error_code) for error_code in error_codes])
             unique_error_codes = list(
                 set(
                     [
@@ -879,6 +1563,8 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                     ]
                 )
             )
+
+        if all_requests_failed:
             nl = '\n'
             raise Exception(
                 f"""Unexpected error happened when executing requests: {f'{nl}-'.join(unique_error_codes)}{nl}"""
@@ -888,22 +1574,32 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         # Capture end time and notify user
         end_time = time.monotonic()
         logger.info('Tasks Executed!')
+
+        # Distributed runs are timed from the synchronized start of the workers, once they are set up
+        if self.coordinator is not None and self.coordinator.run_start_time is not None:
+            start_time = self.coordinator.run_start_time
         logger.info(f'Results for token benchmark for {self.model_name} queried with the {self.llm_api} api.')
 
-        # Calculate switching time
-        llm_responses = self.calculate_switching_time(llm_responses)
+        # Calculate switching time. Responses already written by the results sink can't get it, so it is recorded in
+        # the summary instead
+        server_switching_time = None
+        if self.results_sink is None:
+            llm_responses = self.calculate_switching_time(llm_responses)
+        else:
+            server_switching_time = self.calculate_switching_time_from_sink()
+            logger.info(f'Server switching time: {server_switching_time}, recorded in the summary')
 
         # Build a metrics summary for the results of the benchmarking run
-        results = self.build_metrics_summary(
-            metrics=[response.metrics for response in llm_responses],
-            start_time=start_time,
-            end_time=end_time,
-        )
+        results = self.build_run_summary(llm_responses, start_time, end_time)
+        if self.results_sink is not None:
+            results['server_switching_time'] = server_switching_time
 
         # Construct metadata payload to be returned
-        metadata = {
+        metadata: Dict[str, Any] = {
             'model': self.model_name,
             'num_concurrent_requests': self.num_concurrent_requests,
+            'arrival_process': self.arrival_process,
+            'qps': self.qps,
             'results': results,
             'num_input_tokens': num_input_tokens,
             'num_output_tokens': num_output_tokens,
@@ -937,11 +1633,11 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         # Empty list to be filled with valid request configs and then returned
         request_configs = []
 
-        # Iterate through data points and build a request config for each
-        for request_idx in range(num_requests):
-            # Build input prompt to be sent in LLM request
-            prompt_tuple = self.build_prompt(input_token_count)
+        # Build all the unique input prompts to be sent in LLM requests at once
+        prompt_tuples = self.build_prompts(num_requests, input_token_count)
 
+        # Iterate through data points and build a request config for each
+        for request_idx, prompt_tuple in enumerate(prompt_tuples):
             # Add max_tokens_to_generate to `sampling_params` dictionary
             if self.llm_api == 'sncloud':
                 updated_sampling_params = {
@@ -979,11 +1675,26 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         Returns:
             Tuple[str, int]: A tuple containing the generated prompt and its length in tokens.
         """
+        return self.build_prompts(1, num_input_tokens)[0]
 
-        # Load from prompt files
-        prompt_template = yaml.safe_load(PromptTemplate.from_file(USER_PROMPT_PATH).template)['template']
+    def build_prompts(self, num_prompts: int, num_input_tokens: int) -> List[Tuple[str, int]]:
+        """Synthesizes unique input prompts for the LLM to be queried. Each prompt starts with a random prefix, so
+        requests don't share a prefix that server-side prefix caching would hit, followed by the prompt template
+        adjusted to the user set input_token_count. The tokenized prompt template is cached in memory and on disk,
+        and the prefixes depend on the nonce of the run, so no two runs send the same prompts.
+
+        Args:
+            num_prompts (int): The number of prompts to synthesize.
+            num_input_tokens (int): The user specified length of the input prompts.
+
+        Returns:
+            List[Tuple[str, int]]: A list of tuples containing the generated prompts and their length in tokens.
+        """
 
-        #  Adjust prompt according to desired input tokens
-        full_input_prompt = self.adjust_to_exact_tokens(prompt_template, num_input_tokens)
+        # Load from prompt files
+        if self.prompt_template is None:
+            self.prompt_template = yaml.safe_load(PromptTemplate.from_file(USER_PROMPT_PATH).template)['template']
 
-        return (full_input_prompt, self.get_token_length(full_input_prompt))
+        return self.prompt_cache.get_prompts(
+            self.prompt_template, num_prompts, num_input_tokens, self.prompt_seed, self.run_nonce
+        )
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.llmperf_utils import flatten_dict
+from benchmarking.src.performance_evaluation import SyntheticPerformanceEvaluator
+
+logger = logging.getLogger(__name__)
+
+SWEEP_OUTPUT_FORMATS = ['csv', 'parquet']
+THROUGHPUT_COLUMN = common_metrics.OUTPUT_THROUGHPUT
+TTFT_P99_COLUMN = f'{common_metrics.TTFT}_quantiles_p99'
+STEP_ERROR_COLUMN = 'step_error'
+
+
+class SweepPerformanceEvaluator:
+    """Runs a synthetic performance evaluation over a grid of concurrency levels and input/output token sizes, and
+    finds the saturation point of the endpoint"""
+
+    def __init__(
+        self,
+        model_name: str,
+        results_dir: str,
+        concurrency_levels: List[int],
+        token_sizes: List[Tuple[int, int]],
+        num_requests_per_concurrency: int = 4,
+        throughput_gain_threshold: float = 0.05,
+        output_format: str = 'csv',
+        user_metadata: Dict[str, Any] = {},
+        **evaluator_kwargs: Any,
+    ) -> None:
+        """
+        Args:
+            model_name (str): model name
+            results_dir (str): output directory for the per-run results and the consolidated sweep summary
+            concurrency_levels (list): number of concurrent requests to evaluate
+            token_sizes (list): (number of input tokens, number of output tokens) pairs to evaluate
+            num_requests_per_concurrency (int): number of requests sent by each concurrent request in every run
+            throughput_gain_threshold (float): minimum relative output throughput gain between consecutive
+                concurrency levels for the endpoint not to be considered saturated
+            output_format (str): consolidated sweep summary format, either 'csv' or 'parquet'
+            user_metadata (dict): metadata to include in the results
+            evaluator_kwargs: additional arguments for the SyntheticPerformanceEvaluator
+        """
+        if output_format not in SWEEP_OUTPUT_FORMATS:
+            raise ValueError(
+                f'output_format parameter with value {output_format} is not valid. '
+                f'Available values are {SWEEP_OUTPUT_FORMATS}'
+            )
+        self.model_name = model_name
+        self.results_dir = results_dir
+        self.concurrency_levels = sorted(set(concurrency_levels))
+        self.token_sizes = token_sizes
+        self.num_requests_per_concurrency = num_requests_per_concurrency
+        self.throughput_gain_threshold = throughput_gain_threshold
+        self.output_format = output_format
+        self.user_metadata = user_metadata
+
+        # A single evaluator is reused across runs, so the tokenizer is loaded and the prompts are built only once
+        self.evaluator = SyntheticPerformanceEvaluator(
+            model_name=model_name,
+            results_dir=results_dir,
+            num_concurrent_requests=self.concurrency_levels[0],
+            user_metadata=user_metadata,
+            **evaluator_kwargs,
+        )
+
+        # To be set upon saving of results
+        self.summary_file_path: Optional[str] = None
+        self.saturation_file_path: Optional[str] = None
+        # Columns of the CSV sweep summary, in the order they were first written
+        self.summary_columns: List[str] = []
+
+    def create_output_filename(self) -> str:
+        """Utility for creating a unique filename for a sweep experiment.
+
+        Returns:
+            str: Filename for the sweep run.
+        """
+        output_file_name = f'{self.user_metadata.get("model_idx", 0)}_{self.model_name}_sweep'
+        return SyntheticPerformanceEvaluator.sanitize_file_prefix(output_file_name)
+
+    def append_summary(self, summary_df: pd.DataFrame) -> None:
+        """Writes the consolidated sweep summary after every run, so completed runs are kept if the sweep is
+        interrupted. CSV rows are appended under the columns of the file, and the CSV file is only rewritten when a
+        run brings new columns, e.g. error or load metrics. The Parquet file is rewritten with all the runs so far.
+
+        Args:
+            summary_df (pd.DataFrame): summary rows of all the runs completed so far
+        """
+        assert isinstance(self.summary_file_path, str)
+        if self.output_format == 'csv':
+            new_columns = [column for column in summary_df.columns if column not in self.summary_columns]
+            if len(new_columns) > 0 or not os.path.exists(self.summary_file_path):
+                self.summary_columns.extend(new_columns)
+                summary_df.reindex(columns=self.summary_columns).to_csv(self.summary_file_path, index=False)
+            else:
+                summary_df.tail(1).reindex(columns=self.summary_columns).to_csv(
+                    self.summary_file_path, mode='a', header=False, index=False
+                )
+        else:
+            summary_df.to_parquet(self.summary_file_path, index=False)
+
+    def run_sweep(self, sampling_params: Dict[str, Any] = {}) -> Tuple[pd.DataFrame, Dict[str, Optional[int]]]:
+        """Runs the synthetic performance evaluation for every combination of token sizes and concurrency levels.
+
+        Args:
+            sampling_params (dict): User specified sampling parameters for generation.
+
+        Returns:
+            summary_df (pd.DataFrame): one row per run with the flattened summary metrics, or with its error in the
+                `step_error` column if it failed
+            saturation_points (dict): saturation concurrency level per input/output token sizes
+        """
+        results_dir = Path(self.results_dir)
+        results_dir.mkdir(parents=True, exist_ok=True)
+        filename = self.create_output_filename()
+        self.summary_file_path = f'{results_dir}/{filename}_summary.{self.output_format}'
+        self.saturation_file_path = f'{results_dir}/{filename}_saturation.json'
+        if os.path.exists(self.summary_file_path):
+            os.remove(self.summary_file_path)
+        self.summary_columns = []
+
+        summary_rows: List[Dict[str, Any]] = []
+        for (num_input_tokens, num_output_tokens), num_concurrent_requests in product(
+            self.token_sizes, self.concurrency_levels
+        ):
+            logger.info(
+                f'Running sweep step with {num_concurrent_requests} concurrent requests, '
+                f'{num_input_tokens} input tokens and {num_output_tokens} output tokens'
+            )
+            self.evaluator.num_concurrent_requests = num_concurrent_requests
+            summary_row: Dict[str, Any] = {
+                'model': self.model_name,
+                'num_input_tokens': num_input_tokens,
+                'num_output_tokens': num_output_tokens,
+                'num_concurrent_requests': num_concurrent_requests,
+            }
+            try:
+                summary, _ = self.evaluator.run_benchmark(
+                    num_input_tokens=num_input_tokens,
+                    num_output_tokens=num_output_tokens,
+                    num_requests=num_concurrent_requests * self.num_requests_per_concurrency,
+                    sampling_params=dict(sampling_params),
+                )
+                summary_row.update(flatten_dict(summary['results']))
+            except Exception as e:
+                # Failed steps are kept as rows with their error, so the gap is visible in the sweep summary
+                logger.error(f'Sweep step with {num_concurrent_requests} concurrent requests failed: {e}')
+                summary_row[STEP_ERROR_COLUMN] = str(e)
+
+            summary_rows.append(summary_row)
+            self.append_summary(pd.DataFrame(summary_rows))
+
+        summary_df = pd.DataFrame(summary_rows)
+        saturation_points = self.find_saturation_points(summary_df)
+
+        with open(self.saturation_file_path, 'w') as f:
+            json.dump(saturation_points, f, indent=4)
+
+        return summary_df, saturation_points
+
+    def find_saturation_points(self, summary_df: pd.DataFrame) -> Dict[str, Optional[int]]:
+        """Finds the saturation point for each pair of input/output token sizes: the concurrency level beyond which
+        the overall output throughput stops growing (its relative gain is below `throughput_gain_threshold`) while the
+        p99 client TTFT keeps climbing.
+
+        Args:
+            summary_df (pd.DataFrame): one row per run with the flattened summary metrics
+
+        Returns:
+            dict: saturation concurrency level keyed by '<input tokens>_<output tokens>', None if the endpoint did not
+            saturate within the evaluated concurrency levels
+        """
+        saturation_points: Dict[str, Optional[int]] = {}
+        # Failed steps have no metrics
+        if STEP_ERROR_COLUMN in summary_df.columns:
+            summary_df = summary_df[summary_df[STEP_ERROR_COLUMN].isna()]
+        if summary_df.empty:
+            return saturation_points
+
+        for (num_input_tokens, num_output_tokens), runs_df in summary_df.groupby(
+            ['num_input_tokens', 'num_output_tokens']
+        ):
+            runs_df = runs_df.sort_values('num_concurrent_requests')
+            concurrency_levels = runs_df['num_concurrent_requests'].tolist()
+            throughputs = runs_df[THROUGHPUT_COLUMN].tolist()
+            ttfts_p99 = runs_df[TTFT_P99_COLUMN].tolist()
+
+            saturation_point = None
+            for idx in range(len(concurrency_levels) - 1):
+                throughput_gain = (
+                    (throughputs[idx + 1] - throughputs[idx]) / throughputs[idx] if throughputs[idx] else 0.0
+                )
+                if throughput_gain < self.throughput_gain_threshold and ttfts_p99[idx + 1] > ttfts_p99[idx]:
+                    saturation_point = int(concurrency_levels[idx])
+                    break
+
+            logger.info(
+                f'Saturation point for {num_input_tokens} input tokens and {num_output_tokens} output tokens: '
+                f'{saturation_point} concurrent requests'
+            )
+            saturation_points[f'{num_input_tokens}_{num_output_tokens}'] = saturation_point
+
+        return saturation_points
@@ -19,6 +19,7 @@ sys.path.append(kit_dir)
 sys.path.append(repo_dir)
 
 from enterprise_knowledge_retriever.src.document_retrieval import DocumentRetrieval, RetrievalQAChain
+from utils.model_wrappers.reranker import DEFAULT_RERANKER_MODEL
 
 
 class TimedRetrievalQAChain(RetrievalQAChain):
@@ -103,6 +104,8 @@ def process_bulk_QA(vectordb_path: str, questions_file_path: str) -> str:
             llm=documentRetrieval.llm,
             qa_prompt=load_prompt(os.path.join(kit_dir, documentRetrieval.prompts['qa_prompt'])),
             rerank=documentRetrieval.retrieval_info['rerank'],
+            reranker=documentRetrieval.retrieval_info.get('reranker', DEFAULT_RERANKER_MODEL),
+            reranker_backend=documentRetrieval.retrieval_info.get('reranker_backend', 'torch'),
             final_k_retrieved_documents=documentRetrieval.retrieval_info['final_k_retrieved_documents'],
         )
     else:
@@ -3,7 +3,6 @@ import sys
 from typing import Any, Dict, List, Optional, Tuple
 
 import nltk
-import torch
 import yaml
 from dotenv import load_dotenv
 from langchain.chains.base import Chain
@@ -16,7 +15,6 @@ from langchain_core.language_models.llms import LLM
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.vectorstores.base import VectorStoreRetriever
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
@@ -27,6 +25,8 @@ sys.path.append(repo_dir)
 import streamlit as st
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.reranker import DEFAULT_RERANKER_MODEL, get_reranker
+from utils.vectordb.hybrid_retriever import HybridRetriever
 from utils.vectordb.vector_db import VectorDb
 from utils.visual.env_utils import get_wandb_key
 
@@ -59,6 +59,8 @@ class RetrievalQAChain(Chain):
 
     retriever: BaseRetriever
     rerank: bool = True
+    reranker: str = DEFAULT_RERANKER_MODEL
+    reranker_backend: str = 'torch'
     llm: LanguageModelLike
     qa_prompt: PromptTemplate
     final_k_retrieved_documents: int = 3
@@ -81,37 +83,9 @@ class RetrievalQAChain(Chain):
         return '\n\n'.join(doc.page_content for doc in docs)
 
     def rerank_docs(self, query: str, docs: List[Document], final_k: int) -> List[Document]:
-        # Lazy hardcoding for now
-        tokenizer = AutoTokenizer.from_pretrained('BAAI/bge-reranker-large')
-        reranker = AutoModelForSequenceClassification.from_pretrained('BAAI/bge-reranker-large')
-        pairs = []
-        for d in docs:
-            pairs.append([query, d.page_content])
-
-        with torch.no_grad():
-            inputs = tokenizer(
-                pairs,
-                padding=True,
-                truncation=True,
-                return_tensors='pt',
-                max_length=512,
-            )
-            scores = (
-                reranker(**inputs, return_dict=True)
-                .logits.view(
-                    -1,
-                )
-                .float()
-            )
-
-        scores_list = scores.tolist()
-        scores_sorted_idx = sorted(range(len(scores_list)), key=lambda k: scores_list[k], reverse=True)
-
-        docs_sorted = [docs[k] for k in scores_sorted_idx]
-        # docs_sorted = [docs[k] for k in scores_sorted_idx if scores_list[k]>0]
-        docs_sorted = docs_sorted[:final_k]
-
-        return docs_sorted
+        # The reranker is loaded once per process and shared by all the chains
+        reranker = get_reranker(self.reranker, self.reranker_backend)
+        return reranker.rerank(query, docs, final_k)
 
     def _call(
         self,
@@ -209,6 +183,7 @@ class DocumentRetrieval:
             batch_size=self.embedding_model_info['batch_size'],
             coe=self.embedding_model_info['coe'],
             select_expert=self.embedding_model_info['select_expert'],
+            cache=self.embedding_model_info.get('cache', False),
         )
         return embeddings
 
@@ -221,7 +196,12 @@ class DocumentRetrieval:
     ) -> Any:
         print(f'Collection name is {collection_name}')
         vectorstore = self.vectordb.create_vector_store(
-            text_chunks, embeddings, output_db=output_db, collection_name=collection_name, db_type='chroma'
+            text_chunks,
+            embeddings,
+            output_db=output_db,
+            collection_name=collection_name,
+            db_type='chroma',
+            sparse_index=self.retrieval_info.get('hybrid_search', False),
         )
         return vectorstore
 
@@ -232,20 +212,20 @@ class DocumentRetrieval:
 
     def init_retriever(self, vectorstore: Any) -> None:
         if self.retrieval_info['rerank']:
-            self.retriever = vectorstore.as_retriever(
-                search_type='similarity_score_threshold',
-                search_kwargs={
-                    'score_threshold': self.retrieval_info['score_threshold'],
-                    'k': self.retrieval_info['k_retrieved_documents'],
-                },
-            )
+            k = self.retrieval_info['k_retrieved_documents']
         else:
-            self.retriever = vectorstore.as_retriever(
-                search_type='similarity_score_threshold',
-                search_kwargs={
-                    'score_threshold': self.retrieval_info['score_threshold'],
-                    'k': self.retrieval_info['final_k_retrieved_documents'],
-                },
+            k = self.retrieval_info['final_k_retrieved_documents']
+        self.retriever = vectorstore.as_retriever(
+            search_type='similarity_score_threshold',
+            search_kwargs={
+                'score_threshold': self.retrieval_info['score_threshold'],
+                'k': k,
+            },
+        )
+        # Fuses the dense results with the BM25 results of the vector db, built when hybrid search is enabled
+        if self.retrieval_info.get('hybrid_search', False) and self.vectordb.sparse_index is not None:
+            self.retriever = HybridRetriever(
+                dense_retriever=self.retriever, sparse_index=self.vectordb.sparse_index, k=k
             )
 
     def get_qa_retrieval_chain(self) -> RetrievalQAChain:
@@ -274,13 +254,15 @@ class DocumentRetrieval:
         # response["answer"] = qa_chain.invoke({"question": question, "context": docs})
         # response["source_documents"] = documents
         assert isinstance(
-            self.retriever, VectorStoreRetriever
-        ), f'The Retriever must be VectorStoreRetriever. Got type {type(self.retriever)}'
+            self.retriever, (VectorStoreRetriever, HybridRetriever)
+        ), f'The Retriever must be VectorStoreRetriever or HybridRetriever. Got type {type(self.retriever)}'
         retrievalQAChain = RetrievalQAChain(
             retriever=self.retriever,
             llm=self.llm,
             qa_prompt=load_prompt(os.path.join(repo_dir, self.prompts['qa_prompt'])),
             rerank=self.retrieval_info['rerank'],
+            reranker=self.retrieval_info.get('reranker', DEFAULT_RERANKER_MODEL),
+            reranker_backend=self.retrieval_info.get('reranker_backend', 'torch'),
             final_k_retrieved_documents=self.retrieval_info['final_k_retrieved_documents'],
         )
         return retrievalQAChain
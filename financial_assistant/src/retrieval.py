@@ -17,6 +17,7 @@ from financial_assistant.src.tools import get_logger, time_llm
 from financial_assistant.streamlit.constants import *
 from financial_assistant.streamlit.utilities_app import _get_config_info
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.embedding_cache import CachedEmbeddings
 
 logger = get_logger()
 
@@ -79,7 +80,7 @@ def load_embedding_model(embedding_model_info: Dict[str, Any]) -> SentenceTransf
 
     if embedding_model_info['type'] == 'cpu':
         embeddings_cpu = SentenceTransformerEmbeddings(model_name='paraphrase-mpnet-base-v2')
-        return embeddings_cpu
+        return CachedEmbeddings(embeddings_cpu)
     elif embedding_model_info['type'] == 'sambastudio':
         embeddings_sambastudio = APIGateway.load_embedding_model(
             type=embedding_model_info['type'],
@@ -14,6 +14,7 @@ repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
 sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
+from utils.model_wrappers.embedding_cache import CachedEmbeddings
 from utils.model_wrappers.langchain_chat_models import ChatSambaNovaCloud, ChatSambaStudio
 from utils.model_wrappers.langchain_embeddings import SambaStudioEmbeddings
 from utils.model_wrappers.langchain_llms import SambaNovaCloud, SambaStudio
@@ -44,6 +45,7 @@ class APIGateway:
         sambastudio_embeddings_project_id: Optional[str] = None,
         sambastudio_embeddings_endpoint_id: Optional[str] = None,
         sambastudio_embeddings_api_key: Optional[str] = None,
+        cache: bool = False,
     ) -> Embeddings:
         """Loads a langchain embedding model given a type and parameters
         Args:
@@ -57,6 +59,8 @@ class APIGateway:
             sambastudio_embeddings_project_id (str, optional): project id for sambastudio model. Defaults to None.
             sambastudio_embeddings_endpoint_id (str, optional): endpoint id for sambastudio model. Defaults to None.
             sambastudio_embeddings_api_key (str, optional): api key for sambastudio model. Defaults to None.
+            cache (bool, optional): whether to cache the embeddings on disk, so that texts already embedded by the
+                same model, in any kit, are not embedded again. Defaults to False.
         Returns:
             langchain embedding model
         """
@@ -93,6 +97,9 @@ class APIGateway:
         else:
             raise ValueError(f'{type} is not a valid embedding model type')
 
+        if cache:
+            embeddings = CachedEmbeddings(embeddings)
+
         return embeddings
 
     @staticmethod
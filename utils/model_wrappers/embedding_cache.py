@@ -0,0 +1,367 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.sqlite_store import SQLiteStore, iterate_over_chunks
+
+logger = logging.getLogger(__name__)
+
+# Directory of the embedding cache shared by all the kits
+EMBEDDING_CACHE_DIR = os.environ.get(
+    'EMBEDDING_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ai-starter-kit', 'embeddings')
+)
+# Max number of cached embeddings per embedding dimension, the least recently used ones are evicted beyond it
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', 500_000))
+
+
+class EmbeddingStore(SQLiteStore):
+    """Local store of float32 embeddings with LRU eviction.
+
+    The embeddings of each dimension are stored in a memory-mapped file of `max_entries` rows, and an SQLite index
+    maps each key to its row and last access time. The store can be shared by several processes: rows are reserved in
+    write transactions, and rows are read inside read transactions, so they can't be overwritten while being read.
+    """
+
+    def __init__(self, cache_dir: str = EMBEDDING_CACHE_DIR, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES) -> None:
+        super().__init__(os.path.join(cache_dir, 'index.sqlite'))
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        # Memory-mapped vectors and their capacity, per embedding dimension
+        self.vectors: Dict[int, np.memmap] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memory maps are opened again by each process
+        state = super().__getstate__()
+        state['vectors'] = {}
+        return state
+
+    def _create_schema(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries '
+            '(key TEXT PRIMARY KEY, dim INTEGER NOT NULL, slot INTEGER NOT NULL, last_access REAL NOT NULL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (dim, last_access)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS vector_files '
+            '(dim INTEGER PRIMARY KEY, capacity INTEGER NOT NULL, next_slot INTEGER NOT NULL)'
+        )
+        # Reserved rows that ended up unused, reused before the never used ones
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS free_slots (dim INTEGER NOT NULL, slot INTEGER NOT NULL, '
+            'PRIMARY KEY (dim, slot)) WITHOUT ROWID'
+        )
+        # The memory maps of the parent process are not reused after a fork
+        self.vectors = {}
+
+    def _get_vectors(self, dim: int, capacity: int) -> np.memmap:
+        """Gets the memory-mapped vectors of a dimension, creating their file on first use
+
+        Args:
+            dim (int): embedding dimension
+            capacity (int): number of rows of the file
+
+        Returns:
+            np.memmap: memory-mapped vectors
+        """
+        if dim not in self.vectors:
+            path = os.path.join(self.cache_dir, f'vectors-{dim}.f32')
+            size = capacity * dim * np.dtype(np.float32).itemsize
+            # Opened in append mode, so that a file created by another process is never truncated
+            with open(path, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            self.vectors[dim] = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        return self.vectors[dim]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Gets the cached embeddings of some keys, and marks them as recently used
+
+        Args:
+            keys (Sequence[str]): embedding keys
+
+        Returns:
+            Dict[str, np.ndarray]: embeddings of the cached keys
+        """
+        embeddings: Dict[str, np.ndarray] = {}
+        with self.lock:
+            with self._transaction() as connection:
+                capacities = dict(connection.execute('SELECT dim, capacity FROM vector_files').fetchall())
+                for keys_chunk in iterate_over_chunks(keys):
+                    rows = connection.execute(
+                        f'SELECT key, dim, slot FROM entries WHERE key IN ({",".join("?" * len(keys_chunk))})',
+                        keys_chunk,
+                    ).fetchall()
+                    for key, dim, slot in rows:
+                        # Copied inside the transaction, before the row can be reused
+                        embeddings[key] = np.array(self._get_vectors(dim, capacities[dim])[slot])
+            if len(embeddings) > 0:
+                now = time.time()
+                with self._transaction() as connection:
+                    connection.executemany(
+                        'UPDATE entries SET last_access = ? WHERE key = ?', [(now, key) for key in embeddings]
+                    )
+        return embeddings
+
+    def put_many(self, keys: Sequence[str], embeddings: np.ndarray) -> None:
+        """Stores the embeddings of some keys, evicting the least recently used embeddings of the same dimension if
+        the store is full
+
+        Args:
+            keys (Sequence[str]): embedding keys, without duplicates
+            embeddings (np.ndarray): embeddings, one row per key
+        """
+        if len(keys) == 0:
+            return
+        dim = embeddings.shape[1]
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                existing_keys = set()
+                for keys_chunk in iterate_over_chunks(keys):
+                    rows = connection.execute(
+                        f'SELECT key FROM entries WHERE key IN ({",".join("?" * len(keys_chunk))})', keys_chunk
+                    ).fetchall()
+                    existing_keys.update(row[0] for row in rows)
+                new_rows = [i for i, key in enumerate(keys) if key not in existing_keys]
+
+                row = connection.execute(
+                    'SELECT capacity, next_slot FROM vector_files WHERE dim = ?', (dim,)
+                ).fetchone()
+                if row is None:
+                    capacity, next_slot = self.max_entries, 0
+                    connection.execute('INSERT INTO vector_files VALUES (?, ?, 0)', (dim, capacity))
+                else:
+                    capacity, next_slot = row
+                # Only the last embeddings are kept if there are more than fit in the store
+                new_rows = new_rows[-capacity:]
+                if len(new_rows) == 0:
+                    return
+
+                free_slots = [
+                    slot
+                    for (slot,) in connection.execute(
+                        'SELECT slot FROM free_slots WHERE dim = ? LIMIT ?', (dim, len(new_rows))
+                    ).fetchall()
+                ]
+                connection.executemany(
+                    'DELETE FROM free_slots WHERE dim = ? AND slot = ?', [(dim, slot) for slot in free_slots]
+                )
+                num_free = min(capacity - next_slot, len(new_rows) - len(free_slots))
+                slots = free_slots + list(range(next_slot, next_slot + num_free))
+                connection.execute('UPDATE vector_files SET next_slot = ? WHERE dim = ?', (next_slot + num_free, dim))
+                num_evicted = len(new_rows) - len(slots)
+                if num_evicted > 0:
+                    evicted = connection.execute(
+                        'SELECT key, slot FROM entries WHERE dim = ? ORDER BY last_access LIMIT ?', (dim, num_evicted)
+                    ).fetchall()
+                    connection.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key, _ in evicted])
+                    slots.extend(slot for _, slot in evicted)
+                    # Rows reserved by other processes are not evictable until their keys are committed, the
+                    # embeddings without a row are not cached
+                    new_rows = new_rows[len(new_rows) - len(slots) :]
+
+            # The rows are written outside of the index transaction, they aren't referenced by any key until the
+            # new keys are committed
+            try:
+                vectors = self._get_vectors(dim, capacity)
+                vectors[slots] = embeddings[new_rows]
+                vectors.flush()
+
+                # Another process may have cached some of the keys since their rows were reserved, the rows of these
+                # keys are freed instead
+                now = time.time()
+                with self._transaction('IMMEDIATE') as connection:
+                    conflicting_slots = []
+                    for i, slot in zip(new_rows, slots):
+                        cursor = connection.execute(
+                            'INSERT INTO entries VALUES (?, ?, ?, ?) ON CONFLICT (key) DO NOTHING',
+                            (keys[i], dim, slot, now),
+                        )
+                        if cursor.rowcount == 0:
+                            conflicting_slots.append(slot)
+                    connection.executemany(
+                        'INSERT INTO free_slots VALUES (?, ?)', [(dim, slot) for slot in conflicting_slots]
+                    )
+            except BaseException:
+                with self._transaction('IMMEDIATE') as connection:
+                    connection.executemany(
+                        'INSERT OR IGNORE INTO free_slots VALUES (?, ?)', [(dim, slot) for slot in slots]
+                    )
+                raise
+
+    def clear(self) -> None:
+        """Removes all the cached embeddings"""
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                connection.execute('DELETE FROM entries')
+                connection.execute('DELETE FROM free_slots')
+                connection.execute('UPDATE vector_files SET next_slot = 0')
+
+
+def get_model_id(embeddings: Embeddings) -> str:
+    """Gets an identifier of an embedding model, embeddings are only shared between models with the same identifier
+
+    Args:
+        embeddings (Embeddings): langchain embedding model
+
+    Returns:
+        str: model identifier
+    """
+    # SambaStudio endpoints are identified by their url and tuning parameters
+    if hasattr(embeddings, 'sambastudio_embeddings_endpoint_id'):
+        return (
+            f'{type(embeddings).__name__}:{embeddings.sambastudio_embeddings_base_url}/'
+            f'{embeddings.sambastudio_embeddings_base_uri}/{embeddings.sambastudio_embeddings_project_id}/'
+            f'{embeddings.sambastudio_embeddings_endpoint_id}:{json.dumps(embeddings.model_kwargs, sort_keys=True)}'
+        )
+
+    model_name = getattr(embeddings, 'model_name', None) or getattr(embeddings, 'model', None)
+    if model_name is None:
+        raise ValueError(f'model id of {type(embeddings).__name__} embeddings is unknown, it has to be given')
+    encode_kwargs = getattr(embeddings, 'encode_kwargs', {})
+    return f'{type(embeddings).__name__}:{model_name}:{json.dumps(encode_kwargs, sort_keys=True, default=str)}'
+
+
+class CachedEmbeddings(Embeddings):
+    """Embedding model wrapper that caches the embeddings in an EmbeddingStore.
+
+    Embeddings are keyed by the hash of the model id, the instruction prepended by the model and the text, so they are
+    reused across runs and kits using the same model. Only the texts not found in the cache are sent to the model.
+
+    Example:
+        .. code-block:: python
+
+            embeddings = CachedEmbeddings(SambaStudioEmbeddings(batch_size=32))
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_id: Optional[str] = None,
+        store: Optional[EmbeddingStore] = None,
+        miss_batch_size: int = 1024,
+    ) -> None:
+        """
+        Args:
+            embeddings (Embeddings): embedding model to cache
+            model_id (str, optional): model identifier. Defaults to the one given by get_model_id.
+            store (EmbeddingStore, optional): embedding store. Defaults to a store in EMBEDDING_CACHE_DIR.
+            miss_batch_size (int): number of texts sent to the model at a time, each batch is cached as soon as it's
+                embedded, so an interrupted ingestion doesn't lose the work done.
+        """
+        self.embeddings = embeddings
+        self.model_id = model_id or get_model_id(embeddings)
+        self.store = store or EmbeddingStore()
+        self.miss_batch_size = miss_batch_size
+        # Instructions of the instruct models, empty for the others
+        self.embed_instruction = getattr(embeddings, 'embed_instruction', '')
+        self.query_instruction = getattr(embeddings, 'query_instruction', '')
+
+    def get_key(self, text: str, instruction: str = '') -> str:
+        """Gets the cache key of a text
+
+        Args:
+            text (str): text to embed
+            instruction (str): instruction prepended to the text by the model
+
+        Returns:
+            str: cache key
+        """
+        return hashlib.sha256(json.dumps([self.model_id, instruction, text]).encode('utf-8')).hexdigest()
+
+    def _get_misses(self, texts: List[str]) -> Tuple[List[str], Dict[str, np.ndarray], List[Tuple[str, str]]]:
+        """Gets the cached embeddings of some documents and the documents to embed
+
+        Args:
+            texts (List[str]): texts to embed
+
+        Returns:
+            Tuple: keys of the texts, cached embeddings by key, and key and text of each distinct miss
+        """
+        keys = [self.get_key(text, self.embed_instruction) for text in texts]
+        cached = self.store.get_many(list(dict.fromkeys(keys)))
+        misses = {key: text for key, text in zip(keys, texts) if key not in cached}
+        logger.info(f'{len(texts) - len(misses)} of {len(texts)} embeddings found in the cache')
+        return keys, cached, list(misses.items())
+
+    def _put(self, misses: List[Tuple[str, str]], embeddings: List[List[float]], cached: Dict[str, np.ndarray]) -> None:
+        """Caches the embeddings of a batch of misses
+
+        Args:
+            misses (List[Tuple[str, str]]): key and text of each miss
+            embeddings (List[List[float]]): embeddings of the misses
+            cached (Dict[str, np.ndarray]): cached embeddings by key, updated with the new embeddings
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        keys = [key for key, _ in misses]
+        self.store.put_many(keys, vectors)
+        cached.update(zip(keys, vectors))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns the embeddings of the given texts, only the texts not in the cache are embedded by the model
+
+        Args:
+            texts (List[str]): texts to embed
+
+        Returns:
+            List[List[float]]: embeddings of the texts
+        """
+        keys, cached, misses = self._get_misses(texts)
+        for misses_batch in iterate_over_chunks(misses, self.miss_batch_size):
+            embeddings = self.embeddings.embed_documents([text for _, text in misses_batch])
+            self._put(list(misses_batch), embeddings, cached)
+        return [cached[key].tolist() for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns the embeddings of the given texts asynchronously, only the texts not in the cache are embedded by
+        the model
+
+        Args:
+            texts (List[str]): texts to embed
+
+        Returns:
+            List[List[float]]: embeddings of the texts
+        """
+        keys, cached, misses = self._get_misses(texts)
+        for misses_batch in iterate_over_chunks(misses, self.miss_batch_size):
+            embeddings = await self.embeddings.aembed_documents([text for _, text in misses_batch])
+            self._put(list(misses_batch), embeddings, cached)
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Returns the embedding of the given query
+
+        Args:
+            text (str): query to embed
+
+        Returns:
+            List[float]: embedding of the query
+        """
+        key = self.get_key(text, self.query_instruction)
+        cached = self.store.get_many([key])
+        if key not in cached:
+            cached[key] = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.store.put_many([key], cached[key][np.newaxis])
+        return cached[key].tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Returns the embedding of the given query asynchronously
+
+        Args:
+            text (str): query to embed
+
+        Returns:
+            List[float]: embedding of the query
+        """
+        key = self.get_key(text, self.query_instruction)
+        cached = self.store.get_many([key])
+        if key not in cached:
+            cached[key] = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+            self.store.put_many([key], cached[key][np.newaxis])
+        return cached[key].tolist()
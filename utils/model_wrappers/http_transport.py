@@ -0,0 +1,302 @@
+"""Shared, pooled HTTP transport for the SambaNova LangChain wrappers."""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HTTPTransportConfig(BaseModel):
+    """Connection pool and retry settings of the HTTP transport."""
+
+    pool_connections: int = 10
+    """number of host connection pools to cache"""
+
+    pool_maxsize: int = 32
+    """max number of connections kept alive per host"""
+
+    keep_alive: bool = True
+    """whether to reuse connections between requests"""
+
+    max_retries: int = 3
+    """max number of retries on connection errors and retryable status codes"""
+
+    backoff_factor: float = 0.5
+    """exponential backoff factor between retries, in seconds"""
+
+    retry_status_codes: List[int] = [429, 503]
+    """status codes that are retried, honoring the Retry-After header"""
+
+    http2: bool = True
+    """whether the async client uses HTTP/2, when the h2 package is installed"""
+
+    timeout: float = 600.0
+    """max number of seconds the async client waits to connect, to send a request or for the next chunk of a
+    response"""
+
+
+DEFAULT_TRANSPORT_CONFIG = HTTPTransportConfig()
+
+_sessions: Dict[Tuple[str, str], requests.Session] = {}
+_sessions_lock = threading.Lock()
+# Async clients are bound to the event loop they run in, so they are shared per event loop, and closed when it shuts
+# down
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], httpx.AsyncClient]]' = (
+    weakref.WeakKeyDictionary()
+)
+# Async generators closing the clients of each event loop, kept alive until it shuts down
+_async_clients_closers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncIterator[None]]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class SSEEvent(NamedTuple):
+    """Server-sent event"""
+
+    event: str
+    data: str
+
+
+def _get_host(url: str) -> str:
+    """
+    Get the scheme and host of a URL
+
+    Args:
+        url: request URL
+
+    Returns:
+        str: scheme and host, e.g. https://api.sambanova.ai
+    """
+    parsed_url = urlparse(url)
+    return f'{parsed_url.scheme}://{parsed_url.netloc}'
+
+
+def _build_session(config: HTTPTransportConfig) -> requests.Session:
+    """
+    Build a requests Session with a pooled, retrying adapter
+
+    Args:
+        config: transport settings
+
+    Returns:
+        requests.Session: new session
+    """
+    retry = Retry(
+        total=config.max_retries,
+        connect=config.max_retries,
+        # Requests that may have reached the server are not retried, so a generation is never run twice
+        read=0,
+        status=config.max_retries,
+        status_forcelist=config.retry_status_codes,
+        allowed_methods=frozenset(['GET', 'POST']),
+        backoff_factor=config.backoff_factor,
+        respect_retry_after_header=True,
+        # The last response is returned, so callers keep handling errors from its status code
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not config.keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_http_session(url: str, config: Optional[HTTPTransportConfig] = None) -> requests.Session:
+    """
+    Get the shared session for the host of a URL. All the model instances pointing at the same host with the same
+    transport settings share one session, and therefore its pool of keep-alive connections.
+
+    Args:
+        url: request URL
+        config: transport settings, defaults to DEFAULT_TRANSPORT_CONFIG
+
+    Returns:
+        requests.Session: shared session
+    """
+    config = config or DEFAULT_TRANSPORT_CONFIG
+    key = (_get_host(url), config.model_dump_json())
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = _build_session(config)
+        return _sessions[key]
+
+
+def close_http_sessions() -> None:
+    """Close all the shared sessions and their connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _build_async_client(config: HTTPTransportConfig) -> httpx.AsyncClient:
+    """
+    Build an httpx AsyncClient with a pool of keep-alive connections
+
+    Args:
+        config: transport settings
+
+    Returns:
+        httpx.AsyncClient: new async client
+    """
+    limits = httpx.Limits(
+        # The number of requests in flight is not capped, only the number of idle connections kept alive
+        max_connections=None,
+        max_keepalive_connections=config.pool_maxsize if config.keep_alive else 0,
+    )
+    return httpx.AsyncClient(
+        # Retries connection errors, status codes are retried by send_with_retries
+        transport=httpx.AsyncHTTPTransport(
+            http2=config.http2 and importlib.util.find_spec('h2') is not None,
+            limits=limits,
+            retries=config.max_retries,
+        ),
+        timeout=config.timeout,
+    )
+
+
+def get_async_http_client(url: str, config: Optional[HTTPTransportConfig] = None) -> httpx.AsyncClient:
+    """
+    Get the shared async client for the host of a URL, in the running event loop. All the model instances pointing at
+    the same host with the same transport settings share one client, and therefore its pool of connections.
+
+    Args:
+        url: request URL
+        config: transport settings, defaults to DEFAULT_TRANSPORT_CONFIG
+
+    Returns:
+        httpx.AsyncClient: shared async client
+    """
+    config = config or DEFAULT_TRANSPORT_CONFIG
+    key = (_get_host(url), config.model_dump_json())
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = {}
+        if loop not in _async_clients_closers:
+            _async_clients_closers[loop] = _close_async_clients_on_shutdown()
+            # Started in the event loop, so that the loop closes it on shutdown
+            asyncio.ensure_future(_async_clients_closers[loop].__anext__())
+    loop_clients = _async_clients[loop]
+    if key not in loop_clients or loop_clients[key].is_closed:
+        loop_clients[key] = _build_async_client(config)
+    return loop_clients[key]
+
+
+async def _close_async_clients_on_shutdown() -> AsyncIterator[None]:
+    """
+    Close the shared async clients of the running event loop when it shuts down. Event loops close the async
+    generators they started when they shut down, e.g. at the end of asyncio.run, which runs the finally clause.
+
+    Yields:
+        None: once started, until the event loop shuts down
+    """
+    try:
+        yield
+    finally:
+        # The generator references its event loop, so it would keep it alive
+        _async_clients_closers.pop(asyncio.get_running_loop(), None)
+        await aclose_http_clients()
+
+
+def _get_retry_delay(response: httpx.Response, attempt: int, config: HTTPTransportConfig) -> float:
+    """
+    Get the delay before retrying a request, from the Retry-After header or the exponential backoff
+
+    Args:
+        response: response to retry
+        attempt: number of the retry, starting at 0
+        config: transport settings
+
+    Returns:
+        float: delay in seconds
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    return float(config.backoff_factor * (2**attempt))
+
+
+async def send_with_retries(
+    url: str, config: Optional[HTTPTransportConfig] = None, method: str = 'POST', **kwargs: Any
+) -> httpx.Response:
+    """
+    Send a request with the shared async client, retrying the retryable status codes with backoff. The response body
+    is streamed, the caller has to read it or close it.
+
+    Args:
+        url: request URL
+        config: transport settings, defaults to DEFAULT_TRANSPORT_CONFIG
+        method: HTTP method
+        kwargs: request arguments, e.g. headers and json
+
+    Returns:
+        httpx.Response: last response, with its body not read yet
+    """
+    config = config or DEFAULT_TRANSPORT_CONFIG
+    client = get_async_http_client(url, config)
+    attempt = 0
+    while True:
+        request = client.build_request(method, url, **kwargs)
+        response = await client.send(request, stream=True)
+        if response.status_code not in config.retry_status_codes or attempt >= config.max_retries:
+            return response
+        await response.aclose()
+        await asyncio.sleep(_get_retry_delay(response, attempt, config))
+        attempt += 1
+
+
+async def aiter_sse_events(response: httpx.Response) -> AsyncIterator[SSEEvent]:
+    """
+    Parse the server-sent events of a streamed response as they arrive
+
+    Args:
+        response: streamed response
+
+    Yields:
+        SSEEvent: parsed event, with 'message' as default event name
+    """
+    event = 'message'
+    data_lines: List[str] = []
+    async for line in response.aiter_lines():
+        if line == '':
+            if len(data_lines) > 0:
+                yield SSEEvent(event=event, data='\n'.join(data_lines))
+            event = 'message'
+            data_lines = []
+        elif line.startswith(':'):
+            # comment line
+            continue
+        else:
+            field, _, value = line.partition(':')
+            value = value[1:] if value.startswith(' ') else value
+            if field == 'event':
+                event = value
+            elif field == 'data':
+                data_lines.append(value)
+    if len(data_lines) > 0:
+        yield SSEEvent(event=event, data='\n'.join(data_lines))
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared async clients of the running event loop, they are otherwise closed when it shuts down if it
+    closes its async generators, as asyncio.run does"""
+    loop_clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        await client.aclose()
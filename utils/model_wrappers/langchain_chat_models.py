@@ -1,12 +1,16 @@
 import json
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+import os
+import sys
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 
-import requests
+import httpx
 from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models.chat_models import (
     BaseChatModel,
+    agenerate_from_stream,
     generate_from_stream,
 )
 from langchain_core.messages import (
@@ -24,6 +28,19 @@ from langchain_core.utils import convert_to_secret_str, get_from_dict_or_env
 from pydantic import Field, SecretStr
 from requests import Response
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(utils_dir)
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.http_transport import (
+    HTTPTransportConfig,
+    aiter_sse_events,
+    get_http_session,
+    send_with_retries,
+)
+
 
 def _convert_message_to_dict(message: BaseMessage) -> Dict[str, Any]:
     """
@@ -183,6 +200,9 @@ class ChatSambaNovaCloud(BaseChatModel):
     stream_options: dict = Field(default={'include_usage': True})
     """stream options, include usage to get generation metrics"""
 
+    transport_config: Optional[HTTPTransportConfig] = Field(default=None, exclude=True)
+    """connection pool and retry settings, shared by the instances pointing at the same host"""
+
     class Config:
         populate_by_name = True
 
@@ -230,16 +250,19 @@ class ChatSambaNovaCloud(BaseChatModel):
         )
         super().__init__(**kwargs)
 
-    def _handle_request(self, messages_dicts: List[Dict], stop: Optional[List[str]] = None) -> Dict[str, Any]:
+    def _get_request_data(
+        self, messages_dicts: List[Dict], stop: Optional[List[str]] = None, streaming: bool = False
+    ) -> Dict[str, Any]:
         """
-        Performs a post request to the LLM API.
+        Get the payload of a request to the LLM API.
 
         Args:
             messages_dicts: List of role / content dicts to use as input.
             stop: list of stop tokens
+            streaming: wether to do a streaming call
 
         Returns:
-            An iterator of response dicts.
+            the request payload
         """
         data = {
             'messages': messages_dicts,
@@ -250,27 +273,126 @@ class ChatSambaNovaCloud(BaseChatModel):
             'top_p': self.top_p,
             'top_k': self.top_k,
         }
-        http_session = requests.Session()
+        if streaming:
+            data['stream'] = True
+            data['stream_options'] = self.stream_options
+        return data
+
+    def _get_request_headers(self) -> Dict[str, str]:
+        """
+        Get the headers of a request to the LLM API.
+
+        Returns:
+            the request headers
+        """
+        return {
+            'Authorization': f'Bearer {self.sambanova_api_key.get_secret_value()}',
+            'Content-Type': 'application/json',
+        }
+
+    def _process_response_dict(self, response_dict: Dict[str, Any], status_code: int) -> Dict[str, Any]:
+        """
+        Check a non streaming response payload from the LLM API.
+
+        Args:
+            response_dict: response payload
+            status_code: response status code
+
+        Returns:
+            the response payload
+        """
+        if response_dict.get('error'):
+            raise RuntimeError(
+                f'Sambanova /complete call failed with status code ' f'{status_code}.',
+                f'{response_dict}.',
+            )
+        return response_dict
+
+    def _process_stream_event(self, event: str, event_data: Any, status_code: int) -> Optional[Dict[str, Any]]:
+        """
+        Parse a server-sent event of a streaming response from the LLM API.
+
+        Args:
+            event: event name
+            event_data: event data
+            status_code: response status code
+
+        Returns:
+            the partial response dict, None for the final '[DONE]' event
+        """
+        if event == 'error_event':
+            raise RuntimeError(f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.')
+
+        try:
+            # check if the response is a final event
+            # in that case event data response is '[DONE]'
+            if event_data != '[DONE]':
+                if isinstance(event_data, str):
+                    data = json.loads(event_data)
+                else:
+                    raise RuntimeError(
+                        f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                    )
+                if data.get('error'):
+                    raise RuntimeError(
+                        f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                    )
+                return data
+            return None
+        except Exception as e:
+            raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event_data}')
+
+    def _handle_request(self, messages_dicts: List[Dict], stop: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Performs a post request to the LLM API.
+
+        Args:
+            messages_dicts: List of role / content dicts to use as input.
+            stop: list of stop tokens
+
+        Returns:
+            An iterator of response dicts.
+        """
+        http_session = get_http_session(self.sambanova_url, self.transport_config)
         response = http_session.post(
             self.sambanova_url,
-            headers={
-                'Authorization': f'Bearer {self.sambanova_api_key.get_secret_value()}',
-                'Content-Type': 'application/json',
-            },
-            json=data,
+            headers=self._get_request_headers(),
+            json=self._get_request_data(messages_dicts, stop),
         )
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.',
                 f'{response.text}.',
             )
-        response_dict = response.json()
-        if response_dict.get('error'):
+        return self._process_response_dict(response.json(), response.status_code)
+
+    async def _ahandle_request(self, messages_dicts: List[Dict], stop: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Performs an async post request to the LLM API.
+
+        Args:
+            messages_dicts: List of role / content dicts to use as input.
+            stop: list of stop tokens
+
+        Returns:
+            The response dict.
+        """
+        response = await send_with_retries(
+            self.sambanova_url,
+            self.transport_config,
+            headers=self._get_request_headers(),
+            json=self._get_request_data(messages_dicts, stop),
+        )
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.',
-                f'{response_dict}.',
+                f'{response.text}.',
             )
-        return response_dict
+        return self._process_response_dict(response.json(), response.status_code)
 
     def _handle_streaming_request(self, messages_dicts: List[Dict], stop: Optional[List[str]] = None) -> Iterator[Dict]:
         """
@@ -287,62 +409,124 @@ class ChatSambaNovaCloud(BaseChatModel):
             import sseclient
         except ImportError:
             raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
-        data = {
-            'messages': messages_dicts,
-            'max_tokens': self.max_tokens,
-            'stop': stop,
-            'model': self.model,
-            'temperature': self.temperature,
-            'top_p': self.top_p,
-            'top_k': self.top_k,
-            'stream': True,
-            'stream_options': self.stream_options,
-        }
-        http_session = requests.Session()
+        http_session = get_http_session(self.sambanova_url, self.transport_config)
         response = http_session.post(
             self.sambanova_url,
-            headers={
-                'Authorization': f'Bearer {self.sambanova_api_key.get_secret_value()}',
-                'Content-Type': 'application/json',
-            },
-            json=data,
+            headers=self._get_request_headers(),
+            json=self._get_request_data(messages_dicts, stop, streaming=True),
             stream=True,
         )
 
-        client = sseclient.SSEClient(response)
-
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
             )
 
-        for event in client.events():
-            if event.event == 'error_event':
+        client = sseclient.SSEClient(response)
+
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            for event in client.events():
+                data = self._process_stream_event(event.event, event.data, response.status_code)
+                if data is not None:
+                    yield data
+        finally:
+            response.close()
+
+    async def _ahandle_streaming_request(
+        self, messages_dicts: List[Dict], stop: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Performs an async streaming post request to the LLM API, parsing the events as they arrive.
+
+        Args:
+            messages_dicts: List of role / content dicts to use as input.
+            stop: list of stop tokens
+
+        Yields:
+            An async iterator of response dicts.
+        """
+        response = await send_with_retries(
+            self.sambanova_url,
+            self.transport_config,
+            headers=self._get_request_headers(),
+            json=self._get_request_data(messages_dicts, stop, streaming=True),
+        )
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            if response.status_code != 200:
+                await response.aread()
                 raise RuntimeError(
-                    f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{event.data}.'
+                    f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
                 )
-
-            try:
-                # check if the response is a final event
-                # in that case event data response is '[DONE]'
-                if event.data != '[DONE]':
-                    if isinstance(event.data, str):
-                        data = json.loads(event.data)
-                    else:
-                        raise RuntimeError(
-                            f'Sambanova /complete call failed with status code '
-                            f'{response.status_code}.'
-                            f'{event.data}.'
-                        )
-                    if data.get('error'):
-                        raise RuntimeError(
-                            f'Sambanova /complete call failed with status code '
-                            f'{response.status_code}.'
-                            f'{event.data}.'
-                        )
+            async for event in aiter_sse_events(response):
+                data = self._process_stream_event(event.event, event.data, response.status_code)
+                if data is not None:
                     yield data
-            except Exception as e:
-                raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event.data}')
+        finally:
+            await response.aclose()
+
+    def _response_to_message(self, response: Dict[str, Any]) -> AIMessage:
+        """
+        Convert a non streaming response dict to an AIMessage
+
+        Args:
+            response: response dict
+
+        Returns:
+            generation: an AIMessage with model generation
+        """
+        return AIMessage(
+            content=response['choices'][0]['message']['content'],
+            additional_kwargs={},
+            response_metadata={
+                'finish_reason': response['choices'][0]['finish_reason'],
+                'usage': response.get('usage'),
+                'model_name': response['model'],
+                'system_fingerprint': response['system_fingerprint'],
+                'created': response['created'],
+            },
+            id=response['id'],
+        )
+
+    def _partial_response_to_chunk(
+        self, partial_response: Dict[str, Any], finish_reason: Optional[str]
+    ) -> Tuple[ChatGenerationChunk, Optional[str]]:
+        """
+        Convert a partial response dict to a ChatGenerationChunk
+
+        Args:
+            partial_response: partial response dict
+            finish_reason: finish reason of the previous partial responses
+
+        Returns:
+            chunk: ChatGenerationChunk with model partial generation
+            finish_reason: updated finish reason
+        """
+        if len(partial_response['choices']) > 0:
+            finish_reason = partial_response['choices'][0].get('finish_reason')
+            content = partial_response['choices'][0]['delta']['content']
+            id = partial_response['id']
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=content, id=id, additional_kwargs={}))
+        else:
+            content = ''
+            id = partial_response['id']
+            metadata = {
+                'finish_reason': finish_reason,
+                'usage': partial_response.get('usage'),
+                'model_name': partial_response['model'],
+                'system_fingerprint': partial_response['system_fingerprint'],
+                'created': partial_response['created'],
+            }
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
+                )
+            )
+        return chunk, finish_reason
 
     def _generate(
         self,
@@ -373,18 +557,35 @@ class ChatSambaNovaCloud(BaseChatModel):
                 return generate_from_stream(stream_iter)
         messages_dicts = _create_message_dicts(messages)
         response = self._handle_request(messages_dicts, stop)
-        message = AIMessage(
-            content=response['choices'][0]['message']['content'],
-            additional_kwargs={},
-            response_metadata={
-                'finish_reason': response['choices'][0]['finish_reason'],
-                'usage': response.get('usage'),
-                'model_name': response['model'],
-                'system_fingerprint': response['system_fingerprint'],
-                'created': response['created'],
-            },
-            id=response['id'],
-        )
+        message = self._response_to_message(response)
+
+        generation = ChatGeneration(message=message)
+        return ChatResult(generations=[generation])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """
+        Asynchronously call SambaNovaCloud models.
+
+        Args:
+            messages: the prompt composed of a list of messages.
+            stop: a list of strings on which the model should stop generating.
+            run_manager: A run manager with callbacks for the LLM.
+
+        Returns:
+            result: ChatResult with model generation
+        """
+        if self.streaming:
+            stream_iter = self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return await agenerate_from_stream(stream_iter)
+        messages_dicts = _create_message_dicts(messages)
+        response = await self._ahandle_request(messages_dicts, stop)
+        message = self._response_to_message(response)
 
         generation = ChatGeneration(message=message)
         return ChatResult(generations=[generation])
@@ -415,34 +616,37 @@ class ChatSambaNovaCloud(BaseChatModel):
         messages_dicts = _create_message_dicts(messages)
         finish_reason = None
         for partial_response in self._handle_streaming_request(messages_dicts, stop):
-            if len(partial_response['choices']) > 0:
-                finish_reason = partial_response['choices'][0].get('finish_reason')
-                content = partial_response['choices'][0]['delta']['content']
-                id = partial_response['id']
-                chunk = ChatGenerationChunk(message=AIMessageChunk(content=content, id=id, additional_kwargs={}))
-            else:
-                content = ''
-                id = partial_response['id']
-                metadata = {
-                    'finish_reason': finish_reason,
-                    'usage': partial_response.get('usage'),
-                    'model_name': partial_response['model'],
-                    'system_fingerprint': partial_response['system_fingerprint'],
-                    'created': partial_response['created'],
-                }
-                chunk = ChatGenerationChunk(
-                    message=AIMessageChunk(
-                        content=content,
-                        id=id,
-                        response_metadata=metadata,
-                        additional_kwargs={},
-                    )
-                )
-
+            chunk, finish_reason = self._partial_response_to_chunk(partial_response, finish_reason)
             if run_manager:
                 run_manager.on_llm_new_token(chunk.text, chunk=chunk)
             yield chunk
 
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        Asynchronously stream the output of the SambaNovaCloud chat model.
+
+        Args:
+            messages: the prompt composed of a list of messages.
+            stop: a list of strings on which the model should stop generating.
+            run_manager: A run manager with callbacks for the LLM.
+
+        Yields:
+            chunk: ChatGenerationChunk with model partial generation
+        """
+        messages_dicts = _create_message_dicts(messages)
+        finish_reason = None
+        async for partial_response in self._ahandle_streaming_request(messages_dicts, stop):
+            chunk, finish_reason = self._partial_response_to_chunk(partial_response, finish_reason)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
 
 class ChatSambaStudio(BaseChatModel):
     """
@@ -616,6 +820,9 @@ class ChatSambaStudio(BaseChatModel):
     model_kwargs: Optional[Dict[str, Any]] = None
     """Key word arguments to pass to the model."""
 
+    transport_config: Optional[HTTPTransportConfig] = Field(default=None, exclude=True)
+    """connection pool and retry settings, shared by the instances pointing at the same host"""
+
     class Config:
         populate_by_name = True
 
@@ -755,14 +962,14 @@ class ChatSambaStudio(BaseChatModel):
                     raise ValueError('Unsupported URL')
         return base_url, stream_url
 
-    def _handle_request(
+    def _get_request_payload(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
         streaming: Optional[bool] = False,
-    ) -> Response:
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
         """
-        Performs a post request to the LLM API.
+        Get the payload and headers of a request to the LLM API.
 
         Args:
         messages_dicts: List of role / content dicts to use as input.
@@ -770,7 +977,8 @@ class ChatSambaStudio(BaseChatModel):
         streaming: wether to do a streaming call
 
         Returns:
-            A request Response object
+            data: the request payload
+            headers: the request headers
         """
 
         # create request payload for openai compatible API
@@ -846,7 +1054,28 @@ class ChatSambaStudio(BaseChatModel):
                 f'Unsupported URL{self.sambastudio_url}' 'only openai, generic v1 and generic v2 APIs are supported'
             )
 
-        http_session = requests.Session()
+        return data, headers
+
+    def _handle_request(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        streaming: Optional[bool] = False,
+    ) -> Response:
+        """
+        Performs a post request to the LLM API.
+
+        Args:
+        messages_dicts: List of role / content dicts to use as input.
+        stop: list of stop tokens
+        streaming: wether to do a streaming call
+
+        Returns:
+            A request Response object
+        """
+        data, headers = self._get_request_payload(messages, stop, streaming)
+
+        http_session = get_http_session(self.base_url, self.transport_config)
         if streaming:
             response = http_session.post(self.streaming_url, headers=headers, json=data, stream=True)
         else:
@@ -857,7 +1086,40 @@ class ChatSambaStudio(BaseChatModel):
             )
         return response
 
-    def _process_response(self, response: Response) -> AIMessage:
+    async def _ahandle_request(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        streaming: Optional[bool] = False,
+    ) -> httpx.Response:
+        """
+        Performs an async post request to the LLM API.
+
+        Args:
+        messages_dicts: List of role / content dicts to use as input.
+        stop: list of stop tokens
+        streaming: wether to do a streaming call
+
+        Returns:
+            An httpx Response object, with its body already read for non streaming calls. Streaming responses have to
+            be closed by the caller
+        """
+        data, headers = self._get_request_payload(messages, stop, streaming)
+
+        url = self.streaming_url if streaming else self.base_url
+        response = await send_with_retries(url, self.transport_config, headers=headers, json=data)
+        if not streaming or response.status_code != 200:
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+        if response.status_code != 200:
+            raise RuntimeError(
+                f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
+            )
+        return response
+
+    def _process_response(self, response: Union[Response, httpx.Response]) -> AIMessage:
         """
         Process a non streaming response from the api
 
@@ -912,6 +1174,156 @@ class ChatSambaStudio(BaseChatModel):
             id=id,
         )
 
+    def _process_openai_stream_event(
+        self, event: str, event_data: Any, status_code: int, finish_reason: Optional[str]
+    ) -> Tuple[Optional[AIMessageChunk], Optional[str]]:
+        """
+        Process a server-sent event of a streaming response from the openai compatible API
+
+        Args:
+            event: event name
+            event_data: event data
+            status_code: response status code
+            finish_reason: finish reason of the previous events
+
+        Returns:
+            generation: an AIMessageChunk with model partial generation, None for the final '[DONE]' event
+            finish_reason: updated finish reason
+        """
+        if event == 'error_event':
+            raise RuntimeError(f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.')
+        try:
+            # check if the response is not a final event ("[DONE]")
+            if event_data != '[DONE]':
+                if isinstance(event_data, str):
+                    data = json.loads(event_data)
+                else:
+                    raise RuntimeError(
+                        f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                    )
+                if data.get('error'):
+                    raise RuntimeError(
+                        f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                    )
+                if len(data['choices']) > 0:
+                    finish_reason = data['choices'][0].get('finish_reason')
+                    content = data['choices'][0]['delta']['content']
+                    id = data['id']
+                    metadata = {}
+                else:
+                    content = ''
+                    id = data['id']
+                    metadata = {
+                        'finish_reason': finish_reason,
+                        'usage': data.get('usage'),
+                        'model_name': data['model'],
+                        'system_fingerprint': data['system_fingerprint'],
+                        'created': data['created'],
+                    }
+                return (
+                    AIMessageChunk(
+                        content=content,
+                        id=id,
+                        response_metadata=metadata,
+                        additional_kwargs={},
+                    ),
+                    finish_reason,
+                )
+            return None, finish_reason
+
+        except Exception as e:
+            raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event_data}')
+
+    def _process_generic_stream_line(self, line: Union[str, bytes]) -> AIMessageChunk:
+        """
+        Process a line of a streaming response from the generic v1 and v2 APIs
+
+        Args:
+            line: response line
+
+        Returns:
+            generation: an AIMessageChunk with model partial generation
+        """
+
+        # process response payload for generic v2 API
+        if 'api/v2/predict/generic' in self.sambastudio_url:
+            try:
+                data = json.loads(line)
+                content = data['result']['items'][0]['value']['stream_token']
+                id = data['result']['items'][0]['id']
+                if data['result']['items'][0]['value']['is_last_response']:
+                    metadata = {
+                        'finish_reason': data['result']['items'][0]['value'].get('stop_reason'),
+                        'prompt': data['result']['items'][0]['value'].get('prompt'),
+                        'usage': {
+                            'prompt_tokens_count': data['result']['items'][0]['value'].get('prompt_tokens_count'),
+                            'completion_tokens_count': data['result']['items'][0]['value'].get(
+                                'completion_tokens_count'
+                            ),
+                            'total_tokens_count': data['result']['items'][0]['value'].get('total_tokens_count'),
+                            'start_time': data['result']['items'][0]['value'].get('start_time'),
+                            'end_time': data['result']['items'][0]['value'].get('end_time'),
+                            'model_execution_time': data['result']['items'][0]['value'].get('model_execution_time'),
+                            'time_to_first_token': data['result']['items'][0]['value'].get('time_to_first_token'),
+                            'throughput_after_first_token': data['result']['items'][0]['value'].get(
+                                'throughput_after_first_token'
+                            ),
+                            'batch_size_used': data['result']['items'][0]['value'].get('batch_size_used'),
+                        },
+                    }
+                else:
+                    metadata = {}
+                return AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
+                )
+
+            except Exception as e:
+                raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+
+        # process response payload for generic v1 API
+        elif 'api/predict/generic' in self.sambastudio_url:
+            try:
+                data = json.loads(line)
+                content = data['result']['responses'][0]['stream_token']
+                id = None
+                if data['result']['responses'][0]['is_last_response']:
+                    metadata = {
+                        'finish_reason': data['result']['responses'][0].get('stop_reason'),
+                        'prompt': data['result']['responses'][0].get('prompt'),
+                        'usage': {
+                            'prompt_tokens_count': data['result']['responses'][0].get('prompt_tokens_count'),
+                            'completion_tokens_count': data['result']['responses'][0].get('completion_tokens_count'),
+                            'total_tokens_count': data['result']['responses'][0].get('total_tokens_count'),
+                            'start_time': data['result']['responses'][0].get('start_time'),
+                            'end_time': data['result']['responses'][0].get('end_time'),
+                            'model_execution_time': data['result']['responses'][0].get('model_execution_time'),
+                            'time_to_first_token': data['result']['responses'][0].get('time_to_first_token'),
+                            'throughput_after_first_token': data['result']['responses'][0].get(
+                                'throughput_after_first_token'
+                            ),
+                            'batch_size_used': data['result']['responses'][0].get('batch_size_used'),
+                        },
+                    }
+                else:
+                    metadata = {}
+                return AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
+                )
+
+            except Exception as e:
+                raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+
+        else:
+            raise ValueError(
+                f'Unsupported URL{self.sambastudio_url}' 'only openai, generic v1 and generic v2 APIs are supported'
+            )
+
     def _process_stream_response(self, response: Response) -> Iterator[BaseMessageChunk]:
         """
         Process a streaming response from the api
@@ -930,132 +1342,52 @@ class ChatSambaStudio(BaseChatModel):
 
         # process response payload for openai compatible API
         if 'openai' in self.sambastudio_url:
-            finish_reason = ''
+            finish_reason: Optional[str] = ''
             client = sseclient.SSEClient(response)
             for event in client.events():
-                if event.event == 'error_event':
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{event.data}.'
-                    )
-                try:
-                    # check if the response is not a final event ("[DONE]")
-                    if event.data != '[DONE]':
-                        if isinstance(event.data, str):
-                            data = json.loads(event.data)
-                        else:
-                            raise RuntimeError(
-                                f'Sambanova /complete call failed with status code '
-                                f'{response.status_code}.'
-                                f'{event.data}.'
-                            )
-                        if data.get('error'):
-                            raise RuntimeError(
-                                f'Sambanova /complete call failed with status code '
-                                f'{response.status_code}.'
-                                f'{event.data}.'
-                            )
-                        if len(data['choices']) > 0:
-                            finish_reason = data['choices'][0].get('finish_reason')
-                            content = data['choices'][0]['delta']['content']
-                            id = data['id']
-                            metadata = {}
-                        else:
-                            content = ''
-                            id = data['id']
-                            metadata = {
-                                'finish_reason': finish_reason,
-                                'usage': data.get('usage'),
-                                'model_name': data['model'],
-                                'system_fingerprint': data['system_fingerprint'],
-                                'created': data['created'],
-                            }
-                        yield AIMessageChunk(
-                            content=content,
-                            id=id,
-                            response_metadata=metadata,
-                            additional_kwargs={},
-                        )
-
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event.data}')
+                message_chunk, finish_reason = self._process_openai_stream_event(
+                    event.event, event.data, response.status_code, finish_reason
+                )
+                if message_chunk is not None:
+                    yield message_chunk
 
-        # process response payload for generic v2 API
-        elif 'api/v2/predict/generic' in self.sambastudio_url:
+        # process response payload for generic v1 and v2 APIs
+        elif 'api/v2/predict/generic' in self.sambastudio_url or 'api/predict/generic' in self.sambastudio_url:
             for line in response.iter_lines():
-                try:
-                    data = json.loads(line)
-                    content = data['result']['items'][0]['value']['stream_token']
-                    id = data['result']['items'][0]['id']
-                    if data['result']['items'][0]['value']['is_last_response']:
-                        metadata = {
-                            'finish_reason': data['result']['items'][0]['value'].get('stop_reason'),
-                            'prompt': data['result']['items'][0]['value'].get('prompt'),
-                            'usage': {
-                                'prompt_tokens_count': data['result']['items'][0]['value'].get('prompt_tokens_count'),
-                                'completion_tokens_count': data['result']['items'][0]['value'].get(
-                                    'completion_tokens_count'
-                                ),
-                                'total_tokens_count': data['result']['items'][0]['value'].get('total_tokens_count'),
-                                'start_time': data['result']['items'][0]['value'].get('start_time'),
-                                'end_time': data['result']['items'][0]['value'].get('end_time'),
-                                'model_execution_time': data['result']['items'][0]['value'].get('model_execution_time'),
-                                'time_to_first_token': data['result']['items'][0]['value'].get('time_to_first_token'),
-                                'throughput_after_first_token': data['result']['items'][0]['value'].get(
-                                    'throughput_after_first_token'
-                                ),
-                                'batch_size_used': data['result']['items'][0]['value'].get('batch_size_used'),
-                            },
-                        }
-                    else:
-                        metadata = {}
-                    yield AIMessageChunk(
-                        content=content,
-                        id=id,
-                        response_metadata=metadata,
-                        additional_kwargs={},
-                    )
+                yield self._process_generic_stream_line(line)
 
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+        else:
+            raise ValueError(
+                f'Unsupported URL{self.sambastudio_url}' 'only openai, generic v1 and generic v2 APIs are supported'
+            )
 
-        # process response payload for generic v1 API
-        elif 'api/predict/generic' in self.sambastudio_url:
-            for line in response.iter_lines():
-                try:
-                    data = json.loads(line)
-                    content = data['result']['responses'][0]['stream_token']
-                    id = None
-                    if data['result']['responses'][0]['is_last_response']:
-                        metadata = {
-                            'finish_reason': data['result']['responses'][0].get('stop_reason'),
-                            'prompt': data['result']['responses'][0].get('prompt'),
-                            'usage': {
-                                'prompt_tokens_count': data['result']['responses'][0].get('prompt_tokens_count'),
-                                'completion_tokens_count': data['result']['responses'][0].get(
-                                    'completion_tokens_count'
-                                ),
-                                'total_tokens_count': data['result']['responses'][0].get('total_tokens_count'),
-                                'start_time': data['result']['responses'][0].get('start_time'),
-                                'end_time': data['result']['responses'][0].get('end_time'),
-                                'model_execution_time': data['result']['responses'][0].get('model_execution_time'),
-                                'time_to_first_token': data['result']['responses'][0].get('time_to_first_token'),
-                                'throughput_after_first_token': data['result']['responses'][0].get(
-                                    'throughput_after_first_token'
-                                ),
-                                'batch_size_used': data['result']['responses'][0].get('batch_size_used'),
-                            },
-                        }
-                    else:
-                        metadata = {}
-                    yield AIMessageChunk(
-                        content=content,
-                        id=id,
-                        response_metadata=metadata,
-                        additional_kwargs={},
-                    )
+    async def _aprocess_stream_response(self, response: httpx.Response) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Process a streaming response from the api as it arrives
 
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+        Args:
+            response: A streamed httpx Response object
+
+        Yields:
+            generation: an AIMessageChunk with model partial generation
+        """
+
+        # process response payload for openai compatible API
+        if 'openai' in self.sambastudio_url:
+            finish_reason: Optional[str] = ''
+            async for event in aiter_sse_events(response):
+                message_chunk, finish_reason = self._process_openai_stream_event(
+                    event.event, event.data, response.status_code, finish_reason
+                )
+                if message_chunk is not None:
+                    yield message_chunk
+
+        # process response payload for generic v1 and v2 APIs
+        elif 'api/v2/predict/generic' in self.sambastudio_url or 'api/predict/generic' in self.sambastudio_url:
+            async for line in response.aiter_lines():
+                # iter_lines of the sync responses skips the keep-alive empty lines
+                if line:
+                    yield self._process_generic_stream_line(line)
 
         else:
             raise ValueError(
@@ -1094,6 +1426,32 @@ class ChatSambaStudio(BaseChatModel):
         generation = ChatGeneration(message=message)
         return ChatResult(generations=[generation])
 
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """
+        Asynchronously call SambaStudio models.
+
+        Args:
+            messages: the prompt composed of a list of messages.
+            stop: a list of strings on which the model should stop generating.
+            run_manager: A run manager with callbacks for the LLM.
+
+        Returns:
+            result: ChatResult with model generation
+        """
+        if self.streaming:
+            stream_iter = self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return await agenerate_from_stream(stream_iter)
+        response = await self._ahandle_request(messages, stop, streaming=False)
+        message = self._process_response(response)
+        generation = ChatGeneration(message=message)
+        return ChatResult(generations=[generation])
+
     def _stream(
         self,
         messages: List[BaseMessage],
@@ -1118,8 +1476,39 @@ class ChatSambaStudio(BaseChatModel):
             chunk: ChatGenerationChunk with model partial generation
         """
         response = self._handle_request(messages, stop, streaming=True)
-        for ai_message_chunk in self._process_stream_response(response):
-            chunk = ChatGenerationChunk(message=ai_message_chunk)
-            if run_manager:
-                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
-            yield chunk
+        try:
+            for ai_message_chunk in self._process_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            response.close()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        Asynchronously stream the output of the SambaStudio model.
+
+        Args:
+            messages: the prompt composed of a list of messages.
+            stop: a list of strings on which the model should stop generating.
+            run_manager: A run manager with callbacks for the LLM.
+
+        Yields:
+            chunk: ChatGenerationChunk with model partial generation
+        """
+        response = await self._ahandle_request(messages, stop, streaming=True)
+        try:
+            async for ai_message_chunk in self._aprocess_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            await response.aclose()
@@ -1,11 +1,33 @@
+import asyncio
 import json
-from typing import Dict, Generator, List, Optional
-
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generator, List, Optional
+
+import httpx
 import requests
 from langchain_core.embeddings import Embeddings
 from langchain_core.utils import get_from_dict_or_env, pre_init
 from pydantic import BaseModel
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(utils_dir)
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.http_transport import (
+    DEFAULT_TRANSPORT_CONFIG,
+    HTTPTransportConfig,
+    get_http_session,
+    send_with_retries,
+)
+
+logger = logging.getLogger(__name__)
+
 
 class SambaStudioEmbeddings(BaseModel, Embeddings):
     """SambaNova embedding models.
@@ -41,6 +63,15 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
                     'select_expert':'e5-mistral-7b-instruct'
                 }
             )
+
+            (or)
+
+            # Up to 8 batches in flight, each one of at most 32 texts and 8192 tokens
+            embeddings = SambaStudioEmbeddings(
+                batch_size=32,
+                max_concurrency=8,
+                max_batch_tokens=8192,
+            )
     """
 
     sambastudio_embeddings_base_url: str = ''
@@ -64,6 +95,27 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
     batch_size: int = 32
     """Batch size for the embedding models"""
 
+    max_concurrency: int = 4
+    """Max number of batches sent to the endpoint at the same time"""
+
+    max_retries: int = 3
+    """Max number of retries of a batch failed with a server or connection error"""
+
+    retry_backoff: float = 1.0
+    """Exponential backoff factor between retries of a failed batch, in seconds, unless the response has a Retry-After
+    header"""
+
+    max_batch_tokens: Optional[int] = None
+    """Max number of tokens per batch, if set batches are also cut by their total number of tokens"""
+
+    tokenizer: Optional[str] = None
+    """HuggingFace tokenizer used to count the tokens of max_batch_tokens,
+    if not set the tokens are estimated from the number of characters"""
+
+    transport_config: Optional[HTTPTransportConfig] = None
+    """Connection pool settings of the shared HTTP transport, its retries are disabled as the batches are retried with
+    max_retries and retry_backoff"""
+
     @pre_init
     def validate_environment(cls, values: Dict) -> Dict:
         """Validate that api key and python package exists in environment."""
@@ -126,182 +178,303 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
         Yields:
             List[str]: list (batch) of strings of size batch size
         """
-        for i in range(0, len(texts), batch_size):
-            yield texts[i : i + batch_size]
+        if self.max_batch_tokens is None:
+            for i in range(0, len(texts), batch_size):
+                yield texts[i : i + batch_size]
+            return
+
+        # Adaptive batching, a batch is closed when adding the next text would exceed the token budget
+        batch: List[str] = []
+        batch_tokens = 0
+        for text, num_tokens in zip(texts, self._count_tokens(texts)):
+            if len(batch) > 0 and (len(batch) >= batch_size or batch_tokens + num_tokens > self.max_batch_tokens):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += num_tokens
+        if len(batch) > 0:
+            yield batch
+
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of each text, with the tokenizer if set, or estimated as 4 characters per token
 
-    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
-        """Returns a list of embeddings for the given sentences.
         Args:
-            texts (`List[str]`): List of texts to encode
-            batch_size (`int`): Batch size for the encoding
+            texts: list of strings to embed
 
         Returns:
-            `List[np.ndarray]` or `List[tensor]`: List of embeddings
-            for the given sentences
+            List[int]: number of tokens of each text
         """
-        if batch_size is None:
-            batch_size = self.batch_size
-        http_session = requests.Session()
-        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
-        params = json.loads(self._get_tuning_params())
-        embeddings = []
+        if self.tokenizer is None:
+            return [len(text) // 4 + 1 for text in texts]
+
+        from utils.model_wrappers.tokenizer_registry import get_tokenizer
+
+        tokenizer = get_tokenizer(self.tokenizer)
+        return [len(input_ids) for input_ids in tokenizer(texts, add_special_tokens=True)['input_ids']]
+
+    def _get_request_data(self, batch: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the request payload of a batch for the endpoint uri
+
+        Args:
+            batch: list (batch) of strings to embed
+            params: tuning parameters
 
+        Returns:
+            Dict[str, Any]: request payload
+        """
         if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'inputs': batch, 'params': params}
-                response = http_session.post(
-                    url,
-                    headers={'key': self.sambastudio_embeddings_api_key},
-                    json=data,
-                )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    embedding = response.json()['data']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'data' not found in endpoint response",
-                        response.json(),
-                    )
+            return {'inputs': batch, 'params': params}
+        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
+            items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)]
+            return {'items': items, 'params': params}
+        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
+            return {'instances': batch, 'params': params}
+        else:
+            raise ValueError(
+                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
+            )
+
+    def _process_response(self, response_dict: Dict[str, Any]) -> List[List[float]]:
+        """
+        Get the embeddings of a batch from the endpoint response
 
+        Args:
+            response_dict: endpoint response body
+
+        Returns:
+            List[List[float]]: embeddings of the batch
+        """
+        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
+            try:
+                return response_dict['data']
+            except KeyError:
+                raise KeyError(
+                    "'data' not found in endpoint response",
+                    response_dict,
+                )
         elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)]
-                data = {'items': items, 'params': params}
+            try:
+                return [item['value'] for item in response_dict['items']]
+            except KeyError:
+                raise KeyError(
+                    "'items' not found in endpoint response",
+                    response_dict,
+                )
+        else:
+            try:
+                return response_dict['predictions']
+            except KeyError:
+                raise KeyError(
+                    "'predictions' not found in endpoint response",
+                    response_dict,
+                )
+
+    def _is_retryable(self, status_code: int) -> bool:
+        """
+        Whether a failed batch is retried, server errors are, client errors are not
+
+        Args:
+            status_code: response status code
+
+        Returns:
+            bool: whether the batch is retried
+        """
+        return status_code >= 500 or status_code == 429
+
+    def _get_retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Get the delay before retrying a failed batch, from the Retry-After header or the exponential backoff
+
+        Args:
+            attempt: number of the retry, starting at 0
+            retry_after: Retry-After header of the failed response, if any
+
+        Returns:
+            float: delay in seconds
+        """
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+        return float(self.retry_backoff * (2**attempt))
+
+    def _get_transport_config(self) -> HTTPTransportConfig:
+        """
+        Get the settings of the shared HTTP transport, without its retries, so that a failed batch is only retried by
+        _embed_batch and _aembed_batch instead of by both layers
+
+        Returns:
+            HTTPTransportConfig: transport settings
+        """
+        return (self.transport_config or DEFAULT_TRANSPORT_CONFIG).model_copy(update={'max_retries': 0})
+
+    def _embed_batch(self, url: str, batch: List[str], params: Dict[str, Any]) -> List[List[float]]:
+        """
+        Embed a batch, retrying it on server and connection errors
+
+        Args:
+            url: endpoint url
+            batch: list (batch) of strings to embed
+            params: tuning parameters
+
+        Returns:
+            List[List[float]]: embeddings of the batch
+        """
+        http_session = get_http_session(url, self._get_transport_config())
+        data = self._get_request_data(batch, params)
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
                 response = http_session.post(
                     url,
                     headers={'key': self.sambastudio_embeddings_api_key},
                     json=data,
                 )
-                if response.status_code != 200:
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.max_retries:
+                    raise e
+                logger.warning(f'Embedding batch failed, retrying: {e}')
+            else:
+                if response.status_code == 200:
+                    return self._process_response(response.json())
+                if not self._is_retryable(response.status_code) or attempt >= self.max_retries:
                     raise RuntimeError(
                         f'Sambanova /complete call failed with status code '
                         f'{response.status_code}.\n Details: {response.text}'
                     )
-                try:
-                    embedding = [item['value'] for item in response.json()['items']]
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'items' not found in endpoint response",
-                        response.json(),
-                    )
+                logger.warning(f'Embedding batch failed with status code {response.status_code}, retrying')
+                retry_after = response.headers.get('Retry-After')
+            time.sleep(self._get_retry_delay(attempt, retry_after))
+            attempt += 1
 
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'instances': batch, 'params': params}
-                response = http_session.post(
+    async def _aembed_batch(self, url: str, batch: List[str], params: Dict[str, Any]) -> List[List[float]]:
+        """
+        Embed a batch asynchronously, retrying it on server and connection errors
+
+        Args:
+            url: endpoint url
+            batch: list (batch) of strings to embed
+            params: tuning parameters
+
+        Returns:
+            List[List[float]]: embeddings of the batch
+        """
+        data = self._get_request_data(batch, params)
+        transport_config = self._get_transport_config()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = await send_with_retries(
                     url,
+                    transport_config,
                     headers={'key': self.sambastudio_embeddings_api_key},
                     json=data,
                 )
-                if response.status_code != 200:
+                await response.aread()
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise e
+                logger.warning(f'Embedding batch failed, retrying: {e}')
+            else:
+                if response.status_code == 200:
+                    return self._process_response(response.json())
+                if not self._is_retryable(response.status_code) or attempt >= self.max_retries:
                     raise RuntimeError(
                         f'Sambanova /complete call failed with status code '
                         f'{response.status_code}.\n Details: {response.text}'
                     )
-                try:
-                    if params.get('select_expert'):
-                        embedding = response.json()['predictions']
-                    else:
-                        embedding = response.json()['predictions']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'predictions' not found in endpoint response",
-                        response.json(),
-                    )
+                logger.warning(f'Embedding batch failed with status code {response.status_code}, retrying')
+                retry_after = response.headers.get('Retry-After')
+            await asyncio.sleep(self._get_retry_delay(attempt, retry_after))
+            attempt += 1
 
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Returns a list of embeddings for the given sentences.
+        Batches are sent concurrently, up to max_concurrency at a time, and the embeddings keep the order of the texts.
+        Args:
+            texts (`List[str]`): List of texts to encode
+            batch_size (`int`): Batch size for the encoding
+
+        Returns:
+            `List[np.ndarray]` or `List[tensor]`: List of embeddings
+            for the given sentences
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
+        params = json.loads(self._get_tuning_params())
+        batches = list(self._iterate_over_batches(texts, batch_size))
+
+        if self.max_concurrency <= 1 or len(batches) <= 1:
+            batch_embeddings = [self._embed_batch(url, batch, params) for batch in batches]
         else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                # map yields the results in the order of the batches
+                batch_embeddings = list(executor.map(lambda batch: self._embed_batch(url, batch, params), batches))
 
+        embeddings = []
+        for embedding in batch_embeddings:
+            embeddings.extend(embedding)
         return embeddings
 
-    def embed_query(self, text: str) -> List[float]:
-        """Returns a list of embeddings for the given sentences.
+    async def aembed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Returns a list of embeddings for the given sentences, asynchronously.
+        Batches are sent concurrently, up to max_concurrency at a time, and the embeddings keep the order of the texts.
         Args:
-            sentences (`List[str]`): List of sentences to encode
+            texts (`List[str]`): List of texts to encode
+            batch_size (`int`): Batch size for the encoding
 
         Returns:
             `List[np.ndarray]` or `List[tensor]`: List of embeddings
             for the given sentences
         """
-        http_session = requests.Session()
+        if batch_size is None:
+            batch_size = self.batch_size
         url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
         params = json.loads(self._get_tuning_params())
+        semaphore = asyncio.Semaphore(max(self.max_concurrency, 1))
 
-        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            data = {'inputs': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['data'][0]
-            except KeyError:
-                raise KeyError(
-                    "'data' not found in endpoint response",
-                    response.json(),
-                )
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_batch(url, batch, params)
 
-        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'items': [{'id': 'item0', 'value': text}], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['items'][0]['value']
-            except KeyError:
-                raise KeyError(
-                    "'items' not found in endpoint response",
-                    response.json(),
-                )
+        # gather returns the results in the order of the batches
+        batch_embeddings = await asyncio.gather(
+            *[embed_batch(batch) for batch in self._iterate_over_batches(texts, batch_size)]
+        )
 
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'instances': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                if params.get('select_expert'):
-                    embedding = response.json()['predictions'][0]
-                else:
-                    embedding = response.json()['predictions'][0]
-            except KeyError:
-                raise KeyError(
-                    "'predictions' not found in endpoint response",
-                    response.json(),
-                )
+        embeddings = []
+        for embedding in batch_embeddings:
+            embeddings.extend(embedding)
+        return embeddings
 
-        else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
+    def embed_query(self, text: str) -> List[float]:
+        """Returns a list of embeddings for the given sentences.
+        Args:
+            sentences (`List[str]`): List of sentences to encode
 
-        return embedding
+        Returns:
+            `List[np.ndarray]` or `List[tensor]`: List of embeddings
+            for the given sentences
+        """
+        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
+        params = json.loads(self._get_tuning_params())
+        return self._embed_batch(url, [text], params)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Returns the embedding of the given text, asynchronously.
+        Args:
+            text (`str`): text to encode
+
+        Returns:
+            `List[float]`: embedding of the text
+        """
+        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
+        params = json.loads(self._get_tuning_params())
+        return (await self._aembed_batch(url, [text], params))[0]
@@ -1,15 +1,31 @@
 """Langchain Wrapper around Sambanova LLM APIs."""
 
 import json
-from typing import Any, Dict, Generator, Iterator, List, Optional, Union
+import os
+import sys
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Generator, Iterator, List, Optional, Union
 
+import httpx
 import requests
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.llms import LLM
 from langchain_core.outputs import GenerationChunk
 from langchain_core.utils import get_from_dict_or_env, pre_init
 from pydantic import ConfigDict
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(utils_dir)
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.http_transport import (
+    HTTPTransportConfig,
+    aiter_sse_events,
+    get_http_session,
+    send_with_retries,
+)
+
 
 class SSEndpointHandler:
     """
@@ -18,18 +34,22 @@ class SSEndpointHandler:
     :param str host_url: Base URL of the DaaS API service
     """
 
-    def __init__(self, host_url: str, api_base_uri: str) -> None:
+    def __init__(
+        self, host_url: str, api_base_uri: str, transport_config: Optional[HTTPTransportConfig] = None
+    ) -> None:
         """
         Initialize the SSEndpointHandler.
 
         :param str host_url: Base URL of the DaaS API service
         :param str api_base_uri: Base URI of the DaaS API service
+        :param HTTPTransportConfig transport_config: connection pool and retry settings
         """
         self.host_url = host_url
         self.api_base_uri = api_base_uri
-        self.http_session = requests.Session()
+        self.transport_config = transport_config
+        self.http_session = get_http_session(host_url, transport_config)
 
-    def _process_response(self, response: requests.Response) -> Dict:
+    def _process_response(self, response: Union[requests.Response, httpx.Response]) -> Dict:
         """
         Processes the API response and returns the resulting dict.
 
@@ -92,6 +112,34 @@ class SSEndpointHandler:
         else:
             raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
 
+    async def _aprocess_streaming_response(
+        self,
+        response: httpx.Response,
+    ) -> AsyncGenerator[Dict, None]:
+        """Process the streaming response as it arrives"""
+        if 'api/predict/nlp' in self.api_base_uri:
+            async for event in aiter_sse_events(response):
+                chunk = {
+                    'event': event.event,
+                    'data': event.data,
+                    'status_code': response.status_code,
+                }
+                yield chunk
+        elif 'api/v2/predict/generic' in self.api_base_uri or 'api/predict/generic' in self.api_base_uri:
+            try:
+                async for line in response.aiter_lines():
+                    # iter_lines of the sync responses skips the keep-alive empty lines
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if 'status_code' not in chunk:
+                        chunk['status_code'] = response.status_code
+                    yield chunk
+            except Exception as e:
+                raise RuntimeError(f'Error processing streaming response: {e}')
+        else:
+            raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
+
     def _get_full_url(self, path: str) -> str:
         """
         Return the full API URL for a given path.
@@ -102,53 +150,109 @@ class SSEndpointHandler:
         """
         return f'{self.host_url}/{self.api_base_uri}/{path}'
 
-    def nlp_predict(
-        self,
-        project: str,
-        endpoint: str,
-        key: str,
-        input: Union[List[str], str],
-        params: Optional[str] = '',
-        stream: bool = False,
-    ) -> Dict:
+    def _get_request_data(
+        self, input: Union[List[str], str], params: Optional[str] = '', stream: bool = False
+    ) -> Dict[str, Any]:
         """
-        NLP predict using inline input string.
+        Build the request payload for the endpoint base URI.
 
-        :param str project: Project ID in which the endpoint exists
-        :param str endpoint: Endpoint ID
-        :param str key: API Key
-        :param str input_str: Input string
+        :param str input: Input string or list of input strings
         :param str params: Input params string
-        :returns: Prediction results
+        :param bool stream: whether the payload is for a streaming call
+        :returns: request payload
         :type: dict
         """
-        if isinstance(input, str):
-            input = [input]
         if 'api/predict/nlp' in self.api_base_uri:
+            if isinstance(input, str):
+                input = [input]
             if params:
                 data = {'inputs': input, 'params': json.loads(params)}
             else:
                 data = {'inputs': input}
         elif 'api/v2/predict/generic' in self.api_base_uri:
+            if isinstance(input, str):
+                input = [input]
             items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(input)]
             if params:
                 data = {'items': items, 'params': json.loads(params)}
             else:
                 data = {'items': items}
         elif 'api/predict/generic' in self.api_base_uri:
+            # streaming calls take a single instance
+            if stream:
+                instances_key = 'instance'
+                if isinstance(input, list):
+                    input = input[0]
+            else:
+                instances_key = 'instances'
+                if isinstance(input, str):
+                    input = [input]
             if params:
-                data = {'instances': input, 'params': json.loads(params)}
+                data = {instances_key: input, 'params': json.loads(params)}
             else:
-                data = {'instances': input}
+                data = {instances_key: input}
         else:
             raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
+        return data
+
+    def nlp_predict(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+        stream: bool = False,
+    ) -> Dict:
+        """
+        NLP predict using inline input string.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
         response = self.http_session.post(
             self._get_full_url(f'{project}/{endpoint}'),
             headers={'key': key},
-            json=data,
+            json=self._get_request_data(input, params),
         )
         return self._process_response(response)
 
+    async def anlp_predict(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+    ) -> Dict:
+        """
+        Async NLP predict using inline input string.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
+        response = await send_with_retries(
+            self._get_full_url(f'{project}/{endpoint}'),
+            self.transport_config,
+            headers={'key': key},
+            json=self._get_request_data(input, params),
+        )
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        return self._process_response(response)
+
     def nlp_predict_stream(
         self,
         project: str,
@@ -168,39 +272,52 @@ class SSEndpointHandler:
         :returns: Prediction results
         :type: dict
         """
-        if 'api/predict/nlp' in self.api_base_uri:
-            if isinstance(input, str):
-                input = [input]
-            if params:
-                data = {'inputs': input, 'params': json.loads(params)}
-            else:
-                data = {'inputs': input}
-        elif 'api/v2/predict/generic' in self.api_base_uri:
-            if isinstance(input, str):
-                input = [input]
-            items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(input)]
-            if params:
-                data = {'items': items, 'params': json.loads(params)}
-            else:
-                data = {'items': items}
-        elif 'api/predict/generic' in self.api_base_uri:
-            if isinstance(input, list):
-                input = input[0]
-            if params:
-                data = {'instance': input, 'params': json.loads(params)}
-            else:
-                data = {'instance': input}
-        else:
-            raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
         # Streaming output
         response = self.http_session.post(
             self._get_full_url(f'stream/{project}/{endpoint}'),
             headers={'key': key},
-            json=data,
+            json=self._get_request_data(input, params, stream=True),
             stream=True,
         )
-        for chunk in self._process_streaming_response(response):
-            yield chunk
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            for chunk in self._process_streaming_response(response):
+                yield chunk
+        finally:
+            response.close()
+
+    async def anlp_predict_stream(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+    ) -> AsyncIterator[Dict]:
+        """
+        Async NLP predict using inline input string, parsing the streamed output as it arrives.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
+        # Streaming output
+        response = await send_with_retries(
+            self._get_full_url(f'stream/{project}/{endpoint}'),
+            self.transport_config,
+            headers={'key': key},
+            json=self._get_request_data(input, params, stream=True),
+        )
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            async for chunk in self._aprocess_streaming_response(response):
+                yield chunk
+        finally:
+            await response.aclose()
 
 
 class SambaStudio(LLM):
@@ -263,6 +380,9 @@ class SambaStudio(LLM):
     streaming: Optional[bool] = False
     """Streaming flag to get streamed response."""
 
+    transport_config: Optional[HTTPTransportConfig] = None
+    """connection pool and retry settings, shared by the instances pointing at the same host"""
+
     model_config = ConfigDict(
         extra='forbid',
     )
@@ -326,14 +446,12 @@ class SambaStudio(LLM):
         tuning_params = json.dumps(tuning_params_dict)
         return tuning_params
 
-    def _handle_nlp_predict(self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str) -> str:
+    def _process_nlp_predict_response(self, response: Dict[str, Any]) -> str:
         """
-        Perform an NLP prediction using the SambaStudio endpoint handler.
+        Check an NLP prediction response and extract its completion.
 
         Args:
-            sdk: The SSEndpointHandler to use for the prediction.
-            prompt: The prompt to use for the prediction.
-            tuning_params: The tuning parameters to use for the prediction.
+            response: The prediction response dict.
 
         Returns:
             The prediction result.
@@ -341,13 +459,6 @@ class SambaStudio(LLM):
         Raises:
             ValueError: If the prediction fails.
         """
-        response = sdk.nlp_predict(
-            self.sambastudio_project_id,
-            self.sambastudio_endpoint_id,
-            self.sambastudio_api_key,
-            prompt,
-            tuning_params,
-        )
         if response['status_code'] != 200:
             optional_detail = response.get('detail')
             if optional_detail:
@@ -369,6 +480,56 @@ class SambaStudio(LLM):
         else:
             raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri} not implemented')
 
+    def _handle_nlp_predict(self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str) -> str:
+        """
+        Perform an NLP prediction using the SambaStudio endpoint handler.
+
+        Args:
+            sdk: The SSEndpointHandler to use for the prediction.
+            prompt: The prompt to use for the prediction.
+            tuning_params: The tuning parameters to use for the prediction.
+
+        Returns:
+            The prediction result.
+
+        Raises:
+            ValueError: If the prediction fails.
+        """
+        response = sdk.nlp_predict(
+            self.sambastudio_project_id,
+            self.sambastudio_endpoint_id,
+            self.sambastudio_api_key,
+            prompt,
+            tuning_params,
+        )
+        return self._process_nlp_predict_response(response)
+
+    async def _ahandle_nlp_predict(
+        self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str
+    ) -> str:
+        """
+        Perform an async NLP prediction using the SambaStudio endpoint handler.
+
+        Args:
+            sdk: The SSEndpointHandler to use for the prediction.
+            prompt: The prompt to use for the prediction.
+            tuning_params: The tuning parameters to use for the prediction.
+
+        Returns:
+            The prediction result.
+
+        Raises:
+            ValueError: If the prediction fails.
+        """
+        response = await sdk.anlp_predict(
+            self.sambastudio_project_id,
+            self.sambastudio_endpoint_id,
+            self.sambastudio_api_key,
+            prompt,
+            tuning_params,
+        )
+        return self._process_nlp_predict_response(response)
+
     def _handle_completion_requests(self, prompt: Union[List[str], str], stop: Optional[List[str]]) -> str:
         """
         Perform a prediction using the SambaStudio endpoint handler.
@@ -383,10 +544,68 @@ class SambaStudio(LLM):
         Raises:
             ValueError: If the prediction fails.
         """
-        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri)
+        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri, self.transport_config)
         tuning_params = self._get_tuning_params(stop)
         return self._handle_nlp_predict(ss_endpoint, prompt, tuning_params)
 
+    async def _ahandle_completion_requests(self, prompt: Union[List[str], str], stop: Optional[List[str]]) -> str:
+        """
+        Perform an async prediction using the SambaStudio endpoint handler.
+
+        Args:
+            prompt: The prompt to use for the prediction.
+            stop: stop sequences.
+
+        Returns:
+            The prediction result.
+
+        Raises:
+            ValueError: If the prediction fails.
+        """
+        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri, self.transport_config)
+        tuning_params = self._get_tuning_params(stop)
+        return await self._ahandle_nlp_predict(ss_endpoint, prompt, tuning_params)
+
+    def _process_stream_chunk(self, chunk: Dict[str, Any]) -> GenerationChunk:
+        """
+        Check a streamed response chunk and extract its text.
+
+        Args:
+            chunk: The streamed response chunk dict.
+
+        Returns:
+            The GenerationChunk of the response chunk.
+        """
+        if chunk['status_code'] != 200:
+            error = chunk.get('error')
+            if error:
+                optional_code = error.get('code')
+                optional_details = error.get('details')
+                optional_message = error.get('message')
+                raise ValueError(
+                    f"Sambanova /complete call failed with status code "
+                    f"{chunk['status_code']}.\n"
+                    f"Message: {optional_message}\n"
+                    f"Details: {optional_details}\n"
+                    f"Code: {optional_code}\n"
+                )
+            else:
+                raise RuntimeError(
+                    f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+                )
+        if 'api/predict/nlp' in self.sambastudio_base_uri:
+            text = json.loads(chunk['data'])['stream_token']
+        elif 'api/v2/predict/generic' in self.sambastudio_base_uri:
+            text = chunk['result']['items'][0]['value']['stream_token']
+        elif 'api/predict/generic' in self.sambastudio_base_uri:
+            if len(chunk['result']['responses']) > 0:
+                text = chunk['result']['responses'][0]['stream_token']
+            else:
+                text = ''
+        else:
+            raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri}' f'not implemented')
+        return GenerationChunk(text=text)
+
     def _handle_nlp_predict_stream(
         self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str
     ) -> Iterator[GenerationChunk]:
@@ -408,36 +627,30 @@ class SambaStudio(LLM):
             prompt,
             tuning_params,
         ):
-            if chunk['status_code'] != 200:
-                error = chunk.get('error')
-                if error:
-                    optional_code = error.get('code')
-                    optional_details = error.get('details')
-                    optional_message = error.get('message')
-                    raise ValueError(
-                        f"Sambanova /complete call failed with status code "
-                        f"{chunk['status_code']}.\n"
-                        f"Message: {optional_message}\n"
-                        f"Details: {optional_details}\n"
-                        f"Code: {optional_code}\n"
-                    )
-                else:
-                    raise RuntimeError(
-                        f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
-                    )
-            if 'api/predict/nlp' in self.sambastudio_base_uri:
-                text = json.loads(chunk['data'])['stream_token']
-            elif 'api/v2/predict/generic' in self.sambastudio_base_uri:
-                text = chunk['result']['items'][0]['value']['stream_token']
-            elif 'api/predict/generic' in self.sambastudio_base_uri:
-                if len(chunk['result']['responses']) > 0:
-                    text = chunk['result']['responses'][0]['stream_token']
-                else:
-                    text = ''
-            else:
-                raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri}' f'not implemented')
-            generated_chunk = GenerationChunk(text=text)
-            yield generated_chunk
+            yield self._process_stream_chunk(chunk)
+
+    async def _ahandle_nlp_predict_stream(
+        self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str
+    ) -> AsyncIterator[GenerationChunk]:
+        """
+        Perform an async streaming request to the LLM.
+
+        Args:
+            sdk: The SVEndpointHandler to use for the prediction.
+            prompt: The prompt to use for the prediction.
+            tuning_params: The tuning parameters to use for the prediction.
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        async for chunk in sdk.anlp_predict_stream(
+            self.sambastudio_project_id,
+            self.sambastudio_endpoint_id,
+            self.sambastudio_api_key,
+            prompt,
+            tuning_params,
+        ):
+            yield self._process_stream_chunk(chunk)
 
     def _stream(
         self,
@@ -455,7 +668,7 @@ class SambaStudio(LLM):
         Returns:
             The string generated by the model.
         """
-        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri)
+        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri, self.transport_config)
         tuning_params = self._get_tuning_params(stop)
         try:
             if self.streaming:
@@ -469,6 +682,36 @@ class SambaStudio(LLM):
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
 
+    async def _astream(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri, self.transport_config)
+        tuning_params = self._get_tuning_params(stop)
+        try:
+            if self.streaming:
+                async for chunk in self._ahandle_nlp_predict_stream(ss_endpoint, prompt, tuning_params):
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text)
+                    yield chunk
+            else:
+                return
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
     def _handle_stream_request(
         self,
         prompt: Union[List[str], str],
@@ -495,6 +738,32 @@ class SambaStudio(LLM):
             completion += chunk.text
         return completion
 
+    async def _ahandle_stream_request(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        kwargs: Dict[str, Any],
+    ) -> str:
+        """
+        Perform an async streaming request to the LLM.
+
+        Args:
+            prompt: The prompt to generate from.
+            stop: Stop words to use when generating. Model output is cut off at the
+                first occurrence of any of the stop substrings.
+            run_manager: Callback manager for the run.
+            kwargs: Additional keyword arguments. directly passed
+                to the sambastudio model in API call.
+
+        Returns:
+            The model output as a string.
+        """
+        completion = ''
+        async for chunk in self._astream(prompt=prompt, stop=stop, run_manager=run_manager, **kwargs):
+            completion += chunk.text
+        return completion
+
     def _call(
         self,
         prompt: Union[List[str], str],
@@ -521,6 +790,32 @@ class SambaStudio(LLM):
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
 
+    async def _acall(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        if stop is not None:
+            raise Exception('stop not implemented')
+        try:
+            if self.streaming:
+                return await self._ahandle_stream_request(prompt, stop, run_manager, kwargs)
+            return await self._ahandle_completion_requests(prompt, stop)
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
 
 class SambaNovaCloud(LLM):
     """
@@ -574,6 +869,9 @@ class SambaNovaCloud(LLM):
     stream_options: dict = {'include_usage': True}
     """stream options, include usage to get generation metrics"""
 
+    transport_config: Optional[HTTPTransportConfig] = None
+    """connection pool and retry settings, shared by the instances pointing at the same host"""
+
     model_config = ConfigDict(
         extra='forbid',
     )
@@ -608,34 +906,25 @@ class SambaNovaCloud(LLM):
         values['sambanova_api_key'] = get_from_dict_or_env(values, 'sambanova_api_key', 'SAMBANOVA_API_KEY')
         return values
 
-    def _handle_nlp_predict_stream(
-        self,
-        prompt: Union[List[str], str],
-        stop: List[str],
-    ) -> Iterator[GenerationChunk]:
+    def _get_request_data(self, prompt: Union[List[str], str], stop: Optional[List[str]]) -> Dict[str, Any]:
         """
-        Perform a streaming request to the LLM.
+        Get the payload of a request to the LLM.
 
         Args:
             prompt: The prompt to use for the prediction.
             stop: list of stop tokens
 
         Returns:
-            An iterator of GenerationChunks.
+            The request payload.
         """
-        try:
-            import sseclient
-        except ImportError:
-            raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
         try:
             formatted_prompt = json.loads(prompt)  # type: ignore
         except:
             formatted_prompt = [{'role': 'user', 'content': prompt}]
 
-        http_session = requests.Session()
         if not stop:
             stop = self.stop_tokens
-        data = {
+        return {
             'messages': formatted_prompt,
             'max_tokens': self.max_tokens,
             'stop': stop,
@@ -646,53 +935,129 @@ class SambaNovaCloud(LLM):
             'stream': self.stream_api,
             'stream_options': self.stream_options,
         }
+
+    def _process_stream_event(self, event: str, event_data: Any, status_code: int) -> Optional[GenerationChunk]:
+        """
+        Parse a server-sent event of a streaming response.
+
+        Args:
+            event: event name
+            event_data: event data
+            status_code: response status code
+
+        Returns:
+            The GenerationChunk of the event, None if the event has no content.
+        """
+        chunk = {
+            'event': event,
+            'data': event_data,
+            'status_code': status_code,
+        }
+
+        if chunk.get('error'):
+            raise RuntimeError(
+                f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+            )
+
+        try:
+            # check if the response is a final event in that case event data response is '[DONE]'
+            if chunk['data'] != '[DONE]':
+                data = json.loads(chunk['data'])
+                if data.get('error'):
+                    raise RuntimeError(
+                        f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+                    )
+                # check if the response is a final response with usage stats (not includes content)
+                if data.get('usage') is None:
+                    # check is not "end of text" response
+                    if data['choices'][0]['finish_reason'] is None:
+                        text = data['choices'][0]['delta']['content']
+                        return GenerationChunk(text=text)
+            return None
+        except Exception as e:
+            raise Exception(f'Error getting content chunk raw streamed response: {chunk}')
+
+    def _handle_nlp_predict_stream(
+        self,
+        prompt: Union[List[str], str],
+        stop: List[str],
+    ) -> Iterator[GenerationChunk]:
+        """
+        Perform a streaming request to the LLM.
+
+        Args:
+            prompt: The prompt to use for the prediction.
+            stop: list of stop tokens
+
+        Returns:
+            An iterator of GenerationChunks.
+        """
+        try:
+            import sseclient
+        except ImportError:
+            raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
+
+        http_session = get_http_session(self.sambanova_url, self.transport_config)
         # Streaming output
         response = http_session.post(
             self.sambanova_url,
             headers={'Authorization': f'Bearer {self.sambanova_api_key}', 'Content-Type': 'application/json'},
-            json=data,
+            json=self._get_request_data(prompt, stop),
             stream=True,
         )
 
         client = sseclient.SSEClient(response)
-        close_conn = False
 
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
             )
 
-        for event in client.events():
-            if event.event == 'error_event':
-                close_conn = True
-            chunk = {
-                'event': event.event,
-                'data': event.data,
-                'status_code': response.status_code,
-            }
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            for event in client.events():
+                generated_chunk = self._process_stream_event(event.event, event.data, response.status_code)
+                if generated_chunk is not None:
+                    yield generated_chunk
+        finally:
+            response.close()
+
+    async def _ahandle_nlp_predict_stream(
+        self,
+        prompt: Union[List[str], str],
+        stop: List[str],
+    ) -> AsyncIterator[GenerationChunk]:
+        """
+        Perform an async streaming request to the LLM, parsing the events as they arrive.
 
-            if chunk.get('error'):
+        Args:
+            prompt: The prompt to use for the prediction.
+            stop: list of stop tokens
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        # Streaming output
+        response = await send_with_retries(
+            self.sambanova_url,
+            self.transport_config,
+            headers={'Authorization': f'Bearer {self.sambanova_api_key}', 'Content-Type': 'application/json'},
+            json=self._get_request_data(prompt, stop),
+        )
+
+        # the response is closed even if the caller stops iterating early, so the connection goes back to the pool
+        try:
+            if response.status_code != 200:
+                await response.aread()
                 raise RuntimeError(
-                    f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+                    f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
                 )
-
-            try:
-                # check if the response is a final event in that case event data response is '[DONE]'
-                if chunk['data'] != '[DONE]':
-                    data = json.loads(chunk['data'])
-                    if data.get('error'):
-                        raise RuntimeError(
-                            f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
-                        )
-                    # check if the response is a final response with usage stats (not includes content)
-                    if data.get('usage') is None:
-                        # check is not "end of text" response
-                        if data['choices'][0]['finish_reason'] is None:
-                            text = data['choices'][0]['delta']['content']
-                            generated_chunk = GenerationChunk(text=text)
-                            yield generated_chunk
-            except Exception as e:
-                raise Exception(f'Error getting content chunk raw streamed response: {chunk}')
+            async for event in aiter_sse_events(response):
+                generated_chunk = self._process_stream_event(event.event, event.data, response.status_code)
+                if generated_chunk is not None:
+                    yield generated_chunk
+        finally:
+            await response.aclose()
 
     def _stream(
         self,
@@ -719,6 +1084,31 @@ class SambaNovaCloud(LLM):
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
 
+    async def _astream(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        try:
+            async for chunk in self._ahandle_nlp_predict_stream(prompt, stop):  # type: ignore
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text)
+                yield chunk
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
     def _handle_stream_request(
         self,
         prompt: Union[List[str], str],
@@ -745,6 +1135,32 @@ class SambaNovaCloud(LLM):
             completion += chunk.text
         return completion
 
+    async def _ahandle_stream_request(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        kwargs: Dict[str, Any],
+    ) -> str:
+        """
+        Perform an async streaming request to the LLM.
+
+        Args:
+            prompt: The prompt to generate from.
+            stop: Stop words to use when generating. Model output is cut off at the
+                first occurrence of any of the stop substrings.
+            run_manager: Callback manager for the run.
+            **kwargs: Additional keyword arguments. directly passed
+                to the Sambanova Cloud model in API call.
+
+        Returns:
+            The model output as a string.
+        """
+        completion = ''
+        async for chunk in self._astream(prompt=prompt, stop=stop, run_manager=run_manager, **kwargs):
+            completion += chunk.text
+        return completion
+
     def _call(
         self,
         prompt: Union[List[str], str],
@@ -766,3 +1182,25 @@ class SambaNovaCloud(LLM):
         except Exception as e:
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
+    async def _acall(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        try:
+            return await self._ahandle_stream_request(prompt, stop, run_manager, kwargs)
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(utils_dir)
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.tokenizer_registry import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = 'BAAI/bge-reranker-large'
+RERANKER_BACKENDS = ['torch', 'int8', 'onnx']
+
+
+class CrossEncoderReranker:
+    """Cross-encoder reranker, scoring the relevance of passages to a query.
+
+    The model is loaded once, on first use. The (query, passage) pairs are tokenized in one call and sorted by length
+    before being batched, so that each batch is only padded to the length of its longest pair. Scores are cached per
+    query and document, so that reranking the same documents again for a same query doesn't run the model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANKER_MODEL,
+        backend: str = 'torch',
+        batch_size: int = 16,
+        max_length: int = 512,
+        cache_size: int = 10000,
+        device: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            model_name (str, optional): HuggingFace Hub repo id or local directory of the cross-encoder.
+                Defaults to 'BAAI/bge-reranker-large'.
+            backend (str, optional): 'torch', 'int8' for dynamically int8-quantized linear layers on CPU, or 'onnx'
+                for ONNX Runtime on CPU, which needs `optimum[onnxruntime]`. Defaults to 'torch'.
+            batch_size (int, optional): max number of pairs per forward pass. Defaults to 16.
+            max_length (int, optional): max number of tokens per pair, longer pairs are truncated. Defaults to 512.
+            cache_size (int, optional): max number of cached scores. Defaults to 10000.
+            device (str, optional): torch device of the 'torch' backend. Defaults to cuda if available, else cpu.
+        """
+        if backend not in RERANKER_BACKENDS:
+            raise ValueError(f'Unsupported reranker backend: {backend}, expected one of {RERANKER_BACKENDS}')
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.device = device
+        self.model: Any = None
+        self.tokenizer: Any = None
+        self.scores_cache: OrderedDict[Tuple[str, str], float] = OrderedDict()
+        # Guards the cache, loading has its own lock so that cache hits don't wait for the model
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Loads the tokenizer and the model, only the first call loads them"""
+        with self.load_lock:
+            if self.model is not None:
+                return
+            self.tokenizer = get_tokenizer(self.model_name)
+            logger.info(f'Loading reranker {self.model_name} with the {self.backend} backend')
+            self.model = self._load_model()
+
+    def _load_model(self) -> Any:
+        if self.backend == 'onnx':
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+            except ImportError:
+                raise ImportError(
+                    'The onnx reranker backend needs optimum with onnxruntime. '
+                    'Please install it with `pip install optimum[onnxruntime]`.'
+                )
+            return ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        if self.backend == 'int8':
+            self.device = 'cpu'
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.device is None:
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        return model.to(self.device)
+
+    def _run_model(self, batch: Dict[str, Any]) -> List[float]:
+        import torch
+
+        with torch.inference_mode():
+            if self.backend == 'torch':
+                batch = {key: value.to(self.device) for key, value in batch.items()}
+            logits = self.model(**batch, return_dict=True).logits
+        return logits.view(-1).float().cpu().tolist()
+
+    def compute_scores(self, query: str, passages: Sequence[str]) -> List[float]:
+        """Scores passages with the model, without the cache
+
+        Args:
+            query (str): query
+            passages (list): passages
+
+        Returns:
+            list: relevance score of each passage, higher is more relevant
+        """
+        if len(passages) == 0:
+            return []
+        self.load()
+        encodings = self.tokenizer([query] * len(passages), list(passages), truncation=True, max_length=self.max_length)
+        # Length bucketing, pairs of similar lengths are batched together
+        order = sorted(range(len(passages)), key=lambda i: len(encodings['input_ids'][i]))
+        scores = [0.0] * len(passages)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start : start + self.batch_size]
+            features = [{key: values[i] for key, values in encodings.items()} for i in indices]
+            batch = self.tokenizer.pad(features, padding=True, return_tensors='pt')
+            for i, score in zip(indices, self._run_model(batch)):
+                scores[i] = score
+        return scores
+
+    def score(self, query: str, passages: Sequence[str], doc_ids: Optional[Sequence[str]] = None) -> List[float]:
+        """Scores passages, only running the model for the passages without cached score for the query
+
+        Args:
+            query (str): query
+            passages (list): passages
+            doc_ids (list, optional): ids identifying the passages in the cache. Defaults to the hashes of the
+                passages.
+
+        Returns:
+            list: relevance score of each passage, higher is more relevant
+        """
+        if doc_ids is None:
+            doc_ids = [hashlib.sha256(passage.encode('utf-8')).hexdigest() for passage in passages]
+        query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        keys = [(query_hash, doc_id) for doc_id in doc_ids]
+
+        scores: List[Optional[float]] = []
+        with self.lock:
+            for key in keys:
+                score = self.scores_cache.get(key)
+                if score is not None:
+                    self.scores_cache.move_to_end(key)
+                scores.append(score)
+
+        missing_indices = [i for i, score in enumerate(scores) if score is None]
+        if len(missing_indices) > 0:
+            missing_scores = self.compute_scores(query, [passages[i] for i in missing_indices])
+            with self.lock:
+                for i, score in zip(missing_indices, missing_scores):
+                    scores[i] = score
+                    self.scores_cache[keys[i]] = score
+                while len(self.scores_cache) > self.cache_size:
+                    self.scores_cache.popitem(last=False)
+        return scores  # type: ignore
+
+    def rerank(self, query: str, docs: Sequence[Document], final_k: Optional[int] = None) -> List[Document]:
+        """Sorts documents by relevance to a query
+
+        Args:
+            query (str): query
+            docs (list): documents, identified in the cache by their `id` if they have one, else by their contents
+            final_k (int, optional): number of documents to keep. Defaults to None, all the documents are kept.
+
+        Returns:
+            list: most relevant documents first
+        """
+        doc_ids = [get_document_id(doc) for doc in docs]
+        scores = self.score(query, [doc.page_content for doc in docs], doc_ids)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order][:final_k]
+
+    def clear_cache(self) -> None:
+        """Removes all the cached scores"""
+        with self.lock:
+            self.scores_cache.clear()
+
+
+def get_document_id(doc: Document) -> str:
+    """Gets the id identifying a document in the scores cache, its `id` if it has one, else the hash of its contents
+    and metadata
+
+    Args:
+        doc (Document): document
+
+    Returns:
+        str: document id
+    """
+    doc_id = getattr(doc, 'id', None) or doc.metadata.get('id')
+    if doc_id is not None:
+        return str(doc_id)
+    content = doc.page_content + '\n' + repr(sorted(doc.metadata.items()))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+_rerankers: Dict[Tuple[str, str], CrossEncoderReranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(
+    model_name: str = DEFAULT_RERANKER_MODEL, backend: str = 'torch', **kwargs: Any
+) -> CrossEncoderReranker:
+    """Gets the process-wide reranker of a model and backend, created on first use and loaded on first scoring, so
+    that all the chains of a process share one model in memory
+
+    Args:
+        model_name (str, optional): HuggingFace Hub repo id or local directory of the cross-encoder.
+            Defaults to 'BAAI/bge-reranker-large'.
+        backend (str, optional): 'torch', 'int8' or 'onnx'. Defaults to 'torch'.
+        kwargs: other CrossEncoderReranker arguments, only used when the reranker is created
+
+    Returns:
+        CrossEncoderReranker: shared reranker
+    """
+    with _rerankers_lock:
+        key = (model_name, backend)
+        if key not in _rerankers:
+            _rerankers[key] = CrossEncoderReranker(model_name, backend, **kwargs)
+        return _rerankers[key]
+
+
+class CrossEncoderRerankerCompressor(BaseDocumentCompressor):
+    """Document compressor reranking the retrieved documents with the shared cross-encoder reranker, to plug it in
+    any retriever with a langchain ContextualCompressionRetriever"""
+
+    model_name: str = DEFAULT_RERANKER_MODEL
+    """HuggingFace Hub repo id or local directory of the cross-encoder"""
+
+    backend: str = 'torch'
+    """'torch', 'int8' or 'onnx'"""
+
+    top_n: Optional[int] = 3
+    """number of documents to keep, None to keep them all"""
+
+    def compress_documents(
+        self, documents: Sequence[Document], query: str, callbacks: Callbacks = None
+    ) -> Sequence[Document]:
+        return get_reranker(self.model_name, self.backend).rerank(query, documents, self.top_n)
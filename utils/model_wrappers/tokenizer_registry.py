@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
+
+logger = logging.getLogger(__name__)
+
+# Directory where fast tokenizers are serialized after their first load, so later loads work offline
+TOKENIZER_CACHE_DIR = os.environ.get(
+    'TOKENIZER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ai-starter-kit', 'tokenizers')
+)
+
+
+class TokenizerRegistry:
+    """Process-wide registry of HuggingFace tokenizers.
+
+    Each tokenizer is loaded once per process and shared by all its users. Fast tokenizers loaded from the
+    HuggingFace Hub are also serialized to `cache_dir`, and later processes load them from there without any
+    network call.
+    """
+
+    def __init__(self, cache_dir: str = TOKENIZER_CACHE_DIR) -> None:
+        self.cache_dir = cache_dir
+        self.tokenizers: Dict[str, PreTrainedTokenizerBase] = {}
+        self.lock = threading.Lock()
+        # One lock per tokenizer, so that loading a tokenizer doesn't block the users of the others
+        self.load_locks: Dict[str, threading.Lock] = {}
+
+    def get_key(self, name_or_path: str, **kwargs: Any) -> str:
+        """Gets the registry key of a tokenizer
+
+        Args:
+            name_or_path (str): HuggingFace Hub repo id or local tokenizer directory
+            kwargs: keyword arguments passed to `AutoTokenizer.from_pretrained`
+
+        Returns:
+            str: registry key
+        """
+        if len(kwargs) == 0:
+            return name_or_path
+        return f'{name_or_path}?{json.dumps(kwargs, sort_keys=True, default=str)}'
+
+    def get_cache_path(self, key: str) -> str:
+        """Gets the directory of the serialized tokenizer
+
+        Args:
+            key (str): registry key
+
+        Returns:
+            str: serialized tokenizer directory
+        """
+        name = key.split('?')[0].strip('/').replace('/', '--')
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f'{name}-{digest}')
+
+    def get(self, name_or_path: str, **kwargs: Any) -> PreTrainedTokenizerBase:
+        """Gets a tokenizer, loading it on first use
+
+        Args:
+            name_or_path (str): HuggingFace Hub repo id or local tokenizer directory
+            kwargs: keyword arguments passed to `AutoTokenizer.from_pretrained`
+
+        Returns:
+            PreTrainedTokenizerBase: shared tokenizer
+        """
+        key = self.get_key(name_or_path, **kwargs)
+        tokenizer = self.tokenizers.get(key)
+        if tokenizer is not None:
+            return tokenizer
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another thread may have loaded it while waiting
+            if key not in self.tokenizers:
+                self.tokenizers[key] = self.load(key, name_or_path, **kwargs)
+        return self.tokenizers[key]
+
+    def load(self, key: str, name_or_path: str, **kwargs: Any) -> PreTrainedTokenizerBase:
+        """Loads a tokenizer from the serialized tokenizer cache, or from its source, serializing it if it's a fast
+        tokenizer from the HuggingFace Hub
+
+        Args:
+            key (str): registry key
+            name_or_path (str): HuggingFace Hub repo id or local tokenizer directory
+            kwargs: keyword arguments passed to `AutoTokenizer.from_pretrained`
+
+        Returns:
+            PreTrainedTokenizerBase: loaded tokenizer
+        """
+        # Local tokenizers are already on disk
+        if os.path.isdir(name_or_path):
+            return AutoTokenizer.from_pretrained(name_or_path, **kwargs)
+
+        cache_path = self.get_cache_path(key)
+        if os.path.isfile(os.path.join(cache_path, 'tokenizer.json')):
+            try:
+                tokenizer = AutoTokenizer.from_pretrained(cache_path, **kwargs)
+                # Keeps the original name, used to identify the tokenizer
+                tokenizer.name_or_path = name_or_path
+                return tokenizer
+            except Exception as e:
+                logger.warning(f'Serialized tokenizer {cache_path} could not be loaded, reloading it: {e}')
+
+        logger.info(f'Loading tokenizer {name_or_path}')
+        tokenizer = AutoTokenizer.from_pretrained(name_or_path, **kwargs)
+        if tokenizer.is_fast:
+            try:
+                tokenizer.save_pretrained(cache_path)
+            except OSError as e:
+                logger.warning(f'Tokenizer {name_or_path} could not be serialized to {cache_path}: {e}')
+        return tokenizer
+
+    def clear(self) -> None:
+        """Removes all the tokenizers from memory, the serialized tokenizers are kept"""
+        with self.lock:
+            self.tokenizers.clear()
+            self.load_locks.clear()
+
+
+class LazyTokenizer:
+    """Tokenizer proxy that gets the tokenizer from the registry on first use, so that building the objects that hold
+    a tokenizer doesn't pay for loading it. Attribute access, calls and `len` are forwarded to the tokenizer."""
+
+    def __init__(self, name_or_path: str, registry: Optional[TokenizerRegistry] = None, **kwargs: Any) -> None:
+        self.__dict__['name_or_path'] = name_or_path
+        self.__dict__['registry'] = registry
+        self.__dict__['kwargs'] = kwargs
+        self.__dict__['tokenizer'] = None
+
+    def load(self) -> PreTrainedTokenizerBase:
+        """Gets the tokenizer from the registry, only the first call loads it
+
+        Returns:
+            PreTrainedTokenizerBase: shared tokenizer
+        """
+        if self.__dict__['tokenizer'] is None:
+            registry = self.__dict__['registry'] or default_registry
+            self.__dict__['tokenizer'] = registry.get(self.__dict__['name_or_path'], **self.__dict__['kwargs'])
+        return self.__dict__['tokenizer']
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__['tokenizer'] is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.load(), name, value)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    def __reduce__(self) -> Any:
+        # Pickled as a new proxy, so that other processes load the tokenizer from their own registry
+        return (_build_lazy_tokenizer, (self.__dict__['name_or_path'], self.__dict__['kwargs']))
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"LazyTokenizer('{self.__dict__['name_or_path']}', {state})"
+
+
+def _build_lazy_tokenizer(name_or_path: str, kwargs: Dict[str, Any]) -> LazyTokenizer:
+    return LazyTokenizer(name_or_path, **kwargs)
+
+
+default_registry = TokenizerRegistry()
+
+
+def get_tokenizer(name_or_path: str, lazy: bool = False, **kwargs: Any) -> Any:
+    """Gets a tokenizer from the process-wide registry
+
+    Args:
+        name_or_path (str): HuggingFace Hub repo id or local tokenizer directory
+        lazy (bool): whether to return a proxy that loads the tokenizer on first use
+        kwargs: keyword arguments passed to `AutoTokenizer.from_pretrained`
+
+    Returns:
+        PreTrainedTokenizerBase | LazyTokenizer: shared tokenizer, or its lazy proxy
+    """
+    if lazy:
+        return LazyTokenizer(name_or_path, **kwargs)
+    return default_registry.get(name_or_path, **kwargs)
+
+
+def resolve_tokenizer(tokenizer: Any) -> Any:
+    """Gets the actual tokenizer of a tokenizer name, lazy proxy or tokenizer, for code that type checks it
+
+    Args:
+        tokenizer (str | LazyTokenizer | PreTrainedTokenizerBase): tokenizer or tokenizer name
+
+    Returns:
+        PreTrainedTokenizerBase: tokenizer
+    """
+    if isinstance(tokenizer, str):
+        return default_registry.get(tokenizer)
+    if isinstance(tokenizer, LazyTokenizer):
+        return tokenizer.load()
+    return tokenizer
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Directory of the parse cache shared by all the kits
+PARSE_CACHE_DIR = os.environ.get(
+    'PARSE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ai-starter-kit', 'parsing')
+)
+# Max total size of the compressed cached elements, the least recently used files are evicted beyond it
+PARSE_CACHE_MAX_BYTES = int(os.environ.get('PARSE_CACHE_MAX_BYTES', 1024**3))
+
+# Config keys that don't change the partitioning output
+_IGNORED_CONFIG_KEYS = {'default_unstructured_api_key', 'api_key', 'api_token', 'verbose'}
+
+
+def get_file_hash(file_path: str) -> str:
+    """Gets the hash of the contents of a file
+
+    Args:
+        file_path (str): file path
+
+    Returns:
+        str: sha256 of the file contents
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_config_digest(config: Dict[str, Any]) -> str:
+    """Gets the digest of a partitioning config, the keys that don't change the partitioning output, like API keys,
+    are ignored
+
+    Args:
+        config (dict): partitioning config, e.g. the partitioning, chunking and embedding sections of the
+            SambaParse config
+
+    Returns:
+        str: config digest
+    """
+
+    def without_ignored_keys(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: without_ignored_keys(item) for key, item in value.items() if key not in _IGNORED_CONFIG_KEYS}
+        return value
+
+    content = json.dumps(without_ignored_keys(config), sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_cache_key(file_path: str, config_digest: str, strategy: str) -> str:
+    """Gets the cache key of the parsed elements of a file
+
+    Args:
+        file_path (str): file path
+        config_digest (str): partitioning config digest, see get_config_digest
+        strategy (str): partitioning strategy, e.g. 'hi_res' or 'pymupdf'
+
+    Returns:
+        str: cache key
+    """
+    return f'{get_file_hash(file_path)}:{config_digest}:{strategy}'
+
+
+class ParseCache(SQLiteStore):
+    """Local cache of the elements parsed from files, stored as zlib-compressed JSON in SQLite.
+
+    Entries are keyed by the hash of the file contents, the digest of the partitioning config and the strategy, so
+    that the same file parsed with the same config is only partitioned once, whatever its name or location. The least
+    recently used entries are evicted when the total compressed size exceeds `max_bytes`. The cache can be shared by
+    several processes.
+    """
+
+    def __init__(self, cache_dir: str = PARSE_CACHE_DIR, max_bytes: int = PARSE_CACHE_MAX_BYTES) -> None:
+        super().__init__(os.path.join(cache_dir, 'parse_cache.sqlite'))
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _create_schema(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries '
+            '(key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Gets the cached elements of a key, and marks them as recently used
+
+        Args:
+            key (str): cache key, see get_cache_key
+
+        Returns:
+            list: parsed elements, None if they are not cached
+        """
+        with self.lock:
+            with self._transaction() as connection:
+                row = connection.execute('SELECT data FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            with self._transaction() as connection:
+                connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, elements: List[Dict[str, Any]]) -> None:
+        """Caches the elements of a key, evicting the least recently used entries if the cache is full
+
+        Args:
+            key (str): cache key, see get_cache_key
+            elements (list): parsed elements, JSON-serializable
+        """
+        self.put_json(key, json.dumps(elements).encode('utf-8'))
+
+    def put_json(self, key: str, elements_json: bytes) -> None:
+        """Caches the elements of a key given as JSON, e.g. read from an ingest output file
+
+        Args:
+            key (str): cache key, see get_cache_key
+            elements_json (bytes): JSON list of parsed elements
+        """
+        data = zlib.compress(elements_json)
+        if len(data) > self.max_bytes:
+            logger.warning(f'Parsed elements of {len(data)} bytes are larger than the parse cache, not cached')
+            return
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (key, data, len(data), time.time())
+                )
+                total_size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                if total_size > self.max_bytes:
+                    evicted_keys = []
+                    for evicted_key, size in connection.execute(
+                        'SELECT key, size FROM entries WHERE key != ? ORDER BY last_access', (key,)
+                    ):
+                        evicted_keys.append(evicted_key)
+                        total_size -= size
+                        if total_size <= self.max_bytes:
+                            break
+                    connection.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in evicted_keys])
+                    logger.info(f'{len(evicted_keys)} files evicted from the parse cache')
+
+    def clear(self) -> None:
+        """Removes all the cached elements"""
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                connection.execute('DELETE FROM entries')
@@ -1,21 +1,52 @@
+import contextlib
+import functools
 import json
 import logging
 import os
 import shutil
+import signal
 import subprocess
-from typing import Any, Dict, List, Optional, Tuple, Union
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import yaml
 from dotenv import load_dotenv
 from langchain.docstore.document import Document
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(utils_dir)
+sys.path.append(repo_dir)
+
+from utils.parsing.parse_cache import (
+    PARSE_CACHE_DIR,
+    PARSE_CACHE_MAX_BYTES,
+    ParseCache,
+    get_cache_key,
+    get_config_digest,
+)
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Default number of files per unstructured-ingest invocation in batch mode
+DEFAULT_INGEST_BATCH_SIZE = 32
+# Seconds between checks for new outputs of a batch ingest
+INGEST_POLL_INTERVAL = 0.5
+# Chunking of the PyMuPDF lite mode
+PYMUPDF_CHUNK_SIZE = 1000
+PYMUPDF_CHUNK_OVERLAP = 200
+# Default number of pages per PyMuPDF extraction task
+PYMUPDF_PAGES_PER_TASK = 50
+
 
 class SambaParse:
     def __init__(self, config_path: str) -> None:
@@ -28,6 +59,16 @@ class SambaParse:
             if default_api_key:
                 os.environ['UNSTRUCTURED_API_KEY'] = default_api_key
 
+        # Parsed elements of the files are cached by contents, partitioning config and strategy
+        parse_cache_config = self.config.get('parse_cache', {})
+        self.parse_cache: Optional[ParseCache] = None
+        if parse_cache_config.get('enabled', False):
+            max_size_mb = parse_cache_config.get('max_size_mb')
+            self.parse_cache = ParseCache(
+                cache_dir=parse_cache_config.get('cache_dir') or PARSE_CACHE_DIR,
+                max_bytes=int(max_size_mb * 1024**2) if max_size_mb is not None else PARSE_CACHE_MAX_BYTES,
+            )
+
     def run_ingest(
         self,
         source_type: str,
@@ -47,6 +88,14 @@ class SambaParse:
             LangChain documents.
         """
 
+        cache_key = None
+        if self.parse_cache is not None and source_type == 'local' and input_path and os.path.isfile(input_path):
+            cache_key = self._get_cache_key(input_path)
+            elements = self.parse_cache.get(cache_key)
+            if elements is not None:
+                logger.info(f'Using the cached partitioning of {input_path}')
+                return self._process_elements(elements, input_path, additional_metadata)
+
         output_dir = self.config['processor']['output_dir']
 
         # Create the output directory if it doesn't exist
@@ -57,6 +106,39 @@ class SambaParse:
         logger.info(f'Deleting contents of output directory: {output_dir}')
         subprocess.run(del_command, shell=True, check=True)
 
+        command_str = ' '.join(self._get_ingest_command(source_type, output_dir, input_path))
+        logger.info(f'Running command: {command_str}')
+        logger.info('This may take some time depending on the size of your data. Please be patient...')
+
+        subprocess.run(command_str, shell=True, check=True)
+
+        logger.info('Ingest process completed successfully!')
+
+        if cache_key is not None:
+            output_paths = [os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith('.json')]
+            if len(output_paths) == 1:
+                with open(output_paths[0], 'rb') as file:
+                    self.parse_cache.put_json(cache_key, file.read())  # type: ignore
+
+        # Call the additional processing function if enabled
+        if self.config['additional_processing']['enabled']:
+            logger.info('Performing additional processing...')
+            texts, metadata_list, langchain_docs = self._process_output(output_dir, additional_metadata)
+            logger.info('Additional processing completed.')
+            return texts, metadata_list, langchain_docs
+
+    def _get_ingest_command(self, source_type: str, output_dir: str, input_path: Optional[str] = None) -> List[str]:
+        """
+        Builds the unstructured-ingest command for the specified source type, from the config.
+
+        Args:
+            source_type (str): The type of source to ingest (e.g., 'local', 'confluence', 'github', 'google-drive').
+            output_dir (str): The directory where the ingest writes its output JSON files.
+            input_path (Optional[str]): The input path for the source (only required for 'local' source type).
+
+        Returns:
+            List[str]: The command arguments, to be joined and run in a shell.
+        """
         command = [
             'unstructured-ingest',
             source_type,
@@ -232,34 +314,215 @@ class SambaParse:
             else:
                 raise ValueError(f'Unsupported destination connector type: {destination_type}')
 
-        command_str = ' '.join(command)
-        logger.info(f'Running command: {command_str}')
-        logger.info('This may take some time depending on the size of your data. Please be patient...')
+        return command
 
-        subprocess.run(command_str, shell=True, check=True)
+    def _process_output(
+        self, output_path: str, additional_metadata: Optional[Dict] = None
+    ) -> Tuple[List[str], List[Dict], List[Document]]:
+        """
+        Runs the additional processing of the config on ingest output JSON files, streaming their elements without
+        rewriting the files.
 
-        logger.info('Ingest process completed successfully!')
+        Args:
+            output_path (str): An output JSON file, or a directory of output JSON files.
+            additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
 
-        # Call the additional processing function if enabled
-        if self.config['additional_processing']['enabled']:
-            logger.info('Performing additional processing...')
-            texts, metadata_list, langchain_docs = additional_processing(
-                directory=output_dir,
-                extend_metadata=self.config['additional_processing']['extend_metadata'],
-                additional_metadata=additional_metadata,
-                replace_table_text=self.config['additional_processing']['replace_table_text'],
-                table_text_key=self.config['additional_processing']['table_text_key'],
-                return_langchain_docs=self.config['additional_processing']['return_langchain_docs'],
-                convert_metadata_keys_to_string=self.config['additional_processing']['convert_metadata_keys_to_string'],
-            )
-            logger.info('Additional processing completed.')
-            return texts, metadata_list, langchain_docs
+        Returns:
+            Tuple[List[str], List[Dict], List[Document]]: A tuple containing the extracted texts, metadata, and
+            LangChain documents.
+        """
+        texts: List[str] = []
+        metadata_list: List[Dict] = []
+        langchain_docs: List[Document] = []
+        for doc in iterate_additional_processing(
+            directory=output_path,
+            extend_metadata=self.config['additional_processing']['extend_metadata'],
+            additional_metadata=additional_metadata,
+            replace_table_text=self.config['additional_processing']['replace_table_text'],
+            table_text_key=self.config['additional_processing']['table_text_key'],
+            convert_metadata_keys_to_string=self.config['additional_processing']['convert_metadata_keys_to_string'],
+        ):
+            texts.append(doc.page_content)
+            metadata_list.append(doc.metadata)
+            if self.config['additional_processing']['return_langchain_docs']:
+                langchain_docs.append(doc)
+        return texts, metadata_list, langchain_docs
+
+    def _get_cache_key(self, file_path: str, lite_mode: bool = False) -> str:
+        """
+        Gets the parse cache key of a file, from its contents and the partitioning config of the ingest mode.
+
+        Args:
+            file_path (str): The path of the local file.
+            lite_mode (bool): Whether the file is parsed with PyMuPDF instead of unstructured-ingest.
+
+        Returns:
+            str: The parse cache key.
+        """
+        if lite_mode:
+            config = {'chunk_size': PYMUPDF_CHUNK_SIZE, 'chunk_overlap': PYMUPDF_CHUNK_OVERLAP}
+            return get_cache_key(file_path, get_config_digest(config), 'pymupdf')
+        config = {key: self.config.get(key) for key in ['partitioning', 'chunking', 'embedding']}
+        return get_cache_key(file_path, get_config_digest(config), self.config['partitioning']['strategy'])
+
+    def _process_elements(
+        self, elements: List[Dict[str, Any]], file_path: str, additional_metadata: Optional[Dict] = None
+    ) -> Tuple[List[str], List[Dict], List[Document]]:
+        """
+        Runs the additional processing of the config on the partitioned elements of a file, e.g. from the parse cache.
+
+        Args:
+            elements (List[Dict]): The elements of the file, as in the ingest output JSON.
+            file_path (str): The path of the file, which replaces the file name and directory of the elements, as
+                the elements can come from a staged or an earlier uploaded copy of the file.
+            additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+
+        Returns:
+            Tuple[List[str], List[Dict], List[Document]]: A tuple containing the extracted texts, metadata, and
+            LangChain documents.
+        """
+        if not self.config['additional_processing']['enabled']:
+            return [], [], []
+        set_elements_file_path(elements, file_path)
+        texts, metadata_list = process_elements(
+            elements,
+            extend_metadata=self.config['additional_processing']['extend_metadata'],
+            additional_metadata=additional_metadata,
+            replace_table_text=self.config['additional_processing']['replace_table_text'],
+            table_text_key=self.config['additional_processing']['table_text_key'],
+            convert_metadata_keys_to_string=self.config['additional_processing']['convert_metadata_keys_to_string'],
+        )
+        langchain_docs = []
+        if self.config['additional_processing']['return_langchain_docs']:
+            langchain_docs = get_langchain_docs(texts, metadata_list)
+        return texts, metadata_list, langchain_docs
+
+    def run_ingest_batch(
+        self, file_paths: List[str], additional_metadata: Optional[Dict] = None
+    ) -> Iterator[Tuple[str, List[str], List[Dict], List[Document]]]:
+        """
+        Runs the ingest process on a set of local files, in one unstructured-ingest invocation per batch of
+        `processor.batch_size` files, each one with `processor.num_processes` workers. Each invocation gets its own
+        input and output directories, with the files staged under unique names, so that outputs of files with the same
+        name can't overwrite each other, and so that it doesn't clear the outputs of other ingests. The files in the
+        parse cache are yielded first, without being ingested.
+
+        Args:
+            file_paths (List[str]): The paths of the local files to ingest.
+            additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+
+        Yields:
+            Tuple[str, List[str], List[Dict], List[Document]]: The path of an ingested file and its extracted texts,
+            metadata, and LangChain documents, as soon as its output is written.
+        """
+        output_dir = self.config['processor']['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        batch_size = self.config['processor'].get('batch_size', DEFAULT_INGEST_BATCH_SIZE)
+
+        cache_keys: Dict[str, str] = {}
+        if self.parse_cache is not None:
+            uncached_file_paths = []
+            for file_path in file_paths:
+                cache_keys[file_path] = self._get_cache_key(file_path)
+                elements = self.parse_cache.get(cache_keys[file_path])
+                if elements is None:
+                    uncached_file_paths.append(file_path)
+                else:
+                    logger.info(f'Using the cached partitioning of {file_path}')
+                    yield (file_path, *self._process_elements(elements, file_path, additional_metadata))
+            file_paths = uncached_file_paths
+
+        for start in range(0, len(file_paths), batch_size):
+            batch_file_paths = file_paths[start : start + batch_size]
+            run_dir = tempfile.mkdtemp(prefix='batch_', dir=output_dir)
+            try:
+                yield from self._run_ingest_batch(batch_file_paths, run_dir, additional_metadata, cache_keys)
+            finally:
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _run_ingest_batch(
+        self,
+        file_paths: List[str],
+        run_dir: str,
+        additional_metadata: Optional[Dict] = None,
+        cache_keys: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Tuple[str, List[str], List[Dict], List[Document]]]:
+        """
+        Runs one unstructured-ingest invocation on a batch of local files, see run_ingest_batch.
+
+        Args:
+            file_paths (List[str]): The paths of the local files to ingest.
+            run_dir (str): The directory of the invocation, where the files are staged and the outputs written.
+            additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+            cache_keys (Optional[Dict[str, str]]): The parse cache keys of the files, whose outputs are cached.
+
+        Yields:
+            Tuple[str, List[str], List[Dict], List[Document]]: The path of an ingested file and its extracted texts,
+            metadata, and LangChain documents.
+        """
+        input_dir = os.path.join(run_dir, 'input')
+        batch_output_dir = os.path.join(run_dir, 'output')
+        os.makedirs(input_dir)
+        os.makedirs(batch_output_dir)
+
+        # Files are staged with their index as prefix, which maps their outputs back to them
+        pending_files = {}
+        for i, file_path in enumerate(file_paths):
+            staged_name = f'{i:06d}_{os.path.basename(file_path)}'
+            try:
+                os.symlink(os.path.abspath(file_path), os.path.join(input_dir, staged_name))
+            except OSError:
+                shutil.copyfile(file_path, os.path.join(input_dir, staged_name))
+            pending_files[f'{i:06d}'] = file_path
+
+        command_str = ' '.join(self._get_ingest_command('local', batch_output_dir, input_dir))
+        logger.info(f'Ingesting {len(file_paths)} files, running command: {command_str}')
+        # In its own process group, so that the ingest and its workers can be killed together
+        process = subprocess.Popen(command_str, shell=True, start_new_session=True)
+
+        try:
+            while len(pending_files) > 0:
+                finished = process.poll() is not None
+                for output_name in sorted(os.listdir(batch_output_dir)):
+                    prefix = output_name.split('_', 1)[0]
+                    if prefix not in pending_files or not output_name.endswith('.json'):
+                        continue
+                    with open(os.path.join(batch_output_dir, output_name), 'rb') as file:
+                        output = file.read()
+                    try:
+                        elements = json.loads(output)
+                    except json.JSONDecodeError:
+                        if finished:
+                            raise
+                        # Still being written
+                        continue
+                    file_path = pending_files.pop(prefix)
+                    if self.parse_cache is not None and cache_keys is not None and file_path in cache_keys:
+                        self.parse_cache.put_json(cache_keys[file_path], output)
+                    yield (file_path, *self._process_elements(elements, file_path, additional_metadata))
+                if finished:
+                    break
+                time.sleep(INGEST_POLL_INTERVAL)
+            process.wait()
+        finally:
+            if process.poll() is None:
+                # The generator was closed or the processing failed, the ingest is not left running. It may exit in
+                # the meantime
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command_str)
+        for file_path in pending_files.values():
+            logger.warning(f'No output for {file_path}, it could not be partitioned')
+        logger.info(f'Ingest of {len(file_paths)} files completed successfully!')
 
     def _run_ingest_pymupdf(
         self, input_path: str, additional_metadata: Optional[Dict] = None
     ) -> Tuple[List[str], List[Dict], List[Document]]:
         """
-        Runs the ingest process using PyMuPDF via LangChain.
+        Runs the ingest process using PyMuPDF, see iterate_ingest_pymupdf.
 
         Args:
             input_path (str): The input path for the source.
@@ -281,35 +544,165 @@ class SambaParse:
         else:
             file_paths = [os.path.join(input_path, f) for f in os.listdir(input_path) if f.lower().endswith('.pdf')]
 
+        for _, file_texts, file_metadata_list, file_docs in self.iterate_ingest_pymupdf(
+            file_paths, additional_metadata
+        ):
+            texts.extend(file_texts)
+            metadata_list.extend(file_metadata_list)
+            langchain_docs.extend(file_docs)
+
+        return texts, metadata_list, langchain_docs
+
+    def iterate_ingest_pymupdf(
+        self, file_paths: List[str], additional_metadata: Optional[Dict] = None
+    ) -> Iterator[Tuple[str, List[str], List[Dict], List[Document]]]:
+        """
+        Runs the ingest process on PDF files using PyMuPDF. The files are split in ranges of
+        `processor.lite_mode_pages_per_task` pages, extracted and chunked in a pool of
+        `processor.lite_mode_num_processes` processes, so that both the pages of large files and separate files are
+        processed in parallel. The files in the parse cache are not extracted again.
+
+        Args:
+            file_paths (List[str]): The paths of the PDF files.
+            additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+
+        Yields:
+            Tuple[str, List[str], List[Dict], List[Document]]: The path of a file and its extracted texts, metadata,
+            and LangChain documents, in the order of the files, as soon as all its pages are chunked.
+        """
+        cache_keys: Dict[str, str] = {}
+        cached_docs: Dict[str, List[Document]] = {}
+        if self.parse_cache is not None:
+            for file_path in file_paths:
+                cache_keys[file_path] = self._get_cache_key(file_path, lite_mode=True)
+                elements = self.parse_cache.get(cache_keys[file_path])
+                if elements is not None:
+                    logger.info(f'Using the cached partitioning of {file_path}')
+                    docs = [
+                        Document(page_content=element['text'], metadata=element['metadata']) for element in elements
+                    ]
+                    for doc in docs:
+                        doc.metadata['source'] = doc.metadata['file_path'] = file_path
+                    cached_docs[file_path] = docs
+
+        # Page ranges of the files to extract, in the order of the files
+        pages_per_task = self.config['processor'].get('lite_mode_pages_per_task', PYMUPDF_PAGES_PER_TASK)
+        tasks = []
         for file_path in file_paths:
-            loader = PyMuPDFLoader(file_path)
-            docs = loader.load()
-
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-                separators=['\n\n', '\n', ' ', ''],
-                is_separator_regex=False,
+            if file_path not in cached_docs:
+                num_pages = get_pdf_page_count(file_path)
+                tasks.extend(
+                    (file_path, start, min(start + pages_per_task, num_pages))
+                    for start in range(0, num_pages, pages_per_task)
+                )
+        remaining_tasks = Counter(file_path for file_path, _, _ in tasks)
+
+        num_workers = min(self.config['processor'].get('lite_mode_num_processes') or os.cpu_count() or 1, len(tasks))
+        executor = None
+        if num_workers > 1:
+            logger.info(
+                f'Extracting {len(tasks)} page ranges of {len(remaining_tasks)} PDFs in {num_workers} processes'
             )
+            executor = ProcessPoolExecutor(max_workers=num_workers)
+            # map returns the page ranges in order
+            results = executor.map(extract_pymupdf_pages, *zip(*tasks))
+        else:
+            results = (extract_pymupdf_pages(*task) for task in tasks)
+
+        try:
+            for file_path in file_paths:
+                if file_path in cached_docs:
+                    docs = cached_docs[file_path]
+                else:
+                    docs = []
+                    for _ in range(remaining_tasks[file_path]):
+                        docs.extend(Document(page_content=text, metadata=metadata) for text, metadata in next(results))
+                    if self.parse_cache is not None:
+                        elements = [{'text': doc.page_content, 'metadata': doc.metadata} for doc in docs]
+                        self.parse_cache.put(cache_keys[file_path], elements)
+
+                texts = []
+                metadata_list = []
+                for doc in docs:
+                    # Add 'filename' key to metadata
+                    doc.metadata['filename'] = os.path.basename(doc.metadata['source'])
+
+                    if additional_metadata:
+                        doc.metadata.update(additional_metadata)
+
+                    texts.append(doc.page_content)
+                    metadata_list.append(doc.metadata)
+
+                yield file_path, texts, metadata_list, docs
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+
+def get_pdf_page_count(file_path: str) -> int:
+    """
+    Gets the number of pages of a PDF file, without extracting them.
+
+    Args:
+        file_path (str): The path of the PDF file.
 
-            docs = splitter.split_documents(docs)
+    Returns:
+        int: The number of pages.
+    """
+    import fitz
 
-            for doc in docs:
-                text = doc.page_content
-                metadata = doc.metadata
+    with fitz.open(file_path) as pdf:
+        return pdf.page_count
 
-                # Add 'filename' key to metadata
-                metadata['filename'] = os.path.basename(metadata['source'])
 
-                if additional_metadata:
-                    metadata.update(additional_metadata)
+@functools.lru_cache(maxsize=None)
+def get_pymupdf_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    Gets the text splitter of the PyMuPDF lite mode, created once per process.
 
-                texts.append(text)
-                metadata_list.append(metadata)
-                langchain_docs.append(doc)
+    Returns:
+        RecursiveCharacterTextSplitter: The text splitter.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=PYMUPDF_CHUNK_SIZE,
+        chunk_overlap=PYMUPDF_CHUNK_OVERLAP,
+        length_function=len,
+        separators=['\n\n', '\n', ' ', ''],
+        is_separator_regex=False,
+    )
 
-        return texts, metadata_list, langchain_docs
+
+def extract_pymupdf_pages(file_path: str, start_page: int, end_page: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Extracts and chunks a range of pages of a PDF file with PyMuPDF, with the same page metadata as PyMuPDFLoader.
+    Pages are chunked separately, so chunking the ranges of a file gives the same chunks as chunking it whole.
+
+    Args:
+        file_path (str): The path of the PDF file.
+        start_page (int): The first page of the range, from 0.
+        end_page (int): The end of the range, excluded.
+
+    Returns:
+        List[Tuple[str, Dict]]: The text and metadata of the chunks, in page order.
+    """
+    import fitz
+
+    with fitz.open(file_path) as pdf:
+        file_metadata = {key: value for key, value in pdf.metadata.items() if type(value) in [str, int]}
+        pages = [
+            Document(
+                page_content=pdf[page_number].get_text(),
+                metadata={
+                    'source': file_path,
+                    'file_path': file_path,
+                    'page': page_number,
+                    'total_pages': pdf.page_count,
+                    **file_metadata,
+                },
+            )
+            for page_number in range(start_page, end_page)
+        ]
+    return [(chunk.page_content, chunk.metadata) for chunk in get_pymupdf_splitter().split_documents(pages)]
 
 
 def convert_to_string(value: Union[List, Tuple, Dict, Any]) -> str:
@@ -330,6 +723,149 @@ def convert_to_string(value: Union[List, Tuple, Dict, Any]) -> str:
         return str(value)
 
 
+def process_element(
+    element: Dict[str, Any],
+    extend_metadata: bool,
+    additional_metadata: Optional[Dict[str, Any]],
+    replace_table_text: bool,
+    table_text_key: str,
+    convert_metadata_keys_to_string: bool,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Performs additional processing on an element extracted from a document, updating it in place.
+
+    Args:
+        element (Dict): The element, as in the ingest output JSON.
+        extend_metadata (bool): Whether to extend the metadata with additional metadata.
+        additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+        replace_table_text (bool): Whether to replace table text with the specified table text key.
+        table_text_key (str): The key to use for replacing table text.
+        convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+
+    Returns:
+        Tuple[str, Dict]: A tuple containing the text and metadata of the element.
+    """
+    if extend_metadata and additional_metadata:
+        element['metadata'].update(additional_metadata)
+
+    if replace_table_text and element['type'] == 'Table':
+        element['text'] = element['metadata'][table_text_key]
+
+    metadata = element['metadata'].copy()
+    if convert_metadata_keys_to_string:
+        metadata = {str(key): convert_to_string(value) for key, value in metadata.items()}
+    for key in element:
+        if key not in ['text', 'metadata', 'embeddings']:
+            metadata[key] = element[key]
+    if 'page_number' in metadata:
+        metadata['page'] = metadata['page_number']
+    else:
+        metadata['page'] = 1
+
+    return element['text'], metadata
+
+
+def process_elements(
+    elements: List[Dict[str, Any]],
+    extend_metadata: bool,
+    additional_metadata: Optional[Dict[str, Any]],
+    replace_table_text: bool,
+    table_text_key: str,
+    convert_metadata_keys_to_string: bool,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Performs additional processing on the elements extracted from a document, updating them in place.
+
+    Args:
+        elements (List[Dict]): The elements, as in the ingest output JSON.
+        extend_metadata (bool): Whether to extend the metadata with additional metadata.
+        additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+        replace_table_text (bool): Whether to replace table text with the specified table text key.
+        table_text_key (str): The key to use for replacing table text.
+        convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+
+    Returns:
+        Tuple[List[str], List[Dict]]: A tuple containing the texts and metadata of the elements.
+    """
+    texts = []
+    metadata_list = []
+
+    for element in elements:
+        text, metadata = process_element(
+            element,
+            extend_metadata=extend_metadata,
+            additional_metadata=additional_metadata,
+            replace_table_text=replace_table_text,
+            table_text_key=table_text_key,
+            convert_metadata_keys_to_string=convert_metadata_keys_to_string,
+        )
+        metadata_list.append(metadata)
+        texts.append(text)
+
+    return texts, metadata_list
+
+
+def iterate_elements(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterates over the elements of an ingest output JSON file. With ijson installed, the file is parsed incrementally,
+    so only one element is in memory at a time, else it is loaded whole.
+
+    Args:
+        file_path (str): The path of the output JSON file.
+
+    Yields:
+        Dict: The elements, in the file order.
+    """
+    with open(file_path, 'rb') as file:
+        try:
+            import ijson
+        except ImportError:
+            yield from json.load(file)
+            return
+        yield from ijson.items(file, 'item', use_float=True)
+
+
+def iterate_additional_processing(
+    directory: str,
+    extend_metadata: bool,
+    additional_metadata: Optional[Dict[str, Any]],
+    replace_table_text: bool,
+    table_text_key: str,
+    convert_metadata_keys_to_string: bool,
+) -> Iterator[Document]:
+    """
+    Performs additional processing on the extracted documents, streaming the elements of the JSON files and yielding
+    each one as a LangChain document. Unlike additional_processing, the files are not rewritten.
+
+    Args:
+        directory (str): The directory containing the extracted JSON files, or one JSON file.
+        extend_metadata (bool): Whether to extend the metadata with additional metadata.
+        additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+        replace_table_text (bool): Whether to replace table text with the specified table text key.
+        table_text_key (str): The key to use for replacing table text.
+        convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+
+    Yields:
+        Document: The LangChain document of each element, in the files order.
+    """
+    if os.path.isfile(directory):
+        file_paths = [directory]
+    else:
+        file_paths = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json')]
+
+    for file_path in file_paths:
+        for element in iterate_elements(file_path):
+            text, metadata = process_element(
+                element,
+                extend_metadata=extend_metadata,
+                additional_metadata=additional_metadata,
+                replace_table_text=replace_table_text,
+                table_text_key=table_text_key,
+                convert_metadata_keys_to_string=convert_metadata_keys_to_string,
+            )
+            yield Document(page_content=text, metadata=metadata)
+
+
 def additional_processing(
     directory: str,
     extend_metadata: bool,
@@ -340,7 +876,8 @@ def additional_processing(
     convert_metadata_keys_to_string: bool,
 ) -> Tuple[List[str], List[Dict[str, Any]], List[Document]]:
     """
-    Performs additional processing on the extracted documents.
+    Performs additional processing on the extracted documents, and rewrites the JSON files with the processed
+    elements. See iterate_additional_processing to only process them in memory.
 
     Args:
         directory (str): The directory containing the extracted JSON files.
@@ -368,29 +905,19 @@ def additional_processing(
         with open(file_path, 'r') as file:
             data = json.load(file)
 
-        for element in data:
-            if extend_metadata and additional_metadata:
-                element['metadata'].update(additional_metadata)
-
-            if replace_table_text and element['type'] == 'Table':
-                element['text'] = element['metadata'][table_text_key]
-
-            metadata = element['metadata'].copy()
-            if convert_metadata_keys_to_string:
-                metadata = {str(key): convert_to_string(value) for key, value in metadata.items()}
-            for key in element:
-                if key not in ['text', 'metadata', 'embeddings']:
-                    metadata[key] = element[key]
-            if 'page_number' in metadata:
-                metadata['page'] = metadata['page_number']
-            else:
-                metadata['page'] = 1
-
-            metadata_list.append(metadata)
-            texts.append(element['text'])
+        file_texts, file_metadata_list = process_elements(
+            data,
+            extend_metadata=extend_metadata,
+            additional_metadata=additional_metadata,
+            replace_table_text=replace_table_text,
+            table_text_key=table_text_key,
+            convert_metadata_keys_to_string=convert_metadata_keys_to_string,
+        )
+        texts.extend(file_texts)
+        metadata_list.extend(file_metadata_list)
 
         if return_langchain_docs:
-            langchain_docs.extend(get_langchain_docs(texts, metadata_list))
+            langchain_docs.extend(get_langchain_docs(file_texts, file_metadata_list))
 
         with open(file_path, 'w') as file:
             json.dump(data, file, indent=2)
@@ -398,6 +925,22 @@ def additional_processing(
     return texts, metadata_list, langchain_docs
 
 
+def set_elements_file_path(elements: List[Dict[str, Any]], file_path: str) -> None:
+    """
+    Sets the file name and directory of partitioned elements to those of a file, e.g. when they were partitioned from
+    a staged copy of the file.
+
+    Args:
+        elements (List[Dict]): The elements of the file, as in the ingest output JSON, updated in place.
+        file_path (str): The path of the file.
+    """
+    for element in elements:
+        if 'filename' in element['metadata']:
+            element['metadata']['filename'] = os.path.basename(file_path)
+        if 'file_directory' in element['metadata']:
+            element['metadata']['file_directory'] = os.path.dirname(os.path.abspath(file_path))
+
+
 def get_langchain_docs(texts: List[str], metadata_list: List[Dict]) -> List[Document]:
     """
     Creates LangChain documents from the extracted texts and metadata.
@@ -412,11 +955,16 @@ def get_langchain_docs(texts: List[str], metadata_list: List[Dict]) -> List[Docu
     return [Document(page_content=content, metadata=metadata) for content, metadata in zip(texts, metadata_list)]
 
 
-def parse_doc_universal(
-    doc: str, additional_metadata: Optional[Dict] = None, source_type: str = 'local', lite_mode: bool = False
-) -> Tuple[List[str], List[Dict], List[Document]]:
+def iterate_doc_universal(
+    doc: str,
+    additional_metadata: Optional[Dict] = None,
+    source_type: str = 'local',
+    lite_mode: bool = False,
+    batch_mode: Optional[bool] = None,
+) -> Iterator[Tuple[str, List[str], List[Dict], List[Document]]]:
     """
-    Extract text, tables, images, and metadata from a document or a folder of documents.
+    Extract text, tables, images, and metadata from a document or a folder of documents, yielding the results of each
+    document as soon as it's parsed.
 
     Args:
         doc (str): Path to the document or folder of documents.
@@ -424,12 +972,13 @@ def parse_doc_universal(
             Defaults to an empty dictionary.
         source_type (str, optional): The type of source to ingest. Defaults to 'local'.
         lite_mode (bool, optional): Whether to use a lighter version (PyMupdf) for pdf parsing.
+        batch_mode (Optional[bool], optional): Whether to ingest the documents of a local folder in batches, see
+            SambaParse.run_ingest_batch, instead of one unstructured-ingest run per document. Defaults to the
+            `processor.batch_mode` config.
 
-    Returns:
-        Tuple[List[str], List[Dict], List[Document]]: A tuple containing:
-            - A list of extracted text per page.
-            - A list of extracted metadata per page.
-            - A list of LangChain documents.
+    Yields:
+        Tuple[str, List[str], List[Dict], List[Document]]: The path of a document and its extracted texts, metadata,
+        and LangChain documents, in the order the documents are parsed.
     """
     if additional_metadata is None:
         additional_metadata = {}
@@ -441,6 +990,8 @@ def parse_doc_universal(
     config_path = os.path.join(current_dir, 'config.yaml')
 
     wrapper = SambaParse(config_path)
+    if batch_mode is None:
+        batch_mode = wrapper.config['processor'].get('batch_mode', False)
 
     def process_file(file_path: str) -> Any:
         if file_path.lower().endswith('.pdf') and lite_mode:
@@ -451,17 +1002,65 @@ def parse_doc_universal(
             return wrapper.run_ingest(source_type, input_path=file_path, additional_metadata=additional_metadata)
 
     if os.path.isfile(doc):
-        return process_file(doc)
+        yield (doc, *process_file(doc))
+        return
+
+    file_paths = [os.path.join(root, file) for root, _, files in os.walk(doc) for file in files]
+    if batch_mode and source_type == 'local':
+        lite_file_paths = [file_path for file_path in file_paths if file_path.lower().endswith('.pdf') and lite_mode]
+        batch_file_paths = [
+            file_path for file_path in file_paths if not (file_path.lower().endswith('.pdf') and lite_mode)
+        ]
+        yield from wrapper.iterate_ingest_pymupdf(lite_file_paths, additional_metadata)
+        if len(batch_file_paths) > 0:
+            yield from wrapper.run_ingest_batch(batch_file_paths, additional_metadata)
     else:
-        all_texts, all_metadata, all_docs = [], [], []
-        for root, _, files in os.walk(doc):
-            for file in files:
-                file_path = os.path.join(root, file)
-                texts, metadata_list, langchain_docs = process_file(file_path)
-                all_texts.extend(texts)
-                all_metadata.extend(metadata_list)
-                all_docs.extend(langchain_docs)
-        return all_texts, all_metadata, all_docs
+        for file_path in file_paths:
+            yield (file_path, *process_file(file_path))
+
+
+def parse_doc_universal(
+    doc: str,
+    additional_metadata: Optional[Dict] = None,
+    source_type: str = 'local',
+    lite_mode: bool = False,
+    batch_mode: Optional[bool] = None,
+) -> Tuple[List[str], List[Dict], List[Document]]:
+    """
+    Extract text, tables, images, and metadata from a document or a folder of documents.
+
+    Args:
+        doc (str): Path to the document or folder of documents.
+        additional_metadata (Optional[Dict], optional): Additional metadata to include in the processed documents.
+            Defaults to an empty dictionary.
+        source_type (str, optional): The type of source to ingest. Defaults to 'local'.
+        lite_mode (bool, optional): Whether to use a lighter version (PyMupdf) for pdf parsing.
+        batch_mode (Optional[bool], optional): Whether to ingest the documents of a local folder in batches, see
+            iterate_doc_universal. Defaults to the `processor.batch_mode` config.
+
+    Returns:
+        Tuple[List[str], List[Dict], List[Document]]: A tuple containing:
+            - A list of extracted text per page.
+            - A list of extracted metadata per page.
+            - A list of LangChain documents.
+    """
+    results = {
+        file_path: (texts, metadata_list, langchain_docs)
+        for file_path, texts, metadata_list, langchain_docs in iterate_doc_universal(
+            doc, additional_metadata, source_type, lite_mode, batch_mode
+        )
+    }
+    if os.path.isdir(doc):
+        # In the order of the folder walk, whatever the order the documents were parsed in
+        file_paths = [os.path.join(root, file) for root, _, files in os.walk(doc) for file in files]
+        results = {file_path: results[file_path] for file_path in file_paths if file_path in results}
+
+    all_texts, all_metadata, all_docs = [], [], []
+    for texts, metadata_list, langchain_docs in results.values():
+        all_texts.extend(texts)
+        all_metadata.extend(metadata_list)
+        all_docs.extend(langchain_docs)
+    return all_texts, all_metadata, all_docs
 
 
 def parse_doc_streamlit(
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import gzip
 import io
 import json
@@ -7,14 +8,28 @@ import logging
 import mimetypes
 import os
 import secrets
+import time
 import zipfile
 from base64 import b64encode
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from types import TracebackType
-from typing import IO, Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union, cast
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 import backoff
+import httpx
 import pandas as pd
 import psutil
 import requests
@@ -30,6 +45,7 @@ from fastapi import (
 from fastapi.responses import PlainTextResponse, StreamingResponse
 from pypdf import PageObject, PdfReader, PdfWriter
 from pypdf.errors import FileNotDecryptedError, PdfReadError
+from starlette.concurrency import run_in_threadpool
 from starlette.datastructures import Headers
 from starlette.types import Send
 
@@ -156,6 +172,51 @@ def call_api(
     return response.text
 
 
+def _get_form_data(partition_kwargs: Dict[str, Any]) -> Dict[str, Union[str, List[str]]]:
+    """Encode partition params as form fields the way `requests` does, dropping None values and
+    sending lists as repeated fields."""
+    data: Dict[str, Union[str, List[str]]] = {}
+    for key, value in partition_kwargs.items():
+        if isinstance(value, (list, tuple)):
+            data[key] = [str(v) for v in cast(Sequence[Any], value) if v is not None]
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+
+@backoff.on_exception(
+    backoff.expo,
+    HTTPException,
+    max_tries=int(os.environ.get("UNSTRUCTURED_PARALLEL_RETRY_ATTEMPTS", 2)) + 1,
+    giveup=is_non_retryable,
+    logger=logger,
+)
+async def call_api_async(
+    http_client: httpx.AsyncClient,
+    request_url: str,
+    api_key: str,
+    filename: str,
+    file: bytes,
+    content_type: str,
+    **partition_kwargs: Any,
+) -> str:
+    """Call the api with the given request_url, without blocking the event loop."""
+    headers = {"unstructured-api-key": api_key}
+
+    response = await http_client.post(
+        request_url,
+        files={"files": (filename, file, content_type)},
+        data=_get_form_data(partition_kwargs),
+        headers=headers,
+    )
+
+    if response.status_code != 200:
+        detail = response.json().get("detail") or response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    return response.text
+
+
 def partition_file_via_api(
     file_tuple: Tuple[IO[bytes], int],
     request: Request,
@@ -195,6 +256,166 @@ def partition_file_via_api(
     return elements_from_json(text=result)
 
 
+async def partition_file_via_api_async(
+    http_client: httpx.AsyncClient,
+    file_tuple: Tuple[bytes, int],
+    request: Request,
+    filename: str,
+    content_type: str,
+    **partition_kwargs: Any,
+) -> List[Element]:
+    """Async version of `partition_file_via_api`, sending the request with `http_client`."""
+    file, page_offset = file_tuple
+
+    request_url = os.environ.get("UNSTRUCTURED_PARALLEL_MODE_URL")
+    if not request_url:
+        raise HTTPException(status_code=500, detail="Parallel mode enabled but no url set!")
+
+    api_key = request.headers.get("unstructured-api-key", default="")
+    partition_kwargs["starting_page_number"] = (
+        partition_kwargs.get("starting_page_number", 1) + page_offset
+    )
+
+    result = await call_api_async(
+        http_client,
+        request_url,
+        api_key,
+        filename,
+        file,
+        content_type,
+        **partition_kwargs,
+    )
+    return elements_from_json(text=result)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Size the number of page splits partitioned at once from their latency and the free memory.
+
+    The limit starts at `UNSTRUCTURED_PARALLEL_MODE_THREADS`. It grows additively, by about one
+    split per round of completed splits, as long as the smoothed split latency stays within
+    `latency_tolerance` times the fastest split seen, and shrinks by a quarter as soon as the
+    latency goes above it, i.e. when the remote api starts queuing requests. It never goes above
+    `max_limit`, nor above the number of splits that fit in the free memory left before
+    `_check_free_memory` would reject traffic.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 3,
+        max_limit: int = 16,
+        latency_tolerance: float = 2.0,
+        split_memory_mb: int = 256,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.split_memory_mb = split_memory_mb
+        self.limit = float(min(max(1, initial_limit), self.max_limit))
+        self.min_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> AdaptiveConcurrencyLimiter:
+        return cls(
+            initial_limit=int(os.environ.get("UNSTRUCTURED_PARALLEL_MODE_THREADS", 3)),
+            max_limit=int(os.environ.get("UNSTRUCTURED_PARALLEL_MODE_MAX_CONCURRENCY", 16)),
+            latency_tolerance=float(
+                os.environ.get("UNSTRUCTURED_PARALLEL_MODE_LATENCY_TOLERANCE", 2.0)
+            ),
+            split_memory_mb=int(os.environ.get("UNSTRUCTURED_PARALLEL_MODE_SPLIT_MEMORY_MB", 256)),
+        )
+
+    def record_latency(self, latency: float) -> None:
+        """Update the limit with the latency of a completed split, in seconds."""
+        self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+        self.smoothed_latency = (
+            latency
+            if self.smoothed_latency is None
+            else 0.8 * self.smoothed_latency + 0.2 * latency
+        )
+
+        if self.smoothed_latency > self.latency_tolerance * self.min_latency:
+            self.limit = max(1.0, self.limit * 0.75)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def get_limit(self) -> int:
+        """Return the number of splits that can be in flight now, at least 1."""
+        memory_limit = int(_get_free_memory_headroom_mb() // max(1, self.split_memory_mb))
+        return max(1, min(int(self.limit), memory_limit))
+
+
+async def partition_pdf_splits_async(
+    request: Request,
+    pdf_splits: Sequence[Tuple[bytes, int]],
+    metadata_filename: str,
+    content_type: str,
+    coordinates: bool,
+    **partition_kwargs: Any,
+) -> AsyncIterator[List[Element]]:
+    """Partition pdf splits with concurrent async api calls, yielding the elements of each split in
+    page order, as soon as it and all the splits before it are done.
+
+    The number of calls in flight is sized by an `AdaptiveConcurrencyLimiter`, and so is the number
+    of completed splits held until the splits before them are done, so a slow split doesn't let the
+    results after it pile up. As soon as any remote call fails, the other calls are cancelled and
+    the error is bubbled up.
+
+    Arguments:
+    request is used to forward relevant headers to the api calls
+    pdf_splits are the split files with their page offset, see get_pdf_splits
+    metadata_filename, content_type, coordinates and partition_kwargs are passed on to the api calls
+    """
+    limiter = AdaptiveConcurrencyLimiter.from_env()
+
+    async with httpx.AsyncClient(timeout=None) as http_client:
+
+        async def partition_split(split: Tuple[bytes, int]) -> List[Element]:
+            start = time.monotonic()
+            elements = await partition_file_via_api_async(
+                http_client,
+                split,
+                request=request,
+                filename=metadata_filename,
+                content_type=content_type,
+                coordinates=coordinates,
+                **partition_kwargs,
+            )
+            limiter.record_latency(time.monotonic() - start)
+            return elements
+
+        tasks: Dict[int, asyncio.Task[List[Element]]] = {}
+        next_split = 0
+        next_result = 0
+        try:
+            while next_result < len(pdf_splits):
+                in_flight = [task for task in tasks.values() if not task.done()]
+                limit = limiter.get_limit()
+                while (
+                    next_split < len(pdf_splits)
+                    and len(in_flight) < limit
+                    # -- completed splits waiting for the ones before them --
+                    and len(tasks) - len(in_flight) < limit
+                ):
+                    task = asyncio.create_task(partition_split(pdf_splits[next_split]))
+                    tasks[next_split] = task
+                    in_flight.append(task)
+                    next_split += 1
+
+                if tasks[next_result].done():
+                    yield tasks.pop(next_result).result()
+                    next_result += 1
+                    continue
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # -- bubble up the errors of any split, not only of the leading one --
+                    task.result()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
 def partition_pdf_splits(
     request: Request,
     pdf_pages: Sequence[PageObject],
@@ -226,6 +447,24 @@ def partition_pdf_splits(
             **partition_kwargs,
         )
 
+    if os.environ.get("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "false") == "true":
+
+        async def collect_splits() -> List[Element]:
+            return [
+                element
+                async for elements in partition_pdf_splits_async(
+                    request,
+                    list(get_pdf_splits(pdf_pages, split_size=pages_per_pdf)),
+                    metadata_filename=metadata_filename,
+                    content_type=content_type,
+                    coordinates=coordinates,
+                    **partition_kwargs,
+                )
+                for element in elements
+            ]
+
+        return asyncio.run(collect_splits())
+
     results: List[Element] = []
     page_iterator = get_pdf_splits(pdf_pages, split_size=pages_per_pdf)
 
@@ -246,6 +485,46 @@ def partition_pdf_splits(
     return results
 
 
+def partition_pdf_splits_stream(
+    request: Request,
+    pdf_pages: Sequence[PageObject],
+    file: IO[bytes],
+    metadata_filename: str,
+    content_type: str,
+    coordinates: bool,
+    **partition_kwargs: Any,
+) -> AsyncIterator[List[Element]]:
+    """Streaming version of `partition_pdf_splits`, returning the elements of each split in page
+    order as soon as they're partitioned, with async api calls, see `partition_pdf_splits_async`.
+
+    The pdf is split, or partitioned locally if it's small enough, before returning, so the file
+    is not read anymore once the iteration starts.
+    """
+    pages_per_pdf = int(os.environ.get("UNSTRUCTURED_PARALLEL_MODE_SPLIT_SIZE", 1))
+
+    if len(pdf_pages) <= pages_per_pdf:
+        elements = partition(
+            file=file,
+            metadata_filename=metadata_filename,
+            content_type=content_type,
+            **partition_kwargs,
+        )
+
+        async def local_elements() -> AsyncIterator[List[Element]]:
+            yield elements
+
+        return local_elements()
+
+    return partition_pdf_splits_async(
+        request,
+        list(get_pdf_splits(pdf_pages, split_size=pages_per_pdf)),
+        metadata_filename=metadata_filename,
+        content_type=content_type,
+        coordinates=coordinates,
+        **partition_kwargs,
+    )
+
+
 is_chipper_processing = False
 
 
@@ -305,7 +584,13 @@ def pipeline_api(
     extract_image_block_types: Optional[List[str]] = None,
     unique_element_ids: Optional[bool] = False,
     starting_page_number: Optional[int] = None,
-) -> List[Dict[str, Any]] | str:
+    stream_pdf_splits: bool = False,
+) -> List[Dict[str, Any]] | str | AsyncIterator[List[Dict[str, Any]] | str]:
+    """Partition a file and format the elements as the response.
+
+    With `stream_pdf_splits`, when pdfs are partitioned in async parallel mode, return an async
+    iterator over the formatted response of each pdf split instead, in page order.
+    """
     if filename.endswith(".msg"):
         # Note(yuming): convert file type for msg files
         # since fast api might sent the wrong one.
@@ -372,6 +657,7 @@ def pipeline_api(
     # Parallel mode is set by env variable
     enable_parallel_mode = os.environ.get("UNSTRUCTURED_PARALLEL_MODE_ENABLED", "false")
     pdf_parallel_mode_enabled = enable_parallel_mode == "true"
+    pdf_async_mode_enabled = os.environ.get("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "false") == "true"
     if starting_page_number is None:
         starting_page_number = 1
 
@@ -437,7 +723,21 @@ def pipeline_api(
             "starting_page_number": starting_page_number,
         }
 
-        if file_content_type == "application/pdf" and pdf_parallel_mode_enabled:
+        if (
+            file_content_type == "application/pdf"
+            and pdf_parallel_mode_enabled
+            and pdf_async_mode_enabled
+            and stream_pdf_splits
+        ):
+            pdf = PdfReader(file)
+            element_splits = partition_pdf_splits_stream(
+                request=request,
+                pdf_pages=pdf.pages,
+                coordinates=coordinates,
+                **partition_kwargs,
+            )
+            return _format_element_splits(element_splits, filename, coordinates, response_type)
+        elif file_content_type == "application/pdf" and pdf_parallel_mode_enabled:
             pdf = PdfReader(file)
             elements = partition_pdf_splits(
                 request=request,
@@ -498,6 +798,13 @@ def pipeline_api(
             detail=f"Unknown model type: {hi_res_model_name}",
         )
 
+    return _format_elements(elements, filename, coordinates, response_type)
+
+
+def _format_elements(
+    elements: List[Element], filename: str, coordinates: bool, response_type: str
+) -> List[Dict[str, Any]] | str:
+    """Clean up the partitioned elements and format them as the response."""
     # Clean up returned elements
     # Note(austin): pydantic should control this sort of thing for us
     for i, element in enumerate(elements):
@@ -524,12 +831,29 @@ def pipeline_api(
     return result
 
 
+async def _format_element_splits(
+    element_splits: AsyncIterator[List[Element]],
+    filename: str,
+    coordinates: bool,
+    response_type: str,
+) -> AsyncIterator[List[Dict[str, Any]] | str]:
+    """Format the elements of each pdf split as a response, as they're partitioned."""
+    async for elements in element_splits:
+        yield _format_elements(elements, filename, coordinates, response_type)
+
+
+def _get_free_memory_headroom_mb() -> float:
+    """Return the free memory left before reaching the minimum (default 2GB), in MB."""
+    mem = psutil.virtual_memory()
+    memory_free_minimum = int(os.environ.get("UNSTRUCTURED_MEMORY_FREE_MINIMUM_MB", 2048))
+    return mem.available / (1024 * 1024) - memory_free_minimum
+
+
 def _check_free_memory():
     """Reject traffic when free memory is below minimum (default 2GB)."""
-    mem = psutil.virtual_memory()
     memory_free_minimum = int(os.environ.get("UNSTRUCTURED_MEMORY_FREE_MINIMUM_MB", 2048))
 
-    if mem.available <= memory_free_minimum * 1024 * 1024:
+    if _get_free_memory_headroom_mb() <= 0:
         logger.warning(f"Rejecting because free memory is below {memory_free_minimum} MB")
         raise HTTPException(
             status_code=503, detail="Server is under heavy load. Please try again later."
@@ -694,6 +1018,17 @@ class MultipartMixedResponse(StreamingResponse):
         await send({"type": "http.response.body", "body": b"", "more_body": False})
 
 
+def copy_upload_file(file: UploadFile) -> UploadFile:
+    """Copy an uploaded file in memory, so it can be read after the upload is closed."""
+    content = file.file.read()
+    return UploadFile(
+        file=io.BytesIO(content),
+        size=len(content),
+        filename=file.filename,
+        headers=file.headers,
+    )
+
+
 def ungz_file(file: UploadFile, gz_uncompressed_content_type: Optional[str] = None) -> UploadFile:
     def return_content_type(filename: str):
         if gz_uncompressed_content_type:
@@ -778,40 +1113,44 @@ def general_partition(
         if is_content_type_gz or is_extension_gz:
             files[idx] = ungz_file(file, form_params.gz_uncompressed_content_type)
 
+    def partition_file(file: UploadFile, stream_pdf_splits: bool = False):
+        file_content_type = get_validated_mimetype(file)
+
+        _file = file.file
+
+        return pipeline_api(
+            _file,
+            request=request,
+            coordinates=form_params.coordinates,
+            encoding=form_params.encoding,
+            hi_res_model_name=form_params.hi_res_model_name,
+            include_page_breaks=form_params.include_page_breaks,
+            ocr_languages=form_params.ocr_languages,
+            pdf_infer_table_structure=form_params.pdf_infer_table_structure,
+            skip_infer_table_types=form_params.skip_infer_table_types,
+            strategy=form_params.strategy,
+            xml_keep_tags=form_params.xml_keep_tags,
+            response_type=form_params.output_format,
+            filename=str(file.filename),
+            file_content_type=file_content_type,
+            languages=form_params.languages,
+            extract_image_block_types=form_params.extract_image_block_types,
+            unique_element_ids=form_params.unique_element_ids,
+            # -- chunking options --
+            chunking_strategy=chunking_strategy,
+            combine_under_n_chars=form_params.combine_under_n_chars,
+            max_characters=form_params.max_characters,
+            multipage_sections=form_params.multipage_sections,
+            new_after_n_chars=form_params.new_after_n_chars,
+            overlap=form_params.overlap,
+            overlap_all=form_params.overlap_all,
+            starting_page_number=form_params.starting_page_number,
+            stream_pdf_splits=stream_pdf_splits,
+        )
+
     def response_generator(is_multipart: bool):
         for file in files:
-            file_content_type = get_validated_mimetype(file)
-
-            _file = file.file
-
-            response = pipeline_api(
-                _file,
-                request=request,
-                coordinates=form_params.coordinates,
-                encoding=form_params.encoding,
-                hi_res_model_name=form_params.hi_res_model_name,
-                include_page_breaks=form_params.include_page_breaks,
-                ocr_languages=form_params.ocr_languages,
-                pdf_infer_table_structure=form_params.pdf_infer_table_structure,
-                skip_infer_table_types=form_params.skip_infer_table_types,
-                strategy=form_params.strategy,
-                xml_keep_tags=form_params.xml_keep_tags,
-                response_type=form_params.output_format,
-                filename=str(file.filename),
-                file_content_type=file_content_type,
-                languages=form_params.languages,
-                extract_image_block_types=form_params.extract_image_block_types,
-                unique_element_ids=form_params.unique_element_ids,
-                # -- chunking options --
-                chunking_strategy=chunking_strategy,
-                combine_under_n_chars=form_params.combine_under_n_chars,
-                max_characters=form_params.max_characters,
-                multipage_sections=form_params.multipage_sections,
-                new_after_n_chars=form_params.new_after_n_chars,
-                overlap=form_params.overlap,
-                overlap_all=form_params.overlap_all,
-                starting_page_number=form_params.starting_page_number,
-            )
+            response = partition_file(file)
 
             yield (
                 json.dumps(response)
@@ -823,6 +1162,21 @@ def general_partition(
                 )
             )
 
+    async def split_response_generator():
+        """Stream the multipart response with one part per pdf split in async parallel mode, as
+        soon as the leading splits are partitioned, and one part per file otherwise."""
+        for file in files:
+            response = await run_in_threadpool(partition_file, file, stream_pdf_splits=True)
+            if not hasattr(response, "__aiter__"):
+                yield json.dumps(response) if type(response) not in [str, bytes] else response
+                continue
+            async for split_response in response:
+                yield (
+                    json.dumps(split_response)
+                    if type(split_response) not in [str, bytes]
+                    else split_response
+                )
+
     def join_responses(
         responses: Sequence[str | List[Dict[str, Any]] | PlainTextResponse],
     ) -> List[str | List[Dict[str, Any]]] | PlainTextResponse:
@@ -843,9 +1197,25 @@ def general_partition(
                 )
         return PlainTextResponse(data.to_csv())
 
+    is_async_parallel_mode = (
+        os.environ.get("UNSTRUCTURED_PARALLEL_MODE_ENABLED", "false") == "true"
+        and os.environ.get("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "false") == "true"
+    )
+
+    if content_type == "multipart/mixed":
+        # -- the uploaded files are closed when the endpoint returns, before the response is
+        # -- streamed, so the streamed partitioning reads copies of them
+        for idx, file in enumerate(files):
+            files[idx] = copy_upload_file(file)
+
     return (
         MultipartMixedResponse(
-            response_generator(is_multipart=True), content_type=form_params.output_format
+            (
+                split_response_generator()
+                if is_async_parallel_mode
+                else response_generator(is_multipart=True)
+            ),
+            content_type=form_params.output_format,
         )
         if content_type == "multipart/mixed"
         else (
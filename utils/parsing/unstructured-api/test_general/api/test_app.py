@@ -1,4 +1,7 @@
+import asyncio
+import base64
 import io
+import json
 import os
 import tempfile
 import time
@@ -832,6 +835,158 @@ def test_partition_file_via_api_not_retryable_error_code(monkeypatch, mocker):
     assert remote_partition.called_once()
 
 
+def make_blank_pdf(num_pages: int) -> io.BytesIO:
+    writer = PdfWriter()
+    for _ in range(num_pages):
+        writer.add_blank_page(width=612, height=792)
+    pdf = io.BytesIO()
+    writer.write(pdf)
+    pdf.seek(0)
+    return pdf
+
+
+async def mock_call_api_async(
+    http_client, request_url, api_key, filename, file, content_type, **partition_kwargs
+) -> str:
+    """Return one element per page, the first pages being the slowest to partition."""
+    page_number = partition_kwargs["starting_page_number"]
+    await asyncio.sleep(0.05 / page_number)
+    element = {
+        "type": "NarrativeText",
+        "element_id": f"element-{page_number}",
+        "text": f"page {page_number}",
+        "metadata": {"page_number": page_number, "filename": filename},
+    }
+    return json.dumps([element])
+
+
+def test_parallel_mode_async_returns_splits_in_page_order(monkeypatch):
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ENABLED", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_URL", "unused")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_SPLIT_SIZE", "1")
+    monkeypatch.setattr(general, "call_api_async", mock_call_api_async)
+
+    client = TestClient(app)
+    response = client.post(
+        MAIN_API_ROUTE,
+        files=[("files", ("blank.pdf", make_blank_pdf(6), "application/pdf"))],
+    )
+
+    assert response.status_code == 200
+    assert [element["text"] for element in response.json()] == [f"page {i}" for i in range(1, 7)]
+
+
+def test_parallel_mode_async_streams_one_part_per_split(monkeypatch):
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ENABLED", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_URL", "unused")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_SPLIT_SIZE", "2")
+    monkeypatch.setattr(general, "call_api_async", mock_call_api_async)
+
+    client = TestClient(app)
+    response = client.post(
+        MAIN_API_ROUTE,
+        files=[("files", ("blank.pdf", make_blank_pdf(6), "application/pdf"))],
+        headers={"Accept": "multipart/mixed"},
+    )
+
+    assert response.status_code == 200
+    boundary = response.headers["content-type"].split('boundary="')[1].rstrip('"')
+    parts = [
+        part.split(b"\r\n\r\n", 1)[1].strip()
+        for part in response.content.split(b"--" + boundary.encode())
+        if part.strip()
+    ]
+    split_texts = [
+        [element["text"] for element in json.loads(base64.b64decode(part))] for part in parts
+    ]
+    assert split_texts == [["page 1"], ["page 3"], ["page 5"]]
+
+
+def test_parallel_mode_async_bounds_completed_splits(monkeypatch):
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_URL", "unused")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_THREADS", "2")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_MAX_CONCURRENCY", "2")
+    monkeypatch.setattr(general, "_get_free_memory_headroom_mb", lambda: 100000)
+    scheduled_pages = []
+
+    async def mock_call_api_async_slow_first_page(*args, **kwargs):
+        page_number = kwargs["starting_page_number"]
+        scheduled_pages.append(page_number)
+        await asyncio.sleep(0.2 if page_number == 1 else 0.01)
+        return await mock_call_api_async(*args, **kwargs)
+
+    monkeypatch.setattr(general, "call_api_async", mock_call_api_async_slow_first_page)
+
+    async def collect_splits():
+        return [
+            [element.text for element in elements]
+            async for elements in general.partition_pdf_splits_async(
+                Mock(),
+                list(general.get_pdf_splits(PdfReader(make_blank_pdf(10)).pages, split_size=1)),
+                metadata_filename="blank.pdf",
+                content_type="application/pdf",
+                coordinates=False,
+            )
+        ]
+
+    async def collect_splits_while_first_is_pending():
+        task = asyncio.create_task(collect_splits())
+        await asyncio.sleep(0.15)
+        # -- page 1 is in flight, and only 2 later pages may be done and held until it is --
+        assert scheduled_pages == [1, 2, 3]
+        return await task
+
+    split_texts = asyncio.run(collect_splits_while_first_is_pending())
+
+    assert split_texts == [[f"page {i}"] for i in range(1, 11)]
+
+
+def test_parallel_mode_async_returns_errors(monkeypatch):
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ENABLED", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_ASYNC", "true")
+    monkeypatch.setenv("UNSTRUCTURED_PARALLEL_MODE_URL", "unused")
+
+    async def mock_call_api_async_error(*args, **kwargs):
+        if kwargs["starting_page_number"] == 2:
+            raise HTTPException(status_code=400, detail="Bad page")
+        return await mock_call_api_async(*args, **kwargs)
+
+    monkeypatch.setattr(general, "call_api_async", mock_call_api_async_error)
+
+    client = TestClient(app)
+    response = client.post(
+        MAIN_API_ROUTE,
+        files=[("files", ("blank.pdf", make_blank_pdf(4), "application/pdf"))],
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Bad page"}
+
+
+def test_adaptive_concurrency_limiter(monkeypatch):
+    monkeypatch.setattr(general, "_get_free_memory_headroom_mb", lambda: 100000)
+    limiter = general.AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+
+    # -- the limit grows while the latency stays flat, up to the max --
+    for _ in range(20):
+        limiter.record_latency(1.0)
+    assert limiter.get_limit() == 4
+
+    # -- and shrinks when the remote api slows down --
+    for _ in range(5):
+        limiter.record_latency(10.0)
+    assert limiter.get_limit() == 1
+
+    # -- the free memory caps the limit --
+    limiter = general.AdaptiveConcurrencyLimiter(initial_limit=4, split_memory_mb=100)
+    monkeypatch.setattr(general, "_get_free_memory_headroom_mb", lambda: 250)
+    assert limiter.get_limit() == 2
+    monkeypatch.setattr(general, "_get_free_memory_headroom_mb", lambda: -10)
+    assert limiter.get_limit() == 1
+
+
 def test_chunking_strategy_param():
     """
     Verify that responses do not chunk elements unless requested
@@ -0,0 +1,103 @@
+import abc
+import contextlib
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+# Max number of keys per SQL query, below the SQLite limit of host parameters
+QUERY_CHUNK_SIZE = 500
+
+
+def iterate_over_chunks(items: Sequence[Any], chunk_size: int = QUERY_CHUNK_SIZE) -> Iterator[Sequence[Any]]:
+    """Iterates over consecutive chunks of a sequence
+
+    Args:
+        items (Sequence): items to split
+        chunk_size (int, optional): max number of items per chunk. Defaults to QUERY_CHUNK_SIZE.
+
+    Yields:
+        Sequence: chunk of items
+    """
+    for i in range(0, len(items), chunk_size):
+        yield items[i : i + chunk_size]
+
+
+class SQLiteStore(abc.ABC):
+    """Base of the stores kept in an SQLite file that can be shared by several processes.
+
+    Each process opens its own connection on first use, and transactions are handled explicitly, so that writers can
+    take the write lock at the start of a transaction with BEGIN IMMEDIATE. Stores are pickled without their
+    connection, which is opened again once unpickled.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        """
+        Args:
+            path (str, optional): path of the SQLite file. None keeps the store in memory, for this process only.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        self.pid: Optional[int] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections and locks can't be shared between processes
+        state = self.__dict__.copy()
+        state.update(lock=None, connection=None, pid=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _create_schema(self, connection: sqlite3.Connection) -> None:
+        """Creates the tables of the store if they don't exist yet
+
+        Args:
+            connection (sqlite3.Connection): new store connection
+        """
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Gets the connection to the store, opening it on first use and after a fork
+
+        Returns:
+            sqlite3.Connection: store connection
+        """
+        if self.connection is None or (self.path is not None and self.pid != os.getpid()):
+            if self.path is None:
+                path = ':memory:'
+            else:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                path = self.path
+            self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+            self._create_schema(self.connection)
+            self.pid = os.getpid()
+        return self.connection
+
+    @contextlib.contextmanager
+    def _transaction(self, mode: str = 'DEFERRED') -> Iterator[sqlite3.Connection]:
+        """Runs a transaction on the store
+
+        Args:
+            mode (str): SQLite transaction mode, IMMEDIATE takes the write lock at the start
+
+        Yields:
+            sqlite3.Connection: store connection
+        """
+        connection = self._get_connection()
+        connection.execute(f'BEGIN {mode}')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self) -> None:
+        """Closes the connection of this process to the store, an in-memory store is then lost"""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
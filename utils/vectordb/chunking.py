@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import glob
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import UnstructuredFileLoader
+from langchain_text_splitters.character import _split_text_with_regex
+
+from utils.model_wrappers.tokenizer_registry import resolve_tokenizer
+
+# Chunk as sent back by the chunking workers, page content and metadata
+ChunkRecord = Tuple[str, Dict[str, Any]]
+
+
+class BatchedTokenTextSplitter(CharacterTextSplitter):
+    """CharacterTextSplitter measuring lengths in tokens, like `CharacterTextSplitter.from_huggingface_tokenizer`, but
+    tokenizing all the splits of a text in one batched call of a fast tokenizer instead of one call per split and per
+    merge step."""
+
+    def __init__(self, tokenizer: Any, **kwargs: Any) -> None:
+        """
+        Args:
+            tokenizer: HuggingFace fast tokenizer
+            kwargs: CharacterTextSplitter arguments
+        """
+        super().__init__(length_function=self._get_token_length, **kwargs)
+        self._tokenizer = tokenizer
+        self._token_lengths: Dict[str, int] = {}
+
+    def _get_token_length(self, text: str) -> int:
+        if text not in self._token_lengths:
+            self._token_lengths[text] = len(self._tokenizer.encode(text))
+        return self._token_lengths[text]
+
+    def split_text(self, text: str) -> List[str]:
+        """Splits a text into chunks of at most `chunk_size` tokens
+
+        Args:
+            text (str): text to split
+
+        Returns:
+            list: chunks
+        """
+        # Same as CharacterTextSplitter.split_text, with the lengths of all the splits computed upfront
+        separator = self._separator if self._is_separator_regex else re.escape(self._separator)
+        splits = _split_text_with_regex(text, separator, self._keep_separator)
+        merge_separator = '' if self._keep_separator else self._separator
+        texts = list(dict.fromkeys(splits + [merge_separator]))
+        self._token_lengths = {
+            text: len(input_ids) for text, input_ids in zip(texts, self._tokenizer(texts)['input_ids'])
+        }
+        try:
+            return self._merge_splits(splits, merge_separator)
+        finally:
+            self._token_lengths = {}
+
+
+def get_text_splitter(chunk_size: int, chunk_overlap: int, tokenizer: Optional[Any] = None) -> Any:
+    """Gets a text splitter, by number of characters or by number of tokens if a tokenizer is given
+
+    Args:
+        chunk_size (int): chunk size
+        chunk_overlap (int): chunk overlap
+        tokenizer (optional): HuggingFace tokenizer, or tokenizer name or path. Defaults to None.
+
+    Returns:
+        text splitter
+    """
+    if tokenizer is None:
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    tokenizer = resolve_tokenizer(tokenizer)
+    if tokenizer.is_fast:
+        return BatchedTokenTextSplitter(tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return CharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def list_files(input_path: str, glob_pattern: str, recursive: bool = False) -> List[str]:
+    """Lists the files of a directory the way DirectoryLoader does, in a deterministic order
+
+    Args:
+        input_path (str): input directory
+        glob_pattern (str): file name pattern, e.g. *.txt
+        recursive (bool, optional): whether to list the files of the subdirectories. Defaults to False.
+
+    Returns:
+        list: sorted file paths, hidden files excluded, written like the DirectoryLoader document sources
+    """
+    pattern = os.path.join(input_path, '**', glob_pattern) if recursive else os.path.join(input_path, glob_pattern)
+    file_paths = glob.glob(pattern, recursive=recursive)
+    return sorted(
+        str(Path(file_path))
+        for file_path in file_paths
+        if os.path.isfile(file_path)
+        and not any(part.startswith('.') for part in os.path.relpath(file_path, input_path).split(os.sep))
+    )
+
+
+def load_and_chunk_files(
+    file_paths: List[str], chunk_size: int, chunk_overlap: int, tokenizer: Optional[Any] = None
+) -> List[ChunkRecord]:
+    """Loads and chunks a shard of files, run in the chunking worker processes
+
+    Args:
+        file_paths (list): files of the shard
+        chunk_size (int): chunk size, in characters or in tokens if a tokenizer is given
+        chunk_overlap (int): chunk overlap, in characters or in tokens if a tokenizer is given
+        tokenizer (optional): HuggingFace tokenizer, or tokenizer name or path. Defaults to None.
+
+    Returns:
+        list: page content and metadata of the chunks, in file order
+    """
+    text_splitter = get_text_splitter(chunk_size, chunk_overlap, tokenizer)
+    records: List[ChunkRecord] = []
+    for file_path in file_paths:
+        # Same loader and arguments as the DirectoryLoader of VectorDb.load_files
+        docs = UnstructuredFileLoader(file_path, autodetect_encoding=True).load()
+        records.extend((chunk.page_content, chunk.metadata) for chunk in text_splitter.split_documents(docs))
+    return records
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# Executor the BM25 searches of all the retrievers run in, its threads are only started when needed
+_SPARSE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix='hybrid_retriever')
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], weights: Optional[List[float]] = None, rrf_k: int = 60
+) -> List[Tuple[Document, float]]:
+    """Fuses rankings of documents with reciprocal rank fusion, each document scoring the sum over the rankings of
+    weight / (rrf_k + rank). Documents are matched across rankings by their contents and source.
+
+    Args:
+        rankings (list): rankings of documents, best first
+        weights (list, optional): weight of each ranking. Defaults to 1 for all.
+        rrf_k (int, optional): rank offset, higher values flatten the differences between ranks. Defaults to 60.
+
+    Returns:
+        list: fused documents and their scores, highest first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[Tuple[str, str], float] = {}
+    documents: Dict[Tuple[str, str], Document] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, document in enumerate(ranking, start=1):
+            key = (document.page_content, str(document.metadata.get('source', '')))
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            documents.setdefault(key, document)
+    return [(documents[key], score) for key, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever combining a dense retriever and a BM25 sparse index.
+
+    Both are queried concurrently, the dense retriever in the calling thread and the BM25 index in a thread of the
+    retriever, and their results fused with reciprocal rank fusion, so that chunks with the exact terms of the query,
+    like tickers, part numbers or error codes, are retrieved even when their embeddings are not the closest ones.
+    """
+
+    dense_retriever: BaseRetriever
+    """dense retriever, e.g. from `vector_store.as_retriever(...)`"""
+
+    sparse_index: Any
+    """BM25Index of the same chunks"""
+
+    k: int = 4
+    """number of documents returned"""
+
+    sparse_k: Optional[int] = None
+    """number of documents retrieved from the sparse index, defaults to `k`"""
+
+    dense_weight: float = 1.0
+    """weight of the dense ranking in the fusion"""
+
+    sparse_weight: float = 1.0
+    """weight of the sparse ranking in the fusion"""
+
+    rrf_k: int = 60
+    """rank offset of the reciprocal rank fusion"""
+
+    sparse_executor: Optional[ThreadPoolExecutor] = None
+    """executor the BM25 searches run in, defaults to one shared by all the retrievers"""
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        sparse_executor = self.sparse_executor or _SPARSE_EXECUTOR
+        sparse_future = sparse_executor.submit(self.sparse_index.search, query, self.sparse_k or self.k)
+        dense_documents = self.dense_retriever.invoke(query, config={'callbacks': run_manager.get_child('dense')})
+        sparse_documents = [document for document, _ in sparse_future.result()]
+        fused = reciprocal_rank_fusion(
+            [dense_documents, sparse_documents], [self.dense_weight, self.sparse_weight], self.rrf_k
+        )
+        return [document for document, _ in fused[: self.k]]
@@ -0,0 +1,216 @@
+"""
+Index configuration of the vector stores, as a dictionary, e.g. from the `index` section of a kit config.yaml.
+Only the keys of the vector db type in use are read, and all of them are optional:
+
+faiss:
+    factory (str): faiss index factory string, e.g. 'HNSW32', 'IVF4096,Flat' or 'IVF4096,PQ64'. Defaults to a flat
+        index. IVF and PQ indexes are trained on a sample of the chunks embeddings, HNSW indexes don't support
+        deleting chunks, so can't be updated incrementally when files change or are deleted.
+    train_size (int): max number of embeddings the index is trained on, streaming ingestion holds the first batches
+        until it has this many embeddings to train the index on. Defaults to 100000.
+    nprobe (int): number of IVF lists searched per query.
+    ef_search (int): HNSW search depth.
+chroma:
+    hnsw_space (str): distance, 'l2', 'ip' or 'cosine'. Defaults to 'l2'.
+    hnsw_m (int): HNSW max number of neighbours per node.
+    hnsw_construction_ef (int): HNSW build depth.
+    hnsw_search_ef (int): HNSW search depth.
+qdrant, applied by qdrant servers, the local mode of qdrant_client only keeps `on_disk`:
+    on_disk (bool): whether the vectors are stored on disk and memory-mapped instead of kept in RAM.
+    on_disk_payload (bool): whether the chunks contents and metadata are stored on disk.
+    quantization (str): 'scalar' (int8), 'product' or 'binary' quantization of the vectors.
+    quantization_always_ram (bool): whether the quantized vectors are kept in RAM when the vectors are on disk.
+        Defaults to True.
+    hnsw_m (int): HNSW max number of neighbours per node.
+    hnsw_ef_construct (int): HNSW build depth.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Defaults of the index configuration, see the docstring of the functions using each key
+DEFAULT_FAISS_TRAIN_SIZE = 100_000
+DEFAULT_CHROMA_SPACE = 'l2'
+# faiss index types that can't delete vectors, and the factory components that wrap or transform the main index
+FAISS_NON_REMOVABLE_INDEX_TYPES = ('HNSW', 'NSG')
+FAISS_WRAPPER_COMPONENTS = ('PCA', 'OPQ', 'RR', 'L2norm', 'ITQ', 'Pad', 'IDMap')
+QDRANT_QUANTIZATION_TYPES = ['scalar', 'product', 'binary']
+
+
+def build_faiss_index(dimension: int, vectors: List[List[float]], index_config: Optional[Dict[str, Any]]) -> Any:
+    """Builds an empty faiss index from its factory string, trained on a sample of vectors if the index needs
+    training. Falls back to a flat index if there are too few vectors to train it.
+
+    Args:
+        dimension (int): embedding dimension
+        vectors (list): embeddings to sample the training set from
+        index_config (dict, optional): index configuration
+
+    Returns:
+        faiss index, searched with the L2 distance like the langchain FAISS default
+    """
+    import faiss
+
+    index_config = index_config or {}
+    factory = index_config.get('factory')
+    if factory is None:
+        return faiss.IndexFlatL2(dimension)
+
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        train_size = index_config.get('train_size', DEFAULT_FAISS_TRAIN_SIZE)
+        train_vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, dimension)
+        if len(train_vectors) > train_size:
+            sample = np.random.default_rng(0).choice(len(train_vectors), train_size, replace=False)
+            train_vectors = train_vectors[np.sort(sample)]
+        logger.info(f'Training faiss {factory} index on {len(train_vectors)} vectors')
+        try:
+            index.train(train_vectors)
+        except RuntimeError as e:
+            logger.warning(f'faiss {factory} index could not be trained on {len(train_vectors)} vectors: {e}')
+            logger.warning('Falling back to a flat faiss index')
+            return faiss.IndexFlatL2(dimension)
+    set_faiss_search_parameters(index, index_config)
+    return index
+
+
+def faiss_index_needs_training(dimension: int, index_config: Optional[Dict[str, Any]]) -> bool:
+    """Checks whether the faiss index of an index configuration needs training before vectors are added
+
+    Args:
+        dimension (int): embedding dimension
+        index_config (dict, optional): index configuration
+
+    Returns:
+        bool: whether the index needs training
+    """
+    import faiss
+
+    factory = (index_config or {}).get('factory')
+    return factory is not None and not faiss.index_factory(dimension, factory, faiss.METRIC_L2).is_trained
+
+
+def faiss_factory_supports_removal(index_config: Optional[Dict[str, Any]]) -> bool:
+    """Checks whether the faiss index of an index configuration can delete vectors. HNSW and NSG indexes can't, so
+    the vector dbs using them can't be updated incrementally.
+
+    Args:
+        index_config (dict, optional): index configuration
+
+    Returns:
+        bool: whether the index can delete vectors
+    """
+    factory = (index_config or {}).get('factory')
+    if factory is None:
+        return True
+    components = [component.strip() for component in factory.split(',')]
+    main_component = next(
+        (component for component in components if not component.startswith(FAISS_WRAPPER_COMPONENTS)), ''
+    )
+    return not main_component.startswith(FAISS_NON_REMOVABLE_INDEX_TYPES)
+
+
+def faiss_index_supports_removal(index: Any) -> bool:
+    """Checks whether a faiss index can delete vectors, see faiss_factory_supports_removal
+
+    Args:
+        index: faiss index, e.g. of a loaded vector db
+
+    Returns:
+        bool: whether the index can delete vectors
+    """
+    import faiss
+
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexPreTransform, faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return not type(index).__name__.startswith(tuple(f'Index{name}' for name in FAISS_NON_REMOVABLE_INDEX_TYPES))
+
+
+def set_faiss_search_parameters(index: Any, index_config: Optional[Dict[str, Any]]) -> None:
+    """Sets the search parameters of a faiss index, `nprobe` for IVF indexes and `ef_search` for HNSW indexes
+
+    Args:
+        index: faiss index
+        index_config (dict, optional): index configuration
+    """
+    import faiss
+
+    index_config = index_config or {}
+    if index_config.get('nprobe') is not None and faiss.try_extract_index_ivf(index) is not None:
+        faiss.ParameterSpace().set_index_parameter(index, 'nprobe', index_config['nprobe'])
+    if index_config.get('ef_search') is not None and 'HNSW' in type(faiss.downcast_index(index)).__name__:
+        faiss.ParameterSpace().set_index_parameter(index, 'efSearch', index_config['ef_search'])
+
+
+def get_chroma_collection_metadata(index_config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Gets the chroma collection metadata setting the HNSW parameters of the collection. They are only applied when
+    the collection is created.
+
+    Args:
+        index_config (dict, optional): index configuration
+
+    Returns:
+        dict: collection metadata, None to keep the chroma defaults
+    """
+    if not index_config:
+        return None
+    keys = {
+        'hnsw_space': 'hnsw:space',
+        'hnsw_m': 'hnsw:M',
+        'hnsw_construction_ef': 'hnsw:construction_ef',
+        'hnsw_search_ef': 'hnsw:search_ef',
+    }
+    metadata = {'hnsw:space': DEFAULT_CHROMA_SPACE}
+    metadata.update({keys[key]: value for key, value in index_config.items() if key in keys and value is not None})
+    return metadata
+
+
+def get_qdrant_collection_kwargs(index_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Gets the qdrant collection arguments for on-disk storage, quantization and HNSW parameters, as taken by
+    `Qdrant.from_documents`. For `QdrantClient.create_collection`, `on_disk` goes in the `VectorParams`.
+
+    Args:
+        index_config (dict, optional): index configuration
+
+    Returns:
+        dict: collection arguments
+    """
+    from qdrant_client import models
+
+    index_config = index_config or {}
+    kwargs: Dict[str, Any] = {}
+    if index_config.get('on_disk') is not None:
+        kwargs['on_disk'] = index_config['on_disk']
+    if index_config.get('on_disk_payload') is not None:
+        kwargs['on_disk_payload'] = index_config['on_disk_payload']
+    if index_config.get('hnsw_m') is not None or index_config.get('hnsw_ef_construct') is not None:
+        kwargs['hnsw_config'] = models.HnswConfigDiff(
+            m=index_config.get('hnsw_m'), ef_construct=index_config.get('hnsw_ef_construct')
+        )
+
+    quantization = index_config.get('quantization')
+    always_ram = index_config.get('quantization_always_ram', True)
+    if quantization == 'scalar':
+        kwargs['quantization_config'] = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=always_ram)
+        )
+    elif quantization == 'product':
+        kwargs['quantization_config'] = models.ProductQuantization(
+            product=models.ProductQuantizationConfig(compression=models.CompressionRatio.X16, always_ram=always_ram)
+        )
+    elif quantization == 'binary':
+        kwargs['quantization_config'] = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    elif quantization is not None:
+        raise ValueError(
+            f'Unsupported qdrant quantization: {quantization}, expected one of {QDRANT_QUANTIZATION_TYPES}'
+        )
+    return kwargs
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = 'ingestion_manifest.json'
+MANIFEST_VERSION = 1
+
+# Chunk ids are UUIDs derived from the chunk contents, so that every backend accepts them and an unchanged chunk
+# always gets the same id
+CHUNK_ID_NAMESPACE = uuid.UUID('d6196697-6397-4106-9cca-dd2fe2976ee1')
+
+
+class IngestionPlan(NamedTuple):
+    """Changes to apply to a vector store to bring it up to date with a set of chunks"""
+
+    chunks: List[Any]
+    """new chunks to embed and add"""
+
+    ids: List[str]
+    """ids of the new chunks"""
+
+    stale_ids: List[str]
+    """ids of the chunks to delete"""
+
+    files: Dict[str, Dict[str, Any]]
+    """manifest files after the changes"""
+
+
+def get_source(chunk: Any) -> str:
+    """Gets the file path or url a chunk comes from
+
+    Args:
+        chunk (Document): chunk
+
+    Returns:
+        str: chunk source
+    """
+    return str(chunk.metadata.get('source', ''))
+
+
+def get_chunk_hash(chunk: Any) -> str:
+    """Gets the hash of the contents and metadata of a chunk
+
+    Args:
+        chunk (Document): chunk
+
+    Returns:
+        str: chunk hash
+    """
+    content = json.dumps([chunk.page_content, chunk.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_chunk_ids(source: str, chunks: List[Any]) -> List[str]:
+    """Gets the ids of the chunks of a source. Ids depend on the chunk contents and not on their position, so editing
+    part of a file only changes the ids of the edited chunks
+
+    Args:
+        source (str): chunks source
+        chunks (list): chunks of the source, in order
+
+    Returns:
+        list: chunk ids
+    """
+    ids = []
+    occurrences: Dict[str, int] = defaultdict(int)
+    for chunk in chunks:
+        chunk_hash = get_chunk_hash(chunk)
+        # Repeated chunks in a source get different ids
+        ids.append(str(uuid.uuid5(CHUNK_ID_NAMESPACE, f'{source}\n{chunk_hash}\n{occurrences[chunk_hash]}')))
+        occurrences[chunk_hash] += 1
+    return ids
+
+
+def get_mtime(source: str) -> Optional[float]:
+    """Gets the modification time of a source, None for the sources that are not local files
+
+    Args:
+        source (str): chunks source
+
+    Returns:
+        float: modification time
+    """
+    if os.path.isfile(source):
+        return os.path.getmtime(source)
+    return None
+
+
+def get_size(source: str) -> Optional[int]:
+    """Gets the size in bytes of a source, None for the sources that are not local files
+
+    Args:
+        source (str): chunks source
+
+    Returns:
+        int: size
+    """
+    if os.path.isfile(source):
+        return os.path.getsize(source)
+    return None
+
+
+class IngestionManifest:
+    """Record of the files ingested in a persisted vector store.
+
+    For each file path or url, the manifest keeps its modification time and size, the hash of its chunks and the ids
+    of its chunks in the vector store, so that updates only embed the chunks of new or changed files, and delete the
+    stale ones. Local files whose modification time and size didn't change are not even loaded again. The manifest is
+    saved as a JSON file in the vector store directory.
+    """
+
+    def __init__(
+        self,
+        db_type: str,
+        collection_name: Optional[str] = None,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        self.db_type = db_type
+        self.collection_name = collection_name
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+
+    @classmethod
+    def load(cls, persist_directory: Optional[str], db_type: Optional[str] = None) -> Optional[IngestionManifest]:
+        """Loads the manifest of a vector store
+
+        Args:
+            persist_directory (str): vector store directory
+            db_type (str, optional): vector db type the vector store is expected to have. Defaults to None, any type.
+
+        Returns:
+            IngestionManifest: manifest, None if the vector store has no manifest
+
+        Raises:
+            ValueError: if the vector store has another vector db type
+        """
+        if persist_directory is None:
+            return None
+        manifest_path = os.path.join(persist_directory, MANIFEST_FILE_NAME)
+        if not os.path.isfile(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest_dict = json.load(f)
+        if manifest_dict.get('version') != MANIFEST_VERSION:
+            logger.warning(f'Ingestion manifest {manifest_path} has an unsupported version, it is ignored')
+            return None
+        if db_type is not None and manifest_dict['db_type'] != db_type:
+            raise ValueError(
+                f'Vector db {persist_directory} is a {manifest_dict["db_type"]} vector db, not a {db_type} one'
+            )
+        return cls(manifest_dict['db_type'], manifest_dict.get('collection_name'), manifest_dict['files'])
+
+    def save(self, persist_directory: str) -> None:
+        """Saves the manifest in a vector store directory
+
+        Args:
+            persist_directory (str): vector store directory
+        """
+        os.makedirs(persist_directory, exist_ok=True)
+        manifest_path = os.path.join(persist_directory, MANIFEST_FILE_NAME)
+        manifest_dict = {
+            'version': MANIFEST_VERSION,
+            'db_type': self.db_type,
+            'collection_name': self.collection_name,
+            'files': self.files,
+        }
+        # Written to a temporary file first, so that an interrupted save never leaves a corrupted manifest
+        with open(f'{manifest_path}.tmp', 'w') as f:
+            json.dump(manifest_dict, f)
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    def get_unchanged_sources(self) -> List[str]:
+        """Gets the local files of the manifest whose modification time and size didn't change since they were
+        ingested, so that they can be skipped without being loaded
+
+        Returns:
+            list: sources of the unchanged files
+        """
+        return [
+            source
+            for source, file in self.files.items()
+            if file.get('mtime') is not None
+            and file['mtime'] == get_mtime(source)
+            and file.get('size') is not None
+            and file['size'] == get_size(source)
+        ]
+
+    def plan(
+        self, chunks: List[Any], delete_missing: bool = False, unchanged_sources: Optional[Iterable[str]] = None
+    ) -> IngestionPlan:
+        """Gets the changes to apply to the vector store to ingest some chunks
+
+        Args:
+            chunks (list): chunks of the files to ingest
+            delete_missing (bool, optional): whether the files in the manifest that are not in the chunks were deleted,
+                and their chunks have to be deleted too. Defaults to False, the chunks are added to the vector store.
+            unchanged_sources (iterable, optional): sources skipped because they are unchanged, see
+                get_unchanged_sources, whose chunks are kept. Defaults to None.
+
+        Returns:
+            IngestionPlan: chunks to add and chunk ids to delete
+        """
+        sources_plan = self.plan_sources(chunks)
+        stale_ids = sources_plan.stale_ids
+        files = {} if delete_missing else dict(self.files)
+        for source in unchanged_sources or []:
+            files[source] = self.files[source]
+        files.update(sources_plan.files)
+
+        if delete_missing:
+            for source, file in self.files.items():
+                if source not in files:
+                    stale_ids.extend(file['chunk_ids'])
+
+        return IngestionPlan(chunks=sources_plan.chunks, ids=sources_plan.ids, stale_ids=stale_ids, files=files)
+
+    def plan_sources(self, chunks: List[Any]) -> IngestionPlan:
+        """Gets the changes to apply to the vector store to ingest the chunks of some sources, e.g. a batch of a
+        streaming ingestion. Unlike plan, the files of the returned plan are only the sources of the chunks, without
+        copying the other files of the manifest.
+
+        Args:
+            chunks (list): chunks of the files to ingest
+
+        Returns:
+            IngestionPlan: chunks to add and chunk ids to delete, with the manifest entries of the chunks sources
+        """
+        chunks_by_source: Dict[str, List[Any]] = defaultdict(list)
+        for chunk in chunks:
+            chunks_by_source[get_source(chunk)].append(chunk)
+
+        new_chunks = []
+        new_ids = []
+        stale_ids = []
+        num_unchanged = 0
+        files = {}
+        for source, source_chunks in chunks_by_source.items():
+            content_hash = hashlib.sha256(
+                ''.join(get_chunk_hash(chunk) for chunk in source_chunks).encode()
+            ).hexdigest()
+            file = self.files.get(source)
+            if file is not None and file['content_hash'] == content_hash:
+                files[source] = {**file, 'mtime': get_mtime(source), 'size': get_size(source)}
+                num_unchanged += 1
+                continue
+
+            chunk_ids = get_chunk_ids(source, source_chunks)
+            old_ids = set(file['chunk_ids']) if file is not None else set()
+            # Chunks left unchanged in a changed file are kept
+            for chunk, chunk_id in zip(source_chunks, chunk_ids):
+                if chunk_id not in old_ids:
+                    new_chunks.append(chunk)
+                    new_ids.append(chunk_id)
+            stale_ids.extend(old_ids.difference(chunk_ids))
+            files[source] = {
+                'mtime': get_mtime(source),
+                'size': get_size(source),
+                'content_hash': content_hash,
+                'chunk_ids': chunk_ids,
+            }
+
+        logger.debug(
+            f'Ingestion plan: {len(chunks_by_source)} files, {num_unchanged} unchanged, '
+            f'{len(new_chunks)} chunks to add, {len(stale_ids)} chunks to delete'
+        )
+        return IngestionPlan(chunks=new_chunks, ids=new_ids, stale_ids=stale_ids, files=files)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the outputs of a stage
+_END = object()
+
+
+class PipelineStage(NamedTuple):
+    """Stage of an ingestion pipeline"""
+
+    name: str
+    """stage name, used in the progress reports"""
+
+    function: Callable[[Iterator[Any]], Iterator[Any]]
+    """generator function, gets the outputs of the previous stage and yields the outputs of the stage"""
+
+    unit: str = 'items'
+    """unit of the stage outputs, used in the progress reports"""
+
+    count: Callable[[Any], int] = lambda output: 1
+    """number of units in an output, e.g. the number of chunks in a batch"""
+
+
+class StageStats:
+    """Progress of a pipeline stage"""
+
+    def __init__(self, name: str, unit: str) -> None:
+        self.name = name
+        self.unit = unit
+        self.count = 0
+        self.start_time = time.perf_counter()
+        self.end_time: float | None = None
+
+    @property
+    def throughput(self) -> float:
+        """Units output per second since the start of the stage"""
+        elapsed_time = (self.end_time or time.perf_counter()) - self.start_time
+        return self.count / elapsed_time if elapsed_time > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.count} {self.unit} ({self.throughput:.1f} {self.unit}/s)'
+
+
+def run_pipeline(
+    stages: List[PipelineStage],
+    queue_size: int = 4,
+    progress_interval: float = 10.0,
+) -> Iterator[Any]:
+    """Runs the stages of a pipeline concurrently, each in its own thread, connected by bounded queues, so that the
+    memory used doesn't depend on the amount of data going through the pipeline. The first stage gets no inputs, and
+    the outputs of the last stage are yielded in the calling thread. The progress and throughput of each stage are
+    logged every `progress_interval` seconds.
+
+    Args:
+        stages (list): pipeline stages, in order
+        queue_size (int, optional): max number of outputs waiting between two stages. Defaults to 4.
+        progress_interval (float, optional): seconds between progress reports. Defaults to 10.0.
+
+    Yields:
+        outputs of the last stage
+
+    Raises:
+        the first exception raised by a stage, after stopping the other stages
+    """
+    queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stats = [StageStats(stage.name, stage.unit) for stage in stages]
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(output_queue: queue.Queue, output: Any) -> bool:
+        # Waits for room in the queue, unless the pipeline is stopped
+        while not stop.is_set():
+            try:
+                output_queue.put(output, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def iterate(input_queue: queue.Queue) -> Iterator[Any]:
+        while True:
+            try:
+                item = input_queue.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def run_stage(index: int) -> None:
+        stage = stages[index]
+        inputs = iterate(queues[index - 1]) if index > 0 else iter(())
+        try:
+            for output in stage.function(inputs):
+                stats[index].count += stage.count(output)
+                if not put(queues[index], output):
+                    return
+            stats[index].end_time = time.perf_counter()
+            put(queues[index], _END)
+        except BaseException as e:
+            logger.error(f'Ingestion pipeline stage {stage.name} failed: {e}')
+            errors.append(e)
+            stop.set()
+
+    # The last stage runs in the calling thread
+    threads = [threading.Thread(target=run_stage, args=(i,), daemon=True) for i in range(len(stages) - 1)]
+    for thread in threads:
+        thread.start()
+
+    last_stage = stages[-1]
+    last_report_time = time.perf_counter()
+    try:
+        for output in last_stage.function(iterate(queues[-2]) if len(stages) > 1 else iter(())):
+            stats[-1].count += last_stage.count(output)
+            yield output
+            if time.perf_counter() - last_report_time >= progress_interval:
+                logger.info('Ingestion progress - ' + ' | '.join(str(stage_stats) for stage_stats in stats))
+                last_report_time = time.perf_counter()
+        stats[-1].end_time = time.perf_counter()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+    logger.info('Ingestion done - ' + ' | '.join(str(stage_stats) for stage_stats in stats))
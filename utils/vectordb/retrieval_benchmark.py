@@ -0,0 +1,447 @@
+# Define the script's usage example
+USAGE_EXAMPLE = """
+Example usage:
+
+To benchmark the default vector stores on 100k synthetic chunks and save the report at report.json:
+python retrieval_benchmark.py --num_chunks 100000 --output report.json
+
+To benchmark the vector stores of a config file on the *.txt files at input_path:
+python retrieval_benchmark.py --input_path input_path --config runs.yaml --k 1 5 10 --output report.json
+
+The config file holds a list of runs, each one with a name, a db_type and an optional index_config, e.g.:
+- name: faiss-ivf
+  db_type: faiss
+  index_config:
+    factory: IVF1024,Flat
+    nprobe: 16
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import yaml
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+vectordb_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(vectordb_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+
+sys.path.append(repo_dir)
+sys.path.append(utils_dir)
+
+from utils.vectordb.vector_db import VectorDb
+
+logger = logging.getLogger(__name__)
+
+# Vector stores benchmarked when no config file is given
+DEFAULT_RUNS: List[Dict[str, Any]] = [
+    {'name': 'faiss-flat', 'db_type': 'faiss'},
+    {'name': 'faiss-hnsw', 'db_type': 'faiss', 'index_config': {'factory': 'HNSW32', 'ef_search': 64}},
+    {'name': 'faiss-ivf', 'db_type': 'faiss', 'index_config': {'factory': 'IVF256,Flat', 'nprobe': 16}},
+    {'name': 'chroma', 'db_type': 'chroma'},
+    {'name': 'qdrant', 'db_type': 'qdrant'},
+]
+DEFAULT_K_VALUES = [1, 5, 10, 50]
+WARMUP_QUERIES = 10
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic local embedding model, embedding a text as the normalized signed count of its hashed words, so
+    that texts sharing words are close. Fast and reproducible across runs and machines, for benchmarks only."""
+
+    def __init__(self, dimension: int = 256) -> None:
+        """
+        Args:
+            dimension (int, optional): embedding dimension. Defaults to 256.
+        """
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            digest = hashlib.md5(word.encode('utf-8')).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[bucket] += 1.0 if digest[4] % 2 == 0 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Embedding model returning precomputed embeddings, so that the build times measure the vector stores only"""
+
+    def __init__(self, embeddings: Embeddings, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Args:
+            embeddings (Embeddings): embedding model, used for the texts that were not precomputed
+            texts (list): precomputed texts
+            vectors (np.ndarray): embeddings of the texts
+        """
+        self.embeddings = embeddings
+        self.vectors = {text: vector for text, vector in zip(texts, vectors.tolist())}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing_texts = [text for text in texts if text not in self.vectors]
+        if len(missing_texts) > 0:
+            self.vectors.update(zip(missing_texts, self.embeddings.embed_documents(missing_texts)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+def generate_synthetic_chunks(
+    num_chunks: int, words_per_chunk: int = 100, vocabulary_size: int = 20000, seed: int = 0
+) -> List[Document]:
+    """Generates chunks of random words, drawn with a Zipf distribution like the words of natural text
+
+    Args:
+        num_chunks (int): number of chunks
+        words_per_chunk (int, optional): number of words per chunk. Defaults to 100.
+        vocabulary_size (int, optional): number of distinct words. Defaults to 20000.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        list: chunks, 50 per synthetic source file
+    """
+    rng = np.random.default_rng(seed)
+    word_ids = rng.zipf(1.3, size=(num_chunks, words_per_chunk)) % vocabulary_size
+    return [
+        Document(
+            page_content=' '.join(f'w{word_id}' for word_id in chunk_word_ids),
+            metadata={'source': f'synthetic/doc_{i // 50}.txt'},
+        )
+        for i, chunk_word_ids in enumerate(word_ids)
+    ]
+
+
+def generate_queries(chunks: List[Document], num_queries: int, words_per_query: int = 8, seed: int = 0) -> List[str]:
+    """Generates queries from random spans of words of random chunks
+
+    Args:
+        chunks (list): chunks
+        num_queries (int): number of queries
+        words_per_query (int, optional): number of words per query. Defaults to 8.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        list: queries
+    """
+    rng = np.random.default_rng(seed)
+    queries = []
+    for chunk_index in rng.integers(len(chunks), size=num_queries):
+        words = chunks[chunk_index].page_content.split()
+        start = int(rng.integers(max(len(words) - words_per_query, 0) + 1))
+        queries.append(' '.join(words[start : start + words_per_query]))
+    return queries
+
+
+def exact_search(
+    doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int, batch_size: int = 256
+) -> Dict[str, np.ndarray]:
+    """Exact nearest neighbours by L2 distance, the ground truth of the recall
+
+    Args:
+        doc_vectors (np.ndarray): chunk embeddings
+        query_vectors (np.ndarray): query embeddings
+        k (int): number of neighbours
+        batch_size (int, optional): number of queries searched at once. Defaults to 256.
+
+    Returns:
+        dict: `indices` and squared L2 `distances` of the k nearest chunks of each query, closest first
+    """
+    k = min(k, len(doc_vectors))
+    doc_norms = (doc_vectors**2).sum(axis=1)
+    all_indices = []
+    all_distances = []
+    for start in range(0, len(query_vectors), batch_size):
+        queries = query_vectors[start : start + batch_size]
+        distances = doc_norms[None, :] - 2 * queries @ doc_vectors.T + (queries**2).sum(axis=1)[:, None]
+        indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        indices_distances = np.take_along_axis(distances, indices, axis=1)
+        order = np.argsort(indices_distances, axis=1)
+        all_indices.append(np.take_along_axis(indices, order, axis=1))
+        all_distances.append(np.take_along_axis(indices_distances, order, axis=1))
+    return {'indices': np.concatenate(all_indices), 'distances': np.concatenate(all_distances)}
+
+
+def get_rss_mb() -> float:
+    """Gets the resident memory of the process, in MB. Without psutil, the peak resident memory is returned instead.
+
+    Returns:
+        float: resident memory
+    """
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB on Linux
+        return max_rss / 2**20 if platform.system() == 'Darwin' else max_rss / 2**10
+
+
+def get_directory_size_mb(path: str) -> float:
+    """Gets the size of the files of a directory, in MB
+
+    Args:
+        path (str): directory
+
+    Returns:
+        float: size
+    """
+    size = 0
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            size += os.path.getsize(os.path.join(root, file_name))
+    return size / 2**20
+
+
+def benchmark_run(
+    run: Dict[str, Any],
+    chunks: List[Document],
+    doc_vectors: np.ndarray,
+    queries: List[str],
+    query_vectors: np.ndarray,
+    ground_truth: Dict[str, np.ndarray],
+    k_values: List[int],
+    embeddings: Embeddings,
+    work_dir: str,
+) -> Dict[str, Any]:
+    """Builds a vector store and measures its build time, size, memory, query latency and recall
+
+    Args:
+        run (dict): run name, db_type and index_config
+        chunks (list): chunks, with their position in the `chunk_index` metadata
+        doc_vectors (np.ndarray): chunk embeddings
+        queries (list): queries
+        query_vectors (np.ndarray): query embeddings
+        ground_truth (dict): exact search results of the queries for the largest k
+        k_values (list): numbers of results to measure latency and recall at
+        embeddings (Embeddings): embedding model
+        work_dir (str): directory the vector store is saved in
+
+    Returns:
+        dict: run results
+    """
+    vectordb = VectorDb()
+    output_db = os.path.join(work_dir, run['name'])
+    precomputed_embeddings = PrecomputedEmbeddings(embeddings, [chunk.page_content for chunk in chunks], doc_vectors)
+
+    rss_before = get_rss_mb()
+    start_time = time.perf_counter()
+    vector_store = vectordb.create_vector_store(
+        chunks, precomputed_embeddings, run['db_type'], output_db, index_config=run.get('index_config')
+    )
+    build_time = time.perf_counter() - start_time
+    rss_after = get_rss_mb()
+
+    results: Dict[str, Any] = {
+        'name': run['name'],
+        'db_type': run['db_type'],
+        'index_config': run.get('index_config'),
+        'build_time_s': build_time,
+        'build_throughput_chunks_per_s': len(chunks) / build_time if build_time > 0 else None,
+        'index_size_mb': get_directory_size_mb(output_db),
+        'rss_mb': rss_after,
+        'rss_build_delta_mb': rss_after - rss_before,
+        'queries': {},
+    }
+
+    for query_vector in query_vectors[:WARMUP_QUERIES]:
+        vector_store.similarity_search_by_vector(query_vector.tolist(), k=max(k_values))
+
+    for k in k_values:
+        latencies = []
+        recalls = []
+        for query_vector, true_distances in zip(query_vectors, ground_truth['distances']):
+            start_time = time.perf_counter()
+            docs = vector_store.similarity_search_by_vector(query_vector.tolist(), k=k)
+            latencies.append(time.perf_counter() - start_time)
+            # A result is a true neighbour if it's as close as the k-th exact neighbour, so that ties don't count as
+            # misses
+            indices = [doc.metadata['chunk_index'] for doc in docs]
+            distances = ((doc_vectors[indices] - query_vector) ** 2).sum(axis=1)
+            max_distance = true_distances[min(k, len(true_distances)) - 1] + 1e-5
+            recalls.append(float((distances <= max_distance).sum()) / min(k, len(doc_vectors)))
+        latencies_ms = np.array(latencies) * 1000
+        results['queries'][f'k={k}'] = {
+            'latency_p50_ms': float(np.percentile(latencies_ms, 50)),
+            'latency_p99_ms': float(np.percentile(latencies_ms, 99)),
+            'latency_mean_ms': float(latencies_ms.mean()),
+            'queries_per_s': float(len(latencies) / sum(latencies)),
+            f'recall@{k}': float(np.mean(recalls)),
+        }
+
+    if run['db_type'] == 'qdrant':
+        # Local qdrant dbs are locked until their client is closed
+        vector_store.client.close()
+    elif run['db_type'] == 'chroma':
+        vector_store.delete_collection()
+    return results
+
+
+def run_benchmark(
+    runs: List[Dict[str, Any]],
+    chunks: Optional[List[Document]] = None,
+    num_chunks: int = 10000,
+    num_queries: int = 200,
+    k_values: List[int] = DEFAULT_K_VALUES,
+    embeddings: Optional[Embeddings] = None,
+    work_dir: Optional[str] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Benchmarks the retrieval of several vector stores built from the same chunks
+
+    Args:
+        runs (list): runs, each one with a name, a db_type and an optional index_config, see create_vector_store
+        chunks (list, optional): chunks to index. Defaults to None, `num_chunks` synthetic chunks are generated.
+        num_chunks (int, optional): number of synthetic chunks. Defaults to 10000.
+        num_queries (int, optional): number of queries. Defaults to 200.
+        k_values (list, optional): numbers of results to measure latency and recall at. Defaults to [1, 5, 10, 50].
+        embeddings (Embeddings, optional): embedding model. Defaults to HashingEmbeddings.
+        work_dir (str, optional): directory the vector stores are saved in. Defaults to a temporary directory, deleted
+            at the end.
+        seed (int, optional): random seed of the synthetic chunks and of the queries. Defaults to 0.
+
+    Returns:
+        dict: benchmark report
+    """
+    embeddings = embeddings or HashingEmbeddings()
+    if chunks is None:
+        chunks = generate_synthetic_chunks(num_chunks, seed=seed)
+    # The position of the chunks identifies them in the search results
+    chunks = [
+        Document(page_content=chunk.page_content, metadata={**chunk.metadata, 'chunk_index': i})
+        for i, chunk in enumerate(chunks)
+    ]
+    queries = generate_queries(chunks, num_queries, seed=seed)
+
+    logger.info(f'Embedding {len(chunks)} chunks and {len(queries)} queries')
+    start_time = time.perf_counter()
+    doc_vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    embedding_time = time.perf_counter() - start_time
+    query_vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    ground_truth = exact_search(doc_vectors, query_vectors, max(k_values))
+
+    report: Dict[str, Any] = {
+        'num_chunks': len(chunks),
+        'num_queries': len(queries),
+        'dimension': int(doc_vectors.shape[1]),
+        'k_values': k_values,
+        'embedding_model': type(embeddings).__name__,
+        'embedding_time_s': embedding_time,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'runs': [],
+    }
+
+    temporary_dir = None
+    if work_dir is None:
+        temporary_dir = tempfile.mkdtemp(prefix='retrieval_benchmark_')
+        work_dir = temporary_dir
+    try:
+        for run in runs:
+            logger.info(f'Benchmarking {run["name"]}')
+            try:
+                results = benchmark_run(
+                    run, chunks, doc_vectors, queries, query_vectors, ground_truth, k_values, embeddings, work_dir
+                )
+            except Exception as e:
+                logger.error(f'Benchmark {run["name"]} failed: {e}')
+                results = {'name': run['name'], 'db_type': run['db_type'], 'error': str(e)}
+            report['runs'].append(results)
+    finally:
+        if temporary_dir is not None:
+            shutil.rmtree(temporary_dir, ignore_errors=True)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats the results of a benchmark report as a table
+
+    Args:
+        report (dict): benchmark report
+
+    Returns:
+        str: table, one row per run and k
+    """
+    header = f'{"run":<20}{"k":>5}{"build s":>10}{"size MB":>10}{"RSS MB":>10}{"p50 ms":>10}{"p99 ms":>10}{"recall":>8}'
+    lines = [header, '-' * len(header)]
+    for run in report['runs']:
+        if 'error' in run:
+            lines.append(f'{run["name"]:<20} failed: {run["error"]}')
+            continue
+        for k_key, query_results in run['queries'].items():
+            k = int(k_key.split('=')[1])
+            lines.append(
+                f'{run["name"]:<20}{k:>5}{run["build_time_s"]:>10.2f}{run["index_size_mb"]:>10.1f}'
+                f'{run["rss_mb"]:>10.0f}{query_results["latency_p50_ms"]:>10.2f}'
+                f'{query_results["latency_p99_ms"]:>10.2f}{query_results[f"recall@{k}"]:>8.3f}'
+            )
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the retrieval of vector stores',
+        epilog=USAGE_EXAMPLE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--input_path', type=str, default=None, help='Directory of *.txt files to chunk and index')
+    parser.add_argument('--chunk_size', type=int, default=1000, help='Chunk size (default: 1000)')
+    parser.add_argument('--chunk_overlap', type=int, default=200, help='Chunk overlap (default: 200)')
+    parser.add_argument('--num_chunks', type=int, default=10000, help='Number of synthetic chunks (default: 10000)')
+    parser.add_argument('--num_queries', type=int, default=200, help='Number of queries (default: 200)')
+    parser.add_argument('--k', type=int, nargs='+', default=DEFAULT_K_VALUES, help='Numbers of results to measure')
+    parser.add_argument('--dimension', type=int, default=256, help='Embedding dimension (default: 256)')
+    parser.add_argument('--config', type=str, default=None, help='YAML file with the runs to benchmark')
+    parser.add_argument('--work_dir', type=str, default=None, help='Directory to keep the vector stores in')
+    parser.add_argument('--output', type=str, default='retrieval_benchmark.json', help='Path of the JSON report')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    runs = DEFAULT_RUNS
+    if args.config is not None:
+        with open(args.config) as f:
+            runs = yaml.safe_load(f)
+
+    chunks = None
+    if args.input_path is not None:
+        chunks = VectorDb().load_and_chunk_files(args.input_path, args.chunk_size, args.chunk_overlap)
+
+    report = run_benchmark(
+        runs,
+        chunks=chunks,
+        num_chunks=args.num_chunks,
+        num_queries=args.num_queries,
+        k_values=sorted(args.k),
+        embeddings=HashingEmbeddings(args.dimension),
+        work_dir=args.work_dir,
+        seed=args.seed,
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    logger.info(f'Benchmark report saved to {args.output}')
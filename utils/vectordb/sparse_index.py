@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from utils.sqlite_store import SQLiteStore, iterate_over_chunks
+
+logger = logging.getLogger(__name__)
+
+SPARSE_INDEX_FILE_NAME = 'bm25_index.sqlite'
+
+# Words, keeping the identifiers with inner punctuation like tickers, part numbers or error codes as one token
+_TOKEN_PATTERN = re.compile(r'\w+(?:[-_./:]\w+)*')
+_WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into lowercase index terms. Compound tokens like `XJ-2041` are indexed whole and by part, so that
+    exact identifiers rank first and their parts still match.
+
+    Args:
+        text (str): text
+
+    Returns:
+        list: terms, in order, with repetitions
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = _WORD_PATTERN.findall(token)
+        if len(parts) > 1 or (len(parts) == 1 and parts[0] != token):
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index(SQLiteStore):
+    """Persistent inverted index of chunks, searched with Okapi BM25.
+
+    The postings, the chunks and the corpus statistics are stored in an SQLite file, so the index is updated
+    incrementally with `add_documents` and `delete`, using the same chunk ids as the vector store, and searches only
+    read the postings of the query terms.
+    """
+
+    def __init__(self, persist_directory: Optional[str] = None, k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        Args:
+            persist_directory (str, optional): directory of the index file, usually the vector db directory.
+                Defaults to None, the index is kept in memory.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 document length normalization. Defaults to 0.75.
+        """
+        super().__init__(None if persist_directory is None else os.path.join(persist_directory, SPARSE_INDEX_FILE_NAME))
+        self.persist_directory = persist_directory
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def load(cls, persist_directory: Optional[str], **kwargs: Any) -> Optional[BM25Index]:
+        """Loads the sparse index of a vector db
+
+        Args:
+            persist_directory (str): vector db directory
+            kwargs: BM25Index arguments
+
+        Returns:
+            BM25Index: sparse index, None if the vector db has none
+        """
+        if persist_directory is None or not os.path.isfile(os.path.join(persist_directory, SPARSE_INDEX_FILE_NAME)):
+            return None
+        return cls(persist_directory, **kwargs)
+
+    def _create_schema(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS documents (doc INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, '
+            'length INTEGER NOT NULL, page_content TEXT NOT NULL, metadata TEXT NOT NULL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL, '
+            'PRIMARY KEY (term, doc)) WITHOUT ROWID'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)')
+        connection.execute('CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        connection.execute("INSERT OR IGNORE INTO stats VALUES ('num_docs', 0), ('total_length', 0)")
+
+    def _delete(self, connection: sqlite3.Connection, ids: Sequence[str]) -> int:
+        num_deleted = 0
+        for ids_chunk in iterate_over_chunks(ids):
+            rows = connection.execute(
+                f'SELECT doc, length FROM documents WHERE id IN ({",".join("?" * len(ids_chunk))})', ids_chunk
+            ).fetchall()
+            if len(rows) == 0:
+                continue
+            connection.executemany('DELETE FROM postings WHERE doc = ?', [(doc,) for doc, _ in rows])
+            connection.executemany('DELETE FROM documents WHERE doc = ?', [(doc,) for doc, _ in rows])
+            connection.execute("UPDATE stats SET value = value - ? WHERE key = 'num_docs'", (len(rows),))
+            connection.execute(
+                "UPDATE stats SET value = value - ? WHERE key = 'total_length'", (sum(length for _, length in rows),)
+            )
+            num_deleted += len(rows)
+        return num_deleted
+
+    def add_documents(self, documents: Sequence[Document], ids: Sequence[str]) -> None:
+        """Adds chunks to the index, replacing the chunks with the same ids
+
+        Args:
+            documents (list): chunks
+            ids (list): chunk ids, the same as in the vector store
+        """
+        if len(documents) == 0:
+            return
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                self._delete(connection, list(ids))
+                total_length = 0
+                for document, id in zip(documents, ids):
+                    term_counts = Counter(tokenize(document.page_content))
+                    length = sum(term_counts.values())
+                    total_length += length
+                    cursor = connection.execute(
+                        'INSERT INTO documents (id, length, page_content, metadata) VALUES (?, ?, ?, ?)',
+                        (id, length, document.page_content, json.dumps(document.metadata, default=str)),
+                    )
+                    connection.executemany(
+                        'INSERT INTO postings VALUES (?, ?, ?)',
+                        [(term, cursor.lastrowid, tf) for term, tf in term_counts.items()],
+                    )
+                connection.execute("UPDATE stats SET value = value + ? WHERE key = 'num_docs'", (len(documents),))
+                connection.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (total_length,))
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """Deletes chunks from the index
+
+        Args:
+            ids (list): chunk ids, the ids not in the index are ignored
+
+        Returns:
+            int: number of chunks deleted
+        """
+        if len(ids) == 0:
+            return 0
+        with self.lock:
+            with self._transaction('IMMEDIATE') as connection:
+                return self._delete(connection, list(ids))
+
+    def __len__(self) -> int:
+        with self.lock:
+            row = self._get_connection().execute("SELECT value FROM stats WHERE key = 'num_docs'").fetchone()
+        return int(row[0])
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Searches the chunks matching the terms of a query
+
+        Args:
+            query (str): query
+            k (int, optional): number of chunks to return. Defaults to 4.
+
+        Returns:
+            list: chunks and their BM25 scores, highest first. Chunks matching none of the query terms are not
+                returned.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if len(terms) == 0:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        with self.lock:
+            with self._transaction() as connection:
+                stats = dict(connection.execute('SELECT key, value FROM stats').fetchall())
+                num_docs = stats['num_docs']
+                if num_docs == 0:
+                    return []
+                average_length = stats['total_length'] / num_docs
+                for term in terms:
+                    postings = connection.execute(
+                        'SELECT p.doc, p.tf, d.length FROM postings p JOIN documents d ON d.doc = p.doc '
+                        'WHERE p.term = ?',
+                        (term,),
+                    ).fetchall()
+                    df = len(postings)
+                    idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                    for doc, tf, length in postings:
+                        norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                        scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+                top_docs = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+                if len(top_docs) == 0:
+                    return []
+                rows = connection.execute(
+                    f'SELECT doc, id, page_content, metadata FROM documents '
+                    f'WHERE doc IN ({",".join("?" * len(top_docs))})',
+                    [doc for doc, _ in top_docs],
+                ).fetchall()
+        documents = {
+            doc: Document(page_content=page_content, metadata=json.loads(metadata), id=id)
+            for doc, id, page_content, metadata in rows
+        }
+        return [(documents[doc], score) for doc, score in top_docs]
@@ -18,13 +18,18 @@ Optional arguments:
 
 import argparse
 import logging
+import math
 import os
+import shutil
 import sys
-from typing import Any, List, Optional, Set
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
 
-from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredURLLoader
+from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader, UnstructuredURLLoader
 from langchain_community.vectorstores import FAISS, Chroma, Qdrant
+from langchain_core.documents import Document
 
 vectordb_dir = os.path.dirname(os.path.abspath(__file__))
 utils_dir = os.path.abspath(os.path.join(vectordb_dir, '..'))
@@ -36,6 +41,20 @@ sys.path.append(utils_dir)
 import uuid
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.vectordb.chunking import get_text_splitter, list_files, load_and_chunk_files
+from utils.vectordb.index_config import (
+    DEFAULT_FAISS_TRAIN_SIZE,
+    build_faiss_index,
+    faiss_factory_supports_removal,
+    faiss_index_needs_training,
+    faiss_index_supports_removal,
+    get_chroma_collection_metadata,
+    get_qdrant_collection_kwargs,
+    set_faiss_search_parameters,
+)
+from utils.vectordb.ingestion_manifest import IngestionManifest, IngestionPlan, get_source
+from utils.vectordb.ingestion_pipeline import PipelineStage, run_pipeline
+from utils.vectordb.sparse_index import SPARSE_INDEX_FILE_NAME, BM25Index
 
 EMBEDDING_MODEL = 'intfloat/e5-large-v2'
 NORMALIZE_EMBEDDINGS = True
@@ -64,31 +83,36 @@ class VectorDb:
         None
 
     Attributes:
-        None
+        sparse_index: BM25 index of the last vector store created or loaded, None if it has none
 
     Methods:
+        iterate_files: Lazily load files from an input directory as langchain documents
         load_files: Load files from an input directory as langchain documents
         get_text_chunks: Get text chunks from a list of documents
         get_token_chunks: Get token chunks from a list of documents
+        load_and_chunk_files: Load and chunk files in parallel, in a pool of processes
         create_vector_store: Create a vector store from chunks and an embedding model
         load_vdb: load a previous stored vector database
-        update_vdb: Update an existing vector store with new chunks
+        update_vdb: Update an existing vector store with new chunks, embedding only the new or changed ones
+        ingest_streaming: Create or update a vector store from a stream of documents in constant memory
         create_vdb: Create a vector database from the raw files in a specific input directory
     """
 
     def __init__(self) -> None:
         self.collection_id = str(uuid.uuid4())
         self.vector_collections: Set[Any] = set()
+        self.sparse_index: Optional[BM25Index] = None
 
-    def load_files(
+    def iterate_files(
         self,
         input_path: str,
         recursive: bool = False,
         load_txt: bool = True,
         load_pdf: bool = False,
         urls: Optional[List[Any]] = None,
-    ) -> List[Any]:
-        """Load files from input location
+        skip_sources: Optional[Set[str]] = None,
+    ) -> Iterator[Any]:
+        """Lazily load files from input location, one document at a time
 
         Args:
             input_path : input location of files
@@ -96,32 +120,86 @@ class VectorDb:
             load_txt (bool, optional): flag to load txt files. Defaults to True.
             load_pdf (bool, optional): flag to load pdf files. Defaults to False.
             urls (list, optional): list of urls to load. Defaults to None.
+            skip_sources (set, optional): paths of the files not to load, e.g. the files unchanged since the last
+                ingestion, see IngestionManifest.get_unchanged_sources. Defaults to None.
 
-        Returns:
-            list: list of documents
+        Yields:
+            Document: loaded document
         """
-        docs = []
         text_loader_kwargs = {'autodetect_encoding': True}
         loader: DirectoryLoader | UnstructuredURLLoader
         if input_path is not None:
-            if load_txt:
-                loader = DirectoryLoader(
-                    input_path, glob='*.txt', recursive=recursive, show_progress=True, loader_kwargs=text_loader_kwargs
-                )
-                docs.extend(loader.load())
-            if load_pdf:
-                loader = DirectoryLoader(
-                    input_path, glob='*.pdf', recursive=recursive, show_progress=True, loader_kwargs=text_loader_kwargs
-                )
-                docs.extend(loader.load())
+            for glob_pattern, load in [('*.txt', load_txt), ('*.pdf', load_pdf)]:
+                if not load:
+                    continue
+                if skip_sources:
+                    # Same files and loader as the DirectoryLoader, which can only exclude files by pattern
+                    for file_path in list_files(input_path, glob_pattern, recursive=recursive):
+                        if file_path not in skip_sources:
+                            yield from UnstructuredFileLoader(file_path, **text_loader_kwargs).lazy_load()
+                else:
+                    loader = DirectoryLoader(
+                        input_path,
+                        glob=glob_pattern,
+                        recursive=recursive,
+                        show_progress=True,
+                        loader_kwargs=text_loader_kwargs,
+                    )
+                    yield from loader.lazy_load()
         if urls:
             loader = UnstructuredURLLoader(urls=urls)
-            docs.extend(loader.load())
+            yield from loader.lazy_load()
+
+    def load_files(
+        self,
+        input_path: str,
+        recursive: bool = False,
+        load_txt: bool = True,
+        load_pdf: bool = False,
+        urls: Optional[List[Any]] = None,
+        skip_sources: Optional[Set[str]] = None,
+    ) -> List[Any]:
+        """Load files from input location
+
+        Args:
+            input_path : input location of files
+            recursive (bool, optional): flag to load files recursively. Defaults to False.
+            load_txt (bool, optional): flag to load txt files. Defaults to True.
+            load_pdf (bool, optional): flag to load pdf files. Defaults to False.
+            urls (list, optional): list of urls to load. Defaults to None.
+            skip_sources (set, optional): paths of the files not to load, see iterate_files. Defaults to None.
+
+        Returns:
+            list: list of documents
+        """
+        docs = list(
+            self.iterate_files(
+                input_path,
+                recursive=recursive,
+                load_txt=load_txt,
+                load_pdf=load_pdf,
+                urls=urls,
+                skip_sources=skip_sources,
+            )
+        )
 
         logger.info(f'Total {len(docs)} files loaded')
 
         return docs
 
+    def get_text_splitter(self, chunk_size: int, chunk_overlap: int, tokenizer: Optional[Any] = None) -> Any:
+        """Gets a text splitter, by number of characters or by number of tokens if a tokenizer is given
+
+        Args:
+            chunk_size (int): chunk size
+            chunk_overlap (int): chunk overlap
+            tokenizer (optional): HuggingFace tokenizer, or tokenizer name or path. Defaults to None.
+
+        Returns:
+            text splitter
+        """
+        return get_text_splitter(chunk_size, chunk_overlap, tokenizer)
+
     def get_text_chunks(
         self, docs: List[Any], chunk_size: int, chunk_overlap: int, meta_data: Optional[List[Any]] = None
     ) -> List[Any]:
@@ -138,9 +216,7 @@ class VectorDb:
             list: list of documents
         """
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
-        )
+        text_splitter = self.get_text_splitter(chunk_size, chunk_overlap)
 
         if meta_data is None:
             logger.info(f'Splitter: splitting documents')
@@ -161,14 +237,13 @@ class VectorDb:
             If metadata is passed, this parameter is a list of texts.
             chunk_size (int): chunk size in number of tokens
             chunk_overlap (int): chunk overlap in number of tokens
+            tokenizer: HuggingFace tokenizer, or tokenizer name or path, taken from the shared tokenizer registry
 
         Returns:
             list: list of documents
         """
 
-        text_splitter = CharacterTextSplitter.from_huggingface_tokenizer(
-            tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap
-        )
+        text_splitter = self.get_text_splitter(chunk_size, chunk_overlap, tokenizer)
 
         logger.info(f'Splitter: splitting documents')
         chunks = text_splitter.split_documents(docs)
@@ -177,6 +252,68 @@ class VectorDb:
 
         return chunks
 
+    def load_and_chunk_files(
+        self,
+        input_path: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        recursive: bool = False,
+        tokenizer: Optional[Any] = None,
+        load_txt: bool = True,
+        load_pdf: bool = False,
+        urls: Optional[List[Any]] = None,
+        num_workers: Optional[int] = None,
+        skip_sources: Optional[Set[str]] = None,
+    ) -> List[Any]:
+        """Loads and chunks files in parallel. The files are sharded across a pool of processes, each one loading and
+        chunking its shards, and the chunks are returned in the order of the sorted file paths.
+
+        Args:
+            input_path : input location of files
+            chunk_size (int): chunk size, in characters or in tokens if a tokenizer is given
+            chunk_overlap (int): chunk overlap, in characters or in tokens if a tokenizer is given
+            recursive (bool, optional): flag to load files recursively. Defaults to False.
+            tokenizer (optional): HuggingFace tokenizer, or tokenizer name or path. Defaults to None.
+            load_txt (bool, optional): flag to load txt files. Defaults to True.
+            load_pdf (bool, optional): flag to load pdf files. Defaults to False.
+            urls (list, optional): list of urls to load, loaded and chunked in the calling process. Defaults to None.
+            num_workers (int, optional): number of worker processes. Defaults to the number of cores.
+            skip_sources (set, optional): paths of the files not to load, see iterate_files. Defaults to None.
+
+        Returns:
+            list: list of chunks
+        """
+        file_paths = []
+        if input_path is not None:
+            if load_txt:
+                file_paths.extend(list_files(input_path, '*.txt', recursive=recursive))
+            if load_pdf:
+                file_paths.extend(list_files(input_path, '*.pdf', recursive=recursive))
+        if skip_sources:
+            file_paths = [file_path for file_path in file_paths if file_path not in skip_sources]
+
+        chunks = []
+        if len(file_paths) > 0:
+            num_workers = min(num_workers or os.cpu_count() or 1, len(file_paths))
+            # Several shards per worker, so that the workers done first take the remaining shards
+            shard_size = math.ceil(len(file_paths) / (num_workers * 4))
+            shards = [file_paths[i : i + shard_size] for i in range(0, len(file_paths), shard_size)]
+            logger.info(f'Loading and chunking {len(file_paths)} files in {num_workers} processes')
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                # map returns the shards in order
+                for records in executor.map(
+                    load_and_chunk_files, shards, repeat(chunk_size), repeat(chunk_overlap), repeat(tokenizer)
+                ):
+                    chunks.extend(Document(page_content=content, metadata=metadata) for content, metadata in records)
+
+        if urls:
+            url_docs = UnstructuredURLLoader(urls=urls).load()
+            chunks.extend(self.get_text_splitter(chunk_size, chunk_overlap, tokenizer).split_documents(url_docs))
+
+        logger.info(f'Total {len(chunks)} chunks created')
+
+        return chunks
+
     def create_vector_store(
         self,
         chunks: list,
@@ -184,22 +321,52 @@ class VectorDb:
         db_type: str,
         output_db: Optional[str] = None,
         collection_name: Optional[str] = None,
+        index_config: Optional[Dict[str, Any]] = None,
+        sparse_index: bool = False,
     ) -> Any:
-        """Creates a vector store
+        """Creates a vector store. If it's saved, an ingestion manifest is saved with it, so that later updates only
+        embed the new or changed chunks.
 
         Args:
             chunks (list): list of chunks
             embeddings (HuggingFaceInstructEmbeddings): embedding model
             db_type (str): vector db type
             output_db (str, optional): output path to save the vector db. Defaults to None.
+            index_config (dict, optional): index configuration of the vector db type, e.g. a faiss IVF or HNSW index
+                instead of a flat one, see utils/vectordb/index_config.py. Defaults to None, the default index.
+            sparse_index (bool, optional): whether to also build a BM25 index of the chunks, saved with the vector
+                db and kept in `self.sparse_index`, for hybrid retrieval with HybridRetriever. Defaults to False.
         """
         if collection_name is None:
             collection_name = f'collection_{self.collection_id}'
             logger.info(f'This is the collection name: {collection_name}')
 
+        ids = None
+        manifest = None
+        if output_db:
+            manifest = IngestionManifest(db_type, {'chroma': collection_name, 'qdrant': 'test_collection'}.get(db_type))
+            plan = manifest.plan(chunks)
+            chunks, ids = plan.chunks, plan.ids
+            manifest.files = plan.files
+
         vector_store: FAISS | Qdrant | Chroma
         if db_type == 'faiss':
-            vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings)
+            if index_config and index_config.get('factory'):
+                # The index is trained on the embeddings of the chunks before they are added
+                vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+                vector_store = self._create_empty_vector_store(
+                    embeddings,
+                    db_type,
+                    self._get_embedding_dimension(embeddings, vectors),
+                    output_db,
+                    None,
+                    index_config,
+                    vectors,
+                )
+                if len(chunks) > 0:
+                    self._add_embedded_chunks(vector_store, chunks, vectors, ids, db_type)  # type: ignore
+            else:
+                vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings, ids=ids)
             if output_db:
                 vector_store.save_local(output_db)
 
@@ -208,13 +375,21 @@ class VectorDb:
                 vector_store = Chroma()
                 vector_store.delete_collection()
                 vector_store = Chroma.from_documents(
-                    documents=chunks, embedding=embeddings, persist_directory=output_db, collection_name=collection_name
+                    documents=chunks,
+                    embedding=embeddings,
+                    persist_directory=output_db,
+                    collection_name=collection_name,
+                    collection_metadata=get_chroma_collection_metadata(index_config),
+                    ids=ids,
                 )
             else:
                 vector_store = Chroma()
                 vector_store.delete_collection()
                 vector_store = Chroma.from_documents(
-                    documents=chunks, embedding=embeddings, collection_name=collection_name
+                    documents=chunks,
+                    embedding=embeddings,
+                    collection_name=collection_name,
+                    collection_metadata=get_chroma_collection_metadata(index_config),
                 )
             self.vector_collections.add(collection_name)
 
@@ -225,14 +400,31 @@ class VectorDb:
                     embedding=embeddings,
                     path=output_db,
                     collection_name='test_collection',
+                    ids=ids,
+                    **get_qdrant_collection_kwargs(index_config),
                 )
             else:
                 vector_store = Qdrant.from_documents(
                     documents=chunks,
                     embedding=embeddings,
                     collection_name='test_collection',
+                    **get_qdrant_collection_kwargs(index_config),
                 )
 
+        if output_db and os.path.isfile(os.path.join(output_db, SPARSE_INDEX_FILE_NAME)):
+            # Left by a previous vector db
+            os.remove(os.path.join(output_db, SPARSE_INDEX_FILE_NAME))
+        self.sparse_index = None
+        if sparse_index:
+            if ids is None:
+                plan = IngestionManifest(db_type).plan(chunks)
+                chunks, ids = plan.chunks, plan.ids
+            self.sparse_index = BM25Index(output_db)
+            self.sparse_index.add_documents(chunks, ids)  # type: ignore
+
+        if manifest is not None and output_db is not None:
+            manifest.save(output_db)
+
         logger.info(f'Vector store saved to {output_db}')
 
         return vector_store
@@ -243,10 +435,25 @@ class VectorDb:
         embedding_model: Any,
         db_type: str = 'chroma',
         collection_name: Optional[str] = None,
+        index_config: Optional[Dict[str, Any]] = None,
     ) -> Any:
+        """Loads a persisted vector store
+
+        Args:
+            persist_directory (str): path of the vector db, or url of the qdrant server for qdrant vector dbs
+            embedding_model (HuggingFaceInstructEmbeddings): embedding model
+            db_type (str, optional): vector db type. Defaults to 'chroma'.
+            collection_name (str, optional): collection name, for chroma and qdrant. Defaults to None.
+            index_config (dict, optional): index configuration, only the faiss search parameters are applied, the
+                other settings are those the vector db was created with. Defaults to None.
+
+        Returns:
+            vector store
+        """
         vector_store: FAISS | Qdrant | Chroma
         if db_type == 'faiss':
             vector_store = FAISS.load_local(persist_directory, embedding_model, allow_dangerous_deserialization=True)  # type: ignore
+            set_faiss_search_parameters(vector_store.index, index_config)
         elif db_type == 'chroma':
             if collection_name:
                 vector_store = Chroma(
@@ -257,11 +464,21 @@ class VectorDb:
             else:
                 vector_store = Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
         elif db_type == 'qdrant':
-            # TODO: Implement Qdrant loading
-            pass
+            from qdrant_client import QdrantClient
+
+            collection_name = collection_name or 'test_collection'
+            if persist_directory is not None and persist_directory.startswith(('http://', 'https://')):
+                client = QdrantClient(url=persist_directory)
+            else:
+                client = QdrantClient(path=persist_directory)
+            if not client.collection_exists(collection_name):
+                raise ValueError(f'Qdrant vector db {persist_directory} has no collection {collection_name}')
+            vector_store = Qdrant(client=client, collection_name=collection_name, embeddings=embedding_model)
         else:
             raise ValueError(f'Unsupported database type: {db_type}')
 
+        self.sparse_index = BM25Index.load(persist_directory)
+
         return vector_store
 
     def update_vdb(
@@ -271,21 +488,423 @@ class VectorDb:
         db_type: str,
         input_db: Optional[str] = None,
         output_db: Optional[str] = None,
+        delete_missing: bool = False,
+        index_config: Optional[Dict[str, Any]] = None,
+        unchanged_sources: Optional[Set[str]] = None,
     ) -> Any:
+        """Updates a persisted vector store with new chunks. Using the ingestion manifest of the vector store, only the
+        chunks of new or changed files are embedded and added, and the chunks changed files no longer have are deleted.
+        Vector stores without manifest get all the chunks added, and a manifest for the later updates. The BM25 index
+        of the vector db, if it has one, is updated the same way.
+
+        Args:
+            chunks (list): list of chunks
+            embeddings (HuggingFaceInstructEmbeddings): embedding model
+            db_type (str): vector db type
+            input_db (str): path of the vector db to update
+            output_db (str, optional): output path to save the updated vector db. Defaults to None, faiss vector dbs
+                are then only updated in memory, and chroma and qdrant vector dbs are updated in place.
+            delete_missing (bool, optional): whether the chunks of the files in the vector db that are not in `chunks`
+                are deleted. Defaults to False.
+            index_config (dict, optional): index configuration, see load_vdb. Defaults to None.
+            unchanged_sources (set, optional): paths of the files skipped because they didn't change since the last
+                ingestion, see IngestionManifest.get_unchanged_sources, whose chunks are kept. Defaults to None.
+
+        Returns:
+            vector store
+        """
+        if db_type not in ['faiss', 'chroma', 'qdrant']:
+            raise ValueError(f'Unsupported database type: {db_type}')
+
+        manifest = IngestionManifest.load(input_db, db_type)
+        if manifest is None:
+            logger.info(f'Vector db {input_db} has no ingestion manifest, all the chunks are added')
+            manifest = IngestionManifest(db_type)
+
+        # chroma and qdrant vector dbs are updated in place, so they are copied first to be saved elsewhere
+        persist_directory = input_db
+        if db_type != 'faiss' and output_db and output_db != input_db:
+            shutil.copytree(input_db, output_db, dirs_exist_ok=True)  # type: ignore
+            persist_directory = output_db
+
+        vector_store = self.load_vdb(persist_directory, embeddings, db_type, manifest.collection_name, index_config)
+        plan = manifest.plan(chunks, delete_missing=delete_missing, unchanged_sources=unchanged_sources)
+        if len(plan.stale_ids) > 0 and db_type == 'faiss' and not faiss_index_supports_removal(vector_store.index):
+            raise ValueError(
+                f"The faiss index of vector db {input_db} can't delete the chunks of changed or deleted files, "
+                'recreate the vector db instead'
+            )
+        self._apply_ingestion_plan(vector_store, plan, db_type)
+        manifest.files = plan.files
+
+        if self.sparse_index is not None:
+            if db_type == 'faiss' and not output_db:
+                logger.warning('The BM25 index is not updated, the updated faiss vector db is not saved')
+            else:
+                if db_type == 'faiss' and output_db != input_db:
+                    os.makedirs(output_db, exist_ok=True)  # type: ignore
+                    shutil.copyfile(
+                        os.path.join(input_db, SPARSE_INDEX_FILE_NAME),  # type: ignore
+                        os.path.join(output_db, SPARSE_INDEX_FILE_NAME),  # type: ignore
+                    )
+                    self.sparse_index = BM25Index(output_db)
+                self.sparse_index.delete(plan.stale_ids)
+                self.sparse_index.add_documents(plan.chunks, plan.ids)
+
         if db_type == 'faiss':
-            vector_store = FAISS.load_local(input_db, embeddings, allow_dangerous_deserialization=True)  # type: ignore
-            new_vector_store = self.create_vector_store(chunks, embeddings, db_type, None)
-            vector_store.merge_from(new_vector_store)
             if output_db:
                 vector_store.save_local(output_db)
+                manifest.save(output_db)
+        else:
+            manifest.save(persist_directory)  # type: ignore
+
+        return vector_store
+
+    def _check_incremental_index_config(self, db_type: str, index_config: Optional[Dict[str, Any]]) -> None:
+        """Checks that the vector stores of an index configuration can be updated incrementally
+
+        Args:
+            db_type (str): vector db type
+            index_config (dict, optional): index configuration
+
+        Raises:
+            ValueError: if the faiss index can't delete the chunks of changed or deleted files
+        """
+        if db_type == 'faiss' and not faiss_factory_supports_removal(index_config):
+            factory = index_config['factory']  # type: ignore
+            raise ValueError(
+                f"faiss {factory} indexes can't delete chunks, so can't be updated incrementally, "
+                'set incremental=False to recreate the vector db'
+            )
+
+    def _apply_ingestion_plan(self, vector_store: Any, plan: IngestionPlan, db_type: str) -> None:
+        """Deletes the stale chunks of a vector store and adds the new ones
+
+        Args:
+            vector_store: vector store to update
+            plan (IngestionPlan): changes to apply
+            db_type (str): vector db type
+        """
+        num_deleted = self._delete_chunks(vector_store, plan.stale_ids, db_type)
+        if len(plan.chunks) > 0:
+            vector_store.add_documents(plan.chunks, ids=plan.ids)
+        logger.info(f'Vector store updated: {len(plan.chunks)} chunks added, {num_deleted} chunks deleted')
 
+    def _delete_chunks(self, vector_store: Any, ids: List[str], db_type: str) -> int:
+        """Deletes chunks from a vector store
+
+        Args:
+            vector_store: vector store to update
+            ids (list): ids of the chunks to delete
+            db_type (str): vector db type
+
+        Returns:
+            int: number of chunks deleted
+        """
+        if len(ids) == 0:
+            return 0
+        if db_type == 'faiss':
+            # faiss fails to delete ids it doesn't have
+            stored_ids = set(vector_store.index_to_docstore_id.values())
+            ids = [id for id in ids if id in stored_ids]
+        if len(ids) > 0:
+            vector_store.delete(ids)
+        return len(ids)
+
+    def _add_embedded_chunks(
+        self, vector_store: Any, chunks: List[Any], vectors: List[List[float]], ids: List[str], db_type: str
+    ) -> None:
+        """Adds already embedded chunks to a vector store
+
+        Args:
+            vector_store: vector store to update
+            chunks (list): chunks to add
+            vectors (list): embeddings of the chunks, unused by chroma, which embeds the chunks itself
+            ids (list): ids of the chunks
+            db_type (str): vector db type
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        if db_type == 'faiss':
+            vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
         elif db_type == 'chroma':
-            # TODO implement update method for chroma
-            pass
+            vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+        elif db_type == 'qdrant':
+            from qdrant_client.models import PointStruct
+
+            points = [
+                PointStruct(
+                    id=id,
+                    vector=vector,
+                    payload={vector_store.content_payload_key: text, vector_store.metadata_payload_key: metadata},
+                )
+                for id, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+            ]
+            vector_store.client.upsert(collection_name=vector_store.collection_name, points=points)
+
+    def _get_embedding_dimension(self, embeddings: Any, vectors: List[List[float]]) -> int:
+        """Gets the embedding dimension of a model
+
+        Args:
+            embeddings (HuggingFaceInstructEmbeddings): embedding model
+            vectors (list): embeddings already computed by the model, the model is only called if there are none
+
+        Returns:
+            int: embedding dimension
+        """
+        if len(vectors) > 0:
+            return len(vectors[0])
+        return len(embeddings.embed_query(''))
+
+    def _create_empty_vector_store(
+        self,
+        embeddings: Any,
+        db_type: str,
+        dimension: Optional[int],
+        output_db: Optional[str],
+        collection_name: Optional[str],
+        index_config: Optional[Dict[str, Any]] = None,
+        train_vectors: Optional[List[List[float]]] = None,
+    ) -> Any:
+        """Creates an empty vector store, chunks are then added with `_add_embedded_chunks`. A qdrant collection left
+        at `output_db` by a previous vector db is recreated.
+
+        Args:
+            embeddings (HuggingFaceInstructEmbeddings): embedding model
+            db_type (str): vector db type
+            dimension (int, optional): embedding dimension, unused by chroma
+            output_db (str, optional): output path to save the vector db
+            collection_name (str): collection name, for chroma and qdrant
+            index_config (dict, optional): index configuration. Defaults to None.
+            train_vectors (list, optional): embeddings the faiss indexes that need training are trained on.
+                Defaults to None.
+
+        Returns:
+            vector store
+        """
+        if db_type == 'faiss':
+            from langchain_community.docstore.in_memory import InMemoryDocstore
+
+            return FAISS(
+                embeddings, build_faiss_index(dimension, train_vectors or [], index_config), InMemoryDocstore(), {}
+            )
+        elif db_type == 'chroma':
+            self.vector_collections.add(collection_name)
+            return Chroma(
+                collection_name=collection_name,  # type: ignore
+                embedding_function=embeddings,
+                persist_directory=output_db,
+                collection_metadata=get_chroma_collection_metadata(index_config),
+            )
         elif db_type == 'qdrant':
-            # TODO implement update method for qdrant
+            from qdrant_client import QdrantClient
+            from qdrant_client.models import Distance, VectorParams
+
+            client = QdrantClient(path=output_db) if output_db else QdrantClient(location=':memory:')
+            if client.collection_exists(collection_name):  # type: ignore
+                # Its points are not in the ingestion manifest of the new vector db, so would never be deleted
+                client.delete_collection(collection_name)  # type: ignore
+            collection_kwargs = get_qdrant_collection_kwargs(index_config)
+            vectors_config = VectorParams(
+                size=dimension,  # type: ignore
+                distance=Distance.COSINE,
+                on_disk=collection_kwargs.pop('on_disk', None),
+            )
+            client.create_collection(collection_name, vectors_config, **collection_kwargs)  # type: ignore
+            return Qdrant(client=client, collection_name=collection_name, embeddings=embeddings)
+        raise ValueError(f'Unsupported database type: {db_type}')
+
+    def ingest_streaming(
+        self,
+        documents: Iterable[Any],
+        chunk_size: int,
+        chunk_overlap: int,
+        embeddings: Any,
+        db_type: str,
+        output_db: Optional[str] = None,
+        tokenizer: Optional[Any] = None,
+        incremental: bool = True,
+        ingestion_batch_size: int = 512,
+        queue_size: int = 4,
+        index_config: Optional[Dict[str, Any]] = None,
+        sparse_index: bool = False,
+        unchanged_sources: Optional[Set[str]] = None,
+    ) -> Any:
+        """Creates a vector store from a stream of documents in constant memory. Loading, splitting, embedding and
+        adding run concurrently, each in its own thread, on batches of chunks going through bounded queues, and their
+        progress and throughput are logged. If `output_db` already holds a vector db with an ingestion manifest, it's
+        updated instead, as in update_vdb with `delete_missing=True`.
+
+        Args:
+            documents (iterable): documents to ingest, e.g. from iterate_files. The documents of a same source are
+                expected to be consecutive.
+            chunk_size (int): chunk size, in characters or in tokens if a tokenizer is given
+            chunk_overlap (int): chunk overlap, in characters or in tokens if a tokenizer is given
+            embeddings (HuggingFaceInstructEmbeddings): embedding model
+            db_type (str): vector db type
+            output_db (str, optional): output path to save the vector db. Defaults to None.
+            tokenizer (optional): HuggingFace tokenizer, or tokenizer name or path. Defaults to None.
+            incremental (bool, optional): whether to update an existing vector db at `output_db`, faiss indexes that
+                can't delete chunks, like HNSW, are created with it but need it set to False to be recreated.
+                Defaults to True.
+            ingestion_batch_size (int, optional): min number of chunks per batch, batches are only cut between
+                sources. Defaults to 512.
+            queue_size (int, optional): max number of batches waiting between two stages. Defaults to 4.
+            index_config (dict, optional): index configuration, see create_vector_store. faiss indexes that need
+                training are trained once on the first `train_size` embeddings, the batches are held until then.
+                Defaults to None.
+            sparse_index (bool, optional): whether to also build a BM25 index of the chunks, see create_vector_store.
+                The BM25 index of an updated vector db is always updated. Defaults to False.
+            unchanged_sources (set, optional): paths of the files left out of the documents because they didn't change
+                since the last ingestion, see update_vdb. Defaults to None.
+
+        Returns:
+            vector store, None if there was nothing to ingest
+        """
+        if db_type not in ['faiss', 'chroma', 'qdrant']:
+            raise ValueError(f'Unsupported database type: {db_type}')
+
+        vector_store = None
+        manifest = IngestionManifest.load(output_db, db_type) if incremental else None
+        if manifest is not None:
+            # Only an existing vector db is updated incrementally
+            self._check_incremental_index_config(db_type, index_config)
+            vector_store = self.load_vdb(output_db, embeddings, db_type, manifest.collection_name, index_config)
+            if db_type == 'faiss' and not faiss_index_supports_removal(vector_store.index):
+                raise ValueError(
+                    f"The faiss index of vector db {output_db} can't delete chunks, so can't be updated "
+                    'incrementally, set incremental=False to recreate it'
+                )
+        else:
+            collection_name = {'chroma': f'collection_{self.collection_id}', 'qdrant': 'test_collection'}.get(db_type)
+            manifest = IngestionManifest(db_type, collection_name)
+            if output_db and os.path.isfile(os.path.join(output_db, SPARSE_INDEX_FILE_NAME)):
+                # Left by a previous vector db
+                os.remove(os.path.join(output_db, SPARSE_INDEX_FILE_NAME))
+            self.sparse_index = None
+        if sparse_index and self.sparse_index is None:
+            if vector_store is None:
+                self.sparse_index = BM25Index(output_db)
+            else:
+                # It would only get the new or changed chunks
+                logger.warning(f'Vector db {output_db} has no BM25 index, recreate it to add one')
+        text_splitter = self.get_text_splitter(chunk_size, chunk_overlap, tokenizer)
+        # The manifest is planned against in the embedding thread and updated in the calling thread
+        manifest_lock = threading.Lock()
+        ingested_sources: Set[str] = set()
+
+        def load(_: Iterator[Any]) -> Iterator[Any]:
+            yield from documents
+
+        def split(docs: Iterator[Any]) -> Iterator[List[Any]]:
+            batch: List[Any] = []
+            for doc in docs:
+                # Batches are only cut between sources, so that each source is planned as a whole
+                if len(batch) >= ingestion_batch_size and get_source(doc) != get_source(batch[-1]):
+                    yield batch
+                    batch = []
+                batch.extend(text_splitter.split_documents([doc]))
+            if len(batch) > 0:
+                yield batch
+
+        def embed(batches: Iterator[List[Any]]) -> Iterator[Any]:
+            for batch in batches:
+                with manifest_lock:
+                    plan = manifest.plan_sources(batch)  # type: ignore
+                # chroma embeds the chunks itself when they are added
+                vectors = (
+                    embeddings.embed_documents([chunk.page_content for chunk in plan.chunks])
+                    if plan.chunks and db_type != 'chroma'
+                    else []
+                )
+                yield {get_source(chunk) for chunk in batch}, plan, vectors
+
+        train_size = (index_config or {}).get('train_size', DEFAULT_FAISS_TRAIN_SIZE)
+
+        def create_vector_store(batches: List[Any]) -> None:
+            nonlocal vector_store
+            vectors = [vector for _, batch_vectors in batches for vector in batch_vectors]
+            vector_store = self._create_empty_vector_store(
+                embeddings,
+                db_type,
+                None if db_type == 'chroma' else self._get_embedding_dimension(embeddings, vectors),
+                output_db,
+                manifest.collection_name,  # type: ignore
+                index_config,
+                vectors,
+            )
+
+        def add_batches(batches: List[Any]) -> int:
+            for plan, vectors in batches:
+                self._delete_chunks(vector_store, plan.stale_ids, db_type)
+                if len(plan.chunks) > 0:
+                    self._add_embedded_chunks(vector_store, plan.chunks, vectors, plan.ids, db_type)
+            return sum(len(plan.chunks) for plan, _ in batches)
+
+        def add(embedded_batches: Iterator[Any]) -> Iterator[int]:
+            # Batches embedded before the vector store is created, faiss indexes that need training are only created
+            # once there are `train_size` embeddings to train them on, or at the end of the stream
+            pending_batches: List[Any] = []
+            num_pending_chunks = 0
+            needs_training = None
+            for sources, plan, vectors in embedded_batches:
+                num_added = 0
+                if vector_store is None:
+                    pending_batches.append((plan, vectors))
+                    num_pending_chunks += len(plan.chunks)
+                    if needs_training is None and len(plan.chunks) > 0:
+                        needs_training = db_type == 'faiss' and faiss_index_needs_training(
+                            self._get_embedding_dimension(embeddings, vectors), index_config
+                        )
+                    if num_pending_chunks > 0 and (not needs_training or num_pending_chunks >= train_size):
+                        create_vector_store(pending_batches)
+                        num_added = add_batches(pending_batches)
+                        pending_batches = []
+                else:
+                    num_added = add_batches([(plan, vectors)])
+                if self.sparse_index is not None:
+                    self.sparse_index.delete(plan.stale_ids)
+                    self.sparse_index.add_documents(plan.chunks, plan.ids)
+                with manifest_lock:
+                    for source in sources:
+                        manifest.files[source] = plan.files[source]  # type: ignore
+                ingested_sources.update(sources)
+                yield num_added
+            if vector_store is None and num_pending_chunks > 0:
+                create_vector_store(pending_batches)
+                yield add_batches(pending_batches)
+
+        stages = [
+            PipelineStage('load', load, 'documents'),
+            PipelineStage('split', split, 'chunks', len),
+            PipelineStage('embed', embed, 'chunks', lambda embedded_batch: len(embedded_batch[1].chunks)),
+            PipelineStage('add', add, 'chunks', lambda num_chunks: num_chunks),
+        ]
+        for _ in run_pipeline(stages, queue_size=queue_size):
             pass
 
+        # The sources not in the documents anymore were deleted
+        unchanged_sources = unchanged_sources or set()
+        missing_sources = [
+            source for source in manifest.files if source not in ingested_sources and source not in unchanged_sources
+        ]
+        if vector_store is not None and len(missing_sources) > 0:
+            stale_ids = [id for source in missing_sources for id in manifest.files[source]['chunk_ids']]
+            num_deleted = self._delete_chunks(vector_store, stale_ids, db_type)
+            if self.sparse_index is not None:
+                self.sparse_index.delete(stale_ids)
+            logger.info(f'{num_deleted} chunks of {len(missing_sources)} deleted sources removed')
+        for source in missing_sources:
+            del manifest.files[source]
+
+        if vector_store is None:
+            logger.warning('No chunks to ingest, no vector store created')
+        elif output_db:
+            if db_type == 'faiss':
+                vector_store.save_local(output_db)
+            manifest.save(output_db)
+            logger.info(f'Vector store saved to {output_db}')
+
         return vector_store
 
     def create_vdb(
@@ -304,19 +923,122 @@ class VectorDb:
         batch_size: Optional[int] = None,
         coe: Optional[bool] = None,
         select_expert: Optional[str] = None,
+        incremental: bool = True,
+        streaming: bool = False,
+        ingestion_batch_size: int = 512,
+        num_workers: Optional[int] = None,
+        index_config: Optional[Dict[str, Any]] = None,
+        sparse_index: bool = False,
     ) -> Any:
-        docs = self.load_files(input_path, recursive=recursive, load_txt=load_txt, load_pdf=load_pdf, urls=urls)
+        """Creates a vector database from the raw files of an input directory and urls. If `output_db` already holds a
+        vector db with an ingestion manifest, it is updated instead: only the new or changed files are embedded, and
+        the chunks of the changed or deleted files are removed. The files whose modification time and size didn't
+        change are not loaded.
 
-        if tokenizer is None:
-            chunks = self.get_text_chunks(docs, chunk_size, chunk_overlap)
-        else:
-            chunks = self.get_token_chunks(docs, chunk_size, chunk_overlap, tokenizer)
+        Args:
+            input_path (str): input directory
+            chunk_size (int): chunk size, in characters or in tokens if a tokenizer is given
+            chunk_overlap (int): chunk overlap, in characters or in tokens if a tokenizer is given
+            db_type (str): vector db type
+            output_db (str, optional): output path to save the vector db. Defaults to None.
+            incremental (bool, optional): whether to update an existing vector db at `output_db` instead of creating a
+                new one, faiss indexes that can't delete chunks, like HNSW, are created with it but need it set to
+                False to be recreated. Defaults to True.
+            streaming (bool, optional): whether to load, split, embed and add the files concurrently in batches, in
+                constant memory, see ingest_streaming. Defaults to False.
+            ingestion_batch_size (int, optional): min number of chunks per batch when streaming. Defaults to 512.
+            num_workers (int, optional): if set, the files are loaded and chunked in this number of processes, see
+                load_and_chunk_files. Defaults to None.
+            index_config (dict, optional): index configuration of the vector db type, see create_vector_store.
+                Defaults to None.
+            sparse_index (bool, optional): whether to also build a BM25 index of the chunks, see create_vector_store.
+                Defaults to False.
+
+        Returns:
+            vector store
+        """
+        manifest = IngestionManifest.load(output_db, db_type) if incremental else None
+        if manifest is not None:
+            # Only an existing vector db is updated incrementally
+            self._check_incremental_index_config(db_type, index_config)
 
         embeddings = APIGateway.load_embedding_model(
             type=embedding_type, batch_size=batch_size, coe=coe, select_expert=select_expert
         )
 
-        vector_store = self.create_vector_store(chunks, embeddings, db_type, output_db)
+        # The files unchanged since the last ingestion are not loaded again
+        unchanged_sources = set(manifest.get_unchanged_sources()) if manifest is not None else set()
+        if len(unchanged_sources) > 0:
+            logger.info(f'{len(unchanged_sources)} files unchanged since the last ingestion are skipped')
+
+        if streaming:
+            docs_stream = self.iterate_files(
+                input_path,
+                recursive=recursive,
+                load_txt=load_txt,
+                load_pdf=load_pdf,
+                urls=urls,
+                skip_sources=unchanged_sources,
+            )
+            return self.ingest_streaming(
+                docs_stream,
+                chunk_size,
+                chunk_overlap,
+                embeddings,
+                db_type,
+                output_db,
+                tokenizer=tokenizer,
+                incremental=incremental,
+                ingestion_batch_size=ingestion_batch_size,
+                index_config=index_config,
+                sparse_index=sparse_index,
+                unchanged_sources=unchanged_sources,
+            )
+
+        if num_workers is not None:
+            chunks = self.load_and_chunk_files(
+                input_path,
+                chunk_size,
+                chunk_overlap,
+                recursive=recursive,
+                tokenizer=tokenizer,
+                load_txt=load_txt,
+                load_pdf=load_pdf,
+                urls=urls,
+                num_workers=num_workers,
+                skip_sources=unchanged_sources,
+            )
+        else:
+            docs = self.load_files(
+                input_path,
+                recursive=recursive,
+                load_txt=load_txt,
+                load_pdf=load_pdf,
+                urls=urls,
+                skip_sources=unchanged_sources,
+            )
+
+            if tokenizer is None:
+                chunks = self.get_text_chunks(docs, chunk_size, chunk_overlap)
+            else:
+                chunks = self.get_token_chunks(docs, chunk_size, chunk_overlap, tokenizer)
+
+        if manifest is not None:
+            # The vector db was already created, only the new or changed files are embedded
+            vector_store = self.update_vdb(
+                chunks,
+                embeddings,
+                db_type,
+                output_db,
+                output_db,
+                delete_missing=True,
+                index_config=index_config,
+                unchanged_sources=unchanged_sources,
+            )
+        else:
+            vector_store = self.create_vector_store(
+                chunks, embeddings, db_type, output_db, index_config=index_config, sparse_index=sparse_index
+            )
 
         return vector_store
 
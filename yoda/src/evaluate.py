@@ -19,9 +19,9 @@ from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain_community.embeddings import HuggingFaceInstructEmbeddings
 from tqdm import tqdm
-from transformers import AutoTokenizer
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.tokenizer_registry import get_tokenizer
 from utils.vectordb.vector_db import VectorDb
 from yoda.prompts.prompts import LLAMA_CHAT_PROMPT_POSTFIX, LLAMA_CHAT_PROMPT_PREFIX, RAG_prompt_template
 
@@ -80,7 +80,7 @@ if __name__ == '__main__':
     CUSTOMPROMPT = PromptTemplate(template=RAG_prompt_template, input_variables=['context', 'question'])
 
     LLAMA_2_70B_CHAT_PATH = config['tokenizer']
-    tokenizer = AutoTokenizer.from_pretrained(LLAMA_2_70B_CHAT_PATH)
+    tokenizer = get_tokenizer(LLAMA_2_70B_CHAT_PATH, lazy=True)
 
     # read in evaluation samples
     qa_eval_file = os.path.join(data_dir, 'processed_data', 'article_data.jsonl')
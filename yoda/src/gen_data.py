@@ -16,12 +16,12 @@ import jsonlines
 import tqdm
 import yaml
 from dotenv import load_dotenv
-from transformers import AutoTokenizer
 
 load_dotenv(os.path.join(repo_dir, '.env'))
 
 from typing import Any, Dict, List, Optional
 
+from utils.model_wrappers.tokenizer_registry import get_tokenizer
 from yoda.prompts.prompts import QA_GEN_TEMPLATE
 from yoda.tools import data_reader, qa_processing
 
@@ -165,7 +165,7 @@ if __name__ == '__main__':
     base_dir = config['src_folder']
     subfolders = config['src_subfolders']
     tokenizer_path = config['tokenizer']
-    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    tokenizer = get_tokenizer(tokenizer_path)
 
     articles = data_reader.collect_articles([os.path.join(base_dir, folder) for folder in subfolders])
     logging.info('number of articles: {}'.format(len(articles)))